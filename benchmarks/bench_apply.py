@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark the apply plans of PDFProcessor.apply_redactions.
+
+Redacts the first words of every page of the sample PDFs and of three
+synthetic documents (a text-only statement, an image-heavy brochure whose
+redactions miss the photos, and one whose redactions sit on top of the
+photos) with every plan in APPLY_PLANS, and reports the apply time and the
+paths taken.
+
+Usage:
+    python benchmarks/bench_apply.py [--pages 20] [--repeat 3]
+"""
+
+import os
+import sys
+import glob
+import random
+import tempfile
+
+import click
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.pdf_processor import PDFProcessor, APPLY_PLANS
+from pdf_pii_redactor.profiling import Profiler
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "sample_pdfs")
+
+
+def create_brochure_pdf(path, page_count, caption_on_photo):
+    """Create an image-heavy document with a caption naming a person on every page."""
+    rng = random.Random(1)
+    noise = bytes(rng.getrandbits(8) for _ in range(800 * 600 * 3))
+    photo = fitz.Pixmap(fitz.csRGB, 800, 600, noise, 0).tobytes("jpg")
+
+    doc = fitz.open()
+    for page_index in range(page_count):
+        page = doc.new_page()
+        for offset in range(4):
+            page.insert_image(fitz.Rect(50 + offset * 10, 50, 550, 425), stream=photo)
+        shape = page.new_shape()
+        for _ in range(500):
+            shape.draw_line((rng.uniform(50, 550), rng.uniform(450, 650)),
+                            (rng.uniform(50, 550), rng.uniform(450, 650)))
+        shape.finish()
+        shape.commit()
+        page.insert_text((60, 300) if caption_on_photo else (50, 700), f"Photo by John Doe {page_index}")
+    doc.save(path)
+    doc.close()
+
+
+def create_text_pdf(path, page_count):
+    """Create a text-only document, such as a generated letter or statement."""
+    doc = fitz.open()
+    for page_index in range(page_count):
+        page = doc.new_page()
+        text = "\n".join(f"Statement line {i} for John Doe, 42 Long Street, Springfield." for i in range(40))
+        page.insert_textbox(fitz.Rect(50, 60, 550, 780), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def first_words(pdf_path, count=15):
+    """Build redaction instructions for the first words of every page."""
+    redactions = []
+    doc = fitz.open(pdf_path)
+    for page in doc:
+        for word in page.get_text("words")[:count]:
+            redactions.append({"page_num": page.number, "x0": word[0], "y0": word[1], "x1": word[2],
+                               "y1": word[3], "text": word[4], "type": "name"})
+    doc.close()
+    return redactions
+
+
+def time_plan(pdf_path, output_path, redactions, plan, repeat):
+    """Return the best apply time and the paths taken with a plan."""
+    best = None
+    paths = {}
+    for _ in range(repeat):
+        profiler = Profiler()
+        processor = PDFProcessor(profiler=profiler, apply_plan=plan)
+        paths = processor.apply_redactions(pdf_path, output_path, redactions)["apply_paths"]
+        elapsed = profiler.stages["apply"]["total"]
+        best = elapsed if best is None else min(best, elapsed)
+    return best, paths
+
+
+@click.command()
+@click.option("--pages", "page_count", default=20, help="Pages in the synthetic documents")
+@click.option("--repeat", default=3, help="Repetitions per plan (best time is reported)")
+def main(page_count, repeat):
+    """Run the apply benchmark."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        text_only = os.path.join(temp_dir, "text_only.pdf")
+        brochure = os.path.join(temp_dir, "brochure.pdf")
+        overlapping = os.path.join(temp_dir, "overlapping.pdf")
+        output_path = os.path.join(temp_dir, "output.pdf")
+        create_text_pdf(text_only, page_count)
+        create_brochure_pdf(brochure, page_count, caption_on_photo=False)
+        create_brochure_pdf(overlapping, page_count, caption_on_photo=True)
+
+        documents = [("sample PDFs", sorted(glob.glob(os.path.join(SAMPLE_DIR, "*.pdf")))),
+                     (f"text only ({page_count} pages)", [text_only]),
+                     (f"brochure, captions off photos ({page_count} pages)", [brochure]),
+                     (f"brochure, captions on photos ({page_count} pages)", [overlapping])]
+
+        click.echo(f"{'document':<45} {'plan':<10} {'apply ms':>9}  paths")
+        for name, pdf_paths in documents:
+            prepared = [(pdf_path, first_words(pdf_path)) for pdf_path in pdf_paths]
+            for plan in APPLY_PLANS:
+                total = 0.0
+                paths = {}
+                for pdf_path, redactions in prepared:
+                    elapsed, document_paths = time_plan(pdf_path, output_path, redactions, plan, repeat)
+                    total += elapsed
+                    for path, count in document_paths.items():
+                        paths[path] = paths.get(path, 0) + count
+                click.echo(f"{name:<45} {plan:<10} {total * 1000:>9.1f}  {paths}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark recording runs in the audit store.
+
+Records synthetic redaction statistics (a few PII types over several pages)
+either synchronously, one transaction per run as a naive sink would, or
+through the background writer, which batches the runs queued while the
+previous batch was written. Reports the time the caller is blocked per run
+and the time until every run is on disk, then times a query by type.
+
+Usage:
+    python benchmarks/bench_audit.py [--runs 5000] [--pages 10]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+import click
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.audit import AuditStore
+
+PII_TYPES = ["name", "email", "phone", "address", "credit_card", "dob"]
+
+
+def make_stats(rng, pages):
+    """Return statistics shaped like those of PDFRedactor.redact_pdf."""
+    page_stats = []
+    totals = {}
+    for page in range(pages):
+        counts = {pii_type: rng.randint(1, 5) for pii_type in rng.sample(PII_TYPES, rng.randint(0, 3))}
+        for pii_type, count in counts.items():
+            totals[pii_type] = totals.get(pii_type, 0) + count
+        page_stats.append({"page": page, "pii_types": counts})
+    return {"pages_processed": pages, "language": "en", "redacted_items": sum(totals.values()),
+            "pii_types": totals, "page_stats": page_stats,
+            "timings": {"elapsed": rng.random() * 10, "detection": {page: rng.random() for page in range(pages)}}}
+
+
+@click.command()
+@click.option("--runs", default=5000, help="Runs to record per mode")
+@click.option("--pages", default=10, help="Pages per run")
+def main(runs, pages):
+    """Run the audit store benchmark."""
+    rng = random.Random(0)
+    runs_stats = [make_stats(rng, pages) for _ in range(runs)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        click.echo(f"{'mode':<14} {'caller us/run':>14} {'total s':>9}")
+
+        store = AuditStore(os.path.join(temp_dir, "sync.db"))
+        connection = store._connect()
+        start = time.perf_counter()
+        for index, stats in enumerate(runs_stats):
+            store._write(connection, [{"recorded_at": time.time(), "source": f"/data/{index}.pdf", "output": None,
+                                       "sha256": None, "method": "redact_pdf", "model": "gpt-4o", "status": "ok",
+                                       "error": None, "stats": stats}])
+        elapsed = time.perf_counter() - start
+        connection.close()
+        click.echo(f"{'synchronous':<14} {elapsed / runs * 1e6:>14.0f} {elapsed:>9.2f}")
+
+        store = AuditStore(os.path.join(temp_dir, "batched.db"))
+        start = time.perf_counter()
+        for index, stats in enumerate(runs_stats):
+            store.record(f"/data/{index}.pdf", stats, model="gpt-4o")
+        queued = time.perf_counter() - start
+        store.close()
+        elapsed = time.perf_counter() - start
+        click.echo(f"{'background':<14} {queued / runs * 1e6:>14.0f} {elapsed:>9.2f}")
+
+        start = time.perf_counter()
+        documents = store.query(pii_type="credit_card", limit=100)
+        click.echo(f"Query by type: {len(documents)} documents in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
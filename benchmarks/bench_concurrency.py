@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark fixed and adaptive limits on detection requests in flight.
+
+Sends requests from many threads to a simulated backend that throttles
+(HTTP 429) the requests beyond its capacity and slows down as its load
+grows. Each fixed limit and the AdaptiveLimiter retry throttled requests
+with the same backoff. Reports the throughput, the 429s received, the
+retries and the final limit.
+
+Usage:
+    python benchmarks/bench_concurrency.py [--requests 2000] [--capacity 8] [--threads 32]
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+
+import click
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.concurrency import AdaptiveLimiter
+
+
+class RateLimited(Exception):
+    """Stand-in for openai.RateLimitError."""
+
+    status_code = 429
+
+
+class Backend:
+    """Simulated LLM API with a capacity and a latency that grows with the load."""
+
+    def __init__(self, capacity, latency):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+
+    def request(self):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.throttled += 1
+                raise RateLimited("Rate limit reached")
+            self.in_flight += 1
+            delay = self.latency * self._random.uniform(0.5, 1.5) * max(1.0, self.in_flight / (self.capacity / 2))
+        try:
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def run(limiter, backend, requests, threads):
+    """Send the requests through the limiter; return the elapsed seconds and the failed requests."""
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    failed = []
+
+    def worker():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            try:
+                limiter.call(backend.request)
+            except RateLimited:
+                with lock:
+                    failed.append(1)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, len(failed)
+
+
+@click.command()
+@click.option("--requests", default=2000, help="Requests per run")
+@click.option("--capacity", default=8, help="Concurrent requests the backend accepts")
+@click.option("--threads", default=32, help="Threads sending requests")
+@click.option("--latency", default=0.005, help="Backend latency in seconds when lightly loaded")
+def main(requests, capacity, threads, latency):
+    """Run the concurrency benchmark."""
+    limiters = [(f"fixed {limit}", AdaptiveLimiter(initial_limit=limit, min_limit=limit, max_limit=limit,
+                                                   retry_delay=0.005, max_retries=6))
+                for limit in (2, capacity, threads)]
+    limiters.append(("adaptive", AdaptiveLimiter(initial_limit=2, max_limit=threads,
+                                                 retry_delay=0.005, max_retries=6)))
+
+    click.echo(f"{'limit':<10} {'req/s':>8} {'429s':>7} {'retries':>8} {'failed':>7} {'final':>6}")
+    for name, limiter in limiters:
+        backend = Backend(capacity, latency)
+        elapsed, failed = run(limiter, backend, requests, threads)
+        metrics = limiter.metrics()
+        click.echo(f"{name:<10} {requests / elapsed:>8.0f} {backend.throttled:>7} {metrics['retries']:>8} "
+                   f"{failed:>7} {metrics['limit']:>6}")
+
+
+if __name__ == "__main__":
+    main()
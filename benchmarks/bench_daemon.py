@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-file overhead of the command-line interface with and without the daemon.
+
+Runs "pdf-pii-redactor redact" as a new process on a one-page PDF, once per
+file like an upstream system would, either in-process or forwarded to a
+daemon started by this script. Both use a local detector that answers at
+once, so the times are the fixed cost of a run: interpreter startup, imports,
+language profiles and the redaction of a small document. The in-process runs
+would also open a new HTTPS connection to the API, which is not measured.
+
+Usage:
+    python benchmarks/bench_daemon.py [--runs 10]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import subprocess
+
+import click
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.daemon import RedactionDaemon
+from pdf_pii_redactor.redactor import PDFRedactor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs the CLI in-process with the local detector in place of the API
+IN_PROCESS = """
+import sys
+from unittest import mock
+sys.path.insert(0, sys.argv[1])
+sys.argv = sys.argv[:1] + sys.argv[2:]
+
+class FakeDetector:
+    model = "fake"
+    def __init__(self, **kwargs):
+        pass
+    def detect_pii(self, text, language="en"):
+        return [{"type": "name", "value": "John Doe"}] if "John Doe" in text else []
+
+with mock.patch("pdf_pii_redactor.redactor.PIIDetector", FakeDetector):
+    from pdf_pii_redactor.main import main
+    main()
+"""
+
+
+class FakeDetector:
+    """Detector stand-in that reports John Doe at once."""
+
+    model = "fake"
+
+    def detect_pii(self, text, language="en"):
+        return [{"type": "name", "value": "John Doe"}] if "John Doe" in text else []
+
+
+def time_runs(command, runs):
+    """Return the sorted wall times of running a command several times."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True, cwd=ROOT)
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+
+@click.command()
+@click.option("--runs", default=10, help="Runs per mode")
+def main(runs):
+    """Run the daemon benchmark."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "input.pdf")
+        output_path = os.path.join(temp_dir, "output.pdf")
+        socket_path = os.path.join(temp_dir, "daemon.sock")
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Statement for John Doe.")
+        doc.save(input_path)
+        doc.close()
+
+        daemon = RedactionDaemon(socket_path, lambda **options: PDFRedactor(pii_detector=FakeDetector()))
+        daemon.bind()
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+
+        arguments = ["redact", input_path, output_path, "--openai-api-key", "test", "--socket", socket_path]
+        try:
+            modes = [
+                ("in-process", time_runs([sys.executable, "-c", IN_PROCESS, ROOT] + arguments + ["--in-process"],
+                                         runs)),
+                ("daemon", time_runs([sys.executable, "-m", "pdf_pii_redactor.main"] + arguments, runs)),
+            ]
+        finally:
+            daemon.shutdown()
+            thread.join()
+
+        click.echo(f"{'mode':<12} {'median ms':>10} {'min ms':>8}")
+        for name, times in modes:
+            click.echo(f"{name:<12} {times[len(times) // 2] * 1000:>10.0f} {times[0] * 1000:>8.0f}")
+        click.echo(f"Daemon jobs: {daemon.jobs}")
+
+
+if __name__ == "__main__":
+    main()
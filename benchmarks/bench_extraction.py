@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the text extraction profiles.
+
+Times every profile in EXTRACTION_PROFILES on the sample PDFs and on a
+synthetic text-heavy document, and checks that each profile still exposes
+the emails and phone numbers found with the default profile.
+
+Usage:
+    python benchmarks/bench_extraction.py [--pages 200] [--repeat 3]
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import tempfile
+
+import click
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.pdf_processor import PDFProcessor, EXTRACTION_PROFILES
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "sample_pdfs")
+
+# Values that any profile must keep intact for the detector to see them
+RECALL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+|\(?\d{3}\)?[ -]\d{3}-\d{4}")
+
+LINE = ("Invoice {n} issued to Jane Roe, 42 Long Street, Springfield. Contact jane.roe{n}@example.com "
+        "or (555) 010-{n:04d}. Terms: payment due within thirty days of the invoice date.")
+
+
+def create_text_heavy_pdf(path, page_count):
+    """Create a synthetic document with dense text, a header and a footer."""
+    doc = fitz.open()
+    for page_index in range(page_count):
+        page = doc.new_page()
+        page.insert_text((50, 30), f"ACME Corp - Confidential - page {page_index + 1}", fontsize=8)
+        text = "\n".join(LINE.format(n=page_index * 40 + i) for i in range(40))
+        page.insert_textbox(fitz.Rect(50, 60, 550, 780), text, fontsize=7)
+        page.insert_text((50, 820), "Registered office: 1 Example Way", fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def time_profile(processor, pdf_path, profile, repeat, **margins):
+    """Return the best extraction time and the extracted pages."""
+    best = None
+    pages = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = processor.extract_text(pdf_path, profile=profile, **margins)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, pages
+
+
+def recall_values(pages):
+    """Collect the recall-checked values from extracted pages."""
+    return {(page["page_num"], value) for page in pages for value in RECALL_PATTERN.findall(page["text"])}
+
+
+@click.command()
+@click.option("--pages", "page_count", default=200, help="Pages in the synthetic document")
+@click.option("--repeat", default=3, help="Repetitions per profile (best time is reported)")
+def main(page_count, repeat):
+    """Run the extraction benchmark."""
+    processor = PDFProcessor()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        synthetic = os.path.join(temp_dir, "synthetic.pdf")
+        create_text_heavy_pdf(synthetic, page_count)
+        
+        documents = sorted(glob.glob(os.path.join(SAMPLE_DIR, "*.pdf"))) + [synthetic]
+        
+        click.echo(f"{'document':<45} {'profile':<8} {'margins':<8} {'ms':>9} {'pages/s':>9} {'recall':>7}")
+        for pdf_path in documents:
+            name = "synthetic (%d pages)" % page_count if pdf_path == synthetic else os.path.basename(pdf_path)
+            _, baseline_pages = time_profile(processor, pdf_path, "default", 1)
+            expected = recall_values(baseline_pages)
+            
+            runs = [(profile, {}) for profile in EXTRACTION_PROFILES]
+            runs.append(("words", {"header_margin": 40, "footer_margin": 30}))
+            for profile, margins in runs:
+                elapsed, pages = time_profile(processor, pdf_path, profile, repeat, **margins)
+                found = recall_values(pages)
+                recall = len(expected & found) / len(expected) if expected else 1.0
+                with fitz.open(pdf_path) as doc:
+                    total_pages = len(doc)
+                click.echo(f"{name:<45} {profile:<8} {'yes' if margins else 'no':<8} "
+                           f"{elapsed * 1000:>9.2f} {total_pages / elapsed:>9.0f} {recall:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark compiling, loading and scanning a large gazetteer.
+
+Compiles synthetic person names and account numbers, then times loading the
+compiled file and scanning page-sized texts with it, against looking up every
+term in the page text one by one (the cost of handing a term list to a
+per-term search).
+
+Usage:
+    python benchmarks/bench_gazetteer.py [--terms 200000] [--pages 20]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+import click
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.gazetteer import Gazetteer, compile_gazetteer, normalize_term
+
+FIRST_NAMES = ["John", "Jane", "Maria", "Ahmed", "Wei", "Olga", "Pierre", "Aiko", "Carlos", "Fatima"]
+WORDS = ["invoice", "payment", "transfer", "account", "balance", "statement", "received", "due", "the", "of"]
+
+
+def make_terms(count, rng):
+    """Return (type, term) pairs: names and account numbers."""
+    terms = []
+    for index in range(count):
+        if index % 2:
+            terms.append(("account", f"ACC-{rng.randrange(10 ** 9):09d}"))
+        else:
+            terms.append(("name", f"{rng.choice(FIRST_NAMES)} Surname{index}"))
+    return terms
+
+
+def make_page(terms, rng, words=800, hits=5):
+    """Return a page text of filler words with a few terms."""
+    tokens = [rng.choice(WORDS) for _ in range(words)]
+    for _ in range(hits):
+        tokens[rng.randrange(words)] = rng.choice(terms)[1]
+    return " ".join(tokens)
+
+
+@click.command()
+@click.option("--terms", "term_count", default=200000, help="Number of terms")
+@click.option("--pages", "page_count", default=20, help="Number of pages to scan")
+@click.option("--naive-terms", default=20000, help="Terms looked up one by one (the naive scan is slow)")
+def main(term_count, page_count, naive_terms):
+    """Run the gazetteer benchmark."""
+    rng = random.Random(0)
+    terms = make_terms(term_count, rng)
+    pages = [make_page(terms[:naive_terms], rng) for _ in range(page_count)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "bench.gaz")
+        start = time.perf_counter()
+        result = compile_gazetteer(terms, path)
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        gazetteer = Gazetteer(path)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        hits = sum(len(gazetteer.find(page)) for page in pages)
+        scan_time = time.perf_counter() - start
+        gazetteer.close()
+
+        click.echo(f"Compiled {result['terms']} terms into {result['nodes']} nodes, "
+                   f"{os.path.getsize(path) / 1e6:.1f} MB in {compile_time:.2f} s")
+        click.echo(f"Load: {load_time * 1000:.2f} ms")
+        click.echo(f"Scan: {scan_time / page_count * 1000:.2f} ms per page "
+                   f"({len(pages[0])} characters), {hits} hits")
+
+    normalized = [normalize_term(term) for _, term in terms[:naive_terms]]
+    start = time.perf_counter()
+    for page in pages:
+        text = normalize_term(page)
+        [term for term in normalized if term in text]
+    naive_time = time.perf_counter() - start
+    click.echo(f"Naive lookup of {naive_terms} terms: {naive_time / page_count * 1000:.2f} ms per page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark the leak verification of PDFProcessor.apply_redactions.
+
+Redacts every occurrence of the first capitalized words and numbers of every
+page (stand-ins for names and account numbers) of the sample PDFs and of a synthetic text-heavy document, with verification off and on, and
+reports the local processing time (extraction, apply and save), the time of
+the verify stage and its overhead. Detection requests, which take far longer
+than all local stages, are not included. For comparison, it also times a
+separate check that reopens the output and runs page.search_for() for every
+redacted value.
+
+Usage:
+    python benchmarks/bench_verify.py [--pages 50] [--repeat 3]
+"""
+
+import os
+import sys
+import glob
+import tempfile
+
+import click
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.pdf_processor import PDFProcessor
+from pdf_pii_redactor.profiling import Profiler
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "sample_pdfs")
+
+
+def create_text_pdf(path, page_count):
+    """Create a text-heavy document with names and account numbers on every page."""
+    doc = fitz.open()
+    for page_index in range(page_count):
+        page = doc.new_page()
+        text = "\n".join(f"Transfer {i} from John Doe, account DE{page_index:04d}{i:06d}, to Jane Roe."
+                         for i in range(60))
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontsize=7)
+    doc.save(path)
+    doc.close()
+
+
+def pii_like_words(pdf_path, count=10):
+    """Build redaction instructions for every occurrence of the first capitalized words and numbers of every page."""
+    redactions = []
+    doc = fitz.open(pdf_path)
+    for page in doc:
+        words = [word[4].strip(".,:;") for word in page.get_text("words")]
+        values = list(dict.fromkeys(word for word in words
+                                    if len(word) > 3 and (word.istitle() or word[-1].isdigit())))[:count]
+        for value in values:
+            for rect in page.search_for(value):
+                redactions.append({"page_num": page.number, "x0": rect.x0, "y0": rect.y0, "x1": rect.x1,
+                                   "y1": rect.y1, "text": value, "type": "name"})
+    doc.close()
+    return redactions
+
+
+def time_extraction(pdf_path, repeat):
+    """Return the best text extraction time of a document."""
+    best = None
+    for _ in range(repeat):
+        profiler = Profiler()
+        PDFProcessor(profiler=profiler).extract_text(pdf_path)
+        elapsed = profiler.stages["extraction"]["total"]
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def time_run(pdf_path, output_path, redactions, verify, repeat):
+    """Return the best stage times of apply_redactions with a verify mode."""
+    best = None
+    for _ in range(repeat):
+        profiler = Profiler()
+        PDFProcessor(profiler=profiler, verify=verify).apply_redactions(pdf_path, output_path, redactions)
+        times = {stage: profiler.stages.get(stage, {"total": 0.0})["total"]
+                 for stage in ("apply", "verify", "save")}
+        if best is None or sum(times.values()) < sum(best.values()):
+            best = times
+    return best
+
+
+def time_separate_check(pdf_path, output_path, redactions, repeat):
+    """Return the best time of reopening a redacted output and searching every value on its page."""
+    PDFProcessor().apply_redactions(pdf_path, output_path, redactions)
+    best = None
+    for _ in range(repeat):
+        profiler = Profiler()
+        with profiler.stage("check"):
+            doc = fitz.open(output_path)
+            for redaction in redactions:
+                doc[redaction["page_num"]].search_for(redaction["text"])
+            doc.close()
+        elapsed = profiler.stages["check"]["total"]
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+@click.command()
+@click.option("--pages", "page_count", default=50, help="Pages in the synthetic document")
+@click.option("--repeat", default=3, help="Repetitions per mode (best time is reported)")
+def main(page_count, repeat):
+    """Run the verification benchmark."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        text_pdf = os.path.join(temp_dir, "text_heavy.pdf")
+        output_path = os.path.join(temp_dir, "output.pdf")
+        create_text_pdf(text_pdf, page_count)
+        documents = [("sample PDFs", sorted(glob.glob(os.path.join(SAMPLE_DIR, "*.pdf")))),
+                     (f"text heavy ({page_count} pages)", [text_pdf])]
+
+        click.echo(f"{'document':<25} {'local ms':>9} {'verify ms':>10} {'overhead':>9} {'separate check ms':>18}")
+        for name, pdf_paths in documents:
+            baseline = verified = verify = separate = 0.0
+            for pdf_path in pdf_paths:
+                redactions = pii_like_words(pdf_path)
+                extraction = time_extraction(pdf_path, repeat)
+                off = time_run(pdf_path, output_path, redactions, "off", repeat)
+                report = time_run(pdf_path, output_path, redactions, "report", repeat)
+                baseline += extraction + off["apply"] + off["save"]
+                verified += extraction + sum(report.values())
+                verify += report["verify"]
+                separate += time_separate_check(pdf_path, output_path, redactions, repeat)
+            overhead = (verified - baseline) / baseline * 100
+            click.echo(f"{name:<25} {baseline * 1000:>9.1f} {verify * 1000:>10.1f} {overhead:>8.1f}% "
+                       f"{separate * 1000:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Load-test the web app with concurrent uploads.
+
+Starts the web app on a local port, either on the single-process threaded
+development server or on the pre-forking server, with a fake detector that
+answers after a fixed latency (a stand-in for the LLM), and drives it with
+concurrent uploads of distinct synthetic documents. Reports requests/s and
+latency percentiles for each server.
+
+Usage:
+    python benchmarks/bench_web.py [--requests 64] [--concurrency 8] [--workers 4] [--latency 0.2]
+"""
+
+import os
+import sys
+import time
+import uuid
+import signal
+import logging
+import tempfile
+import http.client
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import click
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from werkzeug.serving import make_server
+
+from pdf_pii_redactor import web
+from pdf_pii_redactor.redactor import PDFRedactor
+from pdf_pii_redactor.result_store import ResultStore
+from pdf_pii_redactor.server import PreforkServer
+
+
+class FakeDetector:
+    """Detector stand-in that reports John Doe after a fixed latency."""
+
+    model = "fake"
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def detect_pii(self, text, language="en"):
+        time.sleep(self.latency)
+        return [{"type": "name", "value": "John Doe"}] if "John Doe" in text else []
+
+
+def create_pdf(index, page_count):
+    """Return the content of a distinct text-heavy document naming John Doe on every page."""
+    doc = fitz.open()
+    for page_index in range(page_count):
+        text = "\n".join(f"Upload {index}, page {page_index}, line {line}: transfer from John Doe to Jane Roe."
+                         for line in range(60))
+        doc.new_page().insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontsize=7)
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+def upload(port, content):
+    """Upload a document and return its latency, or None if it failed."""
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"letter.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    try:
+        connection.request("POST", "/", body, {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        response = connection.getresponse()
+        response.read()
+        ok = response.status == 302 and "/download/" in response.getheader("Location", "")
+    except OSError:
+        ok = False
+    finally:
+        connection.close()
+    return time.perf_counter() - start if ok else None
+
+
+def serve(server_name, port_queue, workers, threads):
+    """Run the web app with a server in this (forked) process."""
+    if server_name == "dev":
+        web.preload()
+        server = make_server("127.0.0.1", 0, web.app, threaded=True)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        port_queue.put(server.port)
+        server.serve_forever()
+    else:
+        server = PreforkServer(web.app, host="127.0.0.1", port=0, workers=workers, threads=threads,
+                               preload=web.preload)
+        port_queue.put(server.port)
+        server.run()
+
+
+def percentile(values, fraction):
+    """Return a percentile of sorted values."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_load(server_name, documents, concurrency, workers, threads):
+    """Serve the app with a server, upload every document and return the results."""
+    context = multiprocessing.get_context("fork")
+    port_queue = context.Queue()
+    process = context.Process(target=serve, args=(server_name, port_queue, workers, threads))
+    process.start()
+    port = port_queue.get()
+    upload(port, create_pdf(-1, 1))
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(lambda content: upload(port, content), documents))
+        elapsed = time.perf_counter() - start
+    finally:
+        os.kill(process.pid, signal.SIGTERM)
+        process.join()
+
+    ok = sorted(latency for latency in latencies if latency is not None)
+    return {
+        "requests_per_second": len(ok) / elapsed,
+        "errors": len(latencies) - len(ok),
+        "p50": percentile(ok, 0.5) if ok else 0.0,
+        "p90": percentile(ok, 0.9) if ok else 0.0,
+        "p99": percentile(ok, 0.99) if ok else 0.0
+    }
+
+
+@click.command()
+@click.option("--requests", "request_count", default=64, help="Uploads per server")
+@click.option("--concurrency", default=8, help="Uploads in flight at the same time")
+@click.option("--workers", default=4, help="Worker processes of the pre-forking server")
+@click.option("--threads", default=2, help="Threads per worker of the pre-forking server")
+@click.option("--latency", default=0.2, help="Seconds the fake detector takes per page")
+@click.option("--pages", "page_count", default=2, help="Pages per uploaded document")
+def main(request_count, concurrency, workers, threads, latency, page_count):
+    """Run the load test."""
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    temp_dir = tempfile.TemporaryDirectory()
+    web.app.config["UPLOAD_FOLDER"] = temp_dir.name
+    redactor = PDFRedactor(pii_detector=FakeDetector(latency))
+
+    try:
+        with mock.patch.object(web, "RESULT_STORE", ResultStore(os.path.join(temp_dir.name, "results"))), \
+                mock.patch.dict(web.REDACTORS, {web.DEFAULT_MODEL: redactor}):
+            click.echo(f"{'server':<28} {'req/s':>7} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+            for server_name, label in (("dev", "development (1 process)"),
+                                       ("prefork", f"prefork ({workers}x{threads})")):
+                # Distinct documents, so that the result store serves none of them
+                documents = [create_pdf(f"{server_name}-{index}", page_count) for index in range(request_count)]
+                result = run_load(server_name, documents, concurrency, workers, threads)
+                click.echo(f"{label:<28} {result['requests_per_second']:>7.2f} {result['errors']:>7} "
+                           f"{result['p50'] * 1000:>8.0f} {result['p90'] * 1000:>8.0f} {result['p99'] * 1000:>8.0f}")
+    finally:
+        temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
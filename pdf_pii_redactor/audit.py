@@ -0,0 +1,360 @@
+"""
+Audit store recording the outcome of every redaction run.
+
+Each run becomes a row in an embedded SQLite database with its source file,
+model, status and timings, plus its PII counts by type and by page, so that
+questions such as "which documents contained credit card numbers last week"
+are answered by an indexed query instead of by scraping logs.
+
+record() only queues the statistics; a background writer thread inserts the
+queued runs in batches, one transaction per batch, so a batch job is not
+slowed down by the database. The database runs in WAL mode, so the worker
+processes of the web server and of batch runs can share it.
+"""
+
+import os
+import json
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    recorded_at REAL NOT NULL,
+    source TEXT,
+    output TEXT,
+    sha256 TEXT,
+    method TEXT,
+    model TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    language TEXT,
+    pages_processed INTEGER,
+    redacted_items INTEGER,
+    spans INTEGER,
+    elapsed REAL,
+    stats TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_recorded_at ON documents (recorded_at);
+CREATE INDEX IF NOT EXISTS documents_source ON documents (source, recorded_at);
+CREATE TABLE IF NOT EXISTS pii_counts (
+    pii_type TEXT NOT NULL,
+    document_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (pii_type, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pii_counts_document ON pii_counts (document_id);
+CREATE TABLE IF NOT EXISTS pages (
+    document_id INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    pii_types TEXT NOT NULL,
+    detection_time REAL,
+    PRIMARY KEY (document_id, page)
+) WITHOUT ROWID;
+"""
+
+# Statistics kept in their own columns and tables rather than in the stats JSON
+SPLIT_STATS = ("page_stats", "pii_types", "timings")
+
+# Sentinel asking the writer thread to exit
+_STOP = object()
+
+
+def parse_time(value: str) -> float:
+    """
+    Parse a date or date and time given on the command line.
+
+    Args:
+        value: ISO 8601 date ("2026-10-01") or date and time; times without
+            a time zone are local times
+
+    Returns:
+        Unix time
+    """
+    return datetime.fromisoformat(value).timestamp()
+
+
+def format_time(timestamp: float) -> str:
+    """Return a Unix time as an ISO 8601 UTC date and time."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+
+class AuditStore:
+    """
+    SQLite store of redaction runs, written by a background thread.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, max_queue: int = 10000, timeout: float = 30.0):
+        """
+        Open the store, creating the database if needed.
+
+        Args:
+            path: Path of the SQLite database
+            batch_size: Maximum number of runs inserted in one transaction
+            max_queue: Maximum number of queued runs; record() blocks when
+                the writer is this far behind
+            timeout: Seconds to wait for another process holding the write lock
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.written = 0
+        self.failed = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._writer = None
+        self._writer_pid = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+        connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, source: Optional[str], stats: Optional[Dict[str, Any]] = None, method: str = "redact_pdf",
+               output: Optional[str] = None, model: Optional[str] = None, sha256: Optional[str] = None,
+               status: str = "ok", error: Optional[str] = None) -> None:
+        """
+        Queue a run for writing.
+
+        Args:
+            source: Path or name of the input document
+            stats: Statistics returned by PDFRedactor.redact_pdf or detect;
+                None for runs that failed
+            method: Method that ran, e.g. "redact_pdf" or "detect"
+            output: Path or name of the output
+            model: Model used for detection
+            sha256: Hash of the input document
+            status: "ok", "error", or e.g. "cached" for results served from a cache
+            error: Error message of a failed run
+        """
+        self.ensure_writer()
+        self._queue.put({
+            "recorded_at": time.time(), "source": source, "output": output, "sha256": sha256, "method": method,
+            "model": model, "status": status, "error": error, "stats": stats or {}
+        })
+
+    def audited(self, process: Callable[[str, str], Dict[str, Any]], method: str = "redact_pdf",
+                model: Optional[str] = None) -> Callable[[str, str], Dict[str, Any]]:
+        """
+        Wrap a function called with (input_path, output_path) so that its runs are recorded.
+
+        Args:
+            process: Function returning statistics, e.g. PDFRedactor.redact_pdf
+            method: Method recorded for the runs
+            model: Model recorded for the runs
+
+        Returns:
+            Function recording each run, failed ones included, then returning
+            the statistics or raising like process. Output paths are not
+            recorded, as callers such as BatchWorker write to temporary files
+        """
+        def run(input_path: str, output_path: str) -> Dict[str, Any]:
+            try:
+                stats = process(input_path, output_path)
+            except Exception as e:
+                self.record(input_path, method=method, model=model, status="error", error=str(e))
+                raise
+            self.record(input_path, stats, method=method, model=model)
+            return stats
+
+        return run
+
+    def ensure_writer(self) -> None:
+        """Start the writer thread of this process if it is not running (e.g. after a fork)."""
+        if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+
+        with self._lock:
+            if self._writer is None or self._writer_pid != os.getpid() or not self._writer.is_alive():
+                if self._writer_pid != os.getpid():
+                    # Runs queued by the parent process are written by the parent
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._writer = threading.Thread(target=self._run_writer, name="audit-writer", daemon=True)
+                self._writer_pid = os.getpid()
+                self._writer.start()
+
+    def flush(self) -> None:
+        """Wait until every queued run is written."""
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write the queued runs and stop the writer thread."""
+        if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._writer = None
+
+    def _run_writer(self) -> None:
+        connection = self._connect()
+        try:
+            while True:
+                batch = [self._queue.get()]
+                # Take whatever queued up while the previous batch was written
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                runs = [run for run in batch if run is not _STOP]
+                try:
+                    if runs:
+                        self._write(connection, runs)
+                        self.written += len(runs)
+                except sqlite3.Error:
+                    logger.exception(f"Could not write {len(runs)} runs to the audit store {self.path}")
+                    self.failed += len(runs)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if len(runs) < len(batch):
+                    return
+        finally:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, runs: List[Dict[str, Any]]) -> None:
+        """Insert runs in one transaction."""
+        with connection:
+            for run in runs:
+                stats = run["stats"]
+                cursor = connection.execute(
+                    "INSERT INTO documents (recorded_at, source, output, sha256, method, model, status, error, "
+                    "language, pages_processed, redacted_items, spans, elapsed, stats) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run["recorded_at"], run["source"], run["output"], run["sha256"], run["method"], run["model"],
+                     run["status"], run["error"], stats.get("language"), stats.get("pages_processed"),
+                     stats.get("redacted_items"), stats.get("spans"), stats.get("timings", {}).get("elapsed"),
+                     json.dumps({key: value for key, value in stats.items() if key not in SPLIT_STATS}))
+                )
+                document_id = cursor.lastrowid
+                connection.executemany(
+                    "INSERT INTO pii_counts (pii_type, document_id, count) VALUES (?, ?, ?)",
+                    [(pii_type, document_id, count) for pii_type, count in stats.get("pii_types", {}).items()]
+                )
+                # Page numbers are strings after a round trip through JSON (daemon runs)
+                detection_times = {int(page): seconds
+                                   for page, seconds in stats.get("timings", {}).get("detection", {}).items()}
+                connection.executemany(
+                    "INSERT INTO pages (document_id, page, pii_types, detection_time) VALUES (?, ?, ?, ?)",
+                    [(document_id, page["page"], json.dumps(page["pii_types"]), detection_times.get(page["page"]))
+                     for page in stats.get("page_stats", [])]
+                )
+
+    def query(self, pii_type: Optional[str] = None, source: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, status: Optional[str] = None, limit: Optional[int] = 100,
+              pages: bool = False) -> List[Dict[str, Any]]:
+        """
+        Find recorded runs, most recent first.
+
+        Queued runs are not visible until the writer has written them (see flush()).
+
+        Args:
+            pii_type: Only runs that found PII of this type
+            source: Only runs whose source matches this glob pattern
+                (case-sensitive, e.g. "/data/2026/*.pdf"), or equals it
+            since: Only runs recorded at or after this Unix time
+            until: Only runs recorded before this Unix time
+            status: Only runs with this status
+            limit: Maximum number of runs; None for all
+            pages: Whether to include the per-page PII counts and detection times
+
+        Returns:
+            Runs as dictionaries with the document columns, "recorded_at" as
+            an ISO 8601 UTC string, their counts by type under "pii_types"
+            and, with pages, their pages under "pages"
+        """
+        conditions = []
+        parameters: List[Any] = []
+        if pii_type is not None:
+            conditions.append("id IN (SELECT document_id FROM pii_counts WHERE pii_type = ?)")
+            parameters.append(pii_type)
+        if source is not None:
+            conditions.append("source GLOB ?")
+            parameters.append(source)
+        if since is not None:
+            conditions.append("recorded_at >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("recorded_at < ?")
+            parameters.append(until)
+        if status is not None:
+            conditions.append("status = ?")
+            parameters.append(status)
+
+        sql = "SELECT * FROM documents"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY recorded_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+
+        connection = self._connect()
+        try:
+            documents = []
+            for row in connection.execute(sql, parameters):
+                document = dict(row)
+                document["recorded_at"] = format_time(document["recorded_at"])
+                document["stats"] = json.loads(document["stats"]) if document["stats"] else {}
+                document["pii_types"] = {
+                    count_row["pii_type"]: count_row["count"] for count_row in connection.execute(
+                        "SELECT pii_type, count FROM pii_counts WHERE document_id = ? ORDER BY pii_type",
+                        (document["id"],))
+                }
+                if pages:
+                    document["pages"] = [
+                        {"page": page_row["page"], "pii_types": json.loads(page_row["pii_types"]),
+                         "detection_time": page_row["detection_time"]}
+                        for page_row in connection.execute(
+                            "SELECT page, pii_types, detection_time FROM pages WHERE document_id = ? ORDER BY page",
+                            (document["id"],))
+                    ]
+                documents.append(document)
+            return documents
+        finally:
+            connection.close()
+
+    def totals(self, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Count the PII found by type.
+
+        Args:
+            since: Only runs recorded at or after this Unix time
+            until: Only runs recorded before this Unix time
+
+        Returns:
+            Dictionary mapping each PII type to the number of "documents"
+            it was found in and the number of "values" found
+        """
+        sql = ("SELECT pii_type, COUNT(*) AS documents, SUM(count) AS pii_values FROM pii_counts "
+               "JOIN documents ON documents.id = pii_counts.document_id WHERE recorded_at >= ? AND recorded_at < ? "
+               "GROUP BY pii_type ORDER BY pii_type")
+        connection = self._connect()
+        try:
+            rows = connection.execute(sql, (since if since is not None else float("-inf"),
+                                            until if until is not None else float("inf")))
+            return {row["pii_type"]: {"documents": row["documents"], "values": row["pii_values"]} for row in rows}
+        finally:
+            connection.close()
@@ -0,0 +1,427 @@
+"""
+Batch coordination for redaction runs shared by several nodes.
+
+A batch queue is a directory on a volume that every node mounts::
+
+    queue_dir/
+        manifest.json       input and output file of every work item
+        leases/<id>.lease   claimed items; the mtime is the worker's heartbeat
+        done/<id>.json      completed items with their statistics
+        failed/<id>.json    items that raised an error
+
+Workers claim items by creating lease files with O_EXCL, refresh them from a
+heartbeat thread, and may break leases whose heartbeat is older than the
+lease timeout. Outputs are written to a temporary file and moved into place
+atomically, so an item that is processed twice (e.g. after a reclaimed
+lease) still leaves a single complete output.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def default_worker_id() -> str:
+    """Return a worker id unique to this host and process."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    """Write a JSON file through a temporary file and an atomic rename."""
+    temp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def create_manifest(queue_dir: str, input_paths: List[str], output_dir: str) -> Dict[str, Any]:
+    """
+    Create a batch queue with one work item per input file.
+
+    Paths are stored relative to the queue directory when possible, so the
+    shared volume may be mounted at different locations on different nodes.
+
+    Args:
+        queue_dir: Queue directory to create
+        input_paths: PDF files to redact
+        output_dir: Directory for the redacted files ("<name>-redacted.pdf")
+
+    Returns:
+        The manifest
+    """
+    os.makedirs(queue_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    items = []
+    outputs = set()
+    for input_path in input_paths:
+        name = os.path.splitext(os.path.basename(input_path))[0]
+        output_path = os.path.join(output_dir, f"{name}-redacted.pdf")
+        if output_path in outputs:
+            raise ValueError(f"Two inputs would be written to {output_path}")
+        outputs.add(output_path)
+
+        relative_input = _relative_to(queue_dir, input_path)
+        items.append({
+            "id": hashlib.sha1(relative_input.encode("utf-8")).hexdigest()[:16],
+            "input": relative_input,
+            "output": _relative_to(queue_dir, output_path)
+        })
+
+    manifest = {"version": MANIFEST_VERSION, "created_at": time.time(), "items": items}
+    _write_json_atomic(os.path.join(queue_dir, MANIFEST_NAME), manifest)
+
+    logger.info(f"Created batch queue {queue_dir} with {len(items)} items")
+    return manifest
+
+
+def _relative_to(base_dir: str, path: str) -> str:
+    """Return path relative to base_dir, or absolute if that is not possible."""
+    try:
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(base_dir))
+    except ValueError:
+        # Different drives on Windows
+        return os.path.abspath(path)
+
+
+class BatchQueue:
+    """
+    Work queue stored in a shared directory.
+    """
+
+    def __init__(self, queue_dir: str, lease_timeout: float = 300.0):
+        """
+        Open a batch queue.
+
+        Args:
+            queue_dir: Queue directory created by create_manifest
+            lease_timeout: Seconds without heartbeat after which a lease may be reclaimed
+        """
+        self.queue_dir = queue_dir
+        self.lease_timeout = lease_timeout
+
+        with open(os.path.join(queue_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported manifest version {manifest.get('version')!r} in {queue_dir}")
+
+        self.items = manifest["items"]
+        for subdir in ("leases", "done", "failed"):
+            os.makedirs(os.path.join(queue_dir, subdir), exist_ok=True)
+
+    def resolve(self, path: str) -> str:
+        """Resolve a manifest path against the queue directory."""
+        return os.path.normpath(os.path.join(self.queue_dir, path))
+
+    def _lease_path(self, item_id: str) -> str:
+        return os.path.join(self.queue_dir, "leases", f"{item_id}.lease")
+
+    def _done_path(self, item_id: str) -> str:
+        return os.path.join(self.queue_dir, "done", f"{item_id}.json")
+
+    def _failed_path(self, item_id: str) -> str:
+        return os.path.join(self.queue_dir, "failed", f"{item_id}.json")
+
+    def is_finished(self, item_id: str) -> bool:
+        """Return True if the item is done or failed."""
+        return os.path.exists(self._done_path(item_id)) or os.path.exists(self._failed_path(item_id))
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim the next unfinished item.
+
+        Args:
+            worker_id: Id of the claiming worker
+
+        Returns:
+            The claimed item with its lease token under "token", or None if
+            every item is finished or leased by a live worker
+        """
+        for item in self.items:
+            item_id = item["id"]
+            if self.is_finished(item_id):
+                continue
+
+            token = self._create_lease(item_id, worker_id)
+            if token is None and self._break_stale_lease(item_id):
+                token = self._create_lease(item_id, worker_id)
+            if token is None:
+                continue
+
+            # The item may have been completed between the check and the claim
+            if self.is_finished(item_id):
+                self.release(item_id, token)
+                continue
+
+            claimed = dict(item)
+            claimed["token"] = token
+            return claimed
+
+        return None
+
+    def _create_lease(self, item_id: str, worker_id: str) -> Optional[str]:
+        """Create a lease file, returning its token, or None if it already exists."""
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(self._lease_path(item_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"worker": worker_id, "token": token, "claimed_at": time.time()}, f)
+        return token
+
+    def _read_lease(self, path: str) -> Optional[Dict[str, Any]]:
+        """Read a lease file, or return None if it is missing or being written."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _break_stale_lease(self, item_id: str) -> bool:
+        """
+        Remove a lease whose heartbeat is older than the lease timeout.
+
+        The lease is renamed away before it is deleted, so only one worker
+        can break it. If the renamed file turns out to be a newer lease than
+        the one judged stale, it is put back. A lease that is still empty or
+        unreadable after the timeout belongs to a worker killed while
+        writing it, and is stale too.
+
+        Returns:
+            True if a stale lease was removed
+        """
+        lease_path = self._lease_path(item_id)
+        try:
+            age = time.time() - os.stat(lease_path).st_mtime
+        except FileNotFoundError:
+            return True
+        if age < self.lease_timeout:
+            return False
+
+        stale = self._read_lease(lease_path)
+        if stale is None and not os.path.exists(lease_path):
+            return True
+        stale_token = stale.get("token") if stale is not None else None
+
+        broken_path = f"{lease_path}.broken-{uuid.uuid4().hex}"
+        try:
+            os.rename(lease_path, broken_path)
+        except FileNotFoundError:
+            return True
+
+        broken = self._read_lease(broken_path)
+        if broken is not None and broken.get("token") != stale_token:
+            # Another worker reclaimed the item in the meantime: restore its lease
+            try:
+                os.link(broken_path, lease_path)
+            except FileExistsError:
+                pass
+            os.unlink(broken_path)
+            return False
+
+        os.unlink(broken_path)
+        holder = stale.get("worker") if stale is not None else "a worker that did not write its lease"
+        logger.warning(f"Reclaimed stale lease on {item_id} held by {holder}")
+        return True
+
+    def owns(self, item_id: str, token: str) -> bool:
+        """Return True if the lease on the item still carries the token."""
+        lease = self._read_lease(self._lease_path(item_id))
+        return lease is not None and lease.get("token") == token
+
+    def heartbeat(self, item_id: str, token: str) -> bool:
+        """
+        Refresh the lease on a claimed item.
+
+        Returns:
+            False if the lease has been lost to another worker
+        """
+        if not self.owns(item_id, token):
+            return False
+        try:
+            os.utime(self._lease_path(item_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, item_id: str, token: str) -> None:
+        """Remove the lease on an item if it is still owned."""
+        if self.owns(item_id, token):
+            try:
+                os.unlink(self._lease_path(item_id))
+            except FileNotFoundError:
+                pass
+
+    def complete(self, item_id: str, token: str, result: Dict[str, Any]) -> None:
+        """Mark a claimed item as done and release its lease."""
+        _write_json_atomic(self._done_path(item_id), result)
+        self.release(item_id, token)
+
+    def fail(self, item_id: str, token: str, error: str) -> None:
+        """Mark a claimed item as failed and release its lease."""
+        _write_json_atomic(self._failed_path(item_id), {"error": error, "failed_at": time.time()})
+        self.release(item_id, token)
+
+    def status(self) -> Dict[str, int]:
+        """
+        Count the items in each state.
+
+        Returns:
+            Dictionary with "total", "done", "failed", "leased" and "pending" counts
+        """
+        counts = {"total": len(self.items), "done": 0, "failed": 0, "leased": 0, "pending": 0}
+        for item in self.items:
+            item_id = item["id"]
+            if os.path.exists(self._done_path(item_id)):
+                counts["done"] += 1
+            elif os.path.exists(self._failed_path(item_id)):
+                counts["failed"] += 1
+            elif os.path.exists(self._lease_path(item_id)):
+                counts["leased"] += 1
+            else:
+                counts["pending"] += 1
+        return counts
+
+
+class _Heartbeat(threading.Thread):
+    """Background thread refreshing a lease until stopped."""
+
+    def __init__(self, queue: BatchQueue, item_id: str, token: str, interval: float):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.item_id = item_id
+        self.token = token
+        self.interval = interval
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            if not self.queue.heartbeat(self.item_id, self.token):
+                logger.warning(f"Lost lease on {self.item_id}")
+                self.lost = True
+                return
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class BatchWorker:
+    """
+    Processes the items of a batch queue until none are left.
+    """
+
+    def __init__(self, queue: BatchQueue, process: Callable[[str, str], Dict[str, Any]],
+                 worker_id: Optional[str] = None, heartbeat_interval: Optional[float] = None,
+                 poll_interval: float = 5.0, wait_for_leases: bool = True):
+        """
+        Initialize a batch worker.
+
+        Args:
+            queue: Queue to work on
+            process: Function called with (input_path, output_path) that writes
+                the output file and returns statistics
+            worker_id: Id of this worker (defaults to host name and pid)
+            heartbeat_interval: Seconds between heartbeats (defaults to a third of the lease timeout)
+            poll_interval: Seconds to wait before looking again for items leased by other workers
+            wait_for_leases: Keep polling while other workers hold leases, so
+                their items are picked up if they die
+        """
+        self.queue = queue
+        self.process = process
+        self.worker_id = worker_id or default_worker_id()
+        self.heartbeat_interval = heartbeat_interval or queue.lease_timeout / 3
+        self.poll_interval = poll_interval
+        self.wait_for_leases = wait_for_leases
+
+    def run(self) -> Dict[str, int]:
+        """
+        Work the queue until every item is finished.
+
+        Returns:
+            Dictionary with the number of items this worker completed, failed
+            and "lost" to another worker that reclaimed their lease
+        """
+        counts = {"completed": 0, "failed": 0, "lost": 0}
+
+        while True:
+            item = self.queue.claim(self.worker_id)
+            if item is None:
+                status = self.queue.status()
+                if not (self.wait_for_leases and status["leased"]):
+                    break
+                time.sleep(self.poll_interval)
+                continue
+
+            completed = self.run_item(item)
+            if completed is None:
+                counts["lost"] += 1
+            elif completed:
+                counts["completed"] += 1
+            else:
+                counts["failed"] += 1
+
+        logger.info(f"Worker {self.worker_id} finished: {counts}")
+        return counts
+
+    def run_item(self, item: Dict[str, Any]) -> Optional[bool]:
+        """
+        Process one claimed item while heartbeating its lease.
+
+        The output and the result are only published while the lease is
+        still held; once another worker has reclaimed it, the item is theirs.
+
+        Returns:
+            True if the item completed successfully, False if it failed, None
+            if the lease was lost
+        """
+        item_id = item["id"]
+        token = item["token"]
+        input_path = self.queue.resolve(item["input"])
+        output_path = self.queue.resolve(item["output"])
+        temp_output = f"{output_path}.tmp-{uuid.uuid4().hex}.pdf"
+
+        heartbeat = _Heartbeat(self.queue, item_id, token, self.heartbeat_interval)
+        heartbeat.start()
+        try:
+            start = time.time()
+            stats = self.process(input_path, temp_output) or {}
+            if heartbeat.lost or not self.queue.owns(item_id, token):
+                heartbeat.stop()
+                logger.warning(f"Lost lease on {item_id}, discarding the output of {input_path}")
+                return None
+            os.replace(temp_output, output_path)
+            result = {
+                "worker": self.worker_id,
+                "input": item["input"],
+                "output": item["output"],
+                "duration": time.time() - start,
+                "stats": stats
+            }
+            heartbeat.stop()
+            self.queue.complete(item_id, token, result)
+            return True
+        except Exception as e:
+            heartbeat.stop()
+            logger.error(f"Error processing {input_path}: {str(e)}")
+            if heartbeat.lost or not self.queue.owns(item_id, token):
+                return None
+            self.queue.fail(item_id, token, str(e))
+            return False
+        finally:
+            if os.path.exists(temp_output):
+                os.unlink(temp_output)
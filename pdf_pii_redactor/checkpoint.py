@@ -0,0 +1,165 @@
+"""
+Checkpoint journals for resuming interrupted detection runs.
+
+A journal is a JSONL file with a header line followed by one line per page
+whose detection is complete::
+
+    {"version": 1, "document": "<sha256>", "options": {...}, "language": "en"}
+    {"page": 0, "spans": [{"page": 0, "type": "name", ..., "rects": [[...]]}], "usage": {...}}
+    {"page": 1, "spans": [], "skipped": true, "score": 0.0}
+
+Page lines are appended and flushed as soon as a page is done, so a run that
+is killed keeps every completed page. A restarted run with the same document
+and options reads the journal back, detects only the pages that are missing
+and goes on to apply the redactions; a journal written for another document
+or other options is started over. A torn line left by a killed run is ignored.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Any, Optional, List
+
+from pdf_pii_redactor.pdf_processor import PDFSource, is_path
+from pdf_pii_redactor.utils import file_sha256
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 1
+
+
+def document_hash(source: PDFSource) -> str:
+    """
+    Compute the SHA-256 hash identifying a document.
+
+    Args:
+        source: Path to the PDF file, or its content
+
+    Returns:
+        Hexadecimal digest
+    """
+    if is_path(source):
+        return file_sha256(source)
+    return hashlib.sha256(memoryview(source)).hexdigest()
+
+
+class CheckpointJournal:
+    """
+    Append-only journal of the per-page detection results of one document.
+    """
+
+    def __init__(self, path: str, document: str, options: Dict[str, Any], sync_interval: int = 20):
+        """
+        Initialize the journal.
+
+        Args:
+            path: Path of the journal file
+            document: Hash of the document (see document_hash)
+            options: Options that affect the detection results (e.g. model);
+                a journal written with other options is not resumed
+            sync_interval: Number of pages between two fsync calls; lines are
+                flushed after every page either way, which is enough to
+                survive the process being killed
+        """
+        self.path = path
+        self.document = document
+        self.options = options
+        self.sync_interval = sync_interval
+        self._file = None
+        self._unsynced = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the journal back.
+
+        Returns:
+            Dictionary with the "language" of the document and the completed
+            page records by page number, or None if there is no journal for
+            this document and these options
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            logger.warning(f"Ignoring unreadable checkpoint journal {self.path}")
+            return None
+        if (header.get("version") != JOURNAL_VERSION or header.get("document") != self.document
+                or header.get("options") != self.options):
+            logger.warning(f"Checkpoint journal {self.path} belongs to another document or other options; starting over")
+            return None
+
+        pages = {}
+        for line in lines[1:]:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn write of a run that was killed; later runs append after it
+                logger.warning(f"Ignoring incomplete line in checkpoint journal {self.path}")
+                continue
+            pages[record["page"]] = record
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        if lines[-1].strip():
+            # The last line was not terminated; start a new one
+            self._file.write("\n")
+
+        logger.info(f"Resuming from checkpoint journal {self.path}: {len(pages)} pages done")
+        return {"language": header.get("language"), "pages": pages}
+
+    def start(self, language: Optional[str]) -> None:
+        """
+        Start a new journal, replacing any existing one.
+
+        Args:
+            language: Document language, reused when the run is resumed
+        """
+        header = {"version": JOURNAL_VERSION, "document": self.document, "options": self.options,
+                  "language": language}
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(json.dumps(header, ensure_ascii=False) + "\n")
+        self._sync()
+
+    def record(self, page_num: int, spans: List[Dict[str, Any]], **fields: Any) -> None:
+        """
+        Record a completed page.
+
+        Args:
+            page_num: Page number
+            spans: Located spans of the page
+            fields: Other results of the page (route, usage, skipped, score)
+        """
+        record = {"page": page_num, "spans": spans}
+        record.update((name, value) for name, value in fields.items() if value is not None)
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+        self._unsynced += 1
+        if self._unsynced >= self.sync_interval:
+            self._sync()
+
+    def _sync(self) -> None:
+        """Flush the journal to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        """Flush and close the journal."""
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
@@ -0,0 +1,387 @@
+"""
+Adaptive limit on the detection requests in flight.
+
+A fixed number of concurrent requests is either too low (unused quota) or too
+high (429 storms and timeouts), and the right number changes with the time of
+day and the model. AdaptiveLimiter finds it from what the requests observe,
+with additive increase and multiplicative decrease (AIMD), like TCP:
+
+- every successful request that found the limit in use adds 1 / limit, so
+  the limit grows by about one per limit's worth of requests;
+- a throttled request (HTTP 429) multiplies the limit by backoff_ratio;
+- failed requests do the same once their recent rate exceeds
+  error_rate_threshold, so an occasional bad response does not;
+- latency is tracked with a short and a long exponential moving average;
+  when the short one exceeds latency_tolerance times the long one, the
+  backend is queueing requests and the limit is multiplied by
+  latency_backoff_ratio.
+
+Requests that started before the last decrease do not decrease the limit
+again, so a burst of 429s from one overloaded window counts as one event.
+The limiter is shared by threads (slot(), call()) and asyncio tasks
+(slot_async(), call_async()) of any event loop, so one redactor keeps one
+limit per model for the whole process.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ("ok", "throttled", "error")
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Return True if an exception is an HTTP 429 response (e.g. openai.RateLimitError)."""
+    return getattr(error, "status_code", None) == 429
+
+
+def detection_outcome(result: Dict[str, Any]) -> str:
+    """Return the outcome of a detector's analyze() result: "ok", "throttled" or "error"."""
+    if result.get("throttled"):
+        return "throttled"
+    return "ok" if result.get("ok", True) else "error"
+
+
+class Slot:
+    """
+    A request slot held while one request is in flight.
+    """
+
+    def __init__(self, limiter: "AdaptiveLimiter", in_flight: int):
+        self.limiter = limiter
+        self.in_flight = in_flight
+        self.started = time.monotonic()
+        self.outcome: Optional[str] = None
+
+    def observe(self, outcome: str, latency: Optional[float] = None) -> None:
+        """
+        Report how the request went.
+
+        Without a call, the slot reports "ok" when released normally, and
+        "throttled" or "error" when released by an exception.
+
+        Args:
+            outcome: "ok", "throttled" or "error"
+            latency: Seconds the request took; the time since the slot was
+                acquired when omitted
+        """
+        if outcome not in OUTCOMES:
+            raise ValueError(f"Unknown outcome: {outcome}")
+        if self.outcome is None:
+            self.outcome = outcome
+            self.limiter._observe(self, outcome, latency if latency is not None else time.monotonic() - self.started)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on concurrent requests, driven by their latency, throttling and errors.
+    """
+
+    def __init__(self, initial_limit: float = 4, min_limit: int = 1, max_limit: int = 64,
+                 backoff_ratio: float = 0.5, latency_backoff_ratio: float = 0.9, latency_tolerance: float = 2.0,
+                 error_rate_threshold: float = 0.2, max_retries: int = 3, retry_delay: float = 0.5):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_limit: Requests allowed in flight at first
+            min_limit: Lowest limit
+            max_limit: Highest limit
+            backoff_ratio: Factor applied to the limit on throttling and errors
+            latency_backoff_ratio: Factor applied to the limit when the latency rises
+            latency_tolerance: Ratio of the short-term to the long-term
+                latency above which the backend is considered congested
+            error_rate_threshold: Recent error rate above which errors
+                decrease the limit
+            max_retries: Times call() and call_async() retry a throttled request
+            retry_delay: Seconds before the first retry, doubled for each
+                further retry
+        """
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_backoff_ratio = latency_backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.error_rate_threshold = error_rate_threshold
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.retries = 0
+        self.decreases = 0
+
+        self._in_flight = 0
+        self._error_rate = 0.0
+        self._latency_short: Optional[float] = None
+        self._latency_long: Optional[float] = None
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._threads_waiting = 0
+        self._async_waiters: deque = deque()
+
+    def _capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests in flight."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a slot."""
+        return self._threads_waiting + len(self._async_waiters)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return the state of the limiter.
+
+        Returns:
+            Dictionary with the current "limit", the requests "in_flight" and
+            waiting ("queue_depth"), the counts of "requests", "throttled",
+            "errors", "retries" and limit "decreases", the recent "error_rate"
+            and the short- and long-term latency averages in seconds
+        """
+        with self._lock:
+            return {
+                "limit": self._capacity(),
+                "in_flight": self._in_flight,
+                "queue_depth": self.queue_depth,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "errors": self.errors,
+                "retries": self.retries,
+                "decreases": self.decreases,
+                "error_rate": self._error_rate,
+                "latency_short": self._latency_short,
+                "latency_long": self._latency_long
+            }
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """
+        Hold a slot for one request, blocking the thread until one is free.
+
+        Args:
+            timeout: Seconds to wait for a slot; no limit when omitted
+
+        Yields:
+            Slot to report the outcome of the request to
+
+        Raises:
+            TimeoutError: If no slot was free within the timeout
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            self._threads_waiting += 1
+            try:
+                while self._async_waiters or self._in_flight >= self._capacity():
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("No request slot became free")
+                    self._condition.wait(remaining)
+            finally:
+                self._threads_waiting -= 1
+            self._in_flight += 1
+            slot = Slot(self, self._in_flight)
+        try:
+            yield slot
+        except Exception as e:
+            self._fail(slot, e)
+            raise
+        else:
+            self._succeed(slot)
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        """
+        Hold a slot for one request, waiting without blocking the event loop.
+
+        Yields:
+            Slot to report the outcome of the request to
+        """
+        with self._lock:
+            if not self._async_waiters and self._in_flight < self._capacity():
+                self._in_flight += 1
+                slot = Slot(self, self._in_flight)
+                future = None
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._async_waiters.append((asyncio.get_running_loop(), future))
+        if future is not None:
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    granted = future.done() and not future.cancelled()
+                    if not granted:
+                        self._remove_waiter(future)
+                if granted:
+                    self._release()
+                raise
+            with self._lock:
+                slot = Slot(self, self._in_flight)
+
+        try:
+            yield slot
+        except Exception as e:
+            self._fail(slot, e)
+            raise
+        else:
+            self._succeed(slot)
+        finally:
+            self._release()
+
+    def _succeed(self, slot: Slot) -> None:
+        """Report a request that returned without reporting its outcome."""
+        if slot.outcome is None:
+            slot.observe("ok")
+
+    def _fail(self, slot: Slot, error: Exception) -> None:
+        """Report a request that raised; cancelled requests are not reported."""
+        if slot.outcome is None:
+            slot.observe("throttled" if is_throttled(error) else "error")
+
+    def call(self, function: Callable[[], Any], classify: Optional[Callable[[Any], str]] = None) -> Any:
+        """
+        Run a request in a slot, retrying it when it is throttled.
+
+        Args:
+            function: Function sending the request
+            classify: Function returning the outcome ("ok", "throttled" or
+                "error") of a result, for requests that report failures in
+                their result rather than by raising; "ok" when omitted
+
+        Returns:
+            The result of the last attempt
+
+        Raises:
+            The exception of the last attempt, if it raised
+        """
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                with self.slot() as slot:
+                    result = function()
+                    slot.observe(classify(result) if classify else "ok")
+            except Exception as e:
+                if last or not is_throttled(e):
+                    raise
+            else:
+                if last or slot.outcome != "throttled":
+                    return result
+            self._count_retry()
+            time.sleep(self.retry_delay * 2 ** attempt)
+
+    async def call_async(self, function: Callable[[], Any],
+                         classify: Optional[Callable[[Any], str]] = None) -> Any:
+        """
+        Await a request in a slot, retrying it when it is throttled.
+
+        Args:
+            function: Function returning a new awaitable sending the request
+            classify: Function returning the outcome of a result (see call())
+
+        Returns:
+            The result of the last attempt
+        """
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                async with self.slot_async() as slot:
+                    result = await function()
+                    slot.observe(classify(result) if classify else "ok")
+            except Exception as e:
+                if last or not is_throttled(e):
+                    raise
+            else:
+                if last or slot.outcome != "throttled":
+                    return result
+            self._count_retry()
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    def _count_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+
+    def _remove_waiter(self, future: asyncio.Future) -> None:
+        for waiter in self._async_waiters:
+            if waiter[1] is future:
+                self._async_waiters.remove(waiter)
+                return
+
+    def _wake(self) -> None:
+        """Hand free slots to the waiting tasks, then to the waiting threads (with the lock held)."""
+        while self._async_waiters and self._in_flight < self._capacity():
+            loop, future = self._async_waiters.popleft()
+            self._in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._grant, future)
+            except RuntimeError:
+                # The waiter's loop is closed
+                self._in_flight -= 1
+        if self._threads_waiting and self._in_flight < self._capacity():
+            self._condition.notify_all()
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self._release()
+        else:
+            future.set_result(None)
+
+    def _observe(self, slot: Slot, outcome: str, latency: float) -> None:
+        """Update the limit with the outcome of a request."""
+        with self._lock:
+            self.requests += 1
+            self._error_rate += 0.1 * ((outcome == "error") - self._error_rate)
+            fresh = slot.started >= self._last_decrease
+
+            if outcome == "throttled":
+                self.throttled += 1
+                if fresh:
+                    self._decrease(self.backoff_ratio, "throttled")
+            elif outcome == "error":
+                self.errors += 1
+                if fresh and self._error_rate > self.error_rate_threshold:
+                    self._decrease(self.backoff_ratio, f"error rate {self._error_rate:.2f}")
+            else:
+                if self._latency_short is None:
+                    self._latency_short = self._latency_long = latency
+                else:
+                    self._latency_short += 0.3 * (latency - self._latency_short)
+                    self._latency_long += 0.05 * (latency - self._latency_long)
+                if fresh and self._latency_short > self.latency_tolerance * self._latency_long:
+                    self._decrease(self.latency_backoff_ratio,
+                                   f"latency {self._latency_short:.2f} s against {self._latency_long:.2f} s")
+                    # Judge the next requests against the congested latency
+                    self._latency_long = self._latency_short
+                elif slot.in_flight * 2 >= self.limit:
+                    # Only grow a limit that is in use
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self._wake()
+
+    def _decrease(self, ratio: float, reason: str) -> None:
+        self.limit = max(self.min_limit, self.limit * ratio)
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+        logger.info(f"Concurrency limit lowered to {self._capacity()} ({reason})")
@@ -0,0 +1,269 @@
+"""
+Daemon keeping a warm redactor for repeated command-line runs.
+
+``pdf-pii-redactor serve --socket PATH`` imports the detection modules, loads
+the language profiles once and listens on a Unix domain socket. The
+``redact`` and ``detect`` commands send their job to the daemon when one is
+listening on their socket, and run in-process otherwise, so a run only pays
+for the work on its document instead of the interpreter, the imports and a new
+HTTPS connection to the API.
+
+The protocol is one JSON line per connection each way::
+
+    {"method": "redact_pdf", "input": "/abs/in.pdf", "output": "/abs/out.pdf",
+     "pages": "1-3", "checkpoint": null, "options": {"model": "gpt-4o", ...}}
+    {"ok": true, "stats": {...}}
+    {"ok": false, "kind": "usage" | "error", "error": "..."}
+
+Redactors are cached by their options, with the API key hashed, and shared by
+the jobs that use the same ones; beyond MAX_REDACTORS, the least recently
+used ones are dropped. The client side of this module only uses the standard
+library, so that forwarding a job stays cheap.
+"""
+
+import os
+import json
+import stat
+import hashlib
+import socket
+import logging
+import tempfile
+import threading
+import socketserver
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Directory of the default socket when there is no $XDG_RUNTIME_DIR; the
+# daemon creates it with mode 0700
+PRIVATE_DIRECTORY = os.path.join(tempfile.gettempdir(), f"pdf-pii-redactor-{os.getuid()}"
+                                 if hasattr(os, "getuid") else "pdf-pii-redactor")
+
+
+def default_socket_path() -> str:
+    """Return the default socket path: in $XDG_RUNTIME_DIR, which only the user can enter, or PRIVATE_DIRECTORY."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "pdf-pii-redactor.sock")
+    return os.path.join(PRIVATE_DIRECTORY, "daemon.sock")
+
+
+DEFAULT_SOCKET = default_socket_path()
+
+# Warm redactors kept by a daemon, one per distinct set of options
+MAX_REDACTORS = 8
+
+# Methods of PDFRedactor that jobs may run
+JOB_METHODS = ("redact_pdf", "detect")
+
+
+class DaemonUnavailable(Exception):
+    """No daemon is listening on the socket."""
+
+
+class UntrustedSocket(DaemonUnavailable):
+    """The socket is not a socket owned by the current user, so jobs are not sent to it."""
+
+
+class InvalidJob(ValueError):
+    """A job has an unknown method or an invalid page selection."""
+
+
+def submit(socket_path: str, job: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run a job on the daemon.
+
+    Args:
+        socket_path: Path of the daemon's socket
+        job: Job (see the module docstring); paths must be absolute
+        timeout: Seconds to wait for the result; no limit when omitted
+
+    Returns:
+        The daemon's response
+
+    Raises:
+        DaemonUnavailable: If no daemon is listening on the socket
+        UntrustedSocket: If the path is not a socket of the current user,
+            who would otherwise receive the job (and its API key) and could
+            answer it without running it
+        ConnectionError: If the daemon closed the connection without a response
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise DaemonUnavailable(socket_path)
+    try:
+        status = os.lstat(socket_path)
+    except FileNotFoundError:
+        raise DaemonUnavailable(socket_path)
+    if not stat.S_ISSOCK(status.st_mode):
+        raise UntrustedSocket(f"{socket_path} is not a socket")
+    if hasattr(os, "getuid") and status.st_uid != os.getuid():
+        raise UntrustedSocket(f"{socket_path} belongs to another user")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            # Left behind by a daemon that was killed
+            raise DaemonUnavailable(socket_path)
+
+        connection.settimeout(timeout)
+        connection.sendall(json.dumps(job).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as reader:
+            line = reader.readline()
+
+    if not line:
+        raise ConnectionError(f"The daemon at {socket_path} closed the connection without a result")
+    return json.loads(line)
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    """Reads a job, runs it and writes the response."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            response = {"ok": True, "stats": self.server.daemon.run_job(json.loads(line))}
+        except InvalidJob as e:
+            response = {"ok": False, "kind": "usage", "error": str(e)}
+        except Exception as e:
+            logger.exception("Job failed")
+            response = {"ok": False, "kind": "error", "error": str(e)}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class RedactionDaemon:
+    """
+    Serves redaction jobs on a Unix domain socket with warm, cached redactors.
+    """
+
+    def __init__(self, socket_path: str, redactor_factory: Callable[..., Any], max_redactors: int = MAX_REDACTORS):
+        """
+        Initialize the daemon.
+
+        Args:
+            socket_path: Path of the socket to listen on
+            redactor_factory: Function creating a PDFRedactor from the
+                detection options of a job
+            max_redactors: Number of warm redactors kept, least recently
+                used ones first out
+        """
+        self.socket_path = socket_path
+        self.redactor_factory = redactor_factory
+        self.max_redactors = max_redactors
+        self.jobs = 0
+        self._redactors: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def bind(self) -> None:
+        """
+        Create the socket, replacing one left behind by a daemon that was killed.
+
+        PRIVATE_DIRECTORY is created when the socket is in it.
+
+        Raises:
+            RuntimeError: If another daemon is listening on the socket, or
+                PRIVATE_DIRECTORY is not private to the current user
+        """
+        if os.path.dirname(os.path.abspath(self.socket_path)) == PRIVATE_DIRECTORY:
+            os.makedirs(PRIVATE_DIRECTORY, mode=0o700, exist_ok=True)
+            status = os.lstat(PRIVATE_DIRECTORY)
+            if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or status.st_mode & 0o077:
+                raise RuntimeError(f"{PRIVATE_DIRECTORY} must be a directory private to the current user")
+
+        if os.path.exists(self.socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(self.socket_path)
+                except (FileNotFoundError, ConnectionRefusedError):
+                    os.unlink(self.socket_path)
+                else:
+                    raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+
+        # Jobs carry API keys; only the owner may connect
+        old_umask = os.umask(0o177)
+        try:
+            self._server = _UnixServer(self.socket_path, _JobHandler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon = self
+
+    def serve_forever(self) -> None:
+        """Load the language profiles and serve jobs until shutdown() is called."""
+        from langdetect.detector_factory import init_factory
+
+        if self._server is None:
+            self.bind()
+        init_factory()
+        logger.info(f"Listening on {self.socket_path}")
+        try:
+            self._server.serve_forever(poll_interval=0.2)
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self) -> None:
+        """Stop serve_forever() from another thread."""
+        if self._server is not None:
+            self._server.shutdown()
+
+    def redactor(self, options: Dict[str, Any]) -> Any:
+        """Return the cached redactor of a set of detection options, creating it on first use."""
+        if options.get("profile"):
+            # The profiler of a redactor belongs to one run at a time
+            return self.redactor_factory(**options)
+
+        # Client secrets are not kept as cache keys
+        key_options = dict(options)
+        if key_options.get("openai_api_key"):
+            key_options["openai_api_key"] = hashlib.sha256(key_options["openai_api_key"].encode("utf-8")).hexdigest()
+        key = json.dumps(key_options, sort_keys=True)
+
+        with self._lock:
+            if key in self._redactors:
+                self._redactors.move_to_end(key)
+            else:
+                self._redactors[key] = self.redactor_factory(**options)
+                while len(self._redactors) > self.max_redactors:
+                    self._redactors.popitem(last=False)
+            return self._redactors[key]
+
+    def run_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a job.
+
+        Args:
+            job: Job (see the module docstring)
+
+        Returns:
+            Statistics of the run
+
+        Raises:
+            InvalidJob: If the job or its page selection is invalid
+        """
+        from pdf_pii_redactor.pdf_processor import count_pages
+        from pdf_pii_redactor.utils import parse_page_ranges
+
+        if job.get("method") not in JOB_METHODS:
+            raise InvalidJob(f"Unknown job method: {job.get('method')}")
+        pages = job.get("pages")
+        if pages is not None:
+            try:
+                pages = parse_page_ranges(pages, count_pages(job["input"]))
+            except ValueError as e:
+                raise InvalidJob(str(e))
+
+        redactor = self.redactor(job.get("options", {}))
+        stats = getattr(redactor, job["method"])(job["input"], job["output"], pages=pages,
+                                                 checkpoint=job.get("checkpoint"))
+        with self._lock:
+            self.jobs += 1
+        return stats
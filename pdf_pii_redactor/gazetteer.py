@@ -0,0 +1,350 @@
+"""
+Gazetteer of known entities that are always redacted.
+
+Term lists (customer names, employee names, account numbers) are compiled once
+into an Aho-Corasick automaton saved as flat arrays of 32-bit integers.
+Loading a compiled gazetteer maps the file into memory and reads the arrays
+in place, so it takes milliseconds whatever the number of terms, and worker
+processes share the pages of the file. A scan visits every character of the
+page text once (plus failure transitions), independently of the number of
+terms.
+
+Terms and texts are matched case-insensitively (str.casefold) with runs of
+whitespace, line breaks included, treated as a single space. Matches must
+start and end at word boundaries, and overlapping matches are resolved
+leftmost-longest.
+
+File layout: an 8-byte magic, the length of a JSON header (uint32), the
+header (types, counts, byte order, fingerprint, array offsets), then the
+arrays, each aligned to 4 bytes:
+
+    edge_start   node_count + 1   edges of node n are edge_start[n]:edge_start[n + 1]
+    edge_char    edge_count       code point of each edge, sorted per node
+    edge_target  edge_count       child node of each edge
+    fail         node_count       failure link
+    depth        node_count       length of the string a node stands for
+    term_type    node_count       type index + 1 of the term ending at the node, 0 if none
+    dict_link    node_count       nearest node on the failure chain that ends a term, 0 if none
+"""
+
+import os
+import sys
+import json
+import mmap
+import array
+import struct
+import bisect
+import hashlib
+import logging
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PIIGAZ01"
+FORMAT_VERSION = 1
+ARRAYS = ("edge_start", "edge_char", "edge_target", "fail", "depth", "term_type", "dict_link")
+
+# Character that masked hits are replaced with in the text sent to the detector
+MASK_CHAR = "*"
+
+
+def normalize(text: str) -> Tuple[str, List[int]]:
+    """
+    Normalize a text for matching.
+
+    Args:
+        text: Text to normalize
+
+    Returns:
+        Tuple of the case-folded text with whitespace runs collapsed to one
+        space, and the offset in text of every character of it
+    """
+    chars = []
+    offsets = []
+    in_space = False
+    for index, char in enumerate(text):
+        if char.isspace():
+            if not in_space:
+                chars.append(" ")
+                offsets.append(index)
+            in_space = True
+            continue
+        in_space = False
+        folded = char.casefold()
+        chars.append(folded)
+        offsets.extend([index] * len(folded))
+    return "".join(chars), offsets
+
+
+def normalize_term(term: str) -> str:
+    """Return a term as it is stored in the automaton."""
+    return normalize(term.strip())[0]
+
+
+def read_term_file(path: str) -> Iterable[str]:
+    """Yield the terms of a UTF-8 file with one term per line, skipping blank lines."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def compile_gazetteer(terms: Iterable[Tuple[str, str]], output_path: str) -> Dict[str, Any]:
+    """
+    Compile terms into a gazetteer file.
+
+    Args:
+        terms: (type, term) pairs, e.g. ("name", "John Doe"); a term listed
+            under several types keeps the first
+        output_path: Path of the compiled file
+
+    Returns:
+        Dictionary with the number of terms, nodes and edges
+    """
+    types: List[str] = []
+    type_indexes: Dict[str, int] = {}
+    unique: Dict[str, int] = {}
+    for pii_type, term in terms:
+        normalized = normalize_term(term)
+        if not normalized or normalized in unique:
+            continue
+        if pii_type not in type_indexes:
+            type_indexes[pii_type] = len(types)
+            types.append(pii_type)
+        unique[normalized] = type_indexes[pii_type]
+
+    # Build the trie from the sorted terms: the children of a node are then
+    # created in increasing character order
+    parent = array.array("I", [0])
+    char = array.array("I", [0])
+    depth = array.array("I", [0])
+    term_type = array.array("I", [0])
+    digest = hashlib.sha256()
+    path = [0]
+    previous = ""
+    for normalized in sorted(unique):
+        digest.update(f"{unique[normalized]}\t{normalized}\n".encode("utf-8"))
+        common = 0
+        limit = min(len(previous), len(normalized))
+        while common < limit and previous[common] == normalized[common]:
+            common += 1
+        del path[common + 1:]
+        for position in range(common, len(normalized)):
+            parent.append(path[-1])
+            char.append(ord(normalized[position]))
+            depth.append(position + 1)
+            term_type.append(0)
+            path.append(len(parent) - 1)
+        term_type[path[-1]] = unique[normalized] + 1
+        previous = normalized
+
+    node_count = len(parent)
+    edge_count = node_count - 1
+
+    # Group the edges by parent (counting sort, stable so characters stay sorted)
+    edge_start = array.array("I", [0]) * (node_count + 1)
+    for node in range(1, node_count):
+        edge_start[parent[node] + 1] += 1
+    for node in range(node_count):
+        edge_start[node + 1] += edge_start[node]
+    edge_char = array.array("I", [0]) * edge_count
+    edge_target = array.array("I", [0]) * edge_count
+    fill = array.array("I", edge_start)
+    for node in range(1, node_count):
+        slot = fill[parent[node]]
+        edge_char[slot] = char[node]
+        edge_target[slot] = node
+        fill[parent[node]] += 1
+    del fill
+
+    # Failure and dictionary links, breadth first
+    fail = array.array("I", [0]) * node_count
+    dict_link = array.array("I", [0]) * node_count
+    queue = deque(edge_target[edge_start[0]:edge_start[1]])
+    while queue:
+        node = queue.popleft()
+        for slot in range(edge_start[node], edge_start[node + 1]):
+            child = edge_target[slot]
+            code = edge_char[slot]
+            state = fail[node]
+            while True:
+                low, high = edge_start[state], edge_start[state + 1]
+                index = bisect.bisect_left(edge_char, code, low, high)
+                if index < high and edge_char[index] == code:
+                    fail[child] = edge_target[index]
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            target = fail[child]
+            dict_link[child] = target if term_type[target] else dict_link[target]
+            queue.append(child)
+
+    arrays = {"edge_start": edge_start, "edge_char": edge_char, "edge_target": edge_target, "fail": fail,
+              "depth": depth, "term_type": term_type, "dict_link": dict_link}
+    header = {"version": FORMAT_VERSION, "byteorder": sys.byteorder, "types": types, "terms": len(unique),
+              "nodes": node_count, "edges": edge_count, "fingerprint": digest.hexdigest(), "offsets": {}}
+
+    # Offsets depend on the header length, which depends on the offsets; pad to a fixed width
+    for name in ARRAYS:
+        header["offsets"][name] = 0
+    header_length = len(json.dumps(header)) + 16 * len(ARRAYS)
+    offset = _align(len(MAGIC) + 4 + header_length)
+    for name in ARRAYS:
+        header["offsets"][name] = offset
+        offset = _align(offset + len(arrays[name]) * arrays[name].itemsize)
+    encoded = json.dumps(header).encode("utf-8").ljust(header_length)
+
+    temp_path = output_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", header_length) + encoded)
+        for name in ARRAYS:
+            f.write(b"\0" * (header["offsets"][name] - f.tell()))
+            arrays[name].tofile(f)
+    os.replace(temp_path, output_path)
+
+    logger.info(f"Compiled {len(unique)} terms into {node_count} nodes at {output_path}")
+    return {"terms": len(unique), "nodes": node_count, "edges": edge_count, "types": types}
+
+
+def _align(offset: int) -> int:
+    return (offset + 3) & ~3
+
+
+class Gazetteer:
+    """
+    Compiled gazetteer, memory-mapped from its file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Load a compiled gazetteer.
+
+        Args:
+            path: Path of a file written by compile_gazetteer
+
+        Raises:
+            ValueError: If the file is not a compiled gazetteer of this
+                version and byte order
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a compiled gazetteer")
+        header_length = struct.unpack_from("<I", self._mmap, len(MAGIC))[0]
+        start = len(MAGIC) + 4
+        header = json.loads(self._mmap[start:start + header_length])
+        if header["version"] != FORMAT_VERSION or header["byteorder"] != sys.byteorder:
+            self._mmap.close()
+            raise ValueError(f"{path} was compiled for another format version or byte order; compile it again")
+
+        self.types = header["types"]
+        self.terms = header["terms"]
+        self.fingerprint = header["fingerprint"]
+        view = memoryview(self._mmap)
+        sizes = {"edge_start": header["nodes"] + 1, "edge_char": header["edges"], "edge_target": header["edges"]}
+        for name in ARRAYS:
+            offset = header["offsets"][name]
+            size = sizes.get(name, header["nodes"])
+            setattr(self, f"_{name}", view[offset:offset + size * 4].cast("I"))
+
+        # Most transitions start from the root; look them up in a dictionary
+        root_end = self._edge_start[1]
+        self._root = dict(zip(self._edge_char[:root_end], self._edge_target[:root_end]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """Release the memory map."""
+        if self._mmap is not None:
+            for name in ARRAYS:
+                getattr(self, f"_{name}").release()
+            self._mmap.close()
+            self._mmap = None
+
+    def find(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Find the terms in a text.
+
+        Args:
+            text: Text to scan, e.g. a page text
+
+        Returns:
+            Non-overlapping hits in text order, as dictionaries with the
+            "type", the "value" as written in text, and its "start" and
+            "end" offsets in text
+        """
+        normalized, offsets = normalize(text)
+        edge_start, edge_char, edge_target = self._edge_start, self._edge_char, self._edge_target
+        fail, depth, term_type, dict_link = self._fail, self._depth, self._term_type, self._dict_link
+        root = self._root
+        bisect_left = bisect.bisect_left
+
+        matches = []
+        state = 0
+        for position, char in enumerate(normalized):
+            code = ord(char)
+            while True:
+                if state == 0:
+                    state = root.get(code, 0)
+                    break
+                low, high = edge_start[state], edge_start[state + 1]
+                index = bisect_left(edge_char, code, low, high)
+                if index < high and edge_char[index] == code:
+                    state = edge_target[index]
+                    break
+                state = fail[state]
+
+            output = state if term_type[state] else dict_link[state]
+            while output:
+                end = position + 1
+                start = end - depth[output]
+                if ((start == 0 or not normalized[start - 1].isalnum())
+                        and (end == len(normalized) or not normalized[end].isalnum())):
+                    matches.append((start, -end, term_type[output] - 1))
+                output = dict_link[output]
+
+        # Leftmost-longest, without overlaps
+        hits = []
+        covered = 0
+        for start, negative_end, type_index in sorted(matches):
+            if start < covered:
+                continue
+            covered = -negative_end
+            text_start = offsets[start]
+            text_end = offsets[covered - 1] + 1
+            hits.append({"type": self.types[type_index], "value": text[text_start:text_end],
+                         "start": text_start, "end": text_end})
+        return hits
+
+
+def mask_hits(text: str, hits: List[Dict[str, Any]]) -> str:
+    """
+    Hide hits from a text, keeping its length and line structure.
+
+    Every character of a hit other than whitespace is replaced with MASK_CHAR,
+    so offsets into the masked text are offsets into the original.
+
+    Args:
+        text: Text the hits were found in
+        hits: Hits of Gazetteer.find
+
+    Returns:
+        Masked text
+    """
+    parts = []
+    position = 0
+    for hit in hits:
+        parts.append(text[position:hit["start"]])
+        parts.append("".join(char if char.isspace() else MASK_CHAR for char in text[hit["start"]:hit["end"]]))
+        position = hit["end"]
+    parts.append(text[position:])
+    return "".join(parts)
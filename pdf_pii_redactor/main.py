@@ -1,60 +1,711 @@
 #!/usr/bin/env python3
 """
 Command-line interface for the PDF PII Redactor tool.
+
+The default command redacts a PDF in one go. The ``detect`` and ``apply``
+commands split the work in two phases around a span file, so that the PII
+detection (OpenAI) and the redaction (PyMuPDF only) can run separately.
 """
 
 import os
 import sys
 import click
-from tqdm import tqdm
 from dotenv import load_dotenv
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from pdf_pii_redactor.redactor import PDFRedactor
+from pdf_pii_redactor.daemon import DEFAULT_SOCKET
+
+# Choices of options backed by the detection modules, spelled out so that a
+# run forwarded to the daemon does not import PyMuPDF (see
+# pdf_processor.EXTRACTION_PROFILES and ocr.OCR_ENGINES)
+EXTRACTION_PROFILE_NAMES = ["default", "rawdict", "words"]
+OCR_ENGINE_NAMES = ["tesseract"]
+DEFAULT_OCR_DPI = 300
 
 load_dotenv()
 
 
-@click.command()
-@click.argument("input_pdf", type=click.Path(exists=True, readable=True))
-@click.argument("output_pdf", type=click.Path(writable=True))
-@click.option(
-    "--openai-api-key", 
-    envvar="OPENAI_API_KEY",
-    help="OpenAI API key. If not provided, will use OPENAI_API_KEY environment variable."
+class DefaultCommandGroup(click.Group):
+    """
+    Command group that falls back to a default command.
+
+    Keeps ``pdf-pii-redactor INPUT_PDF OUTPUT_PDF`` working alongside the
+    named subcommands.
+    """
+
+    default_command = "redact"
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] not in ("--help", "-h"):
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+apply_plan_option = click.option(
+    "--apply-plan",
+    type=click.Choice(["off", "resources", "overlap"]),
+    default="off",
+    help="Skip image and line-art redaction when safe: off, resources (pages without images) "
+         "or overlap (no rect overlaps an image or path). Default: off"
 )
-@click.option(
-    "--model", 
-    default="gpt-4o",
-    help="OpenAI model to use for PII detection. Default: gpt-4o"
+
+
+verify_option = click.option(
+    "--verify",
+    type=click.Choice(["off", "report", "fail"]),
+    default="off",
+    help="Check the redacted pages for PII values left in the text layer before saving: off, report "
+         "(print the leaks) or fail (exit with an error instead of saving). Default: off"
 )
-@click.option(
-    "--verbose", 
-    is_flag=True, 
-    help="Enable verbose output"
+
+
+audit_option = click.option(
+    "--audit-db",
+    type=click.Path(dir_okay=False),
+    envvar="PDF_PII_REDACTOR_AUDIT_DB",
+    default=None,
+    help="SQLite audit store recording each run with its PII counts and timings (see \"audit query\")"
 )
-def main(input_pdf, output_pdf, openai_api_key, model, verbose):
+
+
+def echo_verification(stats):
+    """Print the result of the leak verification, if it ran."""
+    verification = stats.get("verification")
+    if verification is None:
+        return
+    if verification["leaks"]:
+        for leak in verification["leaks"]:
+            click.echo(f"Warning: {leak['count']} {leak['type']} value(s) left on page {leak['page'] + 1}", err=True)
+    else:
+        click.echo(f"Verified {verification['pages_checked']} redacted pages: no PII values left")
+
+
+def run_options(func):
+    """Add the page selection and checkpoint options of the single-document commands."""
+    options = [
+        click.option(
+            "--pages",
+            default=None,
+            help='Pages to process, numbered from 1, e.g. "1-10,15,20-". Other pages are left unchanged. Default: all'
+        ),
+        click.option(
+            "--checkpoint",
+            type=click.Path(dir_okay=False, writable=True),
+            default=None,
+            help="Journal file recording each completed page; an interrupted run started again with the "
+                 "same journal resumes after the last completed page"
+        ),
+        click.option(
+            "--socket",
+            "socket_path",
+            envvar="PDF_PII_REDACTOR_SOCKET",
+            default=DEFAULT_SOCKET,
+            show_default=True,
+            help="Socket of a daemon started with \"serve\"; the job runs on it when it is listening"
+        ),
+        click.option(
+            "--in-process",
+            is_flag=True,
+            help="Run in this process even if a daemon is listening"
+        ),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def resolve_pages(input_pdf, pages):
+    """Turn the --pages selection into 0-based page numbers, or exit if it is invalid."""
+    if pages is None:
+        return None
+
+    from pdf_pii_redactor.pdf_processor import count_pages
+    from pdf_pii_redactor.utils import parse_page_ranges
+
+    try:
+        return parse_page_ranges(pages, count_pages(input_pdf))
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--pages")
+
+
+def detection_options(func):
+    """Add the options shared by the commands that run PII detection."""
+    options = [
+        click.option(
+            "--openai-api-key",
+            envvar="OPENAI_API_KEY",
+            help="OpenAI API key. If not provided, will use OPENAI_API_KEY environment variable."
+        ),
+        click.option(
+            "--model",
+            default="gpt-4o",
+            help="OpenAI model to use for PII detection. Default: gpt-4o"
+        ),
+        click.option(
+            "--response-format",
+            type=click.Choice(["verbose", "compact"]),
+            default="verbose",
+            help="LLM response format: verbose, or compact offsets with local value rebuilding. Default: verbose"
+        ),
+        click.option(
+            "--stream",
+            is_flag=True,
+            help="Stream LLM responses and locate each PII entity as soon as it is received"
+        ),
+        click.option(
+            "--adaptive-concurrency",
+            is_flag=True,
+            help="Adapt the LLM requests in flight to the observed latency, throttling (429) and errors, "
+                 "and retry throttled requests; the limit is shared by the jobs of a daemon"
+        ),
+        click.option(
+            "--first-pass-model",
+            default=None,
+            help="Cheaper OpenAI model tried first (e.g. gpt-4o-mini); pages are escalated to --model when its answer is not trusted"
+        ),
+        click.option(
+            "--escalation-confidence",
+            type=float,
+            default=0.7,
+            help="First-pass confidence below which a page is escalated to --model. Default: 0.7"
+        ),
+        click.option(
+            "--escalation-risk-score",
+            type=float,
+            default=None,
+            help="Pre-screen score at or above which a page goes straight to --model"
+        ),
+        click.option(
+            "--extraction-profile",
+            type=click.Choice(EXTRACTION_PROFILE_NAMES),
+            default="default",
+            help="Text extraction profile: default, words or rawdict. Default: default"
+        ),
+        click.option(
+            "--header-margin",
+            type=float,
+            default=0.0,
+            help="Height in points at the top of each page to exclude from detection"
+        ),
+        click.option(
+            "--footer-margin",
+            type=float,
+            default=0.0,
+            help="Height in points at the bottom of each page to exclude from detection"
+        ),
+        click.option(
+            "--prescreen-threshold",
+            type=float,
+            default=None,
+            help="Skip PII detection on pages whose pre-screen score is below this value (e.g. 1.0). Default: detect every page"
+        ),
+        click.option(
+            "--ocr",
+            "ocr_engine",
+            type=click.Choice(OCR_ENGINE_NAMES),
+            default=None,
+            help="OCR engine for pages without a text layer (scans). Default: such pages are not redacted"
+        ),
+        click.option(
+            "--ocr-dpi",
+            type=int,
+            default=DEFAULT_OCR_DPI,
+            help=f"Resolution pages are rendered at for OCR. Default: {DEFAULT_OCR_DPI}"
+        ),
+        click.option(
+            "--ocr-workers",
+            type=int,
+            default=None,
+            help="Number of OCR worker processes, 0 to run OCR in-process. Default: number of CPUs, up to 4"
+        ),
+        click.option(
+            "--gazetteer",
+            type=click.Path(exists=True, dir_okay=False),
+            default=None,
+            help="Gazetteer of known entities (see \"gazetteer compile\") redacted on every page"
+        ),
+        click.option(
+            "--gazetteer-mask",
+            is_flag=True,
+            help="Hide the gazetteer hits from the text sent to the LLM"
+        ),
+        apply_plan_option,
+        verify_option,
+        click.option(
+            "--profile",
+            type=click.Path(file_okay=False, writable=True),
+            default=None,
+            help="Write a cProfile dump and a JSON stage/page timing summary of each run to this directory"
+        ),
+        click.option(
+            "--profile-memory",
+            is_flag=True,
+            help="With --profile, also trace memory allocations (slower)"
+        ),
+        click.option(
+            "--verbose",
+            is_flag=True,
+            help="Enable verbose output"
+        ),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def build_redactor(openai_api_key=None, **options):
+    """
+    Create a PDFRedactor from the detection options.
+
+    Raises:
+        ValueError: If no API key is set or the gazetteer is not a compiled one
+        ImportError: If the dependencies of the OCR engine are missing
+    """
+    if not openai_api_key and "OPENAI_API_KEY" not in os.environ:
+        raise ValueError("OpenAI API key not provided. Please provide it via --openai-api-key option or set the OPENAI_API_KEY environment variable.")
+
+    # Imported here so that "apply" does not load the detection dependencies
+    from pdf_pii_redactor.redactor import PDFRedactor
+    from pdf_pii_redactor.ocr import create_engine
+
+    if options.get("ocr_engine"):
+        options["ocr_engine"] = create_engine(options["ocr_engine"])
+
+    return PDFRedactor(openai_api_key=openai_api_key, **options)
+
+
+def create_redactor(**options):
+    """Create a PDFRedactor from the detection options, or exit if it cannot be created."""
+    try:
+        return build_redactor(**options)
+    except (ValueError, ImportError) as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+
+def record_run(audit_db, method, input_pdf, output_path, options, stats=None, error=None):
+    """Record a run in the audit store, if one is set."""
+    if not audit_db:
+        return
+
+    from pdf_pii_redactor.audit import AuditStore
+
+    with AuditStore(audit_db) as store:
+        store.record(os.path.abspath(input_pdf), stats, method=method, output=os.path.abspath(output_path),
+                     model=options.get("model"), status="error" if error else "ok", error=error)
+
+
+def run_job(method, input_pdf, output_path, pages, checkpoint, socket_path, in_process, options, audit_db=None):
+    """
+    Run PDFRedactor.redact_pdf or detect on the daemon listening on socket_path,
+    or in this process if there is none; record the run in the audit store,
+    and return the statistics or exit on errors.
+    """
+    from pdf_pii_redactor.daemon import DaemonUnavailable, UntrustedSocket, submit
+
+    if not in_process:
+        for name in ("profile", "gazetteer"):
+            if options.get(name):
+                options = dict(options, **{name: os.path.abspath(options[name])})
+        job = {"method": method, "input": os.path.abspath(input_pdf), "output": os.path.abspath(output_path),
+               "pages": pages, "checkpoint": os.path.abspath(checkpoint) if checkpoint else None,
+               "options": options}
+        try:
+            response = submit(socket_path, job)
+        except UntrustedSocket as e:
+            click.echo(f"Warning: not using the daemon: {e}", err=True)
+        except DaemonUnavailable:
+            pass
+        except (OSError, ValueError) as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        else:
+            if response["ok"]:
+                record_run(audit_db, method, input_pdf, output_path, options, stats=response["stats"])
+                return response["stats"]
+            if response["kind"] == "usage":
+                raise click.BadParameter(response["error"], param_hint="--pages")
+            record_run(audit_db, method, input_pdf, output_path, options, error=response["error"])
+            click.echo(f"Error: {response['error']}", err=True)
+            sys.exit(1)
+
+    pages = resolve_pages(input_pdf, pages)
+    redactor = create_redactor(**options)
+    try:
+        stats = getattr(redactor, method)(input_pdf, output_path, pages=pages, checkpoint=checkpoint)
+    except Exception as e:
+        record_run(audit_db, method, input_pdf, output_path, options, error=str(e))
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+    record_run(audit_db, method, input_pdf, output_path, options, stats=stats)
+    return stats
+
+
+def echo_checkpoint(stats):
+    """Print how many pages were resumed from the checkpoint journal, if one was used."""
+    if stats.get("checkpoint", {}).get("pages_resumed"):
+        click.echo(f"Resumed {stats['checkpoint']['pages_resumed']} pages from {stats['checkpoint']['path']}, "
+                   f"detected {stats['checkpoint']['pages_detected']}")
+
+
+def echo_profile(stats):
+    """Print where the profile of a run was written, if it was profiled."""
+    if "profile" in stats:
+        click.echo(f"Profile written to {stats['profile']['pstats']} and {stats['profile']['summary']}")
+
+
+@click.group(cls=DefaultCommandGroup)
+def main():
+    """
+    Redact PII from PDF documents.
+
+    Run "pdf-pii-redactor INPUT_PDF OUTPUT_PDF" to detect and redact in one
+    step, or use "detect" and "apply" to run the two phases separately.
+    """
+
+
+@main.command()
+@click.argument("input_pdf", type=click.Path(exists=True, readable=True))
+@click.argument("output_pdf", type=click.Path(writable=True))
+@run_options
+@audit_option
+@detection_options
+def redact(input_pdf, output_pdf, pages, checkpoint, socket_path, in_process, audit_db, **options):
     """
     Redact PII from a PDF document.
-    
+
     INPUT_PDF: Path to the input PDF file.
     OUTPUT_PDF: Path where the redacted PDF will be saved.
     """
-    if not openai_api_key and "OPENAI_API_KEY" not in os.environ:
-        click.echo("Error: OpenAI API key not provided. Please provide it via --openai-api-key option or set the OPENAI_API_KEY environment variable.", err=True)
-        sys.exit(1)
-    
     click.echo(f"Processing {input_pdf}...")
-    
+
+    stats = run_job("redact_pdf", input_pdf, output_pdf, pages, checkpoint, socket_path, in_process, options,
+                    audit_db)
+    echo_checkpoint(stats)
+    click.echo(f"Successfully redacted PII. Redacted PDF saved to {output_pdf}")
+    echo_verification(stats)
+    echo_profile(stats)
+
+
+@main.command()
+@click.argument("input_pdf", type=click.Path(exists=True, readable=True))
+@click.argument("span_file", type=click.Path(writable=True))
+@run_options
+@audit_option
+@detection_options
+def detect(input_pdf, span_file, pages, checkpoint, socket_path, in_process, audit_db, **options):
+    """
+    Detect PII in a PDF document and write it to a span file.
+
+    INPUT_PDF: Path to the input PDF file.
+    SPAN_FILE: Path of the span file to write (.json or .jsonl).
+    """
+    click.echo(f"Detecting PII in {input_pdf}...")
+
+    stats = run_job("detect", input_pdf, span_file, pages, checkpoint, socket_path, in_process, options, audit_db)
+    echo_checkpoint(stats)
+    click.echo(f"Found {stats['spans']} PII spans. Span file saved to {span_file}")
+    echo_profile(stats)
+
+
+@main.command()
+@click.argument("input_pdf", type=click.Path(exists=True, readable=True))
+@click.argument("span_file", type=click.Path(exists=True, readable=True))
+@click.argument("output_pdf", type=click.Path(writable=True))
+@apply_plan_option
+@verify_option
+@click.option(
+    "--verbose",
+    is_flag=True,
+    help="Enable verbose output"
+)
+def apply(input_pdf, span_file, output_pdf, apply_plan, verify, verbose):
+    """
+    Redact a PDF document using a span file written by "detect".
+
+    INPUT_PDF: Path to the input PDF file.
+    SPAN_FILE: Path to the span file (.json or .jsonl).
+    OUTPUT_PDF: Path where the redacted PDF will be saved.
+    """
+    from pdf_pii_redactor.spans import apply_span_file
+
     try:
-        redactor = PDFRedactor(openai_api_key=openai_api_key, model=model, verbose=verbose)
-        redactor.redact_pdf(input_pdf, output_pdf)
-        click.echo(f"Successfully redacted PII. Redacted PDF saved to {output_pdf}")
+        stats = apply_span_file(input_pdf, span_file, output_pdf, verbose=verbose, apply_plan=apply_plan,
+                                verify=verify)
+        click.echo(f"Applied {stats['redacted_items']} redactions. Redacted PDF saved to {output_pdf}")
+        echo_verification(stats)
     except Exception as e:
         click.echo(f"Error: {str(e)}", err=True)
         sys.exit(1)
 
 
+@main.command()
+@click.argument("input_pdf", type=click.Path(exists=True, readable=True))
+def preflight(input_pdf):
+    """
+    Check a PDF against the pre-flight limits without processing it.
+
+    Limits are read from PREFLIGHT_* environment variables (e.g.
+    PREFLIGHT_MAX_PAGES). Exits with status 1 if the document is rejected.
+
+    INPUT_PDF: Path to the input PDF file.
+    """
+    from pdf_pii_redactor import preflight as preflight_module
+
+    report = preflight_module.preflight(input_pdf, preflight_module.limits_from_env())
+    click.echo(f"Pages: {report['page_count']}, objects: {report['object_count']}, size: {report['file_size']} bytes, "
+               f"encrypted: {report['encrypted']}, repaired: {report['repaired']} "
+               f"({report['elapsed'] * 1000:.1f} ms)")
+    click.echo(f"Lane: {report['lane']}" + (f" ({'; '.join(report['reasons'])})" if report["reasons"] else ""))
+    if report["lane"] == "reject":
+        sys.exit(1)
+
+
+@main.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    envvar="PDF_PII_REDACTOR_SOCKET",
+    default=DEFAULT_SOCKET,
+    show_default=True,
+    help="Path of the Unix domain socket to listen on"
+)
+@click.option(
+    "--verbose",
+    is_flag=True,
+    help="Enable verbose output"
+)
+def serve(socket_path, verbose):
+    """
+    Run a daemon that keeps redactors warm for the redact and detect commands.
+
+    While it runs, "redact" and "detect" with the same --socket send their
+    job to it instead of loading the detection modules themselves. Stop it
+    with Ctrl+C or SIGTERM.
+    """
+    import signal
+    import logging
+    from pdf_pii_redactor.daemon import RedactionDaemon
+
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING)
+    # Load the detection modules before the first job
+    import pdf_pii_redactor.redactor  # noqa: F401
+
+    daemon = RedactionDaemon(socket_path, build_redactor)
+    try:
+        daemon.bind()
+    except RuntimeError as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    click.echo(f"Listening on {socket_path}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    click.echo(f"Stopped after {daemon.jobs} jobs")
+
+
+@main.group()
+def batch():
+    """
+    Work one redaction queue from several nodes sharing a volume.
+
+    Create the queue once with "batch init", then start "batch work" on every
+    node against the same queue directory.
+    """
+
+
+@batch.command("init")
+@click.argument("queue_dir", type=click.Path(file_okay=False))
+@click.argument("input_pdfs", nargs=-1, required=True, type=click.Path(exists=True, readable=True))
+@click.option(
+    "--output-dir",
+    required=True,
+    type=click.Path(file_okay=False),
+    help="Directory where the redacted PDFs will be saved"
+)
+def batch_init(queue_dir, input_pdfs, output_dir):
+    """
+    Create a batch queue.
+
+    QUEUE_DIR: Queue directory on the shared volume.
+    INPUT_PDFS: PDF files to redact.
+    """
+    from pdf_pii_redactor.batch import create_manifest
+
+    manifest = create_manifest(queue_dir, list(input_pdfs), output_dir)
+    click.echo(f"Created queue {queue_dir} with {len(manifest['items'])} items")
+
+
+@batch.command("work")
+@click.argument("queue_dir", type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--worker-id",
+    help="Worker id recorded in leases and results. Default: host name and process id"
+)
+@click.option(
+    "--lease-timeout",
+    type=float,
+    default=300.0,
+    help="Seconds without heartbeat after which another worker may reclaim an item. Default: 300"
+)
+@audit_option
+@detection_options
+def batch_work(queue_dir, worker_id, lease_timeout, audit_db, **options):
+    """
+    Redact the items of a batch queue until none are left.
+
+    QUEUE_DIR: Queue directory on the shared volume.
+    """
+    from pdf_pii_redactor.batch import BatchQueue, BatchWorker
+
+    redactor = create_redactor(**options)
+    process = redactor.redact_pdf
+    store = None
+    if audit_db:
+        from pdf_pii_redactor.audit import AuditStore
+
+        store = AuditStore(audit_db)
+        process = store.audited(process, model=options["model"])
+
+    worker = BatchWorker(BatchQueue(queue_dir, lease_timeout=lease_timeout), process, worker_id=worker_id)
+    try:
+        counts = worker.run()
+    finally:
+        if store is not None:
+            store.close()
+    message = f"Worker {worker.worker_id} completed {counts['completed']} items, {counts['failed']} failed"
+    if counts["lost"]:
+        message += f", {counts['lost']} lost to workers that reclaimed their lease"
+    click.echo(message)
+
+
+@batch.command("status")
+@click.argument("queue_dir", type=click.Path(exists=True, file_okay=False))
+def batch_status(queue_dir):
+    """
+    Show the progress of a batch queue.
+
+    QUEUE_DIR: Queue directory on the shared volume.
+    """
+    from pdf_pii_redactor.batch import BatchQueue
+
+    counts = BatchQueue(queue_dir).status()
+    click.echo(", ".join(f"{state}: {count}" for state, count in counts.items()))
+
+
+@main.group()
+def gazetteer():
+    """
+    Build gazetteers of known entities.
+
+    A gazetteer lists values (customer names, account numbers...) that are
+    always redacted; pass it to "redact" or "detect" with --gazetteer.
+    """
+
+
+@gazetteer.command("compile")
+@click.argument("output_file", type=click.Path(dir_okay=False, writable=True))
+@click.option(
+    "--terms",
+    "term_files",
+    multiple=True,
+    required=True,
+    metavar="TYPE=FILE",
+    help="PII type and UTF-8 file with one term per line, e.g. name=customers.txt; repeat for several files"
+)
+def gazetteer_compile(output_file, term_files):
+    """
+    Compile term lists into a gazetteer file.
+
+    OUTPUT_FILE: Path of the compiled gazetteer.
+    """
+    from pdf_pii_redactor.gazetteer import compile_gazetteer, read_term_file
+
+    sources = []
+    for term_file in term_files:
+        pii_type, separator, path = term_file.partition("=")
+        if not separator or not pii_type or not os.path.isfile(path):
+            raise click.BadParameter(f"expected TYPE=FILE with an existing file, got {term_file!r}",
+                                     param_hint="--terms")
+        sources.append((pii_type, path))
+
+    def terms():
+        for pii_type, path in sources:
+            for term in read_term_file(path):
+                yield pii_type, term
+
+    result = compile_gazetteer(terms(), output_file)
+    click.echo(f"Compiled {result['terms']} terms ({', '.join(result['types'])}) into {output_file}")
+
+
+@main.group()
+def audit():
+    """
+    Query the audit store written with --audit-db.
+    """
+
+
+@audit.command("query")
+@click.argument("audit_db", type=click.Path(exists=True, dir_okay=False))
+@click.option("--type", "pii_type", default=None, help="Only documents with PII of this type, e.g. credit_card")
+@click.option("--source", default=None, help="Only source files matching this glob pattern, e.g. \"/data/2026/*\"")
+@click.option("--since", default=None, help="Only runs recorded on or after this ISO date or time")
+@click.option("--until", default=None, help="Only runs recorded before this ISO date or time")
+@click.option("--status", type=click.Choice(["ok", "error", "cached"]), default=None, help="Only runs with this status")
+@click.option("--limit", type=int, default=100, help="Maximum number of runs, most recent first. Default: 100")
+@click.option("--pages", is_flag=True, help="Include the PII counts and detection time of each page")
+@click.option("--json", "as_json", is_flag=True, help="Print JSON lines instead of a table")
+@click.option("--totals", is_flag=True, help="Print the number of documents and values by PII type instead")
+def audit_query(audit_db, pii_type, source, since, until, status, limit, pages, as_json, totals):
+    """
+    List recorded runs, or count the PII found by type.
+
+    AUDIT_DB: Path of the audit store.
+    """
+    import json
+    from pdf_pii_redactor.audit import AuditStore, parse_time
+
+    try:
+        since = parse_time(since) if since else None
+        until = parse_time(until) if until else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--since/--until")
+
+    with AuditStore(audit_db) as store:
+        if totals:
+            counts = store.totals(since=since, until=until)
+            if as_json:
+                click.echo(json.dumps(counts))
+                return
+            click.echo(f"{'type':<16} {'documents':>10} {'values':>10}")
+            for name, count in counts.items():
+                click.echo(f"{name:<16} {count['documents']:>10} {count['values']:>10}")
+            return
+
+        documents = store.query(pii_type=pii_type, source=source, since=since, until=until, status=status,
+                                limit=limit, pages=pages)
+        for document in documents:
+            if as_json:
+                click.echo(json.dumps(document))
+                continue
+            types = ", ".join(f"{name}: {count}" for name, count in document["pii_types"].items()) or "-"
+            elapsed = f"{document['elapsed']:.2f} s" if document["elapsed"] is not None else "-"
+            click.echo(f"{document['recorded_at']}  {document['status']:<6} {document['source']}  "
+                       f"pages: {document['pages_processed']}, {types}, {elapsed}")
+            if document["error"]:
+                click.echo(f"    error: {document['error']}")
+            for page in document.get("pages", []):
+                page_types = ", ".join(f"{name}: {count}" for name, count in sorted(page["pii_types"].items())) or "-"
+                detection = f", {page['detection_time']:.2f} s" if page["detection_time"] is not None else ""
+                click.echo(f"    page {page['page'] + 1}: {page_types}{detection}")
+
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
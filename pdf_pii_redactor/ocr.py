@@ -0,0 +1,262 @@
+"""
+OCR of image-only pages.
+
+Pages without a text layer (scans, faxes, photographed forms) are rendered
+with page.get_pixmap() and passed to an OCR engine. The recognized words,
+with their boxes converted to PDF coordinates, become the page text that is
+sent to the detector, and spans on these pages are located by matching their
+values against the words instead of page.search_for(). Redacting a located
+rect blanks the image pixels under it.
+
+An OCR engine is any picklable object with a ``recognize(image)`` method that
+takes a PNG image as bytes and returns the words in reading order as
+dictionaries ``{"text": "Doe", "bbox": [x0, y0, x1, y1], "line": 3}`` with
+the box in pixels; words with the same "line" value are on the same line.
+
+Pages are rendered and recognized in a pool of worker processes, each of
+which opens the document once and holds the pixmap of a single page at a
+time, so memory stays bounded by the number of workers whatever the size of
+the document. The workers are spawned rather than forked, since OCR runs
+from threaded processes (the daemon, the web workers), and their default
+number is capped so that concurrent documents do not each start one per CPU.
+"""
+
+import io
+import os
+import re
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DPI = 300
+
+# Worker processes per document when not given: the number of CPUs, up to this
+MAX_DEFAULT_WORKERS = 4
+
+
+class TesseractEngine:
+    """
+    OCR engine backed by Tesseract, through pytesseract.
+
+    Requires the optional dependencies (pip install "pdf-pii-redactor[ocr]")
+    and the tesseract binary.
+    """
+
+    def __init__(self, languages: str = "eng", config: str = ""):
+        """
+        Initialize the engine.
+
+        Args:
+            languages: Tesseract language codes, e.g. "eng+deu"
+            config: Extra command-line options for tesseract
+        """
+        try:
+            import pytesseract  # noqa: F401
+            from PIL import Image  # noqa: F401
+        except ImportError:
+            raise ImportError('The tesseract OCR engine needs pytesseract and Pillow: pip install "pdf-pii-redactor[ocr]"')
+
+        self.languages = languages
+        self.config = config
+
+    def recognize(self, image: bytes) -> List[Dict[str, Any]]:
+        """
+        Recognize the words of an image.
+
+        Args:
+            image: PNG image
+
+        Returns:
+            Words in reading order with their pixel boxes and line keys
+        """
+        import pytesseract
+        from PIL import Image
+
+        data = pytesseract.image_to_data(Image.open(io.BytesIO(image)), lang=self.languages, config=self.config,
+                                         output_type=pytesseract.Output.DICT)
+        words = []
+        for index, text in enumerate(data["text"]):
+            if not text.strip():
+                continue
+            left, top = data["left"][index], data["top"][index]
+            words.append({
+                "text": text,
+                "bbox": [left, top, left + data["width"][index], top + data["height"][index]],
+                "line": (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+            })
+        return words
+
+
+# Engines selectable by name from the CLI
+OCR_ENGINES = {
+    "tesseract": TesseractEngine,
+}
+
+
+def create_engine(name: str) -> Any:
+    """
+    Create an OCR engine by name.
+
+    Args:
+        name: Engine name (see OCR_ENGINES)
+
+    Returns:
+        The engine
+
+    Raises:
+        ValueError: If the name is unknown
+    """
+    if name not in OCR_ENGINES:
+        raise ValueError(f"Unknown OCR engine: {name}")
+    return OCR_ENGINES[name]()
+
+
+def words_to_text(words: List[Dict[str, Any]]) -> str:
+    """
+    Build the text of a page from its OCR words.
+
+    Args:
+        words: OCR words in reading order
+
+    Returns:
+        Page text, one line per OCR line
+    """
+    lines = []
+    current_line = object()
+    for word in words:
+        if word.get("line") != current_line:
+            lines.append([])
+            current_line = word.get("line")
+        lines[-1].append(word["text"])
+    return "".join(" ".join(line) + "\n" for line in lines)
+
+
+def _word_key(text: str) -> str:
+    """Casefold a word and strip the punctuation around it."""
+    return re.sub(r"^\W+|\W+$", "", text.casefold())
+
+
+def search_words(words: List[Dict[str, Any]], value: str) -> List[fitz.Rect]:
+    """
+    Find a value in the OCR words of a page, like page.search_for() does in a text layer.
+
+    Matching ignores case, whitespace and the punctuation around words, and
+    compares whole words, so that "Ann" does not match "Annual"; a value
+    found across several lines gives one rect per line.
+
+    Args:
+        words: OCR words of the page, with boxes in PDF coordinates
+        value: Text to find
+
+    Returns:
+        Rectangles covering every occurrence
+    """
+    tokens = [_word_key(token) for token in value.split()]
+    if not tokens:
+        return []
+    texts = [_word_key(word["text"]) for word in words]
+
+    rects = []
+    for start in range(len(words) - len(tokens) + 1):
+        if texts[start:start + len(tokens)] != tokens:
+            continue
+
+        line_rects = {}
+        for word in words[start:start + len(tokens)]:
+            line = word.get("line")
+            line_rects[line] = line_rects.get(line, fitz.Rect(word["bbox"])) | fitz.Rect(word["bbox"])
+        rects.extend(line_rects.values())
+    return rects
+
+
+# Document and engine of a worker process, set by _init_worker
+_worker_doc = None
+_worker_engine = None
+
+
+def _init_worker(source: Any, engine: Any) -> None:
+    """Open the document once in a worker process."""
+    global _worker_doc, _worker_engine
+    _worker_doc = fitz.open(source) if isinstance(source, (str, os.PathLike)) else fitz.open(stream=source)
+    _worker_engine = engine
+
+
+def _ocr_page(page_num: int, dpi: int) -> List[Dict[str, Any]]:
+    """Render a page of the worker's document and recognize its words."""
+    return ocr_page(_worker_doc[page_num], _worker_engine, dpi)
+
+
+def ocr_page(page: fitz.Page, engine: Any, dpi: int = DEFAULT_DPI) -> List[Dict[str, Any]]:
+    """
+    Render a page and recognize its words.
+
+    Args:
+        page: Page to recognize
+        engine: OCR engine
+        dpi: Rendering resolution
+
+    Returns:
+        OCR words, with boxes in PDF coordinates
+    """
+    pixmap = page.get_pixmap(dpi=dpi)
+    image = pixmap.tobytes("png")
+    del pixmap
+
+    # Pixels to unrotated page coordinates
+    scale = 72.0 / dpi
+    matrix = fitz.Matrix(scale, scale) * page.derotation_matrix
+    words = []
+    for word in engine.recognize(image):
+        bbox = fitz.Rect(word["bbox"]) * matrix
+        words.append({"text": word["text"], "bbox": [bbox.x0, bbox.y0, bbox.x1, bbox.y1],
+                      "line": word.get("line")})
+    return words
+
+
+def ocr_pages(source: Any, page_nums: List[int], engine: Any, dpi: int = DEFAULT_DPI,
+              workers: Optional[int] = None) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Recognize the words of several pages in parallel.
+
+    Args:
+        source: Path to the PDF file, or its content (bytes or memoryview;
+            sent once to every worker)
+        page_nums: Pages to recognize
+        engine: OCR engine
+        dpi: Rendering resolution
+        workers: Number of worker processes; os.cpu_count(), up to
+            MAX_DEFAULT_WORKERS, when omitted, 0 to recognize the pages in
+            this process
+
+    Returns:
+        OCR words by page number, with boxes in PDF coordinates
+    """
+    if not page_nums:
+        return {}
+    if workers is None:
+        workers = min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS)
+    workers = min(workers, len(page_nums))
+
+    logger.info(f"Running OCR on {len(page_nums)} image-only pages at {dpi} dpi")
+    is_path = isinstance(source, (str, os.PathLike))
+
+    if workers == 0:
+        doc = fitz.open(source) if is_path else fitz.open(stream=source)
+        try:
+            return {page_num: ocr_page(doc[page_num], engine, dpi) for page_num in page_nums}
+        finally:
+            doc.close()
+
+    if not is_path:
+        # Sent to every worker once; memoryviews and mmaps cannot be pickled
+        source = bytes(source)
+    # Forking a process with other threads running can deadlock the child
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(source, engine)) as pool:
+        results = pool.map(_ocr_page, page_nums, [dpi] * len(page_nums))
+        return dict(zip(page_nums, results))
@@ -2,55 +2,416 @@
 PDF processing utilities for extracting and modifying PDF content.
 """
 
+import os
+import re
+import mmap
+import shutil
 import fitz  # PyMuPDF
 import logging
-from typing import List, Dict, Tuple, Any, Optional
+from typing import List, Dict, Tuple, Any, Optional, Union, BinaryIO
+
+from pdf_pii_redactor.profiling import Profiler, profile_stage
+from pdf_pii_redactor.ocr import DEFAULT_DPI, ocr_pages, words_to_text, search_words
 
 logger = logging.getLogger(__name__)
 
+# A PDF given as a filesystem path or as its bytes in memory
+PDFSource = Union[str, os.PathLike, bytes, bytearray, memoryview, mmap.mmap]
+
+# Where a PDF is written: a filesystem path or a binary file object
+PDFDestination = Union[str, os.PathLike, BinaryIO]
+
+# Text extraction flags for the words and rawdict profiles: no image blocks,
+# ligatures expanded, whitespace normalised, clipped to the mediabox.
+TEXT_FLAGS = fitz.TEXT_MEDIABOX_CLIP | fitz.TEXT_CID_FOR_UNKNOWN_UNICODE
+
+# Extraction profiles selectable through PDFRedactor and the CLI.
+#   default - page.get_text() with PyMuPDF's default flags (original behaviour)
+#   words   - text rebuilt from page.get_text("words")
+#   rawdict - text rebuilt from page.get_text("rawdict"), with per-character
+#             boxes stored under "chars"; only use it when char boxes are needed
+EXTRACTION_PROFILES = {
+    "default": {"mode": "text", "flags": None},
+    "words": {"mode": "words", "flags": TEXT_FLAGS},
+    "rawdict": {"mode": "rawdict", "flags": TEXT_FLAGS},
+}
+
+# How the image and line-art handling of apply_redactions is chosen per page.
+#   off       - PyMuPDF defaults on every page (pixel redaction of images,
+#               removal of covered line art)
+#   resources - skip image handling on pages whose resources hold no images,
+#               form XObjects or inline images
+#   overlap   - additionally skip image and line-art handling when no redaction
+#               rect overlaps an image or a path, from page.get_bboxlog()
+# MuPDF already leaves images and paths alone that no redaction touches, so
+# planning rarely pays for itself (see benchmarks/bench_apply.py); "off" is
+# the default and the other plans are there for documents where it does.
+APPLY_PLANS = ("off", "resources", "overlap")
+
+# Named combinations of (images, graphics) arguments of Page.apply_redactions
+APPLY_PATHS = {
+    "full": (fitz.PDF_REDACT_IMAGE_PIXELS, fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED),
+    "skip_images": (fitz.PDF_REDACT_IMAGE_NONE, fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED),
+    "skip_graphics": (fitz.PDF_REDACT_IMAGE_PIXELS, fitz.PDF_REDACT_LINE_ART_NONE),
+    "text_only": (fitz.PDF_REDACT_IMAGE_NONE, fitz.PDF_REDACT_LINE_ART_NONE),
+}
+
+# Inline image operator in a content stream
+INLINE_IMAGE_PATTERN = re.compile(rb"(?<![^\s])BI(?![^\s])")
+
+# What to do after redactions are applied.
+#   off    - nothing
+#   report - check that the redacted values are gone from the text layer of
+#            the redacted pages and list the ones that are not in the stats
+#   fail   - also raise instead of saving the document when a value is left
+VERIFY_MODES = ("off", "report", "fail")
+
+
+def is_path(source: Any) -> bool:
+    """Return True if a PDF source or destination is a filesystem path."""
+    return isinstance(source, (str, os.PathLike))
+
+
+def describe_pdf(source: Union[PDFSource, PDFDestination]) -> str:
+    """Return a short description of a PDF source or destination for log messages."""
+    if is_path(source):
+        return str(source)
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return f"<{len(source)} bytes in memory>"
+    return "<file object>"
+
+
+def open_pdf(source: PDFSource) -> fitz.Document:
+    """
+    Open a PDF from a path or from bytes in memory.
+
+    bytes and memoryview input is used by PyMuPDF without copying; bytearray
+    and mmap input is wrapped in a memoryview for the same reason, so an mmap
+    must stay open until the document is closed.
+
+    Args:
+        source: Path to the PDF file, or its content
+
+    Returns:
+        The opened document
+    """
+    if is_path(source):
+        return fitz.open(source)
+    if isinstance(source, (bytearray, mmap.mmap)):
+        source = memoryview(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def count_pages(pdf_path: PDFSource) -> int:
+    """
+    Return the number of pages of a PDF without loading them.
+
+    Args:
+        pdf_path: Path to the PDF file, or its content
+    """
+    doc = open_pdf(pdf_path)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def save_pdf(doc: fitz.Document, destination: PDFDestination) -> None:
+    """
+    Save a document to a path or write it to a binary file object.
+
+    Args:
+        doc: Document to save
+        destination: Output path or file object
+    """
+    if is_path(destination):
+        doc.save(destination)
+    else:
+        destination.write(doc.tobytes())
+
+
+def copy_pdf(source: PDFSource, destination: PDFDestination) -> None:
+    """
+    Copy a PDF unchanged, from a path or bytes to a path or file object.
+
+    Args:
+        source: Path to the PDF file, or its content
+        destination: Output path or file object
+    """
+    if is_path(source) and is_path(destination):
+        shutil.copyfile(source, destination)
+    elif is_path(source):
+        with open(source, "rb") as source_file:
+            shutil.copyfileobj(source_file, destination)
+    elif is_path(destination):
+        with open(destination, "wb") as destination_file:
+            destination_file.write(source)
+    else:
+        destination.write(source)
+
+
+def page_has_images(page: fitz.Page) -> bool:
+    """Return True if a page can show images, from its resources and content."""
+    # Images can only be reached through the page resources or inline in the content
+    return bool(page.get_images() or page.get_xobjects() or INLINE_IMAGE_PATTERN.search(page.read_contents()))
+
+
+def survey_page(page: fitz.Page, plan: str = "off") -> Dict[str, Any]:
+    """
+    Collect what the apply plan needs to know about a page's content.
+
+    Must run before redaction annotations are added: their appearance is
+    drawn like any other path.
+
+    Args:
+        page: Page to survey
+        plan: Planning strategy (see APPLY_PLANS)
+
+    Returns:
+        Dictionary with the plan and, unless the plan is "off", whether the
+        page can show images; for "overlap", the "images" and "paths" boxes
+    """
+    survey = {"plan": plan}
+    if plan == "off":
+        return survey
+
+    survey["has_images"] = page_has_images(page)
+
+    if plan == "overlap":
+        survey["images"] = []
+        survey["paths"] = []
+        for kind, bbox in page.get_bboxlog():
+            if kind in ("fill-image", "fill-imgmask"):
+                survey["images"].append(fitz.Rect(bbox))
+            elif kind in ("fill-path", "stroke-path"):
+                survey["paths"].append(fitz.Rect(bbox))
+
+    return survey
+
+
+def plan_page_redactions(survey: Dict[str, Any], rects: List[Any]) -> str:
+    """
+    Choose the cheapest safe image and line-art handling for a page's redactions.
+
+    Args:
+        survey: Survey of the page (see survey_page)
+        rects: Redaction rectangles of the page
+
+    Returns:
+        Name of the path to take (see APPLY_PATHS)
+    """
+    if survey["plan"] == "off":
+        return "full"
+    if survey["plan"] == "resources":
+        return "full" if survey["has_images"] else "skip_images"
+
+    rects = [fitz.Rect(rect) for rect in rects]
+    images_hit = survey["has_images"] and any(rect.intersects(box) for box in survey["images"] for rect in rects)
+    graphics_hit = any(rect.intersects(box) for box in survey["paths"] for rect in rects)
+
+    if images_hit:
+        return "full" if graphics_hit else "skip_graphics"
+    return "skip_images" if graphics_hit else "text_only"
+
+
+def apply_page_redactions(page: fitz.Page, survey: Dict[str, Any], rects: List[Any]) -> str:
+    """
+    Apply the redaction annotations of a page, skipping image and line-art handling when safe.
+
+    Args:
+        page: Page with redaction annotations
+        survey: Survey of the page taken before the annotations were added
+        rects: Redaction rectangles of the page
+
+    Returns:
+        Name of the path taken (see APPLY_PATHS)
+    """
+    path = plan_page_redactions(survey, rects)
+    images, graphics = APPLY_PATHS[path]
+    page.apply_redactions(images=images, graphics=graphics)
+    return path
+
+
+def _normalize_value(value: str) -> str:
+    """Normalize a value for comparison: whitespace runs collapsed, case folded."""
+    return " ".join(value.split()).casefold()
+
+
+def find_leaks(page: fitz.Page, values: Dict[str, Optional[str]]) -> List[Dict[str, Any]]:
+    """
+    Find redacted values that are still in the text layer of a page.
+
+    The page text is extracted once and scanned with a single pattern for all
+    values. Like page.search_for(), which located them, matching ignores case
+    and treats any whitespace run (including line breaks) as a single space.
+    Unlike it, a value only matches as a whole word, so a redacted "Ann" does
+    not count "Annual" as a leak.
+
+    Args:
+        page: Redacted page
+        values: PII type of each value redacted on the page, by value
+
+    Returns:
+        One entry per leaked value with its page, type and number of
+        occurrences; the values themselves are left out so that the stats
+        can be stored without PII
+    """
+    types = {}
+    alternatives = []
+    for value, pii_type in values.items():
+        key = _normalize_value(value)
+        if key and key not in types:
+            types[key] = pii_type
+            alternative = r"\s+".join(re.escape(part) for part in value.split())
+            if re.match(r"\w", key):
+                alternative = r"\b" + alternative
+            if re.search(r"\w$", key):
+                alternative += r"\b"
+            alternatives.append(alternative)
+    if not alternatives:
+        return []
+
+    # Longest first, so that a value containing another one is matched whole
+    alternatives.sort(key=len, reverse=True)
+    pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+
+    counts = {}
+    for match in pattern.finditer(page.get_text()):
+        key = _normalize_value(match.group())
+        counts[key] = counts.get(key, 0) + 1
+
+    return [{"page": page.number, "type": types.get(key), "count": count} for key, count in counts.items()]
+
+
+def verify_redactions(doc: fitz.Document, values_by_page: Dict[int, Dict[str, Optional[str]]],
+                      mode: str = "report", profiler: Optional[Profiler] = None) -> Dict[str, Any]:
+    """
+    Check the redacted pages of an open document for values that were not removed.
+
+    Args:
+        doc: Document after the redactions were applied, before it is saved
+        values_by_page: Values redacted on each page with their PII type, by page number
+        mode: "report" or "fail" (see VERIFY_MODES)
+        profiler: Profiler timing the verify stage
+
+    Returns:
+        Dictionary with the number of pages checked and the leaks (see find_leaks)
+
+    Raises:
+        RuntimeError: In "fail" mode, if a value was left on a page
+    """
+    leaks = []
+    for page_num in sorted(values_by_page):
+        with profile_stage(profiler, "verify", page_num):
+            leaks.extend(find_leaks(doc[page_num], values_by_page[page_num]))
+
+    if leaks:
+        pages = sorted(set(leak["page"] for leak in leaks))
+        message = f"Redaction verification found {len(leaks)} leaked values on pages {pages}"
+        if mode == "fail":
+            raise RuntimeError(message)
+        logger.warning(message)
+
+    return {"pages_checked": len(values_by_page), "leaks": leaks}
+
 
 class PDFProcessor:
     """
     Handles PDF document processing, including text extraction and redaction.
     """
     
-    def __init__(self, verbose: bool = False):
+    def __init__(self, verbose: bool = False, profiler: Optional[Profiler] = None,
+                 apply_plan: str = "off", verify: str = "off", ocr_engine: Optional[Any] = None,
+                 ocr_dpi: int = DEFAULT_DPI, ocr_workers: Optional[int] = None):
         """
         Initialize the PDF processor.
         
         Args:
             verbose: Whether to enable verbose logging
+            profiler: Profiler timing the extraction, ocr, search, apply, verify and save stages
+            apply_plan: How image and line-art handling is chosen when applying
+                redactions (see APPLY_PLANS)
+            verify: Whether applied redactions are checked for leaked values
+                before saving (see VERIFY_MODES)
+            ocr_engine: OCR engine for pages without a text layer (see
+                pdf_pii_redactor.ocr); None skips these pages
+            ocr_dpi: Resolution image-only pages are rendered at for OCR
+            ocr_workers: Number of OCR worker processes; the number of CPUs,
+                up to 4, when omitted, 0 to run OCR in this process
         """
+        if apply_plan not in APPLY_PLANS:
+            raise ValueError(f"Unknown apply plan: {apply_plan}")
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Unknown verify mode: {verify}")
+        
         self.verbose = verbose
+        self.profiler = profiler
+        self.apply_plan = apply_plan
+        self.verify = verify
+        self.ocr_engine = ocr_engine
+        self.ocr_dpi = ocr_dpi
+        self.ocr_workers = ocr_workers
         if verbose:
             logging.basicConfig(level=logging.INFO)
         else:
             logging.basicConfig(level=logging.WARNING)
     
-    def extract_text(self, pdf_path: str) -> List[Dict[str, Any]]:
+    def extract_text(self, pdf_path: PDFSource, profile: str = "default",
+                     header_margin: float = 0.0, footer_margin: float = 0.0,
+                     pages: Optional[List[int]] = None) -> List[Dict[str, Any]]:
         """
         Extract text content from a PDF file, preserving page structure.
         
         Args:
-            pdf_path: Path to the PDF file
+            pdf_path: Path to the PDF file, or its content
+            profile: Name of the extraction profile (see EXTRACTION_PROFILES)
+            header_margin: Height in points at the top of each page to skip
+            footer_margin: Height in points at the bottom of each page to skip
+            pages: 0-based numbers of the pages to extract; all pages when omitted
             
         Returns:
-            List of dictionaries containing page number and text content
+            List of dictionaries containing page number and text content;
+            pages recognized by OCR also hold their words under "ocr_words"
+        
+        Raises:
+            ValueError: If a page number is out of range
         """
+        if profile not in EXTRACTION_PROFILES:
+            raise ValueError(f"Unknown extraction profile: {profile}")
+        
+        page_nums = pages
         pages = []
+        # Page rect and clip of the pages without text that show images, by page number
+        image_only = {}
         
         try:
-            doc = fitz.open(pdf_path)
+            doc = open_pdf(pdf_path)
             
-            for page_num, page in enumerate(doc):
-                text = page.get_text()
-                if text.strip():  # Only add pages with actual text content
-                    pages.append({
+            if page_nums is None:
+                page_nums = range(len(doc))
+            elif any(not 0 <= page_num < len(doc) for page_num in page_nums):
+                raise ValueError(f"Page numbers must be between 0 and {len(doc) - 1}")
+            
+            for page_num in page_nums:
+                page = doc[page_num]
+                with profile_stage(self.profiler, "extraction", page_num):
+                    clip = self._clip_rect(page, header_margin, footer_margin)
+                    page_content = self._extract_page_text(page, profile, clip)
+                if page_content["text"].strip():  # Only add pages with actual text content
+                    page_content.update({
                         "page_num": page_num,
-                        "text": text,
                         "width": page.rect.width,
                         "height": page.rect.height
                     })
+                    pages.append(page_content)
+                elif self.ocr_engine is not None and page_has_images(page):
+                    image_only[page_num] = (page.rect, self._clip_rect(page, header_margin, footer_margin))
+            
+            doc.close()
+            
+            if image_only:
+                pages.extend(self._ocr_pages(pdf_path, image_only))
+                pages.sort(key=lambda page_content: page_content["page_num"])
             
             logger.info(f"Extracted text from {len(pages)} pages")
             return pages
@@ -59,18 +420,128 @@ class PDFProcessor:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise
     
-    def apply_redactions(self, pdf_path: str, output_path: str, 
-                         redactions: List[Dict[str, Any]]) -> None:
+    def _ocr_pages(self, pdf_path: PDFSource,
+                   image_only: Dict[int, Tuple[fitz.Rect, Optional[fitz.Rect]]]) -> List[Dict[str, Any]]:
+        """
+        Recognize the text of image-only pages.
+        
+        Args:
+            pdf_path: Path to the PDF file, or its content
+            image_only: Page rect and clip rectangle of each page, by page number
+            
+        Returns:
+            Page dictionaries like extract_text's, with the OCR words under "ocr_words"
+        """
+        with profile_stage(self.profiler, "ocr"):
+            words_by_page = ocr_pages(pdf_path, sorted(image_only), self.ocr_engine,
+                                      dpi=self.ocr_dpi, workers=self.ocr_workers)
+        
+        pages = []
+        for page_num, words in words_by_page.items():
+            rect, clip = image_only[page_num]
+            if clip is not None:
+                words = [word for word in words if fitz.Rect(word["bbox"]).intersects(clip)]
+            text = words_to_text(words)
+            if text.strip():
+                pages.append({"text": text, "ocr_words": words, "page_num": page_num,
+                              "width": rect.width, "height": rect.height})
+        
+        logger.info(f"Recognized text on {len(pages)} of {len(image_only)} image-only pages")
+        return pages
+    
+    def _clip_rect(self, page: fitz.Page, header_margin: float,
+                   footer_margin: float) -> Optional[fitz.Rect]:
+        """
+        Build the clip rectangle that excludes page headers and footers.
+        
+        Args:
+            page: Page to clip
+            header_margin: Height in points to skip at the top
+            footer_margin: Height in points to skip at the bottom
+            
+        Returns:
+            Clip rectangle, or None to extract the full page
+        """
+        if not header_margin and not footer_margin:
+            return None
+        
+        rect = page.rect
+        return fitz.Rect(rect.x0, rect.y0 + header_margin, rect.x1, rect.y1 - footer_margin)
+    
+    def _extract_page_text(self, page: fitz.Page, profile: str,
+                           clip: Optional[fitz.Rect]) -> Dict[str, Any]:
+        """
+        Extract the text of a single page using an extraction profile.
+        
+        Args:
+            page: Page to extract
+            profile: Name of the extraction profile
+            clip: Optional clip rectangle
+            
+        Returns:
+            Dictionary with the page text, plus "chars" for the rawdict profile
+        """
+        settings = EXTRACTION_PROFILES[profile]
+        mode = settings["mode"]
+        flags = settings["flags"]
+        
+        if mode == "text":
+            if flags is None and clip is None:
+                return {"text": page.get_text()}
+            return {"text": page.get_text("text", flags=flags, clip=clip)}
+        
+        if mode == "words":
+            # Word tuples: (x0, y0, x1, y1, word, block_no, line_no, word_no)
+            lines = []
+            current_line = None
+            for word in page.get_text("words", flags=flags, clip=clip):
+                line_key = (word[5], word[6])
+                if line_key != current_line:
+                    lines.append([])
+                    current_line = line_key
+                lines[-1].append(word[4])
+            return {"text": "".join(" ".join(line) + "\n" for line in lines)}
+        
+        # rawdict: rebuild the text one character at a time so that
+        # chars[i] is the bounding box of text[i] (None for line breaks)
+        text_parts = []
+        chars = []
+        for block in page.get_text("rawdict", flags=flags, clip=clip)["blocks"]:
+            if block.get("type", 0) != 0:
+                continue
+            for line in block["lines"]:
+                for span in line["spans"]:
+                    for char in span["chars"]:
+                        text_parts.append(char["c"])
+                        chars.append(tuple(char["bbox"]))
+                text_parts.append("\n")
+                chars.append(None)
+        return {"text": "".join(text_parts), "chars": chars}
+    
+    def apply_redactions(self, pdf_path: PDFSource, output_path: PDFDestination, 
+                         redactions: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Apply redactions to a PDF file and save the result.
         
         Args:
-            pdf_path: Path to the original PDF file
-            output_path: Path where the redacted PDF will be saved
+            pdf_path: Path to the original PDF file, or its content
+            output_path: Path or binary file object where the redacted PDF will be saved
             redactions: List of redaction instructions
+            
+        Returns:
+            Dictionary with the number of pages that took each apply path
+            ("apply_paths", see APPLY_PATHS) and, when verifying, the result
+            of verify_redactions under "verification"
+        
+        Raises:
+            RuntimeError: If verify is "fail" and a redacted value was left;
+                nothing is saved then
         """
+        stats = {"apply_paths": {}}
+        apply_paths = stats["apply_paths"]
+        
         try:
-            doc = fitz.open(pdf_path)
+            doc = open_pdf(pdf_path)
             
             # Group redactions by page
             redactions_by_page = {}
@@ -83,8 +554,11 @@ class PDFProcessor:
             # Apply redactions page by page
             for page_num, page_redactions in redactions_by_page.items():
                 page = doc[page_num]
+                with profile_stage(self.profiler, "apply", page_num):
+                    survey = survey_page(page, self.apply_plan)
                 
                 # First, mark all redactions
+                rects = []
                 for redaction in page_redactions:
                     rect = fitz.Rect(
                         redaction["x0"], 
@@ -94,30 +568,49 @@ class PDFProcessor:
                     )
                     # Mark text for redaction
                     page.add_redact_annot(rect, text=" ")
+                    rects.append(rect)
                 
                 # Then apply all redactions at once
-                page.apply_redactions()
+                with profile_stage(self.profiler, "apply", page_num):
+                    path = apply_page_redactions(page, survey, rects)
+                apply_paths[path] = apply_paths.get(path, 0) + 1
                 
                 if self.verbose:
                     logger.info(f"Applied {len(page_redactions)} redactions to page {page_num}")
             
+            if self.verify != "off":
+                values_by_page = {
+                    page_num: {redaction["text"]: redaction.get("type")
+                               for redaction in page_redactions if redaction.get("text")}
+                    for page_num, page_redactions in redactions_by_page.items()
+                }
+                try:
+                    stats["verification"] = verify_redactions(doc, values_by_page, self.verify, self.profiler)
+                except RuntimeError:
+                    doc.close()
+                    raise
+            
             # Save the redacted document
-            doc.save(output_path)
+            with profile_stage(self.profiler, "save"):
+                save_pdf(doc, output_path)
             doc.close()
             
-            logger.info(f"Saved redacted PDF to {output_path}")
+            logger.info(f"Saved redacted PDF to {describe_pdf(output_path)}")
+            return stats
             
         except Exception as e:
             logger.error(f"Error applying redactions: {str(e)}")
             raise
     
-    def find_text_instances(self, pdf_path: str, text_to_find: str) -> List[Dict[str, Any]]:
+    def find_text_instances(self, pdf_path: PDFSource, text_to_find: str,
+                            page_num: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Find all instances of a specific text in the PDF and return their positions.
         
         Args:
-            pdf_path: Path to the PDF file
+            pdf_path: Path to the PDF file, or its content
             text_to_find: Text to search for
+            page_num: Only search this page (0-based) when given
             
         Returns:
             List of dictionaries with page number and rectangle coordinates
@@ -125,14 +618,15 @@ class PDFProcessor:
         instances = []
         
         try:
-            doc = fitz.open(pdf_path)
+            doc = open_pdf(pdf_path)
             
-            for page_num, page in enumerate(doc):
-                text_instances = page.search_for(text_to_find)
+            page_nums = [page_num] if page_num is not None else range(len(doc))
+            for current_page in page_nums:
+                text_instances = doc[current_page].search_for(text_to_find)
                 
                 for rect in text_instances:
                     instances.append({
-                        "page_num": page_num,
+                        "page_num": current_page,
                         "x0": rect.x0,
                         "y0": rect.y0,
                         "x1": rect.x1,
@@ -140,6 +634,8 @@ class PDFProcessor:
                         "text": text_to_find
                     })
             
+            doc.close()
+            
             if self.verbose:
                 logger.info(f"Found {len(instances)} instances of '{text_to_find}'")
             
@@ -147,4 +643,42 @@ class PDFProcessor:
             
         except Exception as e:
             logger.error(f"Error searching for text: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+    
+    def locate_spans(self, pdf_path: PDFSource, spans: List[Dict[str, Any]],
+                     ocr_words: Optional[Dict[int, List[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+        """
+        Fill in the "rects" of PII spans by searching their values on their pages.
+        
+        The document is opened once for all spans, and spans that already carry
+        rects are left untouched.
+        
+        Args:
+            pdf_path: Path to the PDF file, or its content
+            spans: List of spans (see pdf_pii_redactor.spans)
+            ocr_words: OCR words of the image-only pages, by page number; spans
+                on these pages are searched in the words
+            
+        Returns:
+            The same list of spans, with "rects" set on every span
+        """
+        try:
+            doc = open_pdf(pdf_path)
+            
+            for span in spans:
+                if span.get("rects"):
+                    continue
+                page = doc[span["page"]]
+                with profile_stage(self.profiler, "search", span["page"]):
+                    if ocr_words and span["page"] in ocr_words:
+                        rects = search_words(ocr_words[span["page"]], span["value"])
+                    else:
+                        rects = page.search_for(span["value"])
+                    span["rects"] = [[rect.x0, rect.y0, rect.x1, rect.y1] for rect in rects]
+            
+            doc.close()
+            return spans
+            
+        except Exception as e:
+            logger.error(f"Error locating spans: {str(e)}")
+            raise
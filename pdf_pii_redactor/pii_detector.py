@@ -2,19 +2,111 @@
 PII detection using OpenAI API.
 """
 
+import re
 import json
+import time
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 import openai
 
+from pdf_pii_redactor.concurrency import is_throttled
+from pdf_pii_redactor.prompts import build_prompt, collapse_whitespace, restore_offsets
+from pdf_pii_redactor.streaming import IncrementalEntityParser
+
 logger = logging.getLogger(__name__)
 
+# Versions of the prompts and response contracts; bump them whenever a prompt
+# changes so that cached results are not reused across prompts
+PROMPT_VERSIONS = {
+    "verbose": "verbose-3",
+    "compact": "compact-2",
+}
+
+# Short type codes of the compact response format
+TYPE_CODES = {
+    "n": "name",
+    "e": "email",
+    "p": "phone",
+    "a": "address",
+    "c": "credit_card",
+    "d": "dob",
+}
+
+# Shapes a value rebuilt from compact offsets must have, so that offsets
+# pointing next to the entity are caught and the page falls back to verbose
+EMAIL_SHAPE = re.compile(r"[^\s@]+@[^\s@]+\.[^\s@]+")
+NUMBER_SHAPE = re.compile(r"[\d\s+().\-/*xX]+")
+# Lowercase words allowed inside names ("Ludwig van Beethoven")
+NAME_PARTICLES = {"van", "von", "der", "den", "de", "del", "della", "di", "da", "du", "la", "le", "bin", "al"}
+
+# Structured-output schema of the compact response format: entities as
+# (type code, start offset, end offset) plus a page-level confidence
+COMPACT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "pii_offsets",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "e": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "t": {"type": "string", "enum": list(TYPE_CODES)},
+                            "s": {"type": "integer"},
+                            "x": {"type": "integer"}
+                        },
+                        "required": ["t", "s", "x"],
+                        "additionalProperties": False
+                    }
+                },
+                "c": {"type": "number"}
+            },
+            "required": ["e", "c"],
+            "additionalProperties": False
+        }
+    }
+}
+
+
+def has_shape(pii_type: str, value: str) -> bool:
+    """
+    Check that a value looks like an entity of its type.
+    
+    Args:
+        pii_type: PII type
+        value: Value without surrounding whitespace and punctuation
+        
+    Returns:
+        False if the value cannot be an entity of the type, e.g. a name with
+        a lowercase word or an email address without a domain
+    """
+    digits = sum(c.isdigit() for c in value)
+    if pii_type == "email":
+        return EMAIL_SHAPE.fullmatch(value) is not None
+    if pii_type in ("phone", "credit_card"):
+        return digits >= 4 and NUMBER_SHAPE.fullmatch(value) is not None
+    if pii_type == "dob":
+        return digits > 0
+    if pii_type == "name":
+        # Capitalized words; letters without case (CJK, Arabic) pass
+        return digits == 0 and all(word[0].isalpha() and not word[0].islower() or word in NAME_PARTICLES
+                                   for word in value.split())
+    if pii_type == "address":
+        return digits > 0 or (value[0].isalpha() and not value[0].islower())
+    return True
+
+
 class PIIDetector:
     """
     Detects personally identifiable information (PII) in text using OpenAI API.
     """
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o", verbose: bool = False):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o", verbose: bool = False,
+                 response_format: str = "verbose", stream: bool = False):
         """
         Initialize the PII detector.
         
@@ -22,12 +114,23 @@ class PIIDetector:
             api_key: OpenAI API key
             model: OpenAI model to use
             verbose: Whether to enable verbose logging
+            response_format: "verbose" (type, value and offsets per entity) or
+                "compact" (type codes and offsets only, values rebuilt locally,
+                falling back to verbose when the offsets do not line up)
+            stream: Whether to stream responses, so that analyze() can hand
+                each entity to a callback as soon as the model has written it
         """
+        if response_format not in PROMPT_VERSIONS:
+            raise ValueError(f"Unknown response format: {response_format}")
+        
         self.model = model
         self.verbose = verbose
-        
-        if api_key:
-            openai.api_key = api_key
+        self.response_format = response_format
+        self.stream = stream
+        self.api_key = api_key
+        self._client = None
+        self._async_client = None
+        self._async_client_loop = None
         
         # Define PII types to detect
         self.pii_types = [
@@ -50,36 +153,398 @@ class PIIDetector:
         Returns:
             List of dictionaries containing PII type and value
         """
+        return self.analyze(text, language)["pii"]
+    
+    def analyze(self, text: str, language: str = "en",
+                on_entity: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Detect PII in the given text and report how the detection went.
+        
+        Args:
+            text: Text to analyze
+            language: ISO 639-1 language code
+            on_entity: Called with each PII dictionary as soon as it is parsed
+                from a streamed response (only when streaming); with the
+                compact format, only once the response has validated
+            
+        Returns:
+            Dictionary with the detected "pii", whether the response was "ok",
+            the "error" and whether it was "throttled" (HTTP 429) if not, the
+            model's "confidence" (None if not given), the "latency" in
+            seconds, the "model" used and the token "usage"
+        """
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        result = {"pii": [], "ok": True, "error": None, "confidence": None,
+                  "latency": 0.0, "model": self.model, "usage": usage}
+        
         if not text or len(text.strip()) < 5:
-            return []
+            return result
         
+        # Send the text without layout whitespace; offsets are mapped back below
+        collapsed, offset_map = collapse_whitespace(text)
+        
+        emit = None
+        if on_entity is not None and self.stream:
+            def emit(pii):
+                on_entity(self._restore_pii_offsets(dict(pii), collapsed, offset_map))
+        
+        start = time.perf_counter()
         try:
-            # Construct the prompt for PII detection
-            prompt = self._create_pii_detection_prompt(text, language)
-            
-            # Call OpenAI API
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": prompt["system"]},
-                    {"role": "user", "content": prompt["user"]}
-                ],
-                temperature=0.0,  # Use deterministic output
-                response_format={"type": "json_object"}
-            )
-            
-            # Parse the response
-            content = response.choices[0].message.content
-            pii_data = json.loads(content)
+            pii_data = None
+            if self.response_format == "compact":
+                pii_data = self._detect_compact(collapsed, language, usage, emit)
+                if pii_data is None:
+                    result["fallback"] = True
+            if pii_data is None:
+                pii_data = self._detect_verbose(collapsed, language, usage, emit)
             
-            if self.verbose:
-                logger.info(f"Detected {len(pii_data.get('pii', []))} PII instances")
+            self._set_pii(result, pii_data, collapsed, offset_map)
             
-            return pii_data.get("pii", [])
+        except Exception as e:
+            logger.error(f"Error detecting PII: {str(e)}")
+            result["ok"] = False
+            result["error"] = str(e)
+            result["throttled"] = is_throttled(e)
+        
+        result["latency"] = time.perf_counter() - start
+        return result
+    
+    async def analyze_async(self, text: str, language: str = "en") -> Dict[str, Any]:
+        """
+        Detect PII in the given text with openai.AsyncOpenAI, without blocking the event loop.
+        
+        Responses are not streamed. Cancelling the coroutine cancels the request.
+        
+        Args:
+            text: Text to analyze
+            language: ISO 639-1 language code
+            
+        Returns:
+            The same dictionary as analyze()
+        """
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        result = {"pii": [], "ok": True, "error": None, "confidence": None,
+                  "latency": 0.0, "model": self.model, "usage": usage}
+        
+        if not text or len(text.strip()) < 5:
+            return result
+        
+        collapsed, offset_map = collapse_whitespace(text)
+        
+        start = time.perf_counter()
+        try:
+            pii_data = None
+            if self.response_format == "compact":
+                content = await self._complete_async(self._create_compact_prompt(collapsed, language),
+                                                     COMPACT_RESPONSE_FORMAT, usage)
+                pii_data = self._parse_compact(collapsed, content)
+                if pii_data is None:
+                    result["fallback"] = True
+            if pii_data is None:
+                content = await self._complete_async(self._create_pii_detection_prompt(collapsed, language),
+                                                     {"type": "json_object"}, usage)
+                pii_data = self._parse_verbose(content)
+            
+            self._set_pii(result, pii_data, collapsed, offset_map)
             
         except Exception as e:
             logger.error(f"Error detecting PII: {str(e)}")
-            return []
+            result["ok"] = False
+            result["error"] = str(e)
+            result["throttled"] = is_throttled(e)
+        
+        result["latency"] = time.perf_counter() - start
+        return result
+    
+    def _set_pii(self, result: Dict[str, Any], pii_data: Dict[str, Any], collapsed: str,
+                 offset_map: List[int]) -> None:
+        """
+        Store parsed PII in a result, with offsets mapped back to the page text.
+        
+        Args:
+            result: Result dictionary to update
+            pii_data: Parsed response with the "pii" list and the "confidence"
+            collapsed: Collapsed text sent to the model
+            offset_map: Offset map returned by collapse_whitespace
+        """
+        result["pii"] = [self._restore_pii_offsets(pii, collapsed, offset_map) for pii in pii_data["pii"]]
+        result["confidence"] = pii_data.get("confidence")
+        
+        if self.verbose:
+            logger.info(f"Detected {len(result['pii'])} PII instances")
+    
+    @property
+    def prompt_version(self) -> str:
+        """Version of the prompt and response contract in use."""
+        return PROMPT_VERSIONS[self.response_format]
+    
+    def _complete(self, prompt: Dict[str, str], response_format: Dict[str, Any], usage: Dict[str, int],
+                  on_object: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+        """
+        Send a prompt to the OpenAI API.
+        
+        Args:
+            prompt: Dictionary with system and user prompts
+            response_format: OpenAI response_format parameter
+            usage: Token counts, updated with the usage of this request
+            on_object: Called with each entity object of a streamed response
+                as soon as it is complete
+            
+        Returns:
+            Content of the response message
+        """
+        request = self._build_request(prompt, response_format)
+        
+        if self.stream:
+            response = self._get_client().chat.completions.create(stream=True,
+                                                                  stream_options={"include_usage": True}, **request)
+            parser = IncrementalEntityParser()
+            response_usage = None
+            for chunk in response:
+                # The last chunk carries the usage and no choices
+                if getattr(chunk, "usage", None) is not None:
+                    response_usage = chunk.usage
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                for entity in parser.feed(chunk.choices[0].delta.content):
+                    if on_object is not None:
+                        on_object(entity)
+            content = parser.text
+        else:
+            response = self._get_client().chat.completions.create(**request)
+            response_usage = getattr(response, "usage", None)
+            content = response.choices[0].message.content
+        
+        self._add_usage(usage, response_usage)
+        return content
+    
+    async def _complete_async(self, prompt: Dict[str, str], response_format: Dict[str, Any],
+                              usage: Dict[str, int]) -> str:
+        """
+        Send a prompt to the OpenAI API with the async client.
+        
+        Args:
+            prompt: Dictionary with system and user prompts
+            response_format: OpenAI response_format parameter
+            usage: Token counts, updated with the usage of this request
+            
+        Returns:
+            Content of the response message
+        """
+        client = self._get_async_client()
+        response = await client.chat.completions.create(**self._build_request(prompt, response_format))
+        self._add_usage(usage, getattr(response, "usage", None))
+        return response.choices[0].message.content
+    
+    def _get_client(self) -> Any:
+        """
+        Return the OpenAI client of this detector, created on first use.
+        
+        Each detector has its own client rather than setting the global
+        openai.api_key, so that detectors with different keys (e.g. in the
+        daemon) do not switch the key of each other's requests.
+        """
+        if self._client is None:
+            self._client = openai.OpenAI(api_key=self.api_key or openai.api_key)
+        return self._client
+    
+    def _get_async_client(self) -> Any:
+        """
+        Return the async OpenAI client of the running event loop.
+        
+        The client's connection pool belongs to one event loop, so a new
+        client is created when the detector is used from another loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = openai.AsyncOpenAI(api_key=self.api_key or openai.api_key)
+            self._async_client_loop = loop
+        return self._async_client
+    
+    def _build_request(self, prompt: Dict[str, str], response_format: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the chat completion parameters of a prompt.
+        
+        Args:
+            prompt: Dictionary with system and user prompts
+            response_format: OpenAI response_format parameter
+            
+        Returns:
+            Keyword arguments for chat.completions.create
+        """
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": prompt["system"]},
+                {"role": "user", "content": prompt["user"]}
+            ],
+            "temperature": 0.0,  # Use deterministic output
+            "response_format": response_format
+        }
+    
+    def _add_usage(self, usage: Dict[str, int], response_usage: Any) -> None:
+        """
+        Add the token counts of a response to the usage totals.
+        
+        Args:
+            usage: Token counts to update
+            response_usage: Usage object of the response, or None
+        """
+        counts = {
+            "prompt_tokens": getattr(response_usage, "prompt_tokens", None),
+            "completion_tokens": getattr(response_usage, "completion_tokens", None),
+            "cached_tokens": getattr(getattr(response_usage, "prompt_tokens_details", None), "cached_tokens", None)
+        }
+        for name, count in counts.items():
+            if isinstance(count, int):
+                usage[name] += count
+    
+    def _detect_verbose(self, text: str, language: str, usage: Dict[str, int],
+                        on_entity: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Detect PII with the verbose response format.
+        
+        Args:
+            text: Text to analyze
+            language: ISO 639-1 language code
+            usage: Token counts to update
+            on_entity: Called with each streamed PII dictionary
+            
+        Returns:
+            Dictionary with the "pii" list and the "confidence"
+        """
+        on_object = None
+        if on_entity is not None:
+            def on_object(pii):
+                if pii.get("type") and isinstance(pii.get("value"), str):
+                    on_entity(pii)
+        
+        prompt = self._create_pii_detection_prompt(text, language)
+        return self._parse_verbose(self._complete(prompt, {"type": "json_object"}, usage, on_object))
+    
+    def _parse_verbose(self, content: str) -> Dict[str, Any]:
+        """
+        Parse a verbose response.
+        
+        Args:
+            content: Response content
+            
+        Returns:
+            Dictionary with the "pii" list and the "confidence"
+        """
+        pii_data = json.loads(content)
+        if not isinstance(pii_data.get("pii", []), list):
+            raise ValueError("'pii' is not a list")
+        
+        return {"pii": pii_data.get("pii", []), "confidence": pii_data.get("confidence")}
+    
+    def _detect_compact(self, text: str, language: str, usage: Dict[str, int],
+                        on_entity: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Detect PII with the compact response format.
+        
+        Args:
+            text: Text to analyze
+            language: ISO 639-1 language code
+            usage: Token counts to update
+            on_entity: Called with each PII dictionary once the whole response
+                has validated, since one bad offset discards it for verbose
+            
+        Returns:
+            Dictionary with the "pii" list and the "confidence", or None if the
+            response does not parse or its offsets do not line up with the text
+        """
+        prompt = self._create_compact_prompt(text, language)
+        pii_data = self._parse_compact(text, self._complete(prompt, COMPACT_RESPONSE_FORMAT, usage))
+        if pii_data is not None and on_entity is not None:
+            for pii in pii_data["pii"]:
+                on_entity(dict(pii))
+        return pii_data
+    
+    def _parse_compact(self, text: str, content: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse a compact response and rebuild its entities.
+        
+        Args:
+            text: Text the offsets refer to
+            content: Response content
+            
+        Returns:
+            Dictionary with the "pii" list and the "confidence", or None if the
+            response does not parse or its offsets do not line up with the text
+        """
+        try:
+            pii_data = json.loads(content)
+            entities = pii_data["e"]
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Unparseable compact response, falling back to verbose: {str(e)}")
+            return None
+        
+        pii = []
+        for entity in entities:
+            rebuilt = self._rebuild_entity(text, entity)
+            if rebuilt is None:
+                logger.warning(f"Compact offsets do not line up ({entity}), falling back to verbose")
+                return None
+            pii.append(rebuilt)
+        
+        return {"pii": pii, "confidence": pii_data.get("c")}
+    
+    def _rebuild_entity(self, text: str, entity: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Rebuild a verbose PII entry from a compact (type code, start, end) entity.
+        
+        Args:
+            text: Text the offsets refer to
+            entity: Compact entity
+            
+        Returns:
+            PII dictionary, or None if the offsets are not plausible
+        """
+        pii_type = TYPE_CODES.get(entity.get("t"))
+        start = entity.get("s")
+        end = entity.get("x")
+        if pii_type is None or not isinstance(start, int) or not isinstance(end, int):
+            return None
+        if not 0 <= start < end <= len(text):
+            return None
+        
+        value = text[start:end]
+        # Trim surrounding whitespace and punctuation the model may have included
+        stripped = value.strip().lstrip(",;:").rstrip(",;:.").strip()
+        if not stripped:
+            return None
+        start += value.index(stripped)
+        end = start + len(stripped)
+        
+        # Offsets off by a few characters cut a word or take in a neighbouring one
+        if stripped[0].isalnum() and start > 0 and text[start - 1].isalnum():
+            return None
+        if stripped[-1].isalnum() and end < len(text) and text[end].isalnum():
+            return None
+        if not has_shape(pii_type, stripped):
+            return None
+        
+        return {"type": pii_type, "value": stripped, "start_index": start, "end_index": end}
+    
+    def _restore_pii_offsets(self, pii: Dict[str, Any], collapsed: str,
+                             offset_map: List[int]) -> Dict[str, Any]:
+        """
+        Map the offsets of a PII entry from the collapsed text back to the page text.
+        
+        Args:
+            pii: PII dictionary with offsets in the collapsed text
+            collapsed: Collapsed text sent to the model
+            offset_map: Offset map returned by collapse_whitespace
+            
+        Returns:
+            The PII dictionary, with offsets in the page text when they were valid
+        """
+        start = pii.get("start_index")
+        end = pii.get("end_index")
+        if isinstance(start, int) and isinstance(end, int) and 0 <= start < end <= len(collapsed):
+            pii["start_index"], pii["end_index"] = restore_offsets(offset_map, start, end)
+        return pii
     
     def _create_pii_detection_prompt(self, text: str, language: str) -> Dict[str, str]:
         """
@@ -92,41 +557,17 @@ class PIIDetector:
         Returns:
             Dictionary with system and user prompts
         """
-        system_prompt = f"""You are a privacy protection assistant specialized in identifying personally identifiable information (PII) in documents.
-Your task is to identify the following types of PII in the provided text:
-- Names (full names, first names, last names)
-- Email addresses
-- Phone numbers (in any format)
-- Physical addresses (street addresses, postal codes, etc.)
-- Credit card numbers
-- Dates of birth (in any format)
-
-Important: For dates of birth, identify dates that are:
-- Explicitly mentioned as birth dates, birthdays, or DOB
-- Mentioned in contexts like "I was born on...", "born in...", "date of birth is..."
-- Any date clearly referring to when someone was born
-
-Do NOT flag regular dates like meeting dates, document dates, or other temporal references that aren't related to someone's birth.
-
-The text is in {language} language.
-
-Respond with a JSON object containing an array of PII instances found in the text. Each instance should include:
-1. "type": The type of PII (name, email, phone, address, credit_card, dob)
-2. "value": The exact text that contains the PII
-3. "start_index": The character index where this PII starts in the text
-4. "end_index": The character index where this PII ends in the text
-
-Format your response as:
-{{"pii": [
-  {{"type": "name", "value": "John Doe", "start_index": 10, "end_index": 18}},
-  ...
-]}}
-
-Be thorough and precise. Include all instances of PII you can find. For dates of birth, include any dates that are clearly indicated as someone's birth date or when someone mentions being born on a specific date."""
-
-        user_prompt = f"Please identify all PII in the following text:\n\n{text}"
+        return build_prompt(text, language, "verbose")
+    
+    def _create_compact_prompt(self, text: str, language: str) -> Dict[str, str]:
+        """
+        Create a prompt for PII detection with the compact response format.
         
-        return {
-            "system": system_prompt,
-            "user": user_prompt
-        } 
\ No newline at end of file
+        Args:
+            text: Text to analyze
+            language: ISO 639-1 language code
+            
+        Returns:
+            Dictionary with system and user prompts
+        """
+        return build_prompt(text, language, "compact")
@@ -0,0 +1,265 @@
+"""
+Pre-flight checks of uploaded PDFs.
+
+preflight() takes a few milliseconds: it checks the file size before opening
+the document, then opens it without loading any page and reads the page
+count, the number of objects (the length of the xref table), the encryption
+and whether MuPDF had to repair a broken xref table. Documents beyond the
+hard limits are rejected; large or repaired documents are sent to the slow
+lane, which runs them one at a time in a child process with a time and a
+memory budget, so that a pathological input cannot stall or exhaust the
+process serving the other requests. The children are spawned rather than
+forked from the multi-threaded caller, whose locks may be held by another
+thread at the time of a fork.
+
+The size of decompressed streams is not known before they are decoded; the
+memory budget of the slow lane bounds it instead.
+"""
+
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from typing import Dict, Any, Optional, Callable, Mapping
+
+from pdf_pii_redactor.pdf_processor import PDFSource, is_path, open_pdf
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+LANES = ("normal", "slow", "reject")
+
+DEFAULT_LIMITS = {
+    # Hard limits: documents beyond them are rejected
+    "max_file_bytes": 200 * 1024 * 1024,
+    "max_pages": 5000,
+    "max_objects": 1000000,
+    # Documents beyond these go to the slow lane
+    "slow_file_bytes": 20 * 1024 * 1024,
+    "slow_pages": 300,
+    "slow_objects": 100000,
+    # Budgets of a document in the slow lane
+    "time_budget": 300.0,
+    "memory_budget": 2 * 1024 * 1024 * 1024,
+}
+
+
+def limits_from_env(environ: Mapping[str, str] = os.environ, prefix: str = "PREFLIGHT_") -> Dict[str, Any]:
+    """
+    Read limits from environment variables such as PREFLIGHT_MAX_PAGES.
+
+    Args:
+        environ: Environment to read
+        prefix: Prefix of the variable names
+
+    Returns:
+        DEFAULT_LIMITS, updated with the values that are set
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for name, default in DEFAULT_LIMITS.items():
+        value = environ.get(f"{prefix}{name.upper()}")
+        if value is not None:
+            limits[name] = type(default)(value)
+    return limits
+
+
+def preflight(pdf_path: PDFSource, limits: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Inspect a PDF and decide how it should be processed.
+
+    Args:
+        pdf_path: Path to the PDF file, or its content
+        limits: Limits, see DEFAULT_LIMITS; missing entries take the default
+
+    Returns:
+        Report with the file size, the page and object counts, the
+        encryption and repair status, the time taken, the lane ("normal",
+        "slow" or "reject") and the reasons for a slow or rejected lane
+    """
+    limits = dict(DEFAULT_LIMITS, **(limits or {}))
+    start = time.perf_counter()
+    report = {
+        "file_size": os.path.getsize(pdf_path) if is_path(pdf_path) else len(memoryview(pdf_path)),
+        "page_count": None,
+        "object_count": None,
+        "encrypted": None,
+        "needs_password": None,
+        "repaired": None,
+        "lane": "normal",
+        "reasons": [],
+    }
+
+    def finish(lane=None, reason=None):
+        if reason:
+            report["reasons"].append(reason)
+        if lane and LANES.index(lane) > LANES.index(report["lane"]):
+            report["lane"] = lane
+        report["elapsed"] = time.perf_counter() - start
+        return report
+
+    # Checked before opening: repairing a broken xref table reads the whole file
+    if report["file_size"] > limits["max_file_bytes"]:
+        return finish("reject", f"file size {report['file_size']} exceeds {limits['max_file_bytes']} bytes")
+
+    try:
+        doc = open_pdf(pdf_path)
+    except Exception as e:
+        return finish("reject", f"cannot be opened: {e}")
+
+    try:
+        report["needs_password"] = bool(doc.needs_pass)
+        report["encrypted"] = bool(doc.is_encrypted or (doc.metadata or {}).get("encryption"))
+        if report["needs_password"]:
+            return finish("reject", "password protected")
+
+        report["page_count"] = doc.page_count
+        report["object_count"] = doc.xref_length()
+        report["repaired"] = bool(doc.is_repaired)
+    except Exception as e:
+        return finish("reject", f"cannot be read: {e}")
+    finally:
+        doc.close()
+
+    checks = [
+        ("page_count", "pages", "max_pages", "slow_pages"),
+        ("object_count", "objects", "max_objects", "slow_objects"),
+        ("file_size", "bytes", "max_file_bytes", "slow_file_bytes"),
+    ]
+    for field, unit, hard_limit, slow_limit in checks:
+        if report[field] > limits[hard_limit]:
+            finish("reject", f"{report[field]} {unit} exceed {limits[hard_limit]}")
+        elif report[field] > limits[slow_limit]:
+            finish("slow", f"{report[field]} {unit} exceed {limits[slow_limit]}")
+    if report["page_count"] == 0:
+        finish("reject", "no pages")
+    if report["repaired"]:
+        finish("slow", "broken xref table was repaired")
+
+    if report["lane"] != "normal":
+        logger.info(f"Pre-flight sent document to the {report['lane']} lane: {'; '.join(report['reasons'])}")
+    return finish()
+
+
+def _limit_memory(memory_budget: int) -> None:
+    """Limit the address space of this process to its current size plus the budget."""
+    if resource is None:
+        logger.warning("Memory budgets are not supported on this platform")
+        return
+    current = 0
+    try:
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    resource.setrlimit(resource.RLIMIT_AS, (current + memory_budget, resource.RLIM_INFINITY))
+
+
+def _run_child(connection, func, args, kwargs, memory_budget):
+    """Entry point of the child process of run_with_budget."""
+    try:
+        if memory_budget:
+            _limit_memory(memory_budget)
+        connection.send(("ok", func(*args, **kwargs)))
+    except BaseException as e:
+        connection.send(("error", type(e).__name__, str(e)))
+    finally:
+        connection.close()
+
+
+def run_with_budget(func: Callable, *args, time_budget: Optional[float] = None,
+                    memory_budget: Optional[int] = None, **kwargs) -> Any:
+    """
+    Run a function in a child process with a time and a memory budget.
+
+    Args:
+        func: Function to run; it, its arguments and its result must be
+            picklable, so a module-level function rather than a bound method
+        args: Positional arguments of func
+        time_budget: Seconds after which the child is killed
+        memory_budget: Bytes the child may allocate beyond its size at start
+
+    Returns:
+        The result of func
+
+    Raises:
+        TimeoutError: If the time budget was exceeded
+        MemoryError: If the memory budget was exceeded
+        RuntimeError: If func raised another error or the child died
+    """
+    # A fork of this process could inherit locks held by its other threads;
+    # a spawned child imports what func needs (and pays for it, once per run)
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_child, args=(sender, func, args, kwargs, memory_budget), daemon=True)
+    process.start()
+    sender.close()
+
+    try:
+        if not receiver.poll(time_budget):
+            process.kill()
+            raise TimeoutError(f"Time budget of {time_budget} seconds exceeded")
+        try:
+            message = receiver.recv()
+        except EOFError:
+            process.join()
+            raise RuntimeError(f"Worker process died with exit code {process.exitcode}")
+    finally:
+        receiver.close()
+        process.join()
+
+    if message[0] == "ok":
+        return message[1]
+    if message[1] == "MemoryError":
+        raise MemoryError(f"Memory budget of {memory_budget} bytes exceeded")
+    raise RuntimeError(f"{message[1]}: {message[2]}")
+
+
+class SlowLane:
+    """
+    Runs documents that failed the normal-lane limits, a bounded number at a time,
+    each in a child process with a time and a memory budget.
+    """
+
+    def __init__(self, max_jobs: int = 1, time_budget: Optional[float] = DEFAULT_LIMITS["time_budget"],
+                 memory_budget: Optional[int] = DEFAULT_LIMITS["memory_budget"]):
+        """
+        Initialize the slow lane.
+
+        Args:
+            max_jobs: Documents processed at the same time by this lane; each
+                process (e.g. each web worker) has its own lane
+            time_budget: Seconds a document may take
+            memory_budget: Bytes a document may allocate
+        """
+        self.max_jobs = max_jobs
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget
+        self._slots = threading.BoundedSemaphore(max_jobs)
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run a function in the slow lane.
+
+        Args:
+            func: Module-level function to run (see run_with_budget)
+            args: Positional arguments of func
+
+        Returns:
+            The result of func
+
+        Raises:
+            RuntimeError: If the lane is full; the caller is not queued
+            TimeoutError, MemoryError: See run_with_budget
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RuntimeError("Too many large documents are being processed, please try again later")
+        try:
+            return run_with_budget(func, *args, time_budget=self.time_budget,
+                                   memory_budget=self.memory_budget, **kwargs)
+        finally:
+            self._slots.release()
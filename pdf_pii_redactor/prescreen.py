@@ -0,0 +1,212 @@
+"""
+Cheap local pre-screening of pages before PII detection.
+
+Pages are scored from surface features that almost always accompany PII:
+runs of capitalized tokens (names), digit patterns (phone numbers, card
+numbers, dates, postal codes), "@" signs (email addresses) and address,
+date and person keywords in the document language. Pages that score below
+the threshold are not sent to the detector.
+"""
+
+import re
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Feature weights; a page needs a total of at least the threshold to be detected
+FEATURE_WEIGHTS = {
+    "at_signs": 3.0,
+    "phone_numbers": 2.0,
+    "card_numbers": 3.0,
+    "dates": 1.0,
+    "postal_codes": 0.5,
+    "capitalized_runs": 1.0,
+    "keywords": 1.0,
+}
+
+# Address, date-of-birth and person keywords per language (lowercase)
+KEYWORDS = {
+    "en": ["street", "st.", "road", "rd.", "avenue", "ave.", "lane", "drive", "apt", "suite", "zip",
+           "address", "born", "birth", "dob", "birthday", "name", "mr.", "mrs.", "ms.", "dr.",
+           "phone", "tel", "mobile", "email", "e-mail", "card", "customer", "patient", "signed",
+           "january", "february", "march", "april", "may", "june", "july", "august",
+           "september", "october", "november", "december"],
+    "de": ["straße", "strasse", "str.", "gasse", "weg", "platz", "allee", "plz", "adresse", "anschrift",
+           "geboren", "geburtsdatum", "geb.", "name", "herr", "frau", "telefon", "tel.", "handy",
+           "e-mail", "karte", "kunde", "kundennummer", "unterschrift",
+           "januar", "jänner", "februar", "märz", "april", "mai", "juni", "juli", "august",
+           "september", "oktober", "november", "dezember"],
+    "fr": ["rue", "avenue", "boulevard", "bd", "chemin", "place", "adresse", "né", "née", "naissance",
+           "nom", "prénom", "m.", "mme", "mlle", "téléphone", "tél", "portable", "courriel", "e-mail",
+           "carte", "client", "signé",
+           "janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août",
+           "septembre", "octobre", "novembre", "décembre"],
+    "es": ["calle", "avenida", "avda", "plaza", "carrer", "dirección", "domicilio", "nacido", "nacida",
+           "nacimiento", "nombre", "apellido", "sr.", "sra.", "teléfono", "tel.", "móvil", "correo",
+           "tarjeta", "cliente", "firmado",
+           "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+           "septiembre", "octubre", "noviembre", "diciembre"],
+    "it": ["via", "viale", "piazza", "corso", "indirizzo", "nato", "nata", "nascita", "nome", "cognome",
+           "sig.", "sig.ra", "telefono", "tel.", "cellulare", "carta", "cliente", "firmato",
+           "gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno", "luglio", "agosto",
+           "settembre", "ottobre", "novembre", "dicembre"],
+    "nl": ["straat", "laan", "weg", "plein", "adres", "geboren", "geboortedatum", "naam", "dhr.", "mevr.",
+           "telefoon", "tel.", "mobiel", "kaart", "klant", "getekend",
+           "januari", "februari", "maart", "april", "mei", "juni", "juli", "augustus",
+           "september", "oktober", "november", "december"],
+    "pt": ["rua", "avenida", "praça", "endereço", "morada", "nascido", "nascida", "nascimento", "nome",
+           "sr.", "sra.", "telefone", "telemóvel", "celular", "cartão", "cliente", "assinado",
+           "janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho", "agosto",
+           "setembro", "outubro", "novembro", "dezembro"],
+}
+
+# Languages whose scripts have no letter case, so capitalized runs say nothing
+# about names; their pages are always detected
+UNCASED_LANGUAGES = {"zh-cn", "zh-tw", "ja", "ko", "th", "ar", "fa", "ur", "he", "hi", "bn", "ta", "te",
+                     "kn", "ml", "mr", "ne", "gu", "pa"}
+
+AT_SIGN_PATTERN = re.compile(r"[@＠]")
+PHONE_PATTERN = re.compile(r"(?<!\d)(?:\+|00)?\d[\d ()./-]{6,}\d(?!\d)")
+CARD_PATTERN = re.compile(r"(?<!\d)(?:\d[ -]?){12,18}\d(?!\d)")
+DATE_PATTERN = re.compile(r"(?<!\d)(?:\d{1,2}[./-]\d{1,2}[./-]\d{2,4}|\d{4}-\d{1,2}-\d{1,2})(?!\d)")
+# Money amounts ("1200.00", "1,350.50") make number tables look like phone numbers
+AMOUNT_PATTERN = re.compile(r"^\d+(?:[.,]\d{3})*[.,]\d{2}$")
+# A postal code followed by a city ("3400 Klosterneuburg", "A-1230 Wien") or after a state ("CA 12345")
+POSTAL_CODE_PATTERN = re.compile(
+    r"(?<![\d.,])(?:[A-Z]{1,2}-)?\d{4,5}\s+[A-ZÀ-ÖØ-Þ]|\b[A-Z]{2}\s+\d{5}(?:-\d{4})?\b"
+)
+TOKEN_PATTERN = re.compile(r"[^\W\d_][\w'’.-]*")
+
+# Function words that break capitalized runs, so that headings such as
+# "TERMS AND CONDITIONS" do not look like names
+STOPWORDS = {"and", "or", "of", "the", "for", "to", "in", "on", "by", "with", "a", "an",
+             "und", "oder", "der", "die", "das", "des", "für", "von", "zu", "im", "mit",
+             "et", "ou", "le", "la", "les", "de", "du", "des", "pour", "au", "aux",
+             "y", "o", "el", "los", "las", "del", "por", "para", "con",
+             "e", "il", "lo", "gli", "di", "per", "da", "con",
+             "en", "het", "een", "voor", "met", "do", "da", "dos", "das", "com"}
+
+
+class PageScreener:
+    """
+    Scores pages for plausible PII so that boilerplate pages can skip detection.
+    """
+
+    def __init__(self, threshold: float = 1.0, verbose: bool = False):
+        """
+        Initialize the page screener.
+
+        Args:
+            threshold: Minimum score for a page to be sent to the detector
+            verbose: Whether to enable verbose logging
+        """
+        self.threshold = threshold
+        self.verbose = verbose
+
+    def extract_features(self, text: str, language: str = "en") -> Dict[str, int]:
+        """
+        Count the PII indicators in a page.
+
+        Args:
+            text: Page text
+            language: ISO 639-1 language code
+
+        Returns:
+            Dictionary with a count per feature (see FEATURE_WEIGHTS)
+        """
+        phone_numbers = 0
+        for match in PHONE_PATTERN.finditer(text):
+            candidate = match.group()
+            if sum(c.isdigit() for c in candidate) < 7:
+                continue
+            if any(AMOUNT_PATTERN.match(chunk) for chunk in candidate.split()):
+                continue
+            phone_numbers += 1
+
+        tokens = list(TOKEN_PATTERN.finditer(text))
+        keywords = set(KEYWORDS.get(language, KEYWORDS["en"]))
+        keyword_count = sum(1 for token in tokens if token.group().lower() in keywords)
+
+        return {
+            "at_signs": len(AT_SIGN_PATTERN.findall(text)),
+            "phone_numbers": phone_numbers,
+            "card_numbers": len(CARD_PATTERN.findall(text)),
+            "dates": len(DATE_PATTERN.findall(text)),
+            "postal_codes": len(POSTAL_CODE_PATTERN.findall(text)),
+            "capitalized_runs": self._count_capitalized_runs(text, tokens),
+            "keywords": keyword_count,
+        }
+
+    def _count_capitalized_runs(self, text: str, tokens) -> int:
+        """
+        Count runs of two or more capitalized tokens ("John Doe", "HOBARTH JUERGEN").
+
+        Tokens only belong to the same run when they are separated by spaces
+        on the same line.
+
+        Args:
+            text: Page text
+            tokens: Word token matches in the page text
+
+        Returns:
+            Number of runs
+        """
+        runs = 0
+        run_length = 0
+        previous_end = None
+        for token in tokens:
+            word = token.group().rstrip(".")
+            capitalized = (len(word) > 1 and word[0].isupper() and (word[1:].islower() or word.isupper())
+                           and word.lower() not in STOPWORDS)
+            adjacent = previous_end is not None and text[previous_end:token.start()].strip(" \t") == ""
+
+            if capitalized and adjacent and run_length:
+                run_length += 1
+            else:
+                if run_length >= 2:
+                    runs += 1
+                run_length = 1 if capitalized else 0
+            previous_end = token.end()
+
+        if run_length >= 2:
+            runs += 1
+        return runs
+
+    def score(self, text: str, language: str = "en") -> Dict[str, Any]:
+        """
+        Score a page.
+
+        Args:
+            text: Page text
+            language: ISO 639-1 language code
+
+        Returns:
+            Dictionary with the "score", the "features" and whether to "detect"
+            the page; the score is None for languages that cannot be scored,
+            whose pages are always detected
+        """
+        if language in UNCASED_LANGUAGES:
+            # None rather than infinity, which is not valid JSON in span files and the audit store
+            return {"score": None, "features": {}, "detect": True}
+
+        features = self.extract_features(text, language)
+        score = sum(FEATURE_WEIGHTS[name] * count for name, count in features.items())
+
+        if self.verbose:
+            logger.info(f"Pre-screen score {score:.1f}: {features}")
+
+        return {"score": score, "features": features, "detect": score >= self.threshold}
+
+    def should_detect(self, text: str, language: str = "en") -> bool:
+        """
+        Decide whether a page may contain PII.
+
+        Args:
+            text: Page text
+            language: ISO 639-1 language code
+
+        Returns:
+            True if the page should be sent to the detector
+        """
+        return self.score(text, language)["detect"]
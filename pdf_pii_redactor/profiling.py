@@ -0,0 +1,185 @@
+"""
+Profiling of redaction runs.
+
+A Profiler records a cProfile profile of the whole run, the time spent in
+each pipeline stage (extraction, ocr, language_detection, gazetteer,
+detection, search, apply, verify, save) overall and per page, and optionally
+memory allocations with tracemalloc. write() saves the pstats dump next to a
+JSON summary, so that slow documents can be reported with reproducible
+evidence.
+"""
+
+import os
+import json
+import time
+import pstats
+import cProfile
+import logging
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages, in order
+STAGES = ["extraction", "ocr", "language_detection", "gazetteer", "prescreen", "detection", "search", "apply", "verify", "save"]
+
+# Number of entries in the hotspot, function and allocation lists of the summary
+TOP_ENTRIES = 20
+
+
+class Profiler:
+    """
+    Collects a cProfile profile, per-stage and per-page timings and memory allocations of a run.
+    """
+
+    def __init__(self, memory: bool = False):
+        """
+        Initialize the profiler.
+
+        Args:
+            memory: Whether to trace memory allocations with tracemalloc
+        """
+        self.memory = memory
+        self.stages = {}
+        self.pages = {}
+        self.wall_time = 0.0
+        self.memory_stats = None
+        self._profile = cProfile.Profile()
+        self._start = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        """Start profiling."""
+        if self.memory:
+            tracemalloc.start()
+        self._start = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self) -> None:
+        """Stop profiling."""
+        self._profile.disable()
+        self.wall_time = time.perf_counter() - self._start
+
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.memory_stats = {
+                "peak_bytes": peak,
+                "top_allocations": [
+                    {"location": str(stat.traceback), "size": stat.size, "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:TOP_ENTRIES]
+                ]
+            }
+
+    @contextmanager
+    def stage(self, name: str, page: Optional[int] = None):
+        """
+        Time a pipeline stage.
+
+        Args:
+            name: Stage name (see STAGES)
+            page: Page the stage works on, for the per-page timings
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stage = self.stages.setdefault(name, {"calls": 0, "total": 0.0, "max": 0.0})
+            stage["calls"] += 1
+            stage["total"] += elapsed
+            stage["max"] = max(stage["max"], elapsed)
+            if page is not None:
+                page_stages = self.pages.setdefault(page, {})
+                page_stages[name] = page_stages.get(name, 0.0) + elapsed
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the run.
+
+        Returns:
+            Dictionary with the wall time, the per-stage totals, the per-page
+            timings, the slowest page stages ("hotspots"), the functions with
+            the highest cumulative time and, with memory tracing, the peak
+            traced memory and the largest allocation sites
+        """
+        stages = {}
+        for name in sorted(self.stages, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES)):
+            stage = self.stages[name]
+            stages[name] = dict(stage, mean=stage["total"] / stage["calls"])
+
+        hotspots = sorted(
+            ({"page": page, "stage": name, "seconds": seconds}
+             for page, page_stages in self.pages.items() for name, seconds in page_stages.items()),
+            key=lambda hotspot: hotspot["seconds"],
+            reverse=True
+        )[:TOP_ENTRIES]
+
+        profile_stats = pstats.Stats(self._profile).stats
+        functions = sorted(profile_stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_ENTRIES]
+
+        summary = {
+            "wall_time": self.wall_time,
+            "stages": stages,
+            "pages": {str(page): self.pages[page] for page in sorted(self.pages)},
+            "hotspots": hotspots,
+            "functions": [
+                {
+                    "function": f"{filename}:{line}({name})",
+                    "calls": calls,
+                    "total_time": total_time,
+                    "cumulative_time": cumulative_time
+                }
+                for (filename, line, name), (_, calls, total_time, cumulative_time, _) in functions
+            ]
+        }
+        if self.memory_stats is not None:
+            summary["memory"] = self.memory_stats
+        return summary
+
+    def write(self, output_dir: str, name: str) -> Dict[str, str]:
+        """
+        Write the pstats dump and the JSON summary.
+
+        Args:
+            output_dir: Directory to write to, created if needed
+            name: Base name of the files
+
+        Returns:
+            Dictionary with the "pstats" and "summary" paths
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        paths = {"pstats": f"{base}.pstats", "summary": f"{base}.json"}
+
+        self._profile.dump_stats(paths["pstats"])
+        with open(paths["summary"], "w", encoding="utf-8") as summary_file:
+            json.dump(self.summary(), summary_file, indent=2)
+
+        logger.info(f"Wrote profile to {paths['pstats']} and {paths['summary']}")
+        return paths
+
+
+def profile_stage(profiler: Optional[Profiler], name: str, page: Optional[int] = None):
+    """
+    Time a pipeline stage when profiling.
+
+    Args:
+        profiler: Active profiler, or None when not profiling
+        name: Stage name (see STAGES)
+        page: Page the stage works on
+
+    Returns:
+        A context manager
+    """
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name, page)
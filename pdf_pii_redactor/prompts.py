@@ -0,0 +1,134 @@
+"""
+Prompt construction for PII detection.
+
+Prompts are laid out for provider-side prefix caching: the system prompt of
+each response format is a static, byte-identical string, and everything
+that changes between requests (the language and the page text) comes last,
+in the user message. Page text is sent with its whitespace runs collapsed;
+the offset map returned by collapse_whitespace converts offsets reported by
+the model back to offsets in the original page text.
+"""
+
+import re
+from typing import List, Dict, Tuple
+
+WHITESPACE_RUN_PATTERN = re.compile(r"\s{2,}|[^\S \n]")
+
+VERBOSE_SYSTEM_PROMPT = """You are a privacy protection assistant specialized in identifying personally identifiable information (PII) in documents.
+Your task is to identify the following types of PII in the provided text:
+- Names (full names, first names, last names)
+- Email addresses
+- Phone numbers (in any format)
+- Physical addresses (street addresses, postal codes, etc.)
+- Credit card numbers
+- Dates of birth (in any format)
+
+Important: For dates of birth, identify dates that are:
+- Explicitly mentioned as birth dates, birthdays, or DOB
+- Mentioned in contexts like "I was born on...", "born in...", "date of birth is..."
+- Any date clearly referring to when someone was born
+
+Do NOT flag regular dates like meeting dates, document dates, or other temporal references that aren't related to someone's birth.
+
+The user message gives the language of the text, then the text itself after the line "Text:".
+
+Respond with a JSON object containing an array of PII instances found in the text. Each instance should include:
+1. "type": The type of PII (name, email, phone, address, credit_card, dob)
+2. "value": The exact text that contains the PII
+3. "start_index": The character index where this PII starts in the text
+4. "end_index": The character index where this PII ends in the text
+
+Character indexes are counted from 0 at the first character after the line "Text:".
+
+Also include a top-level "confidence" between 0 and 1: how confident you are that the list is complete and correct.
+
+Format your response as:
+{"pii": [
+  {"type": "name", "value": "John Doe", "start_index": 10, "end_index": 18},
+  ...
+], "confidence": 0.95}
+
+Be thorough and precise. Include all instances of PII you can find. For dates of birth, include any dates that are clearly indicated as someone's birth date or when someone mentions being born on a specific date."""
+
+COMPACT_SYSTEM_PROMPT = """You are a privacy protection assistant specialized in identifying personally identifiable information (PII) in documents.
+Identify names, email addresses, phone numbers, physical addresses, credit card numbers and dates of birth in the provided text.
+Only flag dates that are someone's date of birth, not meeting dates, document dates or other dates.
+
+The user message gives the language of the text, then the text itself after the line "Text:".
+
+Respond with JSON only: {"e": [{"t": <type code>, "s": <start offset>, "x": <end offset>}, ...], "c": <confidence>}
+- Type codes: n=name, e=email, p=phone, a=address, c=credit_card, d=dob
+- "s" and "x" are the character offsets of the PII in the text (end exclusive), counted from 0 at the first character after the line "Text:"
+- "c" is how confident you are, between 0 and 1, that the list is complete and correct
+Do not repeat the PII values."""
+
+SYSTEM_PROMPTS = {
+    "verbose": VERBOSE_SYSTEM_PROMPT,
+    "compact": COMPACT_SYSTEM_PROMPT,
+}
+
+
+def collapse_whitespace(text: str) -> Tuple[str, List[int]]:
+    """
+    Collapse whitespace runs, keeping a map back to the original offsets.
+
+    Runs containing a line break become a single newline, other runs a
+    single space.
+
+    Args:
+        text: Original text
+
+    Returns:
+        Tuple of the collapsed text and the offset map: offset_map[i] is the
+        offset in text of collapsed[i], with one extra entry for the end of
+        the text
+    """
+    parts = []
+    offset_map = []
+    position = 0
+
+    for match in WHITESPACE_RUN_PATTERN.finditer(text):
+        parts.append(text[position:match.start()])
+        offset_map.extend(range(position, match.start()))
+        parts.append("\n" if "\n" in match.group() else " ")
+        offset_map.append(match.start())
+        position = match.end()
+
+    parts.append(text[position:])
+    offset_map.extend(range(position, len(text)))
+    offset_map.append(len(text))
+
+    return "".join(parts), offset_map
+
+
+def restore_offsets(offset_map: List[int], start: int, end: int) -> Tuple[int, int]:
+    """
+    Convert a [start, end) range in collapsed text to the original text.
+
+    Args:
+        offset_map: Offset map returned by collapse_whitespace
+        start: Start offset in the collapsed text
+        end: End offset (exclusive) in the collapsed text
+
+    Returns:
+        The corresponding (start, end) in the original text
+    """
+    return offset_map[start], offset_map[end]
+
+
+def build_prompt(text: str, language: str, response_format: str = "verbose") -> Dict[str, str]:
+    """
+    Build the messages of a PII detection request.
+
+    Args:
+        text: Page text, normally already collapsed
+        language: ISO 639-1 language code
+        response_format: "verbose" or "compact"
+
+    Returns:
+        Dictionary with system and user prompts
+    """
+    return {
+        "system": SYSTEM_PROMPTS[response_format],
+        "user": f"Language: {language}\n\nText:\n{text}"
+    }
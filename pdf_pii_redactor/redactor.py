@@ -2,14 +2,31 @@
 Main redaction module that coordinates the PII detection and PDF redaction process.
 """
 
+import io
 import os
+import time
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import functools
+from contextlib import ExitStack
+from concurrent.futures import Executor
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, Callable, BinaryIO
 from tqdm import tqdm
 
-from pdf_pii_redactor.pdf_processor import PDFProcessor
+from pdf_pii_redactor.pdf_processor import (PDFProcessor, PDFSource, PDFDestination, describe_pdf, is_path,
+                                             count_pages, copy_pdf)
 from pdf_pii_redactor.pii_detector import PIIDetector
 from pdf_pii_redactor.language_detector import LanguageDetector
+from pdf_pii_redactor.prescreen import PageScreener
+from pdf_pii_redactor.routing import TieredPIIDetector, summarize_routes
+from pdf_pii_redactor.spans import make_span, write_span_file, apply_spans, apply_span_file
+from pdf_pii_redactor.streaming import IncrementalRedaction, entity_key
+from pdf_pii_redactor.profiling import Profiler, profile_stage
+from pdf_pii_redactor.checkpoint import CheckpointJournal, document_hash
+from pdf_pii_redactor.ocr import DEFAULT_DPI
+from pdf_pii_redactor.gazetteer import Gazetteer, mask_hits, normalize_term
+from pdf_pii_redactor.concurrency import AdaptiveLimiter, detection_outcome
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +36,17 @@ class PDFRedactor:
     Coordinates the process of detecting and redacting PII from PDF documents.
     """
     
-    def __init__(self, openai_api_key: Optional[str] = None, model: str = "gpt-4o", verbose: bool = False):
+    def __init__(self, openai_api_key: Optional[str] = None, model: str = "gpt-4o", verbose: bool = False,
+                 extraction_profile: str = "default", header_margin: float = 0.0,
+                 footer_margin: float = 0.0, prescreen_threshold: Optional[float] = None,
+                 pii_detector: Optional[Any] = None, first_pass_model: Optional[str] = None,
+                 escalation_confidence: float = 0.7, escalation_risk_score: Optional[float] = None,
+                 response_format: str = "verbose", stream: bool = False, max_concurrent_requests: int = 8,
+                 profile: Optional[str] = None, profile_memory: bool = False,
+                 apply_plan: str = "off", verify: str = "off", ocr_engine: Optional[Any] = None,
+                 ocr_dpi: int = DEFAULT_DPI, ocr_workers: Optional[int] = None,
+                 gazetteer: Optional[Any] = None, gazetteer_mask: bool = False,
+                 adaptive_concurrency: bool = False):
         """
         Initialize the PDF redactor.
         
@@ -27,8 +54,53 @@ class PDFRedactor:
             openai_api_key: OpenAI API key
             model: OpenAI model to use
             verbose: Whether to enable verbose logging
+            extraction_profile: Text extraction profile (see pdf_processor.EXTRACTION_PROFILES)
+            header_margin: Height in points at the top of each page excluded from detection
+            footer_margin: Height in points at the bottom of each page excluded from detection
+            prescreen_threshold: Pre-screen score below which a page skips PII detection
+                (see prescreen.PageScreener); None sends every page to the detector
+            pii_detector: Detector to use instead of a PIIDetector for the model
+                (any object with a detect_pii(text, language) method)
+            first_pass_model: Cheaper OpenAI model tried before `model`; pages are
+                escalated to `model` when the first pass is not trusted (see routing)
+            escalation_confidence: First-pass confidence below which a page is escalated
+            escalation_risk_score: Pre-screen score at or above which a page skips the
+                first pass; None disables this rule
+            response_format: LLM response format, "verbose" or "compact" (see PIIDetector)
+            stream: Whether to stream LLM responses and locate and mark each entity
+                as soon as it is received; injected detectors stream when they
+                have a true `stream` attribute
+            max_concurrent_requests: Maximum number of detection requests in flight
+                at once across all documents of the async API
+            adaptive_concurrency: Whether an AdaptiveLimiter (see
+                pdf_pii_redactor.concurrency) bounds the detection requests of
+                every thread and event loop using this redactor instead,
+                between 1 and max_concurrent_requests depending on the
+                latency, throttling and errors observed, and retries
+                throttled requests
+            profile: Directory to write a profile of every redact_pdf and detect
+                run to (see pdf_pii_redactor.profiling); None disables profiling
+            profile_memory: Whether profiles also trace memory allocations
+            apply_plan: How image and line-art handling is chosen when applying
+                redactions (see pdf_processor.APPLY_PLANS)
+            verify: Whether the redacted pages are checked for leaked values
+                before the output is saved: "off", "report" (listed under
+                stats["verification"]) or "fail" (the run raises instead of
+                saving); see pdf_processor.VERIFY_MODES
+            ocr_engine: OCR engine for pages without a text layer (see
+                pdf_pii_redactor.ocr); None leaves these pages out
+            ocr_dpi: Resolution image-only pages are rendered at for OCR
+            ocr_workers: Number of OCR worker processes; the number of CPUs,
+                up to 4, when omitted, 0 to run OCR in this process
+            gazetteer: Gazetteer of known entities redacted on every page (see
+                pdf_pii_redactor.gazetteer), or the path of a compiled one
+            gazetteer_mask: Whether gazetteer hits are hidden from the text
+                sent to the detector
         """
         self.verbose = verbose
+        self.extraction_profile = extraction_profile
+        self.header_margin = header_margin
+        self.footer_margin = footer_margin
         
         if verbose:
             logging.basicConfig(level=logging.INFO)
@@ -36,81 +108,749 @@ class PDFRedactor:
             logging.basicConfig(level=logging.WARNING)
         
         # Initialize components
-        self.pdf_processor = PDFProcessor(verbose=verbose)
-        self.pii_detector = PIIDetector(api_key=openai_api_key, model=model, verbose=verbose)
+        self.pdf_processor = PDFProcessor(verbose=verbose, apply_plan=apply_plan, verify=verify,
+                                          ocr_engine=ocr_engine, ocr_dpi=ocr_dpi, ocr_workers=ocr_workers)
+        if pii_detector is None:
+            pii_detector = PIIDetector(api_key=openai_api_key, model=model, verbose=verbose,
+                                       response_format=response_format, stream=stream)
+            if first_pass_model:
+                pii_detector = TieredPIIDetector(
+                    PIIDetector(api_key=openai_api_key, model=first_pass_model, verbose=verbose,
+                                response_format=response_format, stream=stream),
+                    pii_detector,
+                    confidence_threshold=escalation_confidence,
+                    risk_threshold=escalation_risk_score,
+                    verbose=verbose
+                )
+        self.pii_detector = pii_detector
         self.language_detector = LanguageDetector(verbose=verbose)
+        self.page_screener = (PageScreener(threshold=prescreen_threshold, verbose=verbose)
+                              if prescreen_threshold is not None else None)
+        self.gazetteer = Gazetteer(gazetteer) if isinstance(gazetteer, str) else gazetteer
+        self.gazetteer_mask = gazetteer_mask
+        self.max_concurrent_requests = max_concurrent_requests
+        self.limiter = (AdaptiveLimiter(initial_limit=min(4, max_concurrent_requests),
+                                        max_limit=max_concurrent_requests)
+                        if adaptive_concurrency else None)
+        self.profile = profile
+        self.profile_memory = profile_memory
+        self._profiler = None
+        self._semaphore = None
+        self._semaphore_loop = None
     
-    def redact_pdf(self, input_path: str, output_path: str) -> Dict[str, Any]:
+    def redact_pdf(self, input_path: PDFSource, output_path: PDFDestination,
+                   pages: Optional[List[int]] = None, checkpoint: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a PDF file to detect and redact PII.
         
         Args:
-            input_path: Path to the input PDF file
-            output_path: Path where the redacted PDF will be saved
+            input_path: Path to the input PDF file, or its content (bytes,
+                bytearray, memoryview or mmap)
+            output_path: Path or binary file object where the redacted PDF will be saved
+            pages: 0-based numbers of the pages to redact; the other pages are
+                saved unchanged. All pages when omitted
+            checkpoint: Path of a checkpoint journal; a run that was interrupted
+                resumes from the pages recorded in it (see pdf_pii_redactor.checkpoint)
+            
+        Returns:
+            Dictionary with statistics about the redaction process: counts
+            by PII type under "pii_types" and by page under "page_stats",
+            the wall time and the detection time of each page under
+            "timings"; with profiling, "profile" holds the paths of the
+            profile files
+        """
+        start = time.perf_counter()
+        if self.profile:
+            stats = self._run_profiled(input_path, self._redact_pdf, input_path, output_path, pages, checkpoint)
+        else:
+            stats = self._redact_pdf(input_path, output_path, pages, checkpoint)
+        stats.setdefault("timings", {})["elapsed"] = time.perf_counter() - start
+        return stats
+    
+    def _redact_pdf(self, input_path: PDFSource, output_path: PDFDestination,
+                    pages: Optional[List[int]] = None, checkpoint: Optional[str] = None) -> Dict[str, Any]:
+        """Run redact_pdf without profiling."""
+        logger.info(f"Starting redaction process for {describe_pdf(input_path)}")
+        
+        if getattr(self.pii_detector, "stream", False):
+            # Locate and mark entities while the responses are still being generated
+            with IncrementalRedaction(input_path, profiler=self._profiler,
+                                      apply_plan=self.pdf_processor.apply_plan,
+                                      verify=self.pdf_processor.verify) as redaction:
+                spans, stats = self.detect_spans(input_path, redaction, pages, checkpoint)
+                if not stats["pages_processed"]:
+                    return self._copy_unchanged(input_path, output_path)
+                stats.update(redaction.save(output_path))
+            return stats
+        
+        spans, stats = self.detect_spans(input_path, pages=pages, checkpoint=checkpoint)
+        
+        if not stats["pages_processed"]:
+            return self._copy_unchanged(input_path, output_path)
+        
+        # Apply redactions to the PDF
+        stats.update(apply_spans(input_path, output_path, spans, self.pdf_processor))
+        
+        return stats
+    
+    def _copy_unchanged(self, input_path: PDFSource, output_path: PDFDestination) -> Dict[str, Any]:
+        """Write the input as the output of a document without text to redact."""
+        copy_pdf(input_path, output_path)
+        return {"redacted_items": 0, "pages_processed": 0}
+    
+    def redact_bytes(self, data: PDFSource) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Detect and redact PII in a PDF held in memory.
+        
+        Args:
+            data: Content of the input PDF (bytes, bytearray, memoryview or mmap)
+            
+        Returns:
+            Tuple of the redacted PDF content and statistics about the redaction process
+        """
+        output = io.BytesIO()
+        stats = self.redact_pdf(data, output)
+        return output.getvalue(), stats
+    
+    def redact_stream(self, input_file: BinaryIO, output_file: BinaryIO) -> Dict[str, Any]:
+        """
+        Detect and redact PII in a PDF read from a binary file object.
+        
+        Args:
+            input_file: File object to read the input PDF from; io.BytesIO
+                buffers are used without copying
+            output_file: File object the redacted PDF is written to
+            
+        Returns:
+            Dictionary with statistics about the redaction process
+        """
+        if isinstance(input_file, io.BytesIO):
+            data = input_file.getbuffer()
+        else:
+            data = input_file.read()
+        
+        try:
+            return self.redact_pdf(data, output_file)
+        finally:
+            # Release the buffer export so that the BytesIO can be resized again
+            if isinstance(data, memoryview):
+                data.release()
+    
+    async def redact_pdf_async(self, input_path: PDFSource, output_path: PDFDestination,
+                               timeout: Optional[float] = None,
+                               executor: Optional[Executor] = None) -> Dict[str, Any]:
+        """
+        Detect and redact PII without blocking the event loop.
+        
+        Pages are detected concurrently, sharing the max_concurrent_requests
+        limit with every other document processed on the loop; the PyMuPDF and
+        language detection stages run in an executor. Cancellation and the
+        timeout take effect at once for detection requests; a PyMuPDF stage
+        that is already running finishes in its executor thread.
+        
+        Args:
+            input_path: Path to the input PDF file, or its content
+            output_path: Path or binary file object where the redacted PDF will be saved
+            timeout: Maximum time in seconds for the whole document; None waits indefinitely
+            executor: Executor for the blocking stages; the loop's default when omitted
             
         Returns:
             Dictionary with statistics about the redaction process
+            
+        Raises:
+            asyncio.TimeoutError: If the document takes longer than the timeout
+        """
+        start = time.perf_counter()
+        stats = await asyncio.wait_for(self._redact_pdf_async(input_path, output_path, executor), timeout)
+        stats.setdefault("timings", {})["elapsed"] = time.perf_counter() - start
+        return stats
+    
+    async def redact_bytes_async(self, data: PDFSource, timeout: Optional[float] = None,
+                                 executor: Optional[Executor] = None) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Detect and redact PII in a PDF held in memory without blocking the event loop.
+        
+        Args:
+            data: Content of the input PDF (bytes, bytearray, memoryview or mmap)
+            timeout: Maximum time in seconds for the whole document; None waits indefinitely
+            executor: Executor for the blocking stages; the loop's default when omitted
+            
+        Returns:
+            Tuple of the redacted PDF content and statistics about the redaction process
+        """
+        output = io.BytesIO()
+        stats = await self.redact_pdf_async(data, output, timeout=timeout, executor=executor)
+        return output.getvalue(), stats
+    
+    async def _redact_pdf_async(self, input_path: PDFSource, output_path: PDFDestination,
+                                executor: Optional[Executor]) -> Dict[str, Any]:
+        """Run redact_pdf_async without the timeout."""
+        logger.info(f"Starting redaction process for {describe_pdf(input_path)}")
+        loop = asyncio.get_running_loop()
+        
+        spans, stats = await self.detect_spans_async(input_path, executor)
+        
+        if not stats["pages_processed"]:
+            return await loop.run_in_executor(executor, self._copy_unchanged, input_path, output_path)
+        
+        stats.update(await loop.run_in_executor(
+            executor, apply_spans, input_path, output_path, spans, self.pdf_processor
+        ))
+        return stats
+    
+    async def detect_spans_async(self, input_path: PDFSource,
+                                 executor: Optional[Executor] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Detect PII in a PDF file and locate it on the pages, without blocking the event loop.
+        
+        Args:
+            input_path: Path to the input PDF file, or its content
+            executor: Executor for the blocking stages; the loop's default when omitted
+            
+        Returns:
+            Tuple of the located spans (see pdf_pii_redactor.spans) and statistics
         """
-        logger.info(f"Starting redaction process for {input_path}")
+        loop = asyncio.get_running_loop()
         
-        # Extract text from PDF
-        pages = self.pdf_processor.extract_text(input_path)
+        pages = await loop.run_in_executor(executor, self._extract_pages, input_path)
         
         if not pages:
             logger.warning("No text content found in the PDF")
-            return {"redacted_items": 0, "pages_processed": 0}
+            return [], {"pages_processed": 0, "language": None}
         
-        # Detect document language
-        language = self.language_detector.detect_document_language(pages)
+        language = await loop.run_in_executor(executor, self.language_detector.detect_document_language, pages)
         logger.info(f"Detected document language: {language}")
         
-        # Process each page to find PII
-        all_redactions = []
+        stats = self._new_stats(pages, language)
+        spans = []
+        known = {}
+        scanned = []
+        for page in pages:
+            gazetteer_spans, page = self._scan_gazetteer(page, stats)
+            spans.extend(gazetteer_spans)
+            known[page["page_num"]] = {normalize_term(span["value"]) for span in gazetteer_spans}
+            scanned.append(page)
+        selected = [page for page in scanned if self._prescreen_page(page, language, stats)]
+        
+        # Detect all pages concurrently; the semaphore bounds the requests in flight
+        detection_times = {}
+        
+        async def analyze(page):
+            start = time.perf_counter()
+            result = await self._analyze_page_async(page["text"], language, executor)
+            detection_times[page["page_num"]] = time.perf_counter() - start
+            return result
         
-        for page in tqdm(pages, desc="Processing pages", disable=not self.verbose):
-            page_num = page["page_num"]
-            text = page["text"]
+        results = await asyncio.gather(*(analyze(page) for page in selected))
+        
+        routes = {}
+        usage = {}
+        for page, result in zip(selected, results):
+            self._record_result(page["page_num"], result, routes, usage)
+            for pii in result["pii"]:
+                if normalize_term(pii["value"]) in known[page["page_num"]]:
+                    continue
+                spans.append(make_span(
+                    page["page_num"],
+                    pii["type"],
+                    pii["value"],
+                    start=pii.get("start_index"),
+                    end=pii.get("end_index")
+                ))
+        
+        self._summarize(stats, routes, usage)
+        self._summarize_pages(stats, spans, [page["page_num"] for page in pages], detection_times)
+        
+        await loop.run_in_executor(executor, self.pdf_processor.locate_spans, input_path, spans,
+                                   self._ocr_words(pages))
+        
+        return spans, stats
+    
+    async def _analyze_page_async(self, text: str, language: str,
+                                  executor: Optional[Executor] = None) -> Dict[str, Any]:
+        """
+        Run the PII detector on a page under the request semaphore, or the
+        adaptive limiter when there is one.
+        
+        Detectors without analyze_async (such as TieredPIIDetector or
+        detect_pii-only detectors) run in the executor.
+        
+        Args:
+            text: Page text
+            language: ISO 639-1 language code
+            executor: Executor for synchronous detectors
             
-            # Detect PII in the page text
-            pii_instances = self.pii_detector.detect_pii(text, language)
+        Returns:
+            The detector's analyze() result
+        """
+        async def request():
+            if hasattr(self.pii_detector, "analyze_async"):
+                return await self.pii_detector.analyze_async(text, language)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(self._analyze_page, text, language))
+        
+        if self.limiter is not None:
+            return await self.limiter.call_async(request, classify=detection_outcome)
+        async with self._request_semaphore():
+            return await request()
+    
+    def _request_semaphore(self) -> asyncio.Semaphore:
+        """Return the semaphore bounding detection requests on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    def detect_spans(self, input_path: PDFSource, redaction: Optional[IncrementalRedaction] = None,
+                     pages: Optional[List[int]] = None,
+                     checkpoint: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Detect PII in a PDF file and locate it on the pages, without redacting.
+        
+        Args:
+            input_path: Path to the input PDF file, or its content
+            redaction: Incremental locator that streamed entities are handed to;
+                when streaming without one, a locator that does not mark is used
+            pages: 0-based numbers of the pages to process; all pages when omitted
+            checkpoint: Path of a checkpoint journal (see pdf_pii_redactor.checkpoint);
+                pages already in the journal are not detected again, and
+                every page detected is added to it
+            
+        Returns:
+            Tuple of the located spans (see pdf_pii_redactor.spans) and statistics
+        """
+        if redaction is None and getattr(self.pii_detector, "stream", False):
+            with IncrementalRedaction(input_path, mark=False, profiler=self._profiler) as locator:
+                return self.detect_spans(input_path, locator, pages, checkpoint)
+        
+        with ExitStack() as stack:
+            journal = None
+            resumed = None
+            if checkpoint:
+                journal = stack.enter_context(
+                    CheckpointJournal(checkpoint, document_hash(input_path), self._checkpoint_options())
+                )
+                resumed = journal.load()
+            done = resumed["pages"] if resumed else {}
+            if pages is not None:
+                selected = set(pages)
+                done = {page_num: record for page_num, record in done.items() if page_num in selected}
+            
+            # Extract text from the pages that are not in the journal
+            remaining = pages
+            if done:
+                remaining = [page_num for page_num in (pages if pages is not None
+                                                       else range(count_pages(input_path)))
+                             if page_num not in done]
+            extracted = self._extract_pages(input_path, remaining)
             
-            # For each PII instance, find its position in the PDF
-            for pii in pii_instances:
-                pii_text = pii["value"]
+            if not extracted and not done:
+                logger.warning("No text content found in the PDF")
+                return [], {"pages_processed": 0, "language": None}
+            
+            # Detect document language, unless the journal has it
+            if resumed:
+                language = resumed["language"]
+            else:
+                with profile_stage(self._profiler, "language_detection"):
+                    language = self.language_detector.detect_document_language(extracted)
+                if journal is not None:
+                    journal.start(language)
+            logger.info(f"Detected document language: {language}")
+            
+            # Process each page to find PII
+            spans = []
+            stats = self._new_stats(extracted, language)
+            stats["pages_processed"] += len(done)
+            
+            routes = {}
+            usage = {}
+            detection_times = {}
+            if redaction is not None:
+                stats["streaming"] = {"entities_streamed": 0, "entities_after_response": 0}
+            
+            # Spans of the journalled pages are located already
+            for page_num in sorted(done):
+                record = done[page_num]
+                self._record_result(page_num, record, routes, usage)
+                if record.get("skipped") and self.page_screener:
+                    stats["prescreen"]["scores"][page_num] = record.get("score")
+                    stats["prescreen"]["pages_skipped"] += 1
+                    stats["prescreen"]["skipped_pages"].append(page_num)
+                for span in record["spans"]:
+                    spans.append(redaction.add(span) if redaction is not None else span)
+            if journal is not None:
+                stats["checkpoint"] = {"path": checkpoint, "pages_resumed": len(done),
+                                       "pages_detected": len(extracted)}
+            
+            # Journalled spans are located page by page, so that the journal holds their rects
+            locator = redaction
+            if journal is not None and locator is None:
+                locator = stack.enter_context(IncrementalRedaction(input_path, mark=False, profiler=self._profiler))
+            ocr_words = self._ocr_words(extracted)
+            if locator is not None:
+                locator.ocr_words.update(ocr_words)
+            
+            for page in tqdm(extracted, desc="Processing pages", disable=not self.verbose):
+                first_span = len(spans)
                 
-                # Find all instances of this text in the PDF
-                text_instances = self.pdf_processor.find_text_instances(input_path, pii_text)
+                # Known entities are found on every page, and the detector may not see them
+                gazetteer_spans, page = self._scan_gazetteer(page, stats)
+                for span in gazetteer_spans:
+                    if locator is not None:
+                        locator.add(span)
+                    spans.append(span)
+                known = {normalize_term(span["value"]) for span in gazetteer_spans}
                 
-                # Add to redactions list
-                for instance in text_instances:
-                    if instance["page_num"] == page_num:  # Only consider instances on the current page
-                        redaction = {
-                            "page_num": page_num,
-                            "x0": instance["x0"],
-                            "y0": instance["y0"],
-                            "x1": instance["x1"],
-                            "y1": instance["y1"],
-                            "text": pii_text,
-                            "type": pii["type"]
-                        }
-                        all_redactions.append(redaction)
+                # Skip pages without plausible PII
+                if not self._prescreen_page(page, language, stats):
+                    if journal is not None:
+                        journal.record(page["page_num"], spans[first_span:], skipped=True,
+                                       score=stats["prescreen"]["scores"][page["page_num"]])
+                    continue
+                
+                # Detect PII in the page text
+                on_entity = None
+                # Keys of the entities streamed on this page; the same value at the same offsets
+                # on another page (a letterhead, a form field) is another instance to redact
+                streamed = set()
+                if redaction is not None:
+                    def on_entity(pii, page_num=page["page_num"], known=known, streamed=streamed):
+                        key = entity_key(pii)
+                        if key is None or key in streamed or normalize_term(pii["value"]) in known:
+                            return
+                        streamed.add(key)
+                        spans.append(redaction.add(make_span(
+                            page_num, pii["type"], pii["value"],
+                            start=pii.get("start_index"), end=pii.get("end_index")
+                        )))
+                        stats["streaming"]["entities_streamed"] += 1
+                
+                start = time.perf_counter()
+                with profile_stage(self._profiler, "detection", page["page_num"]):
+                    result = self._analyze_page_limited(page["text"], language, on_entity)
+                detection_times[page["page_num"]] = time.perf_counter() - start
+                self._record_result(page["page_num"], result, routes, usage)
+                
+                for pii in result["pii"]:
+                    if redaction is not None and entity_key(pii) in streamed:
+                        continue
+                    if normalize_term(pii["value"]) in known:
+                        # Found by the gazetteer already
+                        continue
+                    span = make_span(
+                        page["page_num"],
+                        pii["type"],
+                        pii["value"],
+                        start=pii.get("start_index"),
+                        end=pii.get("end_index")
+                    )
+                    if redaction is not None:
+                        # Entities the detector did not stream (non-streaming tier, parse misses)
+                        stats["streaming"]["entities_after_response"] += 1
+                    if locator is not None:
+                        locator.add(span)
+                    spans.append(span)
+                
+                if journal is not None:
+                    journal.record(page["page_num"], spans[first_span:], route=result.get("route"),
+                                   usage=result.get("usage"))
+            
+            self._summarize(stats, routes, usage)
+            self._summarize_pages(stats, spans, list(done) + [page["page_num"] for page in extracted],
+                                  detection_times)
         
-        # Apply redactions to the PDF
-        if all_redactions:
-            logger.info(f"Applying {len(all_redactions)} redactions")
-            self.pdf_processor.apply_redactions(input_path, output_path, all_redactions)
-        else:
-            logger.info("No PII found to redact")
-            # Create a copy of the original PDF if no redactions
-            with open(input_path, "rb") as src, open(output_path, "wb") as dst:
-                dst.write(src.read())
-        
-        # Return statistics
-        stats = {
-            "redacted_items": len(all_redactions),
-            "pages_processed": len(pages),
-            "language": language,
-            "pii_types_found": list(set(r["type"] for r in all_redactions)) if all_redactions else []
+        # Find the position of every PII instance on its page
+        if locator is None:
+            self.pdf_processor.locate_spans(input_path, spans, ocr_words)
+        
+        return spans, stats
+    
+    def _ocr_words(self, pages: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        """Return the OCR words of the pages recognized by OCR, by page number."""
+        return {page["page_num"]: page["ocr_words"] for page in pages if "ocr_words" in page}
+    
+    def _checkpoint_options(self) -> Dict[str, Any]:
+        """Return the options that a checkpoint journal must have been written with to be resumed."""
+        return {
+            "model": getattr(self.pii_detector, "model", None),
+            "prompt_version": getattr(self.pii_detector, "prompt_version", None),
+            "extraction_profile": self.extraction_profile,
+            "header_margin": self.header_margin,
+            "footer_margin": self.footer_margin,
+            "prescreen_threshold": self.page_screener.threshold if self.page_screener else None,
+            "ocr_engine": type(self.pdf_processor.ocr_engine).__name__ if self.pdf_processor.ocr_engine else None,
+            "ocr_dpi": self.pdf_processor.ocr_dpi if self.pdf_processor.ocr_engine else None,
+            "gazetteer": self.gazetteer.fingerprint if self.gazetteer else None,
+            "gazetteer_mask": self.gazetteer_mask if self.gazetteer else None
         }
+    
+    def _extract_pages(self, input_path: PDFSource, pages: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Extract the page texts with the configured profile and margins.
         
-        return stats 
\ No newline at end of file
+        Args:
+            input_path: Path to the input PDF file, or its content
+            pages: 0-based numbers of the pages to extract; all pages when omitted
+            
+        Returns:
+            List of page dictionaries (see PDFProcessor.extract_text)
+        """
+        return self.pdf_processor.extract_text(
+            input_path,
+            profile=self.extraction_profile,
+            header_margin=self.header_margin,
+            footer_margin=self.footer_margin,
+            pages=pages
+        )
+    
+    def _new_stats(self, pages: List[Dict[str, Any]], language: str) -> Dict[str, Any]:
+        """
+        Create the statistics of a detection run.
+        
+        Args:
+            pages: Extracted pages
+            language: Document language
+            
+        Returns:
+            Statistics dictionary
+        """
+        stats = {"pages_processed": len(pages), "language": language}
+        if self.gazetteer:
+            stats["gazetteer"] = {"hits": 0, "pages_with_hits": 0, "masked": self.gazetteer_mask}
+        if self.page_screener:
+            stats["prescreen"] = {
+                "threshold": self.page_screener.threshold,
+                "pages_skipped": 0,
+                "skipped_pages": [],
+                "scores": {}
+            }
+        return stats
+    
+    def _scan_gazetteer(self, page: Dict[str, Any],
+                        stats: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Find the gazetteer terms of a page and record them in the statistics.
+        
+        Args:
+            page: Page dictionary
+            stats: Statistics to update
+            
+        Returns:
+            Tuple of the spans of the hits and the page to pre-screen and send
+            to the detector: the same page, or with masking a copy whose text
+            has the hits masked (offsets are unchanged)
+        """
+        if self.gazetteer is None:
+            return [], page
+        
+        with profile_stage(self._profiler, "gazetteer", page["page_num"]):
+            hits = self.gazetteer.find(page["text"])
+        if not hits:
+            return [], page
+        
+        stats["gazetteer"]["hits"] += len(hits)
+        stats["gazetteer"]["pages_with_hits"] += 1
+        spans = [make_span(page["page_num"], hit["type"], hit["value"], start=hit["start"], end=hit["end"])
+                 for hit in hits]
+        if self.gazetteer_mask:
+            page = dict(page, text=mask_hits(page["text"], hits))
+        return spans, page
+    
+    def _prescreen_page(self, page: Dict[str, Any], language: str, stats: Dict[str, Any]) -> bool:
+        """
+        Pre-screen a page and record the outcome in the statistics.
+        
+        Args:
+            page: Page dictionary
+            language: Document language
+            stats: Statistics to update
+            
+        Returns:
+            True if the page should be sent to the detector
+        """
+        if not self.page_screener:
+            return True
+        
+        with profile_stage(self._profiler, "prescreen", page["page_num"]):
+            screening = self.page_screener.score(page["text"], language)
+        stats["prescreen"]["scores"][page["page_num"]] = screening["score"]
+        if not screening["detect"]:
+            stats["prescreen"]["pages_skipped"] += 1
+            stats["prescreen"]["skipped_pages"].append(page["page_num"])
+            logger.info(f"Skipping page {page['page_num']}: pre-screen score {screening['score']:.1f}")
+        return screening["detect"]
+    
+    def _record_result(self, page_num: int, result: Dict[str, Any], routes: Dict[int, Any],
+                       usage: Dict[int, Any]) -> None:
+        """
+        Keep the route and token usage of a page's detection result.
+        
+        Args:
+            page_num: Page number
+            result: Detection result
+            routes: Routes by page number, updated
+            usage: Token usage by page number, updated
+        """
+        if "route" in result:
+            routes[page_num] = result["route"]
+        if "usage" in result:
+            usage[page_num] = result["usage"]
+    
+    def _summarize(self, stats: Dict[str, Any], routes: Dict[int, Any], usage: Dict[int, Any]) -> None:
+        """
+        Add the routing and token usage summaries, and the state of the
+        adaptive limiter, to the statistics.
+        
+        Args:
+            stats: Statistics to update
+            routes: Routes by page number
+            usage: Token usage by page number
+        """
+        if routes:
+            stats["routing"] = summarize_routes(routes)
+        if usage:
+            stats["usage"] = {
+                "total": {name: sum(page_usage.get(name, 0) for page_usage in usage.values())
+                          for name in ("prompt_tokens", "completion_tokens", "cached_tokens")},
+                "pages": usage
+            }
+        if self.limiter is not None:
+            stats["concurrency"] = self.limiter.metrics()
+    
+    def _summarize_pages(self, stats: Dict[str, Any], spans: List[Dict[str, Any]], page_nums: List[int],
+                         detection_times: Dict[int, float]) -> None:
+        """
+        Add the PII counts by type and by page and the detection times to the statistics.
+        
+        Args:
+            stats: Statistics to update
+            spans: Spans of the document
+            page_nums: Numbers of the pages processed
+            detection_times: Seconds the detection of each page took; pages
+                resumed from a journal or skipped by the pre-screen have none
+        """
+        by_page = {page_num: Counter() for page_num in page_nums}
+        for span in spans:
+            by_page.setdefault(span["page"], Counter())[span["type"]] += 1
+        
+        stats["pii_types"] = dict(sum(by_page.values(), Counter()))
+        stats["page_stats"] = [{"page": page_num, "pii_types": dict(counts)}
+                               for page_num, counts in sorted(by_page.items())]
+        stats["timings"] = {"detection": detection_times}
+    
+    def _analyze_page_limited(self, text: str, language: str,
+                              on_entity: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run _analyze_page in a slot of the adaptive limiter, if there is one."""
+        if self.limiter is None:
+            return self._analyze_page(text, language, on_entity)
+        return self.limiter.call(functools.partial(self._analyze_page, text, language, on_entity),
+                                 classify=detection_outcome)
+    
+    def _analyze_page(self, text: str, language: str,
+                      on_entity: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Run the PII detector on a page.
+        
+        Args:
+            text: Page text
+            language: ISO 639-1 language code
+            on_entity: Streaming callback for detectors that stream
+            
+        Returns:
+            The detector's analyze() result, or {"pii": [...]} for detectors
+            that only provide detect_pii()
+        """
+        if on_entity is not None and getattr(self.pii_detector, "stream", False):
+            return self.pii_detector.analyze(text, language, on_entity=on_entity)
+        if hasattr(self.pii_detector, "analyze"):
+            return self.pii_detector.analyze(text, language)
+        return {"pii": self.pii_detector.detect_pii(text, language)}
+    
+    def detect(self, input_path: str, span_path: str, pages: Optional[List[int]] = None,
+               checkpoint: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Detect PII in a PDF file and write the located spans to a span file.
+        
+        Args:
+            input_path: Path to the input PDF file
+            span_path: Path of the span file to write (.json or .jsonl)
+            pages: 0-based numbers of the pages to process; all pages when omitted
+            checkpoint: Path of a checkpoint journal to resume from and record to
+            
+        Returns:
+            Dictionary with statistics about the detection (see redact_pdf);
+            with profiling, "profile" holds the paths of the profile files
+        """
+        start = time.perf_counter()
+        if self.profile:
+            stats = self._run_profiled(input_path, self._detect, input_path, span_path, pages, checkpoint)
+        else:
+            stats = self._detect(input_path, span_path, pages, checkpoint)
+        stats.setdefault("timings", {})["elapsed"] = time.perf_counter() - start
+        return stats
+    
+    def _detect(self, input_path: str, span_path: str, pages: Optional[List[int]] = None,
+                checkpoint: Optional[str] = None) -> Dict[str, Any]:
+        """Run detect without profiling."""
+        logger.info(f"Starting detection for {input_path}")
+        
+        spans, stats = self.detect_spans(input_path, pages=pages, checkpoint=checkpoint)
+        write_span_file(
+            span_path,
+            spans,
+            source=input_path if is_path(input_path) else None,
+            metadata={
+                "language": stats["language"],
+                "model": getattr(self.pii_detector, "model", None),
+                "prompt_version": getattr(self.pii_detector, "prompt_version", None)
+            }
+        )
+        
+        stats["spans"] = len(spans)
+        return stats
+    
+    def _run_profiled(self, input_path: PDFSource, method: Callable[..., Dict[str, Any]],
+                      *args: Any) -> Dict[str, Any]:
+        """
+        Run a method under a profiler and write the profile to the profile directory.
+        
+        The profile is also written when the method fails. Profiling is not
+        thread-safe: a redactor must not profile concurrent runs.
+        
+        Args:
+            input_path: Input of the run, used to name the profile files
+            method: Method to run
+            *args: Arguments of the method
+            
+        Returns:
+            The method's statistics, with the profile file paths under "profile"
+        """
+        profiler = Profiler(memory=self.profile_memory)
+        self._profiler = self.pdf_processor.profiler = profiler
+        name = os.path.splitext(os.path.basename(input_path))[0] if is_path(input_path) else "document"
+        try:
+            with profiler:
+                stats = method(*args)
+        finally:
+            self._profiler = self.pdf_processor.profiler = None
+            paths = profiler.write(self.profile, name)
+        
+        stats["profile"] = paths
+        return stats
+    
+    def apply(self, input_path: str, span_path: str, output_path: str) -> Dict[str, Any]:
+        """
+        Redact a PDF file using a previously written span file.
+        
+        Args:
+            input_path: Path to the input PDF file
+            span_path: Path to the span file
+            output_path: Path where the redacted PDF will be saved
+            
+        Returns:
+            Dictionary with statistics about the redaction
+        """
+        return apply_span_file(input_path, span_path, output_path, verbose=self.verbose,
+                               apply_plan=self.pdf_processor.apply_plan, verify=self.pdf_processor.verify)
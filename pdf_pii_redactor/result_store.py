@@ -0,0 +1,254 @@
+"""
+Content-addressed store for redacted PDFs.
+
+Results are keyed by a hash of the uploaded document and the options that
+affect the output (e.g. the model), so identical uploads are served from the
+store instead of being redacted again. A background janitor thread evicts
+entries that are older than the TTL, then the least recently used ones until
+the store fits in its size budget.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResultStore:
+    """
+    Size- and TTL-bounded store of redacted PDFs on the local filesystem.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1024 * 1024 * 1024, ttl: float = 3600.0,
+                 janitor_interval: float = 60.0):
+        """
+        Initialize the result store.
+
+        Args:
+            root: Directory holding the stored results
+            max_bytes: Maximum total size of the stored PDFs
+            ttl: Seconds after which an unused entry expires
+            janitor_interval: Seconds between two eviction passes of the janitor thread
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.janitor_interval = janitor_interval
+
+        self._lock = threading.Lock()
+        self._janitor = None
+        self._janitor_pid = None
+        self._stop_event = threading.Event()
+
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash: str, *options: Any) -> str:
+        """
+        Build a store key from a document hash and the options that affect the result.
+
+        Args:
+            content_hash: Hash of the input document
+            options: Values such as the model name
+
+        Returns:
+            Hexadecimal key
+        """
+        key_source = json.dumps([content_hash] + [str(option) for option in options])
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_valid_key(key: str) -> bool:
+        """Return True if key has the format produced by make_key."""
+        return len(key) == 64 and all(c in "0123456789abcdef" for c in key)
+
+    def _pdf_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.pdf")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a stored result and mark it as recently used.
+
+        Args:
+            key: Store key
+
+        Returns:
+            Dictionary with the result "path" and its "stats", or None if
+            the key is unknown, expired or still being stored
+        """
+        self.ensure_janitor()
+
+        if not self.is_valid_key(key):
+            return None
+
+        pdf_path = self._pdf_path(key)
+        try:
+            mtime = os.stat(pdf_path).st_mtime
+        except FileNotFoundError:
+            return None
+
+        if time.time() - mtime > self.ttl:
+            self._remove(key)
+            return None
+
+        stats = {}
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                stats = json.load(f)
+        except FileNotFoundError:
+            # The metadata is written last, so put() has not finished
+            return None
+        except ValueError:
+            pass
+
+        # The modification time doubles as the last-use time
+        try:
+            os.utime(pdf_path)
+        except FileNotFoundError:
+            return None
+
+        return {"path": pdf_path, "stats": stats}
+
+    def put(self, key: str, source_path: str, stats: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Move a redacted PDF into the store.
+
+        Args:
+            key: Store key
+            source_path: Path of the redacted PDF; the file is moved
+            stats: Statistics returned by the redaction
+
+        Returns:
+            Path of the stored PDF
+        """
+        self.ensure_janitor()
+
+        pdf_path = self._pdf_path(key)
+        temp_suffix = f".tmp-{uuid.uuid4().hex}"
+
+        # The PDF goes first: evict() removes metadata without a PDF, and get()
+        # treats a PDF without metadata as not stored yet
+        # shutil.move falls back to copying when the source is on another filesystem
+        shutil.move(source_path, pdf_path + temp_suffix)
+        os.replace(pdf_path + temp_suffix, pdf_path)
+
+        with open(self._meta_path(key) + temp_suffix, "w", encoding="utf-8") as f:
+            json.dump(stats or {}, f)
+        os.replace(self._meta_path(key) + temp_suffix, self._meta_path(key))
+
+        logger.info(f"Stored result {key}")
+        return pdf_path
+
+    def _remove(self, key: str) -> int:
+        """Remove an entry, returning the number of bytes freed."""
+        freed = 0
+        for path in (self._pdf_path(key), self._meta_path(key)):
+            try:
+                freed += os.path.getsize(path)
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def evict(self) -> int:
+        """
+        Remove expired entries, then least recently used ones until the store fits in max_bytes.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            now = time.time()
+            entries = []
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if ".tmp-" in name:
+                    # Leftover of an interrupted put
+                    try:
+                        if now - os.stat(path).st_mtime > self.ttl:
+                            os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if not name.endswith(".pdf"):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name[:-4]))
+
+            removed = 0
+            total_bytes = 0
+            kept = []
+            for mtime, size, key in entries:
+                if now - mtime > self.ttl:
+                    self._remove(key)
+                    removed += 1
+                else:
+                    kept.append((mtime, size, key))
+                    total_bytes += size
+
+            # Oldest first
+            kept.sort()
+            for mtime, size, key in kept:
+                if total_bytes <= self.max_bytes:
+                    break
+                self._remove(key)
+                total_bytes -= size
+                removed += 1
+
+            # Orphaned metadata files, left when a PDF is evicted while it is
+            # being stored; only expired ones, since every worker process runs
+            # a janitor and self._lock does not cover the put() of the others
+            for name in os.listdir(self.root):
+                if name.endswith(".json") and not os.path.exists(self._pdf_path(name[:-5])):
+                    path = os.path.join(self.root, name)
+                    try:
+                        if now - os.stat(path).st_mtime > self.ttl:
+                            os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+
+        if removed:
+            logger.info(f"Evicted {removed} results")
+        return removed
+
+    def ensure_janitor(self) -> None:
+        """Start the janitor thread if it is not running in this process."""
+        if self._janitor is not None and self._janitor_pid == os.getpid() and self._janitor.is_alive():
+            return
+
+        with self._lock:
+            # Threads do not survive fork(), so restart in worker processes
+            if self._janitor is None or self._janitor_pid != os.getpid() or not self._janitor.is_alive():
+                self._stop_event = threading.Event()
+                self._janitor = threading.Thread(target=self._run_janitor, name="result-store-janitor",
+                                                 daemon=True)
+                self._janitor_pid = os.getpid()
+                self._janitor.start()
+
+    def stop_janitor(self) -> None:
+        """Stop the janitor thread."""
+        self._stop_event.set()
+        if self._janitor is not None and self._janitor_pid == os.getpid():
+            self._janitor.join()
+        self._janitor = None
+
+    def _run_janitor(self) -> None:
+        stop_event = self._stop_event
+        while not stop_event.wait(self.janitor_interval):
+            try:
+                self.evict()
+            except Exception as e:
+                logger.error(f"Error evicting results: {str(e)}")
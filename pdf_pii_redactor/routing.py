@@ -0,0 +1,192 @@
+"""
+Tiered routing of PII detection between a cheap and a strong model.
+
+Pages go to a cheap, fast first-pass detector. They are escalated to the
+strong detector when the first pass fails or returns unparseable output,
+when its confidence is below a threshold, or, without a first pass, when the
+page pre-screen scores the page as high-risk.
+"""
+
+import logging
+from typing import List, Dict, Any, Optional, Callable
+
+from pdf_pii_redactor.prescreen import PageScreener
+
+logger = logging.getLogger(__name__)
+
+
+class TieredPIIDetector:
+    """
+    PII detector that routes pages between a first-pass and an escalation detector.
+
+    Both detectors must provide analyze(text, language) as PIIDetector does.
+    """
+
+    def __init__(self, first_pass: Any, escalation: Any, confidence_threshold: float = 0.7,
+                 risk_threshold: Optional[float] = None, page_screener: Optional[PageScreener] = None,
+                 verbose: bool = False):
+        """
+        Initialize the tiered detector.
+
+        Args:
+            first_pass: Cheap detector tried first
+            escalation: Strong detector used when the first pass is not trusted
+            confidence_threshold: First-pass confidence below which a page is escalated
+            risk_threshold: Pre-screen score at or above which a page goes straight
+                to the escalation detector; None disables this rule
+            page_screener: Screener used to score page risk
+            verbose: Whether to enable verbose logging
+        """
+        self.first_pass = first_pass
+        self.escalation = escalation
+        self.confidence_threshold = confidence_threshold
+        self.risk_threshold = risk_threshold
+        self.page_screener = page_screener or PageScreener()
+        self.verbose = verbose
+
+    @property
+    def model(self) -> str:
+        """Models of both tiers, for span file and cache metadata."""
+        return f"{getattr(self.first_pass, 'model', 'first_pass')}->{getattr(self.escalation, 'model', 'escalation')}"
+
+    @property
+    def prompt_version(self) -> str:
+        """Prompt versions of both tiers, for cache keys."""
+        return f"{getattr(self.first_pass, 'prompt_version', None)}->{getattr(self.escalation, 'prompt_version', None)}"
+
+    @property
+    def stream(self) -> bool:
+        """Whether the escalation detector streams its responses."""
+        return getattr(self.escalation, "stream", False)
+
+    def detect_pii(self, text: str, language: str = "en") -> List[Dict[str, Any]]:
+        """
+        Detect PII in the given text.
+
+        Args:
+            text: Text to analyze
+            language: ISO 639-1 language code
+
+        Returns:
+            List of dictionaries containing PII type and value
+        """
+        return self.analyze(text, language)["pii"]
+
+    def analyze(self, text: str, language: str = "en",
+                on_entity: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Detect PII in the given text, escalating when needed.
+
+        Args:
+            text: Text to analyze
+            language: ISO 639-1 language code
+            on_entity: Streaming callback, passed to the escalation detector
+                only: first-pass entities are not final until the first pass
+                is accepted
+
+        Returns:
+            The result of the tier that answered (see PIIDetector.analyze), with
+            a "route" entry holding the tiers used, the escalation reason and
+            the latency of each tier
+        """
+        route = {"tiers": [], "reason": None, "latency": {}}
+
+        if self.risk_threshold is not None:
+            risk = self.page_screener.score(text, language)["score"]
+            # Pages that cannot be scored count as high risk
+            if risk is None or risk >= self.risk_threshold:
+                route["reason"] = "high_risk"
+
+        first_result = None
+        if route["reason"] is None:
+            first_result = self.first_pass.analyze(text, language)
+            route["tiers"].append("first_pass")
+            route["latency"]["first_pass"] = first_result["latency"]
+            route["reason"] = self._escalation_reason(first_result)
+
+            if route["reason"] is None:
+                first_result["route"] = route
+                return first_result
+
+        if self.verbose:
+            logger.info(f"Escalating page to {getattr(self.escalation, 'model', 'escalation')}: {route['reason']}")
+
+        if on_entity is not None:
+            result = self.escalation.analyze(text, language, on_entity=on_entity)
+        else:
+            result = self.escalation.analyze(text, language)
+        route["tiers"].append("escalation")
+        route["latency"]["escalation"] = result["latency"]
+
+        # Keep the first-pass answer if the escalation fails
+        escalation_usage = result.get("usage")
+        if not result["ok"] and first_result is not None and first_result["ok"]:
+            result = dict(first_result)
+
+        # Token usage covers both tiers
+        if first_result is not None and first_result.get("usage") and escalation_usage:
+            result["usage"] = {name: first_result["usage"].get(name, 0) + escalation_usage.get(name, 0)
+                               for name in escalation_usage}
+
+        result["latency"] = sum(route["latency"].values())
+        result["route"] = route
+        return result
+
+    def _escalation_reason(self, result: Dict[str, Any]) -> Optional[str]:
+        """
+        Decide whether a first-pass result must be escalated.
+
+        Args:
+            result: First-pass result
+
+        Returns:
+            The escalation reason, or None to accept the result
+        """
+        if not result["ok"]:
+            return "error"
+
+        confidences = [result["confidence"]] if result.get("confidence") is not None else []
+        confidences.extend(pii["confidence"] for pii in result["pii"]
+                           if isinstance(pii.get("confidence"), (int, float)))
+        if not confidences:
+            return "no_confidence"
+        if min(confidences) < self.confidence_threshold:
+            return "low_confidence"
+        return None
+
+
+def summarize_routes(routes: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate the routing decisions of a document.
+
+    Args:
+        routes: Route of each page (see TieredPIIDetector.analyze), by page number
+
+    Returns:
+        Dictionary with page counts per outcome, escalation reasons, per-tier
+        latency and the decision for each page
+    """
+    summary = {
+        "first_pass_only": 0,
+        "escalated": 0,
+        "reasons": {},
+        "latency": {},
+        "decisions": {}
+    }
+
+    for page_num, route in routes.items():
+        if "escalation" in route["tiers"]:
+            summary["escalated"] += 1
+            summary["reasons"][route["reason"]] = summary["reasons"].get(route["reason"], 0) + 1
+        else:
+            summary["first_pass_only"] += 1
+
+        for tier, latency in route["latency"].items():
+            tier_stats = summary["latency"].setdefault(tier, {"calls": 0, "total": 0.0, "mean": 0.0})
+            tier_stats["calls"] += 1
+            tier_stats["total"] += latency
+            tier_stats["mean"] = tier_stats["total"] / tier_stats["calls"]
+
+        summary["decisions"][page_num] = {"tiers": route["tiers"], "reason": route["reason"]}
+
+    return summary
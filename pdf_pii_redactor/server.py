@@ -0,0 +1,245 @@
+"""
+Pre-forking WSGI server for running the web app in production.
+
+The master process binds the listening socket, runs an optional preload
+function (importing heavy modules, creating redactors) and forks the worker
+processes, which share the loaded memory copy-on-write and accept connections
+from the shared socket. Each worker serves requests on a bounded pool of
+threads and only accepts a connection when a thread is free, so a worker busy
+with slow redactions leaves new uploads to the others.
+
+A request running for longer than the request timeout makes its worker stop
+accepting, finish its other requests and exit; the master replaces workers
+that exit. On SIGTERM or SIGINT the master drains: the workers stop
+accepting, finish the requests in flight and exit, and those still busy after
+the graceful timeout are killed.
+"""
+
+import os
+import time
+import errno
+import signal
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from werkzeug.serving import BaseWSGIServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THREADS = 4
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_GRACEFUL_TIMEOUT = 30.0
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server of a worker process, serving requests on a bounded thread pool."""
+
+    def __init__(self, host, port, app, fd, threads, timeout):
+        super().__init__(host, port, app, fd=fd)
+        # The listening socket is shared by the workers; a worker that loses
+        # the race for a connection must not block in accept()
+        self.socket.setblocking(False)
+        self.timeout_seconds = timeout
+        self.draining = False
+        self.active = {}
+        self._slots = threading.BoundedSemaphore(threads)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="request")
+
+    def get_request(self):
+        # Only accept when a thread is free to serve the connection
+        while not self._slots.acquire(timeout=0.5):
+            if self.draining:
+                raise OSError(errno.ESHUTDOWN, "Draining")
+        if self.draining:
+            self._slots.release()
+            raise OSError(errno.ESHUTDOWN, "Draining")
+        try:
+            request, client_address = super().get_request()
+        except OSError:
+            self._slots.release()
+            raise
+        request.setblocking(True)
+        request.settimeout(self.timeout_seconds)
+        return request, client_address
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        key = threading.get_ident()
+        self.active[key] = time.monotonic()
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            del self.active[key]
+            self._slots.release()
+
+    def overdue(self) -> int:
+        """Return the number of requests running for longer than the request timeout."""
+        now = time.monotonic()
+        return sum(1 for started in list(self.active.values()) if now - started > self.timeout_seconds)
+
+    def drain(self, graceful_timeout: float, keep: int = 0) -> None:
+        """
+        Wait for the requests in flight to finish.
+
+        Args:
+            graceful_timeout: Seconds to wait at most
+            keep: Number of requests not to wait for (those past the request timeout)
+        """
+        deadline = time.monotonic() + graceful_timeout
+        while len(self.active) > keep and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+class PreforkServer:
+    """
+    Pre-forking server with a fixed number of worker processes.
+    """
+
+    def __init__(self, app: Callable, host: str = "0.0.0.0", port: int = 5000, workers: Optional[int] = None,
+                 threads: int = DEFAULT_THREADS, timeout: float = DEFAULT_TIMEOUT,
+                 graceful_timeout: float = DEFAULT_GRACEFUL_TIMEOUT, preload: Optional[Callable[[], None]] = None,
+                 worker_exit: Optional[Callable[[], None]] = None):
+        """
+        Initialize the server and bind its socket.
+
+        Args:
+            app: WSGI application
+            host: Address to listen on
+            port: Port to listen on; 0 picks a free port (see the port attribute)
+            workers: Number of worker processes; os.cpu_count() when omitted
+            threads: Requests served at the same time by each worker
+            timeout: Seconds after which a request makes its worker restart
+            graceful_timeout: Seconds the workers get to finish their requests
+                when stopping or restarting
+            preload: Function run once in the master before forking, e.g. to
+                import modules and create redactors shared by all workers
+            worker_exit: Function run in each worker after it finished its
+                requests and before it exits, e.g. to flush buffered writes
+        """
+        self.app = app
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.preload = preload
+        self.worker_exit = worker_exit
+        self.socket = socket.create_server((host, port), backlog=128)
+        self.host = host
+        self.port = self.socket.getsockname()[1]
+        self._pids: Dict[int, int] = {}
+        self._stopping = False
+
+    def run(self) -> None:
+        """Fork the workers and supervise them until SIGTERM or SIGINT."""
+        if self.preload is not None:
+            self.preload()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        logger.info(f"Serving on {self.host}:{self.port} with {self.workers} workers of {self.threads} threads")
+
+        try:
+            while not self._stopping:
+                for index in range(self.workers):
+                    if index not in self._pids.values() and not self._stopping:
+                        self._spawn(index)
+                self._reap()
+                time.sleep(0.1)
+        finally:
+            self._shutdown()
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _spawn(self, index: int) -> None:
+        """Fork worker number index."""
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                exit_code = self._run_worker()
+            except BaseException:
+                logger.exception("Worker failed")
+            finally:
+                os._exit(exit_code)
+        self._pids[pid] = index
+        logger.info(f"Started worker {index} (pid {pid})")
+
+    def _reap(self) -> None:
+        """Collect the workers that exited."""
+        while self._pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self._pids.pop(pid, None)
+            if index is not None and not self._stopping:
+                logger.warning(f"Worker {index} (pid {pid}) exited with status {status}; restarting it")
+
+    def _shutdown(self) -> None:
+        """Drain the workers, kill those still busy after the graceful timeout and close the socket."""
+        logger.info(f"Stopping {len(self._pids)} workers")
+        for pid in self._pids:
+            _signal(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._pids and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+
+        for pid in self._pids:
+            logger.warning(f"Killing worker pid {pid} after the graceful timeout")
+            _signal(pid, signal.SIGKILL)
+        for pid in list(self._pids):
+            os.waitpid(pid, 0)
+        self._pids.clear()
+        self.socket.close()
+
+    def _run_worker(self) -> int:
+        """Serve requests in a worker process until told to stop; return the exit code."""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        server = _PooledWSGIServer(self.host, self.port, self.app, self.socket.fileno(), self.threads, self.timeout)
+        exit_code = 0
+
+        def stop(signum=None, frame=None):
+            server.draining = True
+            # shutdown() waits for serve_forever(), which runs in this thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        def watchdog():
+            nonlocal exit_code
+            while not server.draining:
+                time.sleep(min(1.0, self.timeout / 4))
+                if server.overdue():
+                    logger.error(f"Worker pid {os.getpid()} has a request running for over {self.timeout} seconds; "
+                                 "restarting it")
+                    exit_code = 1
+                    stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        threading.Thread(target=watchdog, daemon=True).start()
+        server.serve_forever(poll_interval=0.1)
+
+        # The requests past the timeout are abandoned with the process
+        server.drain(self.graceful_timeout, keep=server.overdue())
+        if self.worker_exit is not None:
+            self.worker_exit()
+        return exit_code
+
+
+def _signal(pid: int, signum: int) -> None:
+    """Send a signal to a process that may already have exited."""
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
@@ -0,0 +1,209 @@
+"""
+Span interchange files for the two-phase detect / apply workflow.
+
+A span file records the PII found in a document so that detection and
+redaction can run separately. Two layouts are supported, chosen by the file
+extension:
+
+- ``.json``: a single object ``{"version": 1, "source": ..., "spans": [...]}``
+- ``.jsonl``: a header line ``{"version": 1, "source": ...}`` followed by one
+  span per line
+
+Each span looks like::
+
+    {"page": 0, "start": 10, "end": 18, "type": "name", "value": "John Doe",
+     "rects": [[50.0, 40.2, 92.1, 52.6]]}
+
+``start``/``end`` are character offsets in the extracted page text and may be
+null; ``rects`` is optional; spans without rects are located by searching
+their value on the page when they are applied.
+
+This module only depends on PyMuPDF, so applying a span file does not need the
+OpenAI or language detection dependencies.
+"""
+
+import json
+import logging
+from typing import List, Dict, Any, Optional
+
+from pdf_pii_redactor.pdf_processor import PDFProcessor, PDFSource, PDFDestination, copy_pdf
+
+logger = logging.getLogger(__name__)
+
+SPAN_FILE_VERSION = 1
+
+
+def make_span(page_num: int, pii_type: str, value: str, start: Optional[int] = None,
+              end: Optional[int] = None, rects: Optional[List[List[float]]] = None) -> Dict[str, Any]:
+    """
+    Build a span dictionary.
+
+    Args:
+        page_num: 0-based page number
+        pii_type: Type of PII (name, email, phone, address, credit_card, dob)
+        value: Text of the PII
+        start: Start offset of the PII in the page text
+        end: End offset of the PII in the page text
+        rects: Rectangles ([x0, y0, x1, y1]) covering the PII on the page
+
+    Returns:
+        Span dictionary
+    """
+    span = {
+        "page": page_num,
+        "start": start,
+        "end": end,
+        "type": pii_type,
+        "value": value
+    }
+    if rects is not None:
+        span["rects"] = rects
+    return span
+
+
+def write_span_file(path: str, spans: List[Dict[str, Any]], source: Optional[str] = None,
+                    metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Write spans to a JSON or JSONL span file.
+
+    Args:
+        path: Output path; a ".jsonl" extension selects the line-delimited layout
+        spans: List of spans
+        source: Path of the document the spans were detected in
+        metadata: Extra header fields (e.g. language, model)
+    """
+    header = {"version": SPAN_FILE_VERSION, "source": source}
+    header.update(metadata or {})
+
+    with open(path, "w", encoding="utf-8") as f:
+        if path.lower().endswith(".jsonl"):
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for span in spans:
+                f.write(json.dumps(span, ensure_ascii=False) + "\n")
+        else:
+            header["spans"] = spans
+            json.dump(header, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"Wrote {len(spans)} spans to {path}")
+
+
+def read_span_file(path: str) -> Dict[str, Any]:
+    """
+    Read a JSON or JSONL span file.
+
+    Args:
+        path: Path to the span file
+
+    Returns:
+        The header fields, with the spans under "spans"
+
+    Raises:
+        ValueError: If the file is malformed or has an unsupported version
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".jsonl"):
+            lines = [line for line in f if line.strip()]
+            if not lines:
+                raise ValueError(f"Empty span file: {path}")
+            data = json.loads(lines[0])
+            data["spans"] = [json.loads(line) for line in lines[1:]]
+        else:
+            data = json.load(f)
+
+    version = data.get("version")
+    if version != SPAN_FILE_VERSION:
+        raise ValueError(f"Unsupported span file version {version!r} in {path}")
+
+    for span in data.get("spans", []):
+        if "page" not in span or "value" not in span:
+            raise ValueError(f"Span without page or value in {path}: {span}")
+
+    data.setdefault("spans", [])
+    return data
+
+
+def spans_to_redactions(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Convert located spans to redaction instructions for PDFProcessor.apply_redactions.
+
+    Args:
+        spans: List of spans with "rects"
+
+    Returns:
+        List of redaction instructions, one per rectangle
+    """
+    redactions = []
+    for span in spans:
+        for x0, y0, x1, y1 in span.get("rects") or []:
+            redactions.append({
+                "page_num": span["page"],
+                "x0": x0,
+                "y0": y0,
+                "x1": x1,
+                "y1": y1,
+                "text": span["value"],
+                "type": span.get("type")
+            })
+    return redactions
+
+
+def apply_spans(input_path: PDFSource, output_path: PDFDestination, spans: List[Dict[str, Any]],
+                pdf_processor: Optional[PDFProcessor] = None) -> Dict[str, Any]:
+    """
+    Redact a PDF using a list of spans.
+
+    Spans without rects are located on their page first.
+
+    Args:
+        input_path: Path to the input PDF file, or its content
+        output_path: Path or binary file object where the redacted PDF will be saved
+        spans: List of spans
+        pdf_processor: Processor to use; a new one is created when omitted
+
+    Returns:
+        Dictionary with statistics about the redaction
+    """
+    pdf_processor = pdf_processor or PDFProcessor()
+
+    if any(not span.get("rects") for span in spans):
+        pdf_processor.locate_spans(input_path, spans)
+
+    redactions = spans_to_redactions(spans)
+
+    stats = {
+        "redacted_items": len(redactions),
+        "pii_types_found": list(set(r["type"] for r in redactions)) if redactions else [],
+        "apply_paths": {}
+    }
+    if redactions:
+        logger.info(f"Applying {len(redactions)} redactions")
+        stats.update(pdf_processor.apply_redactions(input_path, output_path, redactions))
+    else:
+        logger.info("No PII found to redact")
+        # Create a copy of the original PDF if no redactions
+        copy_pdf(input_path, output_path)
+
+    return stats
+
+
+def apply_span_file(input_path: str, span_path: str, output_path: str,
+                    verbose: bool = False, apply_plan: str = "off", verify: str = "off") -> Dict[str, Any]:
+    """
+    Redact a PDF using a span file.
+
+    Args:
+        input_path: Path to the input PDF file
+        span_path: Path to the span file
+        output_path: Path where the redacted PDF will be saved
+        verbose: Whether to enable verbose logging
+        apply_plan: How image and line-art handling is chosen (see pdf_processor.APPLY_PLANS)
+        verify: Whether the output is checked for leaked values (see pdf_processor.VERIFY_MODES)
+
+    Returns:
+        Dictionary with statistics about the redaction
+    """
+    data = read_span_file(span_path)
+    stats = apply_spans(input_path, output_path, data["spans"],
+                        PDFProcessor(verbose=verbose, apply_plan=apply_plan, verify=verify))
+    stats["spans"] = len(data["spans"])
+    return stats
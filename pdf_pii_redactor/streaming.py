@@ -0,0 +1,219 @@
+"""
+Streaming detection: incremental parsing of LLM responses and incremental
+location and marking of PII.
+
+With streaming, each PII entity is taken out of the response as soon as its
+JSON object closes, located on its page and marked for redaction while the
+model is still generating the rest of the response.
+"""
+
+import json
+import logging
+from typing import List, Dict, Any, Optional
+
+import fitz  # PyMuPDF
+
+from pdf_pii_redactor.pdf_processor import (PDFSource, PDFDestination, open_pdf, save_pdf, copy_pdf, describe_pdf,
+                                             survey_page, apply_page_redactions, verify_redactions)
+from pdf_pii_redactor.ocr import search_words
+from pdf_pii_redactor.profiling import Profiler, profile_stage
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalEntityParser:
+    """
+    Extracts entity objects from a JSON response while it is being received.
+
+    Responses look like {"pii": [{...}, {...}], "confidence": 0.9} (or the
+    compact {"e": [...], "c": 0.9}); entities are the objects nested in an
+    array of the top-level object.
+    """
+
+    # Nesting depth of entity objects: top-level object, array, entity
+    ENTITY_DEPTH = 3
+
+    def __init__(self):
+        """Initialize the parser."""
+        self.text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._entity_start = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add a chunk of the response.
+
+        Args:
+            chunk: Next piece of the response text
+
+        Returns:
+            Entity objects completed by this chunk, in order
+        """
+        entities = []
+        offset = len(self.text)
+        self.text += chunk
+
+        for index, char in enumerate(chunk, offset):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if char == "{" and self._depth == self.ENTITY_DEPTH:
+                    self._entity_start = index
+            elif char in "}]":
+                if char == "}" and self._depth == self.ENTITY_DEPTH and self._entity_start is not None:
+                    try:
+                        entity = json.loads(self.text[self._entity_start:index + 1])
+                    except ValueError:
+                        entity = None
+                    if isinstance(entity, dict):
+                        entities.append(entity)
+                    self._entity_start = None
+                self._depth -= 1
+
+        return entities
+
+
+class IncrementalRedaction:
+    """
+    Locates spans and marks them for redaction on an open document, one span at a time.
+    """
+
+    def __init__(self, pdf_path: PDFSource, mark: bool = True, profiler: Optional[Profiler] = None,
+                 apply_plan: str = "off", verify: str = "off"):
+        """
+        Open the document.
+
+        Args:
+            pdf_path: Path to the PDF file, or its content
+            mark: Whether to add redaction annotations for located spans;
+                with False spans are only located
+            profiler: Profiler timing the search, apply, verify and save stages
+            apply_plan: How image and line-art handling is chosen (see
+                pdf_processor.APPLY_PLANS)
+            verify: Whether the marked pages are checked for leaked values
+                before saving (see pdf_processor.VERIFY_MODES)
+        """
+        self.pdf_path = pdf_path
+        self.mark = mark
+        self.profiler = profiler
+        self.apply_plan = apply_plan
+        self.verify = verify
+        self.doc = open_pdf(pdf_path)
+        self.redactions = 0
+        self.pii_types = set()
+        # OCR words of the image-only pages, by page number; spans on these
+        # pages are searched in the words
+        self.ocr_words = {}
+        # Surveys, redaction rects and redacted values of the marked pages, by page number
+        self._surveys = {}
+        self._rects = {}
+        self._values = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, span: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Locate a span on its page and mark it for redaction.
+
+        Args:
+            span: Span (see pdf_pii_redactor.spans); spans that already carry
+                rects are not searched again
+
+        Returns:
+            The same span, with "rects" set
+        """
+        page = self.doc[span["page"]]
+        if not span.get("rects"):
+            with profile_stage(self.profiler, "search", span["page"]):
+                if span["page"] in self.ocr_words:
+                    rects = search_words(self.ocr_words[span["page"]], span["value"])
+                else:
+                    rects = page.search_for(span["value"])
+                span["rects"] = [[rect.x0, rect.y0, rect.x1, rect.y1] for rect in rects]
+
+        if self.mark and span["rects"]:
+            if span["page"] not in self._surveys:
+                with profile_stage(self.profiler, "apply", span["page"]):
+                    self._surveys[span["page"]] = survey_page(page, self.apply_plan)
+                self._rects[span["page"]] = []
+                self._values[span["page"]] = {}
+            for rect in span["rects"]:
+                page.add_redact_annot(fitz.Rect(rect), text=" ")
+            self._rects[span["page"]].extend(span["rects"])
+            self._values[span["page"]][span["value"]] = span.get("type")
+            self.redactions += len(span["rects"])
+            self.pii_types.add(span.get("type"))
+
+        return span
+
+    def save(self, output_path: PDFDestination) -> Dict[str, Any]:
+        """
+        Apply the marked redactions and save the document.
+
+        Args:
+            output_path: Path or binary file object where the redacted PDF will be saved
+
+        Returns:
+            Dictionary with statistics about the redaction
+
+        Raises:
+            RuntimeError: If verify is "fail" and a redacted value was left
+        """
+        if not self.redactions:
+            logger.info("No PII found to redact")
+            copy_pdf(self.pdf_path, output_path)
+            return {"redacted_items": 0, "pii_types_found": [], "apply_paths": {}}
+
+        apply_paths = {}
+        for page_num in sorted(self._surveys):
+            with profile_stage(self.profiler, "apply", page_num):
+                path = apply_page_redactions(self.doc[page_num], self._surveys[page_num], self._rects[page_num])
+            apply_paths[path] = apply_paths.get(path, 0) + 1
+
+        stats = {"redacted_items": self.redactions, "pii_types_found": list(self.pii_types),
+                 "apply_paths": apply_paths}
+        if self.verify != "off":
+            stats["verification"] = verify_redactions(self.doc, self._values, self.verify, self.profiler)
+
+        with profile_stage(self.profiler, "save"):
+            save_pdf(self.doc, output_path)
+        logger.info(f"Saved redacted PDF to {describe_pdf(output_path)}")
+
+        return stats
+
+    def close(self) -> None:
+        """Close the document."""
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+
+
+def entity_key(pii: Dict[str, Any]) -> Optional[tuple]:
+    """
+    Identify a PII entity, so that streamed and final results can be reconciled.
+
+    Args:
+        pii: PII dictionary
+
+    Returns:
+        Hashable key, or None for entries without a type or value
+    """
+    if not pii.get("type") or not pii.get("value"):
+        return None
+    return (pii["type"], pii["value"], pii.get("start_index"), pii.get("end_index"))
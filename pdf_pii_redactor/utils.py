@@ -3,6 +3,7 @@ Utility functions for the PDF PII Redactor.
 """
 
 import os
+import hashlib
 import logging
 from typing import List, Dict, Any, Optional
 
@@ -64,4 +65,62 @@ def group_by_type(pii_instances: List[Dict[str, Any]]) -> Dict[str, List[Dict[st
                 result[pii_type] = []
             result[pii_type].append(pii)
     
-    return result 
\ No newline at end of file
+    return result
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hash of a file.
+    
+    Args:
+        file_path: Path to the file
+        chunk_size: Number of bytes read at a time
+        
+    Returns:
+        Hexadecimal digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_page_ranges(spec: str, page_count: int) -> List[int]:
+    """
+    Parse a page selection such as "1-10,15,20-".
+    
+    Pages are numbered from 1 in the selection, like in PDF viewers; an open
+    range ("20-") runs to the last page.
+    
+    Args:
+        spec: Comma-separated page numbers and ranges
+        page_count: Number of pages of the document
+        
+    Returns:
+        Sorted 0-based page numbers
+        
+    Raises:
+        ValueError: If the selection is malformed or refers to missing pages
+    """
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                first, last = part.split("-", 1)
+                first = int(first) if first.strip() else 1
+                last = int(last) if last.strip() else page_count
+            else:
+                first = last = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part!r}")
+        if first < 1 or last > page_count or first > last:
+            raise ValueError(f"Page range {part!r} is outside pages 1-{page_count}")
+        pages.update(range(first - 1, last))
+    
+    if not pages:
+        raise ValueError(f"Empty page selection: {spec!r}")
+    return sorted(pages)
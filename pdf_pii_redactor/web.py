@@ -5,16 +5,22 @@ Web interface for the PDF PII Redactor tool.
 import os
 import sys
 import tempfile
+import threading
 import uuid
 from flask import Flask, request, render_template, send_file, redirect, url_for, flash
 from werkzeug.utils import secure_filename
-from werkzeug.datastructures import Headers
 
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from pdf_pii_redactor.redactor import PDFRedactor
-from pdf_pii_redactor.utils import validate_pdf
+from pdf_pii_redactor.gazetteer import Gazetteer
+from pdf_pii_redactor.result_store import ResultStore
+from pdf_pii_redactor.audit import AuditStore
+from pdf_pii_redactor.utils import validate_pdf, file_sha256
+from pdf_pii_redactor.preflight import SlowLane, limits_from_env, preflight
+from pdf_pii_redactor.server import (PreforkServer, DEFAULT_THREADS, DEFAULT_TIMEOUT,
+                                     DEFAULT_GRACEFUL_TIMEOUT)
 
 
 
@@ -32,12 +38,117 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
+# Configure the store of redacted results, shared by identical uploads
+RESULT_STORE = ResultStore(
+    os.path.join(UPLOAD_FOLDER, "results"),
+    max_bytes=int(os.environ.get("RESULT_STORE_MAX_BYTES", 1024 * 1024 * 1024)),
+    ttl=float(os.environ.get("RESULT_STORE_TTL", 3600))
+)
+
+# Configure the optional audit store recording every upload (AUDIT_DB)
+AUDIT_DB = os.environ.get("AUDIT_DB")
+AUDIT_STORE = AuditStore(AUDIT_DB) if AUDIT_DB else None
+
+# Configure the pre-flight limits (PREFLIGHT_MAX_PAGES etc.) and the slow lane
+# for large or repaired documents; SLOW_LANE_JOBS is per worker process
+PREFLIGHT_LIMITS = limits_from_env(os.environ)
+SLOW_LANE = SlowLane(
+    max_jobs=int(os.environ.get("SLOW_LANE_JOBS", 1)),
+    time_budget=PREFLIGHT_LIMITS["time_budget"],
+    memory_budget=PREFLIGHT_LIMITS["memory_budget"]
+)
+
 # Configure allowed extensions
 ALLOWED_EXTENSIONS = {"pdf"}
 
 # Configure OpenAI API key
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
+# Configure an optional gazetteer of known entities (see "pdf-pii-redactor
+# gazetteer compile"), memory-mapped once and shared by the redactors
+GAZETTEER_PATH = os.environ.get("GAZETTEER_PATH")
+GAZETTEER_MASK = os.environ.get("GAZETTEER_MASK", "").lower() in ("1", "true", "yes")
+GAZETTEER = None
+
+# Adapt the LLM requests in flight of each worker to the latency, throttling
+# and errors observed (ADAPTIVE_CONCURRENCY), up to MAX_CONCURRENT_REQUESTS
+ADAPTIVE_CONCURRENCY = os.environ.get("ADAPTIVE_CONCURRENCY", "").lower() in ("1", "true", "yes")
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("MAX_CONCURRENT_REQUESTS", 8))
+
+# Models uploads may ask for (the default plus ALLOWED_MODELS, comma-separated);
+# each one keeps a redactor per worker, so clients cannot create more
+DEFAULT_MODEL = "gpt-4o"
+ALLOWED_MODELS = {DEFAULT_MODEL} | {model.strip() for model in
+                                   os.environ.get("ALLOWED_MODELS", "gpt-3.5-turbo").split(",") if model.strip()}
+
+# Redactors by model, shared by the requests of a process (and created before
+# forking by preload())
+REDACTORS = {}
+REDACTORS_LOCK = threading.Lock()
+
+
+def get_gazetteer():
+    """Return the configured gazetteer, loading it on first use, or None."""
+    global GAZETTEER
+    if GAZETTEER is None and GAZETTEER_PATH:
+        GAZETTEER = Gazetteer(GAZETTEER_PATH)
+    return GAZETTEER
+
+
+def get_redactor(model):
+    """
+    Return the shared redactor of a model, creating it on first use.
+    
+    Raises:
+        ValueError: If the model is not in ALLOWED_MODELS
+    """
+    if model not in ALLOWED_MODELS:
+        raise ValueError(f"Model not allowed: {model}")
+    with REDACTORS_LOCK:
+        if model not in REDACTORS:
+            REDACTORS[model] = PDFRedactor(openai_api_key=OPENAI_API_KEY, model=model,
+                                           gazetteer=get_gazetteer(), gazetteer_mask=GAZETTEER_MASK,
+                                           max_concurrent_requests=MAX_CONCURRENT_REQUESTS,
+                                           adaptive_concurrency=ADAPTIVE_CONCURRENCY)
+        return REDACTORS[model]
+
+
+def redact_in_slow_lane(model, input_path, output_path):
+    """Redact an upload in a slow lane child process, with a redactor of the child."""
+    return get_redactor(model).redact_pdf(input_path, output_path)
+
+
+def preload():
+    """
+    Load what every request needs before the server forks its workers.
+    
+    Workers then share the loaded modules, the language profiles, the
+    gazetteer and the default redactor instead of each loading them on its
+    first request.
+    """
+    from langdetect.detector_factory import init_factory
+    
+    init_factory()
+    get_redactor(DEFAULT_MODEL)
+
+
+def redactor_gazetteer_key(redactor):
+    """Return the result store key options of a redactor's gazetteer; none without one."""
+    gazetteer = getattr(redactor, "gazetteer", None)
+    return [gazetteer.fingerprint, redactor.gazetteer_mask] if gazetteer is not None else []
+
+
+def record_upload(filename, model, content_hash, stats=None, status="ok", error=None):
+    """Record an upload in the audit store, if one is configured."""
+    if AUDIT_STORE is not None:
+        AUDIT_STORE.record(filename, stats, model=model, sha256=content_hash, status=status, error=error)
+
+
+def close_audit_store():
+    """Write the uploads still queued for the audit store."""
+    if AUDIT_STORE is not None:
+        AUDIT_STORE.close()
+
 
 def allowed_file(filename):
     """Check if the file has an allowed extension."""
@@ -61,6 +172,12 @@ def index():
             flash("No selected file")
             return redirect(request.url)
         
+        # Get model from form
+        model = request.form.get("model", DEFAULT_MODEL)
+        if model not in ALLOWED_MODELS:
+            flash("Model not allowed")
+            return redirect(request.url)
+        
         if file and allowed_file(file.filename):
             # Generate a unique filename
             filename = secure_filename(file.filename)
@@ -77,22 +194,47 @@ def index():
                 flash("Invalid PDF file")
                 return redirect(request.url)
             
-            # Get model from form
-            model = request.form.get("model", "gpt-4o")
+            # Reject pathological documents before any work is done on them
+            report = preflight(input_path, PREFLIGHT_LIMITS)
+            if report["lane"] == "reject":
+                os.unlink(input_path)
+                flash(f"PDF rejected: {'; '.join(report['reasons'])}")
+                return redirect(request.url)
             
-            # Process the PDF
+            content_hash = None
             try:
-                redactor = PDFRedactor(openai_api_key=OPENAI_API_KEY, model=model)
-                stats = redactor.redact_pdf(input_path, output_path)
+                redactor = get_redactor(model)
                 
-                # Clean up the input file
+                # Identical uploads with the same model and prompt share one result
+                content_hash = file_sha256(input_path)
+                key = ResultStore.make_key(content_hash, model,
+                                           getattr(redactor.pii_detector, "prompt_version", None),
+                                           *redactor_gazetteer_key(redactor))
+                cached = RESULT_STORE.get(key)
+                if cached is not None:
+                    os.unlink(input_path)
+                    record_upload(filename, model, content_hash, cached["stats"], status="cached")
+                    return redirect(url_for("download", filename=f"{key}_redacted_{filename}",
+                                            redacted_items=cached["stats"].get("redacted_items", 0)))
+                
+                # Process the PDF
+                if report["lane"] == "slow":
+                    stats = SLOW_LANE.run(redact_in_slow_lane, model, input_path, output_path)
+                else:
+                    stats = redactor.redact_pdf(input_path, output_path)
+                
+                # Clean up the input file and keep the result
                 os.unlink(input_path)
+                RESULT_STORE.put(key, output_path, stats)
+                record_upload(filename, model, content_hash, stats)
                 
                 # Redirect to download page
-                return redirect(url_for("download", filename=f"{unique_id}_redacted_{filename}", 
+                return redirect(url_for("download", filename=f"{key}_redacted_{filename}", 
                                         redacted_items=stats["redacted_items"]))
                 
             except Exception as e:
+                record_upload(filename, model, content_hash, status="error", error=str(e))
+                
                 # Clean up files in case of error
                 if os.path.exists(input_path):
                     os.unlink(input_path)
@@ -114,13 +256,23 @@ def download(filename):
     return render_template("download.html", filename=filename)
 
 
+def stored_result_path(filename):
+    """
+    Return the path of the stored result named by a download filename.
+    
+    Download filenames have the form "<key>_redacted_<original name>".
+    """
+    result = RESULT_STORE.get(filename.split("_", 1)[0])
+    return result["path"] if result else None
+
+
 @app.route("/preview_file/<filename>")
 def preview_file(filename):
     """Serve the redacted file for preview in the browser."""
-    file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+    file_path = stored_result_path(filename)
     
     # Check if file exists
-    if not os.path.exists(file_path):
+    if file_path is None:
         flash("File not found")
         return redirect(url_for("index"))
     
@@ -131,46 +283,48 @@ def preview_file(filename):
 @app.route("/get_file/<filename>")
 def get_file(filename):
     """Serve the redacted file."""
-    file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+    file_path = stored_result_path(filename)
     
     # Check if file exists
-    if not os.path.exists(file_path):
+    if file_path is None:
         flash("File not found")
         return redirect(url_for("index"))
     
-    # Serve the file
-    response = send_file(file_path, as_attachment=True, download_name=filename.split("_", 2)[2])
-    
-    # Store the file path in the response headers for cleanup
-    response.headers.add('X-File-To-Remove', file_path)
-    
-    return response
+    # Serve the file; it stays in the result store until evicted
+    return send_file(file_path, as_attachment=True, download_name=filename.split("_", 2)[2])
 
 
-@app.after_request
-def cleanup_files(response):
-    """Remove temporary files after response is sent."""
-    file_to_remove = response.headers.get('X-File-To-Remove')
-    if file_to_remove:
-        # Remove the custom header before sending response
-        response.headers.remove('X-File-To-Remove')
-        
-        # Schedule file for deletion
-        @response.call_on_close
-        def remove_file():
-            try:
-                if os.path.exists(file_to_remove):
-                    os.unlink(file_to_remove)
-                    app.logger.info(f"Removed file: {file_to_remove}")
-            except Exception as e:
-                app.logger.error(f"Error removing file: {str(e)}")
+def run_web_app(host=None, port=None, debug=False):
+    """
+    Run the web application.
     
-    return response
-
-
-def run_web_app(host="0.0.0.0", port=5000, debug=False):
-    """Run the web application."""
-    app.run(host=host, port=port, debug=debug)
+    With debug, runs Flask's development server. Otherwise runs the
+    pre-forking server, configured by the environment: WEB_HOST, WEB_PORT,
+    WEB_WORKERS (default: number of CPUs), WEB_THREADS (requests per worker),
+    WEB_TIMEOUT (seconds a request may take before its worker is restarted)
+    and WEB_GRACEFUL_TIMEOUT (seconds to finish requests when stopping).
+    Each worker writes its queued audit records before exiting.
+    """
+    host = host or os.environ.get("WEB_HOST", "0.0.0.0")
+    port = port or int(os.environ.get("WEB_PORT", 5000))
+    if debug:
+        try:
+            app.run(host=host, port=port, debug=debug)
+        finally:
+            close_audit_store()
+        return
+    
+    workers = os.environ.get("WEB_WORKERS")
+    server = PreforkServer(
+        app, host=host, port=port,
+        workers=int(workers) if workers else None,
+        threads=int(os.environ.get("WEB_THREADS", DEFAULT_THREADS)),
+        timeout=float(os.environ.get("WEB_TIMEOUT", DEFAULT_TIMEOUT)),
+        graceful_timeout=float(os.environ.get("WEB_GRACEFUL_TIMEOUT", DEFAULT_GRACEFUL_TIMEOUT)),
+        preload=preload,
+        worker_exit=close_audit_store
+    )
+    server.run()
 
 
 if __name__ == "__main__":
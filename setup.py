@@ -12,6 +12,9 @@ setup(
         "tqdm",
         "flask",
     ],
+    extras_require={
+        "ocr": ["pytesseract", "Pillow"],
+    },
     entry_points={
         "console_scripts": [
             "pdf-pii-redactor=pdf_pii_redactor.main:main",
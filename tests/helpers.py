@@ -0,0 +1,42 @@
+"""
+Shared stand-ins for the tests.
+"""
+
+import re
+
+
+class NameDetector:
+    """Local detector stand-in that reports the values it is given and records the texts it sees.
+
+    Accepts and ignores the keyword arguments of PIIDetector, so that it can replace it.
+
+    Args:
+        names: Names reported on the pages that contain them.
+        emails: Email addresses reported on the pages that contain them.
+        pattern: Regular expression whose matches are also reported as names.
+        fail_on: Text that makes detection fail as if the API were unreachable.
+        fail_after: Number of pages after which detection fails.
+    """
+
+    model = "fake"
+
+    def __init__(self, names=("John Doe",), emails=(), pattern=None, fail_on=None, fail_after=None, **kwargs):
+        self.names = names
+        self.emails = emails
+        self.pattern = re.compile(pattern) if pattern else None
+        self.fail_on = fail_on
+        self.fail_after = fail_after
+        self.pages = []
+
+    def detect_pii(self, text, language="en"):
+        if self.fail_on is not None and self.fail_on in text:
+            raise ConnectionError("Network unreachable")
+        if self.fail_after is not None and len(self.pages) >= self.fail_after:
+            raise ConnectionError("Network unreachable")
+        self.pages.append(text)
+
+        pii = [{"type": "name", "value": name} for name in self.names if name in text]
+        pii += [{"type": "email", "value": email} for email in self.emails if email in text]
+        if self.pattern:
+            pii += [{"type": "name", "value": match.group()} for match in self.pattern.finditer(text)]
+        return pii
@@ -0,0 +1,205 @@
+"""
+Tests for the audit store.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from click.testing import CliRunner
+
+from pdf_pii_redactor.audit import AuditStore, parse_time
+from pdf_pii_redactor.main import main
+from helpers import NameDetector
+
+
+def make_stats(pii_types, pages=1):
+    """Return statistics shaped like those of PDFRedactor.redact_pdf, with the PII on the first page."""
+    return {
+        "pages_processed": pages, "language": "en", "redacted_items": sum(pii_types.values()),
+        "pii_types": pii_types,
+        "page_stats": [{"page": page, "pii_types": pii_types if page == 0 else {}} for page in range(pages)],
+        "timings": {"elapsed": 0.5, "detection": {0: 0.25}}
+    }
+
+
+class TestAuditStore(unittest.TestCase):
+    """Test cases for AuditStore."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = AuditStore(os.path.join(self.temp_dir.name, "audit", "audit.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def test_record_and_query(self):
+        """Test that runs are found by type, source, date and status."""
+        self.store.record("/data/a.pdf", make_stats({"credit_card": 2, "name": 1}, pages=2), model="gpt-4o")
+        self.store.record("/data/b.pdf", make_stats({"name": 3}))
+        self.store.record("/other/c.pdf", status="error", error="Network unreachable")
+        self.store.flush()
+
+        documents = self.store.query(pii_type="credit_card", pages=True)
+        self.assertEqual(len(documents), 1)
+        document = documents[0]
+        self.assertEqual(document["source"], "/data/a.pdf")
+        self.assertEqual(document["model"], "gpt-4o")
+        self.assertEqual(document["pii_types"], {"credit_card": 2, "name": 1})
+        self.assertEqual(document["elapsed"], 0.5)
+        self.assertEqual(document["redacted_items"], 3)
+        self.assertEqual(document["stats"], {"pages_processed": 2, "language": "en", "redacted_items": 3})
+        self.assertEqual(document["pages"], [
+            {"page": 0, "pii_types": {"credit_card": 2, "name": 1}, "detection_time": 0.25},
+            {"page": 1, "pii_types": {}, "detection_time": None}
+        ])
+
+        self.assertEqual([d["source"] for d in self.store.query(pii_type="name")], ["/data/b.pdf", "/data/a.pdf"])
+        self.assertEqual(len(self.store.query(source="/data/*")), 2)
+        self.assertEqual(len(self.store.query(source="/data/b.pdf")), 1)
+        self.assertEqual(self.store.query(status="error")[0]["error"], "Network unreachable")
+        self.assertEqual(len(self.store.query(since=time.time() - 60)), 3)
+        self.assertEqual(self.store.query(until=time.time() - 60), [])
+        self.assertEqual(len(self.store.query(limit=2)), 2)
+
+        self.assertEqual(self.store.totals(), {"credit_card": {"documents": 1, "values": 2},
+                                               "name": {"documents": 2, "values": 4}})
+
+    def test_type_queries_use_the_index(self):
+        """Test that queries by type and by source do not scan the documents table."""
+        connection = sqlite3.connect(self.store.path)
+        plan = " ".join(row[-1] for row in connection.execute(
+            "EXPLAIN QUERY PLAN SELECT document_id FROM pii_counts WHERE pii_type = ?", ("name",)))
+        self.assertIn("USING PRIMARY KEY", plan)
+        plan = " ".join(row[-1] for row in connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM documents WHERE source GLOB ?", ("/data/*",)))
+        self.assertIn("documents_source", plan)
+        connection.close()
+
+    def test_batched_writes(self):
+        """Test that runs recorded from several threads are all written, in batches."""
+        transactions = []
+        write = AuditStore._write
+
+        def counting_write(store, connection, runs):
+            transactions.append(len(runs))
+            time.sleep(0.01)
+            write(store, connection, runs)
+
+        with mock.patch.object(AuditStore, "_write", counting_write):
+            threads = [threading.Thread(target=lambda: [self.store.record(f"/data/{i}.pdf", make_stats({"name": 1}))
+                                                        for i in range(100)]) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.store.close()
+
+        self.assertEqual(sum(transactions), 400)
+        self.assertLess(len(transactions), 400)
+        self.assertEqual(self.store.written, 400)
+        self.assertEqual(self.store.totals()["name"], {"documents": 400, "values": 400})
+
+    def test_json_round_trip(self):
+        """Test that statistics returned by the daemon, with string page keys, are recorded."""
+        stats = json.loads(json.dumps(make_stats({"email": 1})))
+        self.store.record("/data/a.pdf", stats)
+        self.store.flush()
+        self.assertEqual(self.store.query(pages=True)[0]["pages"][0]["detection_time"], 0.25)
+
+    def test_audited(self):
+        """Test that wrapped runs are recorded, failed ones included."""
+        def process(input_path, output_path):
+            if "bad" in input_path:
+                raise ValueError("Broken PDF")
+            return make_stats({"name": 1})
+
+        audited = self.store.audited(process, model="gpt-4o")
+        self.assertEqual(audited("/data/good.pdf", "/tmp/out.pdf")["redacted_items"], 1)
+        with self.assertRaisesRegex(ValueError, "Broken PDF"):
+            audited("/data/bad.pdf", "/tmp/out.pdf")
+        self.store.flush()
+
+        documents = self.store.query()
+        self.assertEqual([(d["source"], d["status"]) for d in documents],
+                         [("/data/bad.pdf", "error"), ("/data/good.pdf", "ok")])
+
+
+class TestAuditCommands(unittest.TestCase):
+    """Test cases for recording runs from the command line and querying them."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.audit_db = os.path.join(self.temp_dir.name, "audit.db")
+        self.input_path = os.path.join(self.temp_dir.name, "input.pdf")
+        self.output_path = os.path.join(self.temp_dir.name, "output.pdf")
+
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Statement for John Doe, john@example.com.")
+        doc.new_page().insert_text((50, 50), "Nothing to see here.")
+        doc.save(self.input_path)
+        doc.close()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _invoke(self, *args):
+        return CliRunner().invoke(main, list(args))
+
+    def test_redact_and_query(self):
+        """Test that in-process runs are recorded and listed by the query command."""
+        with mock.patch("pdf_pii_redactor.redactor.PIIDetector",
+                        lambda **kwargs: NameDetector(emails=("john@example.com",), fail_on="error")), \
+                mock.patch("pdf_pii_redactor.redactor.LanguageDetector.detect_document_language",
+                           return_value="en"):
+            result = self._invoke("redact", self.input_path, self.output_path, "--openai-api-key", "test",
+                                  "--in-process", "--audit-db", self.audit_db)
+            self.assertEqual(result.exit_code, 0, result.output)
+
+            error_path = os.path.join(self.temp_dir.name, "error.pdf")
+            doc = fitz.open()
+            doc.new_page().insert_text((50, 50), "This page causes an error.")
+            doc.save(error_path)
+            doc.close()
+            result = self._invoke("redact", error_path, self.output_path, "--openai-api-key", "test",
+                                  "--in-process", "--audit-db", self.audit_db)
+            self.assertEqual(result.exit_code, 1)
+
+        result = self._invoke("audit", "query", self.audit_db, "--type", "email", "--pages")
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn(self.input_path, result.output)
+        self.assertIn("pages: 2, email: 1, name: 1", result.output)
+        self.assertIn("page 1: email: 1, name: 1", result.output)
+        self.assertNotIn("error.pdf", result.output)
+
+        result = self._invoke("audit", "query", self.audit_db, "--status", "error", "--json")
+        document = json.loads(result.output)
+        self.assertEqual(document["source"], error_path)
+        self.assertEqual(document["error"], "Network unreachable")
+
+        result = self._invoke("audit", "query", self.audit_db, "--totals", "--since", "2000-01-01")
+        self.assertRegex(result.output, r"email\s+1\s+1")
+
+        result = self._invoke("audit", "query", self.audit_db, "--until", "2000-01-01")
+        self.assertEqual(result.output, "")
+
+        result = self._invoke("audit", "query", self.audit_db, "--since", "last week")
+        self.assertEqual(result.exit_code, 2)
+
+    def test_parse_time(self):
+        """Test that dates are read as local midnight."""
+        self.assertEqual(parse_time("2026-10-01"), time.mktime((2026, 10, 1, 0, 0, 0, 0, 0, -1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
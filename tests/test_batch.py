@@ -0,0 +1,147 @@
+"""
+Tests for the shared-filesystem batch coordination.
+"""
+
+import os
+import time
+import uuid
+import tempfile
+import unittest
+import multiprocessing
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.batch import BatchQueue, BatchWorker, create_manifest
+
+
+def copy_and_record(input_path, output_path):
+    """Stand-in for PDFRedactor.redact_pdf that records every call."""
+    calls_dir = os.path.join(os.path.dirname(os.path.dirname(output_path)), "calls")
+    name = os.path.basename(input_path)
+    open(os.path.join(calls_dir, f"{name}.{uuid.uuid4().hex}"), "w").close()
+    time.sleep(0.01)
+    with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+        dst.write(src.read())
+    return {"redacted_items": 0}
+
+
+def run_worker(queue_dir, worker_id):
+    """Entry point of the worker processes."""
+    queue = BatchQueue(queue_dir, lease_timeout=5.0)
+    BatchWorker(queue, copy_and_record, worker_id=worker_id, poll_interval=0.05).run()
+
+
+class TestBatch(unittest.TestCase):
+    """Test cases for the batch queue and workers."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = self.temp_dir.name
+        self.queue_dir = os.path.join(root, "queue")
+        self.output_dir = os.path.join(root, "output")
+        os.makedirs(os.path.join(root, "calls"))
+        os.makedirs(os.path.join(root, "input"))
+
+        self.inputs = []
+        for i in range(30):
+            path = os.path.join(root, "input", f"doc{i}.pdf")
+            with open(path, "wb") as f:
+                f.write(b"%%PDF-1.4 document %d" % i)
+            self.inputs.append(path)
+
+        create_manifest(self.queue_dir, self.inputs, self.output_dir)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.temp_dir.cleanup()
+
+    def test_workers_share_queue_without_double_processing(self):
+        """Test several worker processes against one queue directory."""
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=run_worker, args=(self.queue_dir, f"worker-{i}"))
+            for i in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            self.assertEqual(worker.exitcode, 0)
+
+        calls = os.listdir(os.path.join(self.temp_dir.name, "calls"))
+        self.assertEqual(len(calls), len(self.inputs))
+        self.assertEqual(len({call.split(".pdf")[0] for call in calls}), len(self.inputs))
+
+        status = BatchQueue(self.queue_dir).status()
+        self.assertEqual(status["done"], len(self.inputs))
+        self.assertEqual(status["leased"], 0)
+        self.assertEqual(sorted(os.listdir(self.output_dir)),
+                         sorted(f"doc{i}-redacted.pdf" for i in range(30)))
+
+    def test_stale_lease_is_reclaimed(self):
+        """Test that a lease without heartbeat is reclaimed after the timeout."""
+        queue = BatchQueue(self.queue_dir, lease_timeout=60)
+        first = queue.claim("dead-worker")
+        self.assertIsNotNone(first)
+
+        # A fresh lease is not reclaimed
+        other = BatchQueue(self.queue_dir, lease_timeout=60)
+        self.assertNotEqual(other.claim("live-worker")["id"], first["id"])
+
+        # Age the first lease past the timeout
+        lease_path = os.path.join(self.queue_dir, "leases", f"{first['id']}.lease")
+        old = time.time() - 120
+        os.utime(lease_path, (old, old))
+
+        reclaimed = other.claim("live-worker")
+        self.assertEqual(reclaimed["id"], first["id"])
+        self.assertFalse(queue.heartbeat(first["id"], first["token"]))
+        self.assertTrue(other.heartbeat(reclaimed["id"], reclaimed["token"]))
+
+    def test_unwritten_lease_is_reclaimed(self):
+        """Test that an empty lease left by a worker killed while creating it is reclaimed after the timeout."""
+        queue = BatchQueue(self.queue_dir, lease_timeout=60)
+        item_id = queue.items[0]["id"]
+        lease_path = os.path.join(self.queue_dir, "leases", f"{item_id}.lease")
+        open(lease_path, "w").close()
+        self.assertNotEqual(queue.claim("live-worker")["id"], item_id)
+
+        old = time.time() - 120
+        os.utime(lease_path, (old, old))
+        self.assertEqual(queue.claim("live-worker")["id"], item_id)
+
+    def test_output_of_a_lost_lease_is_discarded(self):
+        """Test that a worker whose lease was reclaimed during processing publishes nothing."""
+        queue = BatchQueue(self.queue_dir, lease_timeout=60)
+        item = queue.claim("slow-worker")
+        item_id = item["id"]
+        lease_path = os.path.join(self.queue_dir, "leases", f"{item_id}.lease")
+
+        def process_and_lose_lease(input_path, output_path):
+            # Another worker judges the lease stale and reclaims it
+            old = time.time() - 120
+            os.utime(lease_path, (old, old))
+            self.assertEqual(BatchQueue(self.queue_dir, lease_timeout=60).claim("other-worker")["id"], item_id)
+            return copy_and_record(input_path, output_path)
+
+        worker = BatchWorker(queue, process_and_lose_lease, worker_id="slow-worker")
+        self.assertIsNone(worker.run_item(item))
+        self.assertFalse(os.path.exists(queue.resolve(item["output"])))
+        self.assertFalse(os.path.exists(os.path.join(self.queue_dir, "done", f"{item_id}.json")))
+        self.assertEqual(queue.status()["leased"], 1)
+
+    def test_finished_items_are_not_claimed(self):
+        """Test that completed items are skipped, so re-running a worker is a no-op."""
+        queue = BatchQueue(self.queue_dir, lease_timeout=5.0)
+        counts = BatchWorker(queue, copy_and_record, poll_interval=0.05).run()
+        self.assertEqual(counts["completed"], len(self.inputs))
+
+        self.assertIsNone(queue.claim("another-worker"))
+        counts = BatchWorker(queue, copy_and_record, poll_interval=0.05).run()
+        self.assertEqual(counts["completed"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
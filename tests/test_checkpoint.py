@@ -0,0 +1,174 @@
+"""
+Tests for page selection and checkpointed, resumable runs.
+"""
+
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from click.testing import CliRunner
+
+from pdf_pii_redactor.checkpoint import CheckpointJournal, document_hash
+from pdf_pii_redactor.redactor import PDFRedactor
+from pdf_pii_redactor.utils import parse_page_ranges
+from pdf_pii_redactor.main import main
+from helpers import NameDetector
+
+NAMES = ["John Doe", "Jane Roe", "Jim Poe", "Joan Low"]
+
+
+class TestPageRanges(unittest.TestCase):
+    """Test cases for parse_page_ranges."""
+
+    def test_parse(self):
+        """Test single pages, closed and open ranges."""
+        self.assertEqual(parse_page_ranges("1-3,5", 10), [0, 1, 2, 4])
+        self.assertEqual(parse_page_ranges("8-, 2", 10), [1, 7, 8, 9])
+        self.assertEqual(parse_page_ranges("-2", 10), [0, 1])
+        self.assertEqual(parse_page_ranges("3,3,2-3", 10), [1, 2])
+
+    def test_invalid(self):
+        """Test malformed and out-of-range selections."""
+        for spec in ("0", "11", "5-3", "a-b", "", " , "):
+            with self.assertRaises(ValueError, msg=spec):
+                parse_page_ranges(spec, 10)
+
+
+class TestCheckpoint(unittest.TestCase):
+    """Test cases for page selection and checkpoint journals with PDFRedactor."""
+
+    def setUp(self):
+        """Create a document with one name per page."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "input.pdf")
+        self.output_path = os.path.join(self.temp_dir.name, "output.pdf")
+        self.journal_path = os.path.join(self.temp_dir.name, "input.journal")
+
+        doc = fitz.open()
+        for name in NAMES:
+            doc.new_page().insert_text((50, 50), f"Statement for {name}.")
+        doc.save(self.input_path)
+        doc.close()
+
+    def tearDown(self):
+        """Clean up the test files."""
+        self.temp_dir.cleanup()
+
+    def _redactor(self, detector):
+        redactor = PDFRedactor(pii_detector=detector)
+        redactor.language_detector.detect_document_language = mock.Mock(return_value="en")
+        return redactor
+
+    def _output_texts(self):
+        doc = fitz.open(self.output_path)
+        texts = [page.get_text() for page in doc]
+        doc.close()
+        return texts
+
+    def test_page_selection(self):
+        """Test that only the selected pages are detected and redacted."""
+        detector = NameDetector(names=NAMES)
+        stats = self._redactor(detector).redact_pdf(self.input_path, self.output_path, pages=[1, 3])
+
+        self.assertEqual(len(detector.pages), 2)
+        self.assertEqual(stats["pages_processed"], 2)
+        texts = self._output_texts()
+        self.assertEqual(len(texts), 4)
+        self.assertIn("John Doe", texts[0])
+        self.assertNotIn("Jane Roe", texts[1])
+        self.assertIn("Jim Poe", texts[2])
+        self.assertNotIn("Joan Low", texts[3])
+
+    def test_resume_after_failure(self):
+        """Test that a failed run resumes after its last completed page without detecting it again."""
+        with self.assertRaises(ConnectionError):
+            self._redactor(NameDetector(names=NAMES, fail_after=2)).redact_pdf(self.input_path, self.output_path,
+                                                                  checkpoint=self.journal_path)
+        self.assertFalse(os.path.exists(self.output_path))
+
+        with open(self.journal_path, encoding="utf-8") as journal_file:
+            records = [json.loads(line) for line in journal_file]
+        self.assertEqual(records[0]["language"], "en")
+        self.assertEqual([record["page"] for record in records[1:]], [0, 1])
+        self.assertTrue(records[1]["spans"][0]["rects"])
+
+        detector = NameDetector(names=NAMES)
+        redactor = self._redactor(detector)
+        stats = redactor.redact_pdf(self.input_path, self.output_path, checkpoint=self.journal_path)
+
+        self.assertEqual(len(detector.pages), 2)
+        self.assertIn("Jim Poe", detector.pages[0])
+        redactor.language_detector.detect_document_language.assert_not_called()
+        self.assertEqual(stats["checkpoint"], {"path": self.journal_path, "pages_resumed": 2, "pages_detected": 2})
+        self.assertEqual(stats["pages_processed"], 4)
+        self.assertEqual(stats["redacted_items"], 4)
+        for text, name in zip(self._output_texts(), NAMES):
+            self.assertNotIn(name, text)
+
+        # A completed journal goes straight to applying the redactions
+        detector = NameDetector(names=NAMES)
+        stats = self._redactor(detector).redact_pdf(self.input_path, self.output_path, checkpoint=self.journal_path)
+        self.assertEqual(detector.pages, [])
+        self.assertEqual(stats["redacted_items"], 4)
+
+    def test_torn_last_line(self):
+        """Test that a partly written last line is ignored and the page detected again."""
+        self._redactor(NameDetector(names=NAMES)).redact_pdf(self.input_path, self.output_path, pages=[0, 1],
+                                                  checkpoint=self.journal_path)
+        with open(self.journal_path, "rb+") as journal_file:
+            journal_file.seek(-10, os.SEEK_END)
+            journal_file.truncate()
+
+        detector = NameDetector(names=NAMES)
+        stats = self._redactor(detector).redact_pdf(self.input_path, self.output_path,
+                                                    checkpoint=self.journal_path)
+        self.assertEqual(stats["checkpoint"]["pages_resumed"], 1)
+        self.assertEqual(len(detector.pages), 3)
+
+        journal = CheckpointJournal(self.journal_path, document_hash(self.input_path),
+                                    self._redactor(NameDetector(names=NAMES))._checkpoint_options())
+        self.assertEqual(sorted(journal.load()["pages"]), [0, 1, 2, 3])
+        journal.close()
+
+    def test_journal_of_other_options_is_not_resumed(self):
+        """Test that a journal written with another model starts over."""
+        self._redactor(NameDetector(names=NAMES)).redact_pdf(self.input_path, self.output_path, checkpoint=self.journal_path)
+
+        detector = NameDetector(names=NAMES)
+        detector.model = "other"
+        stats = self._redactor(detector).redact_pdf(self.input_path, self.output_path, checkpoint=self.journal_path)
+
+        self.assertEqual(stats["checkpoint"]["pages_resumed"], 0)
+        self.assertEqual(len(detector.pages), 4)
+
+    def test_cli(self):
+        """Test the --pages and --checkpoint options."""
+        runner = CliRunner()
+        with mock.patch("pdf_pii_redactor.redactor.PIIDetector", lambda **kwargs: NameDetector(names=NAMES)), \
+                mock.patch("pdf_pii_redactor.redactor.LanguageDetector.detect_document_language",
+                           return_value="en"):
+            result = runner.invoke(main, ["redact", self.input_path, self.output_path, "--openai-api-key", "test",
+                                          "--pages", "2-", "--checkpoint", self.journal_path])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("John Doe", self._output_texts()[0])
+            self.assertNotIn("Jane Roe", self._output_texts()[1])
+
+            result = runner.invoke(main, ["redact", self.input_path, self.output_path, "--openai-api-key", "test",
+                                          "--checkpoint", self.journal_path])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("Resumed 3 pages", result.output)
+
+            result = runner.invoke(main, ["redact", self.input_path, self.output_path, "--openai-api-key", "test",
+                                          "--pages", "7"])
+            self.assertEqual(result.exit_code, 2)
+            self.assertIn("outside pages 1-4", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,367 @@
+"""
+Tests for the adaptive concurrency limiter, including simulations against a fake LLM backend.
+"""
+
+import os
+import time
+import random
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.concurrency import AdaptiveLimiter, detection_outcome
+from pdf_pii_redactor.pii_detector import PIIDetector
+from pdf_pii_redactor.redactor import PDFRedactor
+
+
+class RateLimited(Exception):
+    """Stand-in for openai.RateLimitError."""
+
+    status_code = 429
+
+
+class FakeBackend:
+    """
+    Local LLM stand-in with a capacity.
+
+    Requests beyond the capacity are throttled at once. The others take a
+    random latency around `latency`, which grows with the load past half the
+    capacity, like a server that queues work.
+    """
+
+    def __init__(self, capacity, latency=0.004, seed=0):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.served = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def _admit(self):
+        with self._lock:
+            self.in_flight += 1
+            if self.in_flight > self.capacity:
+                self.in_flight -= 1
+                self.throttled += 1
+                raise RateLimited("Rate limit reached")
+            load = self.in_flight / (self.capacity / 2)
+            return self.latency * self._random.uniform(0.5, 1.5) * max(1.0, load)
+
+    def _finish(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.served += 1
+
+    def detect_pii(self, text, language="en"):
+        delay = self._admit()
+        try:
+            time.sleep(delay)
+        finally:
+            self._finish()
+        return [{"type": "name", "value": "John Doe"}]
+
+    async def detect_pii_async(self, text, language="en"):
+        delay = self._admit()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._finish()
+        return [{"type": "name", "value": "John Doe"}]
+
+
+def run_threads(limiter, backend, requests, threads=24, on_request=None):
+    """Send requests through the limiter from several threads; return the number that failed."""
+    counter = iter(range(requests))
+    lock = threading.Lock()
+    failures = []
+
+    def work():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            if on_request is not None:
+                on_request(index)
+            try:
+                limiter.call(lambda: backend.detect_pii("text"))
+            except RateLimited:
+                failures.append(index)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(failures)
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    """Test cases for the limit updates of AdaptiveLimiter."""
+
+    def _requests(self, limiter, count, outcome="ok", latency=0.1):
+        """Hold count slots at once, then report the same outcome for each."""
+        slots = []
+        managers = []
+        for _ in range(count):
+            manager = limiter.slot(timeout=1)
+            slots.append(manager.__enter__())
+            managers.append(manager)
+        for slot, manager in zip(slots, managers):
+            slot.observe(outcome, latency)
+            manager.__exit__(None, None, None)
+
+    def test_additive_increase(self):
+        """Test that the limit grows by about one per window of successful requests."""
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=6)
+        self._requests(limiter, 4)
+        self.assertLess(limiter.limit, 5)
+        self._requests(limiter, 4)
+        self.assertEqual(limiter.metrics()["limit"], 5)
+        for _ in range(10):
+            self._requests(limiter, limiter.metrics()["limit"])
+        self.assertEqual(limiter.limit, 6)
+
+    def test_unused_limit_does_not_grow(self):
+        """Test that requests that leave most of the limit unused do not raise it."""
+        limiter = AdaptiveLimiter(initial_limit=8)
+        for _ in range(20):
+            self._requests(limiter, 1)
+        self.assertEqual(limiter.limit, 8)
+
+    def test_throttling_decreases_once_per_window(self):
+        """Test that a burst of 429s from requests in flight together halves the limit once."""
+        limiter = AdaptiveLimiter(initial_limit=8)
+        self._requests(limiter, 8, outcome="throttled")
+        self.assertEqual(limiter.metrics()["limit"], 4)
+        self.assertEqual(limiter.throttled, 8)
+        self.assertEqual(limiter.decreases, 1)
+
+        self._requests(limiter, 1, outcome="throttled")
+        self.assertEqual(limiter.metrics()["limit"], 2)
+
+    def test_error_rate(self):
+        """Test that occasional errors are tolerated and a high error rate decreases the limit."""
+        limiter = AdaptiveLimiter(initial_limit=8, max_limit=8)
+        for _ in range(5):
+            self._requests(limiter, 4)
+        self._requests(limiter, 1, outcome="error")
+        self.assertEqual(limiter.limit, 8)
+        for _ in range(2):
+            self._requests(limiter, 1, outcome="error")
+        self.assertEqual(limiter.metrics()["limit"], 4)
+        self.assertGreater(limiter.metrics()["error_rate"], 0.2)
+
+    def test_latency_increase(self):
+        """Test that a latency rise past the tolerance lowers the limit."""
+        limiter = AdaptiveLimiter(initial_limit=8, max_limit=8)
+        for _ in range(5):
+            self._requests(limiter, 8, latency=0.1)
+        self.assertEqual(limiter.limit, 8)
+        for _ in range(3):
+            self._requests(limiter, 1, latency=0.5)
+        self.assertEqual(limiter.metrics()["limit"], 7)
+
+    def test_exceptions(self):
+        """Test that exceptions are reported from the slot and that throttled calls are retried."""
+        limiter = AdaptiveLimiter(initial_limit=4, retry_delay=0)
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise RateLimited("Rate limit reached")
+            return "done"
+
+        self.assertEqual(limiter.call(flaky), "done")
+        self.assertEqual((limiter.throttled, limiter.retries), (2, 2))
+
+        with self.assertRaises(ValueError):
+            limiter.call(lambda: int("not a number"))
+        self.assertEqual(limiter.errors, 1)
+
+        limiter.max_retries = 1
+        with self.assertRaises(RateLimited):
+            limiter.call(lambda: (_ for _ in ()).throw(RateLimited("Rate limit reached")))
+        self.assertEqual(limiter.metrics()["in_flight"], 0)
+
+    def test_queue_depth_and_timeout(self):
+        """Test that waiting threads are counted and give up after their timeout."""
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+        with limiter.slot():
+            waiter = threading.Thread(target=lambda: self.assertRaises(TimeoutError,
+                                                                       limiter.slot(timeout=0.2).__enter__))
+            waiter.start()
+            time.sleep(0.05)
+            self.assertEqual(limiter.metrics()["queue_depth"], 1)
+            waiter.join()
+        self.assertEqual(limiter.metrics(), dict(limiter.metrics(), in_flight=0, queue_depth=0))
+
+    def test_detection_outcome(self):
+        """Test the outcome of detector results."""
+        self.assertEqual(detection_outcome({"pii": []}), "ok")
+        self.assertEqual(detection_outcome({"pii": [], "ok": False, "throttled": True}), "throttled")
+        self.assertEqual(detection_outcome({"pii": [], "ok": False, "throttled": False}), "error")
+
+
+class TestSimulation(unittest.TestCase):
+    """Simulations against a fake backend with variable latency and injected 429s."""
+
+    def test_converges_below_the_capacity(self):
+        """Test that the limit settles near the capacity with few 429s, unlike a fixed high limit."""
+        backend = FakeBackend(capacity=8)
+        limiter = AdaptiveLimiter(initial_limit=2, max_limit=32, retry_delay=0.002, max_retries=5)
+        depths = []
+        failures = run_threads(limiter, backend, 600,
+                               on_request=lambda index: depths.append(limiter.metrics()["queue_depth"]))
+
+        metrics = limiter.metrics()
+        self.assertEqual(failures, 0)
+        self.assertEqual(backend.served, 600)
+        self.assertGreaterEqual(metrics["limit"], 2)
+        self.assertLessEqual(metrics["limit"], 9)
+        self.assertLess(backend.throttled, 60)
+        self.assertGreater(max(depths), 0)
+        self.assertEqual((metrics["in_flight"], metrics["queue_depth"]), (0, 0))
+
+        fixed_backend = FakeBackend(capacity=8)
+        fixed = AdaptiveLimiter(initial_limit=24, min_limit=24, max_limit=24, retry_delay=0.002, max_retries=5)
+        run_threads(fixed, fixed_backend, 600)
+        self.assertGreater(fixed_backend.throttled, 3 * backend.throttled)
+
+    def test_follows_a_capacity_drop(self):
+        """Test that the limit grows while the backend has room and follows it down when it shrinks."""
+        backend = FakeBackend(capacity=16, seed=1)
+        limiter = AdaptiveLimiter(initial_limit=2, max_limit=32, retry_delay=0.002, max_retries=8)
+        peaks = []
+
+        def on_request(index):
+            if index == 400:
+                peaks.append(limiter.metrics()["limit"])
+                # Time of day changes: the backend now serves a quarter as many requests
+                backend.capacity = 4
+
+        failures = run_threads(limiter, backend, 800, on_request=on_request)
+        self.assertEqual(failures, 0)
+        self.assertGreaterEqual(peaks[0], 6)
+        self.assertLessEqual(limiter.metrics()["limit"], 5)
+
+    def test_async_tasks(self):
+        """Test that tasks on an event loop share the limit and all complete."""
+        backend = FakeBackend(capacity=6, seed=2)
+        limiter = AdaptiveLimiter(initial_limit=2, max_limit=32, retry_delay=0.002, max_retries=5)
+
+        async def main():
+            return await asyncio.gather(*(
+                limiter.call_async(lambda: backend.detect_pii_async("text")) for _ in range(400)
+            ))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(results), 400)
+        self.assertLessEqual(limiter.metrics()["limit"], 7)
+        self.assertLess(backend.throttled, 60)
+        self.assertEqual(limiter.metrics()["in_flight"], 0)
+
+    def test_cancelled_tasks_free_their_slots(self):
+        """Test that cancelling waiting and running tasks leaves no slot taken."""
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+
+        async def hold():
+            async with limiter.slot_async():
+                await asyncio.sleep(10)
+
+        async def main():
+            tasks = [asyncio.ensure_future(hold()) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            self.assertEqual(limiter.metrics()["queue_depth"], 2)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run(main())
+        self.assertEqual(limiter.metrics()["in_flight"], 0)
+        self.assertEqual(limiter.metrics()["queue_depth"], 0)
+        self.assertEqual(limiter.errors, 0)
+
+
+class ThrottledOnceDetector:
+    """Detector stand-in that is throttled on its first request."""
+
+    model = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect_pii(self, text, language="en"):
+        self.calls += 1
+        if self.calls == 1:
+            raise RateLimited("Rate limit reached")
+        return [{"type": "name", "value": "John Doe"}] if "John Doe" in text else []
+
+
+class TestAdaptiveRedaction(unittest.TestCase):
+    """Test cases for the adaptive limiter in the redaction flow."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "input.pdf")
+        self.output_path = os.path.join(self.temp_dir.name, "output.pdf")
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Statement for John Doe.")
+        doc.save(self.input_path)
+        doc.close()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _redactor(self):
+        redactor = PDFRedactor(pii_detector=ThrottledOnceDetector(), adaptive_concurrency=True)
+        redactor.limiter.retry_delay = 0
+        redactor.language_detector.detect_document_language = mock.Mock(return_value="en")
+        return redactor
+
+    def _text(self):
+        doc = fitz.open(self.output_path)
+        text = doc[0].get_text()
+        doc.close()
+        return text
+
+    def test_throttled_page_is_retried(self):
+        """Test that a throttled page is detected on retry and the limiter state is reported."""
+        stats = self._redactor().redact_pdf(self.input_path, self.output_path)
+        self.assertEqual(stats["redacted_items"], 1)
+        self.assertNotIn("John Doe", self._text())
+        self.assertEqual(stats["concurrency"]["throttled"], 1)
+        self.assertEqual(stats["concurrency"]["retries"], 1)
+        self.assertIn("queue_depth", stats["concurrency"])
+
+    def test_throttled_page_is_retried_async(self):
+        """Test the same with the async API."""
+        stats = asyncio.run(self._redactor().redact_pdf_async(self.input_path, self.output_path))
+        self.assertEqual(stats["redacted_items"], 1)
+        self.assertEqual(stats["concurrency"]["retries"], 1)
+
+    def test_detector_reports_throttling(self):
+        """Test that PIIDetector marks results of 429 responses as throttled."""
+        detector = PIIDetector(api_key="test")
+        with mock.patch("openai.resources.chat.completions.Completions.create",
+                        side_effect=RateLimited("Rate limit reached")):
+            result = detector.analyze("My name is John Doe.")
+        self.assertFalse(result["ok"])
+        self.assertTrue(result["throttled"])
+        self.assertEqual(detection_outcome(result), "throttled")
+
+        with mock.patch("openai.resources.chat.completions.Completions.create",
+                        side_effect=ConnectionError("Network unreachable")):
+            self.assertEqual(detection_outcome(detector.analyze("My name is John Doe.")), "error")
+
+
+if __name__ == "__main__":
+    unittest.main()
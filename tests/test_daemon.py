@@ -0,0 +1,209 @@
+"""
+Tests for the daemon mode of the command-line interface.
+"""
+
+import os
+import socket
+import tempfile
+import threading
+import subprocess
+import unittest
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from click.testing import CliRunner
+
+from pdf_pii_redactor import main as main_module
+from pdf_pii_redactor import daemon as daemon_module
+from pdf_pii_redactor.daemon import DaemonUnavailable, RedactionDaemon, UntrustedSocket, submit
+from pdf_pii_redactor.main import main
+from pdf_pii_redactor.ocr import DEFAULT_DPI, OCR_ENGINES
+from pdf_pii_redactor.pdf_processor import EXTRACTION_PROFILES
+from pdf_pii_redactor.redactor import PDFRedactor
+from helpers import NameDetector
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "The daemon listens on a Unix domain socket")
+class TestDaemon(unittest.TestCase):
+    """Test cases for RedactionDaemon and the forwarding of CLI runs."""
+
+    def setUp(self):
+        """Create a document and start a daemon with a local detector."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.temp_dir.name, "daemon.sock")
+        self.input_path = os.path.join(self.temp_dir.name, "input.pdf")
+        self.output_path = os.path.join(self.temp_dir.name, "output.pdf")
+
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Statement for John Doe.")
+        doc.new_page().insert_text((50, 50), "Nothing to see here.")
+        doc.save(self.input_path)
+        doc.close()
+
+        self.factory_calls = []
+        self.daemon = RedactionDaemon(self.socket_path, self._factory)
+        self.daemon.bind()
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        """Stop the daemon and clean up the test files."""
+        self.daemon.shutdown()
+        self.thread.join()
+        self.temp_dir.cleanup()
+
+    def _factory(self, **options):
+        self.factory_calls.append(options)
+        redactor = PDFRedactor(pii_detector=NameDetector(fail_on="error"))
+        redactor.language_detector.detect_document_language = mock.Mock(return_value="en")
+        return redactor
+
+    def _invoke(self, *args):
+        return CliRunner().invoke(main, list(args) + ["--socket", self.socket_path])
+
+    def test_jobs_run_on_a_warm_redactor(self):
+        """Test that redact and detect runs are forwarded and share the redactor of their options."""
+        with mock.patch.object(main_module, "create_redactor") as in_process:
+            result = self._invoke("redact", self.input_path, self.output_path, "--openai-api-key", "test")
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("Successfully redacted PII", result.output)
+
+            span_path = os.path.join(self.temp_dir.name, "spans.jsonl")
+            result = self._invoke("detect", self.input_path, span_path, "--openai-api-key", "test")
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("Found 1 PII spans", result.output)
+        in_process.assert_not_called()
+
+        self.assertEqual(self.daemon.jobs, 2)
+        self.assertEqual(len(self.factory_calls), 1)
+        self.assertEqual(self.factory_calls[0]["openai_api_key"], "test")
+        doc = fitz.open(self.output_path)
+        self.assertNotIn("John Doe", doc[0].get_text())
+        doc.close()
+
+    def test_redactor_cache(self):
+        """Test that the redactor cache is bounded and does not keep API keys in its keys."""
+        daemon = RedactionDaemon(self.socket_path, lambda **options: object(), max_redactors=2)
+        first = daemon.redactor({"model": "gpt-4o", "openai_api_key": "secret-1"})
+        second = daemon.redactor({"model": "gpt-4o", "openai_api_key": "secret-2"})
+
+        self.assertIsNot(first, second)
+        self.assertIs(daemon.redactor({"model": "gpt-4o", "openai_api_key": "secret-1"}), first)
+        daemon.redactor({"model": "gpt-4o-mini"})
+
+        # The least recently used redactor is dropped
+        self.assertEqual(len(daemon._redactors), 2)
+        self.assertIs(daemon.redactor({"model": "gpt-4o", "openai_api_key": "secret-1"}), first)
+        self.assertIsNot(daemon.redactor({"model": "gpt-4o", "openai_api_key": "secret-2"}), second)
+        self.assertNotIn("secret", "".join(daemon._redactors))
+
+    def test_relative_paths(self):
+        """Test that paths are resolved in the directory of the client."""
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        try:
+            result = self._invoke("redact", "input.pdf", "relative.pdf", "--pages", "2")
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir.name, "relative.pdf")))
+
+    def test_errors(self):
+        """Test that invalid page selections and failed jobs are reported like in-process runs."""
+        result = self._invoke("redact", self.input_path, self.output_path, "--pages", "7")
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("outside pages 1-2", result.output)
+
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "This page causes an error.")
+        doc.save(self.input_path)
+        doc.close()
+        result = self._invoke("redact", self.input_path, self.output_path)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Error: Network unreachable", result.output)
+
+    def test_in_process_fallback(self):
+        """Test that runs without a daemon, or with --in-process, do not use the socket."""
+        with mock.patch("pdf_pii_redactor.redactor.PIIDetector", lambda **kwargs: NameDetector(fail_on="error")), \
+                mock.patch("pdf_pii_redactor.redactor.LanguageDetector.detect_document_language",
+                           return_value="en"):
+            for args in (["--socket", os.path.join(self.temp_dir.name, "missing.sock")],
+                         ["--socket", self.socket_path, "--in-process"]):
+                result = CliRunner().invoke(main, ["redact", self.input_path, self.output_path,
+                                                   "--openai-api-key", "test"] + args)
+                self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.daemon.jobs, 0)
+
+    def test_socket_of_a_killed_daemon(self):
+        """Test that a socket file nobody listens on is treated as no daemon and replaced by a new one."""
+        stale_path = os.path.join(self.temp_dir.name, "stale.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(stale_path)
+        stale.close()
+
+        with self.assertRaises(DaemonUnavailable):
+            submit(stale_path, {"method": "redact_pdf"})
+        replacement = RedactionDaemon(stale_path, self._factory)
+        replacement.bind()
+        replacement._server.server_close()
+
+        with self.assertRaisesRegex(RuntimeError, "already listening"):
+            RedactionDaemon(self.socket_path, self._factory).bind()
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+
+    def test_sockets_of_other_users_are_not_used(self):
+        """Test that jobs are not sent to a socket another user created, nor to a path that is not a socket."""
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            with self.assertRaisesRegex(UntrustedSocket, "another user"):
+                submit(self.socket_path, {"method": "redact_pdf"})
+            with mock.patch("pdf_pii_redactor.redactor.PIIDetector", lambda **kwargs: NameDetector(fail_on="error")), \
+                    mock.patch("pdf_pii_redactor.redactor.LanguageDetector.detect_document_language",
+                               return_value="en"):
+                result = CliRunner(mix_stderr=False).invoke(
+                    main, ["redact", self.input_path, self.output_path, "--openai-api-key", "test",
+                           "--socket", self.socket_path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("not using the daemon", result.stderr)
+        self.assertEqual(self.daemon.jobs, 0)
+
+        with self.assertRaisesRegex(UntrustedSocket, "not a socket"):
+            submit(self.input_path, {"method": "redact_pdf"})
+
+    def test_private_directory(self):
+        """Test that the directory of the default socket is created private and rejected if it is not."""
+        private_directory = os.path.join(self.temp_dir.name, "private")
+        socket_path = os.path.join(private_directory, "daemon.sock")
+        with mock.patch.object(daemon_module, "PRIVATE_DIRECTORY", private_directory):
+            daemon = RedactionDaemon(socket_path, self._factory)
+            daemon.bind()
+            daemon._server.server_close()
+            self.assertEqual(os.stat(private_directory).st_mode & 0o777, 0o700)
+
+            os.unlink(socket_path)
+            os.chmod(private_directory, 0o777)
+            with self.assertRaisesRegex(RuntimeError, "private"):
+                RedactionDaemon(socket_path, self._factory).bind()
+
+
+class TestLightweightClient(unittest.TestCase):
+    """Test cases for the import cost of the command-line interface."""
+
+    def test_cli_does_not_import_pymupdf(self):
+        """Test that forwarding a run does not need PyMuPDF or the detection modules."""
+        code = "import sys, pdf_pii_redactor.main; print(sorted({'fitz', 'openai', 'langdetect'} & set(sys.modules)))"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.join(os.path.dirname(__file__), "..")).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_choices_match_the_modules(self):
+        """Test that the spelled-out option choices match the modules they stand for."""
+        self.assertEqual(main_module.EXTRACTION_PROFILE_NAMES, sorted(EXTRACTION_PROFILES))
+        self.assertEqual(main_module.OCR_ENGINE_NAMES, sorted(OCR_ENGINES))
+        self.assertEqual(main_module.DEFAULT_OCR_DPI, DEFAULT_DPI)
+
+
+if __name__ == "__main__":
+    unittest.main()
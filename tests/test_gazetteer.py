@@ -0,0 +1,196 @@
+"""
+Tests for the gazetteer of known entities.
+"""
+
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from click.testing import CliRunner
+
+from pdf_pii_redactor.gazetteer import Gazetteer, compile_gazetteer, mask_hits, normalize
+from pdf_pii_redactor.main import main
+from pdf_pii_redactor.redactor import PDFRedactor
+from helpers import NameDetector
+
+
+class TestGazetteer(unittest.TestCase):
+    """Test cases for compiling and scanning gazetteers."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "known.gaz")
+        self.result = compile_gazetteer([
+            ("name", "John Doe"),
+            ("name", "John"),
+            ("name", "Doe Holdings Ltd"),
+            ("account", "DE89 3704 0044"),
+            ("address", "Hauptstraße 5"),
+            ("account", "john doe"),
+            ("name", "  "),
+        ], self.path)
+        self.gazetteer = Gazetteer(self.path)
+
+    def tearDown(self):
+        self.gazetteer.close()
+        self.temp_dir.cleanup()
+
+    def _values(self, text):
+        return [(hit["type"], hit["value"]) for hit in self.gazetteer.find(text)]
+
+    def test_compile(self):
+        """Test that duplicate and blank terms are dropped, the first type winning."""
+        self.assertEqual(self.result["terms"], 5)
+        self.assertEqual(self.result["types"], ["name", "account", "address"])
+        self.assertEqual(self.gazetteer.terms, 5)
+
+    def test_normalize(self):
+        """Test that whitespace runs collapse and every character maps back to the original text."""
+        normalized, offsets = normalize("Hello\n  WORLD ß")
+        self.assertEqual(normalized, "hello world ss")
+        self.assertEqual(offsets, [0, 1, 2, 3, 4, 5, 8, 9, 10, 11, 12, 13, 14, 14])
+
+    def test_case_and_whitespace(self):
+        """Test that terms match in any case and across line breaks, with offsets in the original text."""
+        text = "Paid to JOHN\n   doe and de89 3704\t0044."
+        hits = self.gazetteer.find(text)
+        self.assertEqual([(hit["type"], hit["value"]) for hit in hits],
+                         [("name", "JOHN\n   doe"), ("account", "de89 3704\t0044")])
+        for hit in hits:
+            self.assertEqual(text[hit["start"]:hit["end"]], hit["value"])
+
+    def test_case_folding(self):
+        """Test that characters whose case folding is longer still match."""
+        self.assertEqual(self._values("Sent to HAUPTSTRASSE 5, Berlin"), [("address", "HAUPTSTRASSE 5")])
+
+    def test_word_boundaries(self):
+        """Test that terms inside longer words are not hits."""
+        self.assertEqual(self._values("Johnson and Doe Holdings Ltdx"), [])
+        self.assertEqual(self._values("(John)"), [("name", "John")])
+
+    def test_leftmost_longest(self):
+        """Test that overlapping terms resolve to the leftmost, then the longest."""
+        self.assertEqual(self._values("John Doe Holdings Ltd"), [("name", "John Doe")])
+        self.assertEqual(self._values("Mr John Doe."), [("name", "John Doe")])
+        self.assertEqual(self._values("Doe Holdings Ltd, John"), [("name", "Doe Holdings Ltd"), ("name", "John")])
+
+    def test_mask_hits(self):
+        """Test that masking keeps the length and the whitespace of the text."""
+        text = "Paid to John\nDoe today"
+        masked = mask_hits(text, self.gazetteer.find(text))
+        self.assertEqual(masked, "Paid to ****\n*** today")
+
+    def test_invalid_file(self):
+        """Test that files other than compiled gazetteers are rejected."""
+        path = os.path.join(self.temp_dir.name, "terms.txt")
+        with open(path, "w") as f:
+            f.write("John Doe\n")
+        with self.assertRaisesRegex(ValueError, "not a compiled gazetteer"):
+            Gazetteer(path)
+
+
+class TestGazetteerRedaction(unittest.TestCase):
+    """Test cases for gazetteer hits in the redaction flow."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.gazetteer_path = os.path.join(self.temp_dir.name, "known.gaz")
+        self.input_path = os.path.join(self.temp_dir.name, "input.pdf")
+        self.output_path = os.path.join(self.temp_dir.name, "output.pdf")
+        compile_gazetteer([("name", "John Doe")], self.gazetteer_path)
+
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Letter from JOHN DOE to Jane Roe.")
+        doc.new_page().insert_text((50, 50), "Nothing to see here, John Doe.")
+        doc.save(self.input_path)
+        doc.close()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _redactor(self, detector, **options):
+        redactor = PDFRedactor(pii_detector=detector, gazetteer=self.gazetteer_path, **options)
+        redactor.language_detector.detect_document_language = mock.Mock(return_value="en")
+        return redactor
+
+    def _page_texts(self):
+        doc = fitz.open(self.output_path)
+        texts = [page.get_text() for page in doc]
+        doc.close()
+        return texts
+
+    def test_hits_are_redacted(self):
+        """Test that known entities are redacted along with the detected ones."""
+        detector = NameDetector(names=("Jane Roe",))
+        stats = self._redactor(detector).redact_pdf(self.input_path, self.output_path)
+
+        self.assertEqual(stats["gazetteer"], {"hits": 2, "pages_with_hits": 2, "masked": False})
+        self.assertEqual(stats["redacted_items"], 3)
+        texts = self._page_texts()
+        for name in ("JOHN DOE", "Jane Roe"):
+            self.assertNotIn(name, texts[0])
+        self.assertNotIn("John Doe", texts[1])
+        self.assertIn("JOHN DOE", detector.pages[0])
+
+    def test_mask(self):
+        """Test that masked hits are not sent to the detector and still redacted."""
+        detector = NameDetector(names=("Jane Roe", "John Doe"))
+        stats = self._redactor(detector, gazetteer_mask=True).redact_pdf(self.input_path, self.output_path)
+
+        self.assertTrue(stats["gazetteer"]["masked"])
+        self.assertEqual(stats["redacted_items"], 3)
+        for text in detector.pages:
+            self.assertNotIn("John", text.title())
+        self.assertIn("Letter from **** *** to Jane Roe.", detector.pages[0])
+
+    def test_detected_hits_are_not_duplicated(self):
+        """Test that values found by both the gazetteer and the detector give one span."""
+        redactor = self._redactor(NameDetector(names=("Jane Roe", "John Doe")))
+        span_path = os.path.join(self.temp_dir.name, "spans.jsonl")
+        stats = redactor.detect(self.input_path, span_path)
+        self.assertEqual(stats["spans"], 3)
+
+    def test_prescreened_pages(self):
+        """Test that pages skipped by the pre-screen still have their hits redacted."""
+        detector = NameDetector(names=("Jane Roe",))
+        stats = self._redactor(detector, prescreen_threshold=100.0).redact_pdf(self.input_path, self.output_path)
+
+        self.assertEqual(detector.pages, [])
+        self.assertEqual(stats["redacted_items"], 2)
+        texts = self._page_texts()
+        self.assertNotIn("JOHN DOE", texts[0])
+        self.assertIn("Jane Roe", texts[0])
+
+    def test_async(self):
+        """Test that the async API redacts the hits too."""
+        redactor = self._redactor(NameDetector(names=("Jane Roe", "John Doe")), gazetteer_mask=True)
+        stats = asyncio.run(redactor.redact_pdf_async(self.input_path, self.output_path))
+        self.assertEqual(stats["redacted_items"], 3)
+        self.assertNotIn("John Doe", self._page_texts()[1])
+
+    def test_cli_compile(self):
+        """Test compiling term files from the command line."""
+        names_path = os.path.join(self.temp_dir.name, "names.txt")
+        with open(names_path, "w", encoding="utf-8") as f:
+            f.write("John Doe\n\nJane Roe\n")
+        output_path = os.path.join(self.temp_dir.name, "cli.gaz")
+
+        result = CliRunner().invoke(main, ["gazetteer", "compile", output_path, "--terms", f"name={names_path}"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Compiled 2 terms (name)", result.output)
+        with Gazetteer(output_path) as gazetteer:
+            self.assertEqual([hit["value"] for hit in gazetteer.find("Jane Roe")], ["Jane Roe"])
+
+        result = CliRunner().invoke(main, ["gazetteer", "compile", output_path, "--terms", names_path])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("TYPE=FILE", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
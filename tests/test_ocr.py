@@ -0,0 +1,245 @@
+"""
+Tests for the OCR of image-only pages.
+"""
+
+import os
+import struct
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.ocr import MAX_DEFAULT_WORKERS, ocr_page, ocr_pages, search_words, words_to_text
+from pdf_pii_redactor.pdf_processor import PDFProcessor
+from pdf_pii_redactor.redactor import PDFRedactor
+from helpers import NameDetector
+
+# Letter pages, in points
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+GRAY = 128
+
+# Held by the test thread while OCR runs from another thread
+LOCK = threading.Lock()
+
+
+class FakeEngine:
+    """
+    Deterministic OCR engine reporting fixed lines of text.
+
+    Lines are given as (text, x, y) in points of the rendered image and are
+    split into words 6 points wide per character, scaled to the pixels of the
+    image like a real engine would report them.
+    """
+
+    def __init__(self, lines, width=PAGE_WIDTH):
+        self.lines = lines
+        self.width = width
+
+    def recognize(self, image):
+        # PNG width from the IHDR chunk
+        scale = struct.unpack(">I", image[16:20])[0] / self.width
+        words = []
+        for line_index, (text, x, y) in enumerate(self.lines):
+            for word in text.split():
+                words.append({"text": word, "bbox": [x * scale, y * scale, (x + 6 * len(word)) * scale,
+                                                     (y + 12) * scale], "line": line_index})
+                x += 6 * (len(word) + 1)
+        return words
+
+
+class LockingEngine(FakeEngine):
+    """FakeEngine that takes LOCK for every page, as a library with a lock of its own would."""
+
+    def recognize(self, image):
+        if not LOCK.acquire(timeout=10):
+            raise RuntimeError("The worker inherited LOCK held by another thread")
+        try:
+            return super().recognize(image)
+        finally:
+            LOCK.release()
+
+
+def create_scanned_pdf(path, page_count=1, text_pages=()):
+    """Create a document of gray image-only pages, except for text_pages which have a text layer."""
+    doc = fitz.open()
+    for page_index in range(page_count):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        if page_index in text_pages:
+            page.insert_text((50, 50), "Typed letter to Jane Roe.")
+            continue
+        pixmap = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, PAGE_WIDTH, PAGE_HEIGHT), False)
+        pixmap.set_rect(pixmap.irect, (GRAY,))
+        page.insert_image(page.rect, pixmap=pixmap)
+    doc.save(path)
+    doc.close()
+
+
+class TestOCRWords(unittest.TestCase):
+    """Test cases for the word helpers."""
+
+    def setUp(self):
+        self.words = FakeEngine([("Statement for John", 50, 100), ("Doe, account 42", 50, 120)],
+                                width=1).recognize(struct.pack(">16xI", 1))
+
+    def test_words_to_text(self):
+        """Test that words are joined by line."""
+        self.assertEqual(words_to_text(self.words), "Statement for John\nDoe, account 42\n")
+
+    def test_search_words(self):
+        """Test single and multi-word values, across lines and ignoring case."""
+        rects = search_words(self.words, "account")
+        self.assertEqual(rects, [fitz.Rect(80, 120, 122, 132)])
+
+        rects = search_words(self.words, "john  DOE")
+        self.assertEqual(rects, [fitz.Rect(134, 100, 158, 112), fitz.Rect(50, 120, 74, 132)])
+
+        self.assertEqual(search_words(self.words, "Jane"), [])
+        self.assertEqual(search_words(self.words, " "), [])
+
+    def test_search_whole_words(self):
+        """Test that values match whole words, ignoring the punctuation around them."""
+        self.assertEqual(search_words(self.words, "Doe"), [fitz.Rect(50, 120, 74, 132)])
+        self.assertEqual(search_words(self.words, "John Doe."), search_words(self.words, "john doe"))
+        self.assertEqual(search_words(self.words, "account 4"), [])
+        self.assertEqual(search_words(self.words, "state"), [])
+        self.assertEqual(search_words(self.words, "ohn Do"), [])
+
+
+class TestOCRPages(unittest.TestCase):
+    """Test cases for rendering and recognizing pages."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "scan.pdf")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_boxes_are_in_pdf_coordinates(self):
+        """Test that pixel boxes map back to points whatever the resolution and rotation."""
+        create_scanned_pdf(self.input_path)
+        doc = fitz.open(self.input_path)
+        page = doc[0]
+        engine = FakeEngine([("John", 60, 100)])
+
+        for dpi in (72, 150):
+            words = ocr_page(page, engine, dpi)
+            for actual, expected in zip(words[0]["bbox"], [60, 100, 84, 112]):
+                self.assertAlmostEqual(actual, expected, delta=0.5)
+
+        # A page rotated by 90 degrees renders as a landscape image
+        page.set_rotation(90)
+        words = ocr_page(page, FakeEngine([("John", 60, 100)], width=PAGE_HEIGHT), 100)
+        expected = fitz.Rect(60, 100, 84, 112) * page.derotation_matrix
+        for actual, expected in zip(words[0]["bbox"], expected):
+            self.assertAlmostEqual(actual, expected, delta=0.5)
+        doc.close()
+
+    def test_pool_matches_in_process(self):
+        """Test that worker processes return the same words as in-process OCR, from a path or bytes."""
+        create_scanned_pdf(self.input_path, page_count=3)
+        engine = FakeEngine([("John Doe", 50, 100)])
+
+        in_process = ocr_pages(self.input_path, [0, 2], engine, dpi=72, workers=0)
+        self.assertEqual(sorted(in_process), [0, 2])
+        self.assertEqual(ocr_pages(self.input_path, [0, 2], engine, dpi=72, workers=2), in_process)
+        with open(self.input_path, "rb") as f:
+            self.assertEqual(ocr_pages(memoryview(f.read()), [0, 2], engine, dpi=72, workers=2), in_process)
+        self.assertEqual(ocr_pages(self.input_path, [], engine), {})
+
+    def test_pool_from_a_thread(self):
+        """Test OCR workers started from a non-main thread while another thread holds a lock."""
+        create_scanned_pdf(self.input_path, page_count=2)
+        engine = LockingEngine([("John Doe", 50, 100)])
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            ocr_pages(self.input_path, [0, 1], engine, dpi=72, workers=2)), daemon=True)
+
+        # A forked worker would inherit LOCK held
+        with LOCK:
+            thread.start()
+            thread.join(timeout=60)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([word["text"] for word in results[0][1]], ["John", "Doe"])
+
+    def test_default_workers_are_capped(self):
+        """Test that the default number of workers does not grow with the number of CPUs."""
+        create_scanned_pdf(self.input_path, page_count=MAX_DEFAULT_WORKERS + 2)
+        page_nums = list(range(MAX_DEFAULT_WORKERS + 2))
+        with mock.patch("pdf_pii_redactor.ocr.os.cpu_count", return_value=64), \
+                mock.patch("pdf_pii_redactor.ocr.ProcessPoolExecutor") as pool:
+            pool.return_value.__enter__.return_value.map.return_value = [[]] * len(page_nums)
+            ocr_pages(self.input_path, page_nums, FakeEngine([]), dpi=72)
+        self.assertEqual(pool.call_args.kwargs["max_workers"], MAX_DEFAULT_WORKERS)
+
+    def test_extract_text(self):
+        """Test that only image-only pages are recognized and clipped by the margins."""
+        create_scanned_pdf(self.input_path, page_count=2, text_pages=[0])
+        engine = FakeEngine([("Header", 50, 10), ("Letter to John Doe", 50, 100)])
+
+        self.assertEqual([page["page_num"] for page in PDFProcessor().extract_text(self.input_path)], [0])
+
+        processor = PDFProcessor(ocr_engine=engine, ocr_dpi=72, ocr_workers=0)
+        with mock.patch.object(engine, "recognize", wraps=engine.recognize) as recognize:
+            pages = processor.extract_text(self.input_path, header_margin=40)
+        self.assertEqual(recognize.call_count, 1)
+        self.assertEqual([page["page_num"] for page in pages], [0, 1])
+        self.assertNotIn("ocr_words", pages[0])
+        self.assertEqual(pages[1]["text"], "Letter to John Doe\n")
+        self.assertEqual(len(pages[1]["ocr_words"]), 4)
+
+
+class TestOCRRedaction(unittest.TestCase):
+    """Test cases for redacting scanned documents end to end."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "scan.pdf")
+        self.output_path = os.path.join(self.temp_dir.name, "output.pdf")
+        create_scanned_pdf(self.input_path, page_count=2, text_pages=[1])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _redactor(self, detector, **options):
+        redactor = PDFRedactor(pii_detector=detector, ocr_engine=FakeEngine([("Letter to John Doe", 50, 100)]),
+                               ocr_dpi=72, **options)
+        redactor.language_detector.detect_document_language = mock.Mock(return_value="en")
+        return redactor
+
+    def _pixel(self, x, y):
+        doc = fitz.open(self.output_path)
+        pixmap = fitz.Pixmap(doc, doc[0].get_images()[0][0])
+        doc.close()
+        return pixmap.pixel(x, y)[0]
+
+    def test_redact_scanned_page(self):
+        """Test that a name recognized on a scan is redacted in the image."""
+        detector = NameDetector()
+        stats = self._redactor(detector, ocr_workers=0).redact_pdf(self.input_path, self.output_path)
+
+        self.assertIn("Letter to John Doe", detector.pages[0])
+        self.assertEqual(stats["redacted_items"], 1)
+        self.assertEqual(stats["pages_processed"], 2)
+
+        # John Doe spans x 110-158, y 100-112; the rest of the image is untouched
+        self.assertNotEqual(self._pixel(130, 105), GRAY)
+        self.assertEqual(self._pixel(60, 105), GRAY)
+        self.assertEqual(self._pixel(130, 200), GRAY)
+
+    def test_redact_scanned_page_in_workers(self):
+        """Test the same redaction with OCR worker processes and a checkpoint journal."""
+        journal_path = os.path.join(self.temp_dir.name, "scan.journal")
+        stats = self._redactor(NameDetector(), ocr_workers=2).redact_pdf(self.input_path, self.output_path,
+                                                                       checkpoint=journal_path)
+        self.assertEqual(stats["redacted_items"], 1)
+        self.assertNotEqual(self._pixel(130, 105), GRAY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,9 @@
 Tests for the PDF processing functionality.
 """
 
+import io
 import os
+import mmap
 import tempfile
 import unittest
 import fitz 
@@ -10,7 +12,8 @@ import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from pdf_pii_redactor.pdf_processor import PDFProcessor
+from pdf_pii_redactor.pdf_processor import (PDFProcessor, EXTRACTION_PROFILES, open_pdf, copy_pdf,
+                                             survey_page, plan_page_redactions, find_leaks)
 
 
 class TestPDFProcessor(unittest.TestCase):
@@ -59,6 +62,38 @@ class TestPDFProcessor(unittest.TestCase):
         self.assertIn("john.doe@example.com", pages[0]["text"])
         self.assertIn("page 2", pages[1]["text"])
     
+    def test_extract_text_profiles(self):
+        """Test that every extraction profile returns the same words."""
+        for profile in EXTRACTION_PROFILES:
+            pages = self.processor.extract_text(self.test_pdf_path, profile=profile)
+            
+            self.assertEqual(len(pages), 2, profile)
+            self.assertIn("John Doe", pages[0]["text"], profile)
+            self.assertIn("john.doe@example.com", pages[0]["text"], profile)
+    
+    def test_extract_text_rawdict_chars(self):
+        """Test that the rawdict profile returns one box per character."""
+        pages = self.processor.extract_text(self.test_pdf_path, profile="rawdict")
+        page = pages[0]
+        
+        self.assertEqual(len(page["chars"]), len(page["text"]))
+        start = page["text"].index("John")
+        self.assertIsNotNone(page["chars"][start])
+        self.assertNotIn("chars", self.processor.extract_text(self.test_pdf_path)[0])
+    
+    def test_extract_text_margins(self):
+        """Test that header and footer margins exclude text."""
+        pages = self.processor.extract_text(self.test_pdf_path, header_margin=60)
+        self.assertEqual(len(pages), 0)
+        
+        pages = self.processor.extract_text(self.test_pdf_path, profile="words", footer_margin=100)
+        self.assertIn("John Doe", pages[0]["text"])
+    
+    def test_extract_text_unknown_profile(self):
+        """Test that an unknown profile is rejected."""
+        with self.assertRaises(ValueError):
+            self.processor.extract_text(self.test_pdf_path, profile="nope")
+    
     def test_find_text_instances(self):
         """Test finding text instances in PDF."""
         instances = self.processor.find_text_instances(self.test_pdf_path, "John Doe")
@@ -104,6 +139,149 @@ class TestPDFProcessor(unittest.TestCase):
             # Clean up
             if os.path.exists(output_path):
                 os.unlink(output_path)
+    
+    def _image_page_pdf(self):
+        """Create a page with a red photo at the top and line art at the bottom, as bytes."""
+        doc = fitz.open()
+        page = doc.new_page()
+        photo = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 30), 0)
+        photo.set_rect(photo.irect, (255, 0, 0))
+        page.insert_image(fitz.Rect(50, 50, 250, 200), pixmap=photo)
+        page.draw_line((50, 400), (250, 400))
+        page.insert_text((60, 120), "Jane Roe")
+        page.insert_text((60, 300), "John Doe")
+        page.insert_text((60, 403), "Jim Poe")
+        data = doc.tobytes()
+        doc.close()
+        return data
+    
+    def test_apply_plans(self):
+        """Test the image and line-art paths chosen for each plan."""
+        data = self._image_page_pdf()
+        cases = [
+            ("off", "John Doe", "full"),
+            ("resources", "John Doe", "full"),
+            ("overlap", "John Doe", "text_only"),
+            ("overlap", "Jane Roe", "skip_graphics"),
+            ("overlap", "Jim Poe", "skip_images"),
+        ]
+        for plan, value, expected in cases:
+            doc = open_pdf(data)
+            page = doc[0]
+            self.assertEqual(plan_page_redactions(survey_page(page, plan), page.search_for(value)), expected,
+                             (plan, value))
+            doc.close()
+        
+        # Pages without any image never need image handling
+        doc = open_pdf(self.test_pdf_path)
+        self.assertEqual(plan_page_redactions(survey_page(doc[0], "resources"), doc[0].search_for("John Doe")),
+                         "skip_images")
+        doc.close()
+        
+        with self.assertRaises(ValueError):
+            PDFProcessor(apply_plan="fastest")
+    
+    def test_overlapping_image_pixels_are_redacted(self):
+        """Test that the overlap plan still blanks image pixels under a redaction."""
+        data = self._image_page_pdf()
+        doc = open_pdf(data)
+        rect = doc[0].search_for("Jane Roe")[0]
+        doc.close()
+        redactions = [{"page_num": 0, "x0": rect.x0, "y0": rect.y0, "x1": rect.x1, "y1": rect.y1,
+                       "text": "Jane Roe", "type": "name"}]
+        
+        output = io.BytesIO()
+        stats = PDFProcessor(apply_plan="overlap").apply_redactions(data, output, redactions)
+        
+        self.assertEqual(stats, {"apply_paths": {"skip_graphics": 1}})
+        doc = open_pdf(output.getvalue())
+        pixel = doc[0].get_pixmap(clip=rect).pixel(1, 1)
+        doc.close()
+        self.assertNotEqual(pixel, (255, 0, 0))
+    
+    def test_in_memory_sources(self):
+        """Test that bytes, bytearray, memoryview and mmap sources give the same text."""
+        with open(self.test_pdf_path, "rb") as pdf_file:
+            data = pdf_file.read()
+            mapped = mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        expected = self.processor.extract_text(self.test_pdf_path)
+        try:
+            for source in (data, bytearray(data), memoryview(data), mapped):
+                self.assertEqual(self.processor.extract_text(source), expected)
+        finally:
+            mapped.close()
+    
+    def test_apply_redactions_to_file_object(self):
+        """Test redacting bytes into a file object."""
+        with open(self.test_pdf_path, "rb") as pdf_file:
+            data = pdf_file.read()
+        redactions = [{"page_num": 0, "x0": 50, "y0": 40, "x1": 150, "y1": 60, "text": "John Doe", "type": "name"}]
+        
+        output = io.BytesIO()
+        self.processor.apply_redactions(data, output, redactions)
+        
+        doc = open_pdf(output.getvalue())
+        self.assertNotIn("John Doe", doc[0].get_text())
+        doc.close()
+        
+        copy = io.BytesIO()
+        copy_pdf(data, copy)
+        self.assertEqual(copy.getvalue(), data)
+    
+    def test_verify_redactions(self):
+        """Test that values left in the text layer are reported, or fail the run before saving."""
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((50, 50), "Signed by John Doe on 1 May.")
+        page.insert_text((50, 300), "Witness: JOHN   DOE")
+        data = doc.tobytes()
+        first, second = page.search_for("John Doe")
+        doc.close()
+        
+        def redaction(rect):
+            return {"page_num": 0, "x0": rect.x0, "y0": rect.y0, "x1": rect.x1, "y1": rect.y1,
+                    "text": "John Doe", "type": "name"}
+        
+        # Only the first occurrence is redacted; matching ignores case and whitespace runs
+        output = io.BytesIO()
+        stats = PDFProcessor(verify="report").apply_redactions(data, output, [redaction(first)])
+        self.assertEqual(stats["verification"],
+                         {"pages_checked": 1, "leaks": [{"page": 0, "type": "name", "count": 1}]})
+        self.assertTrue(output.getvalue())
+        
+        output = io.BytesIO()
+        with self.assertRaises(RuntimeError):
+            PDFProcessor(verify="fail").apply_redactions(data, output, [redaction(first)])
+        self.assertEqual(output.getvalue(), b"")
+        
+        stats = PDFProcessor(verify="fail").apply_redactions(data, io.BytesIO(),
+                                                             [redaction(first), redaction(second)])
+        self.assertEqual(stats["verification"], {"pages_checked": 1, "leaks": []})
+        self.assertNotIn("verification", self.processor.apply_redactions(data, io.BytesIO(), [redaction(first)]))
+        
+        with self.assertRaises(ValueError):
+            PDFProcessor(verify="always")
+    
+    def test_find_leaks_prefers_longest_value(self):
+        """Test that a value containing another one is counted once, as itself."""
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((50, 50), "Contact Jane Roe at jane.roe@example.com or Jane.")
+        leaks = find_leaks(page, {"Jane": "name", "jane.roe@example.com": "email", "": "name"})
+        doc.close()
+        
+        self.assertEqual(sorted((leak["type"], leak["count"]) for leak in leaks), [("email", 1), ("name", 2)])
+    
+    def test_find_leaks_matches_whole_words(self):
+        """Test that a value inside a longer word is not a leak, unlike the value itself."""
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((50, 50), "Annual report for Annabel, reviewed by Ann. Ref: (555) 0100")
+        leaks = find_leaks(page, {"Ann": "name", "(555) 0100": "phone", "55": "phone"})
+        doc.close()
+        
+        self.assertEqual(sorted((leak["type"], leak["count"]) for leak in leaks), [("name", 1), ("phone", 1)])
 
 
 if __name__ == "__main__":
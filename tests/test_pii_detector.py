@@ -3,12 +3,15 @@ Tests for the PII detection functionality.
 """
 
 import os
+import json
+import asyncio
 import unittest
+from unittest import mock
 import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from pdf_pii_redactor.pii_detector import PIIDetector
+from pdf_pii_redactor.pii_detector import PIIDetector, PROMPT_VERSIONS
 
 from dotenv import load_dotenv
 
@@ -135,5 +138,140 @@ class TestPIIDetector(unittest.TestCase):
         self.assertTrue(dob_detected)
 
 
+def fake_completion(*contents):
+    """Build a mock for the chat completions create method of the OpenAI client returning the given contents in turn."""
+    responses = []
+    for content in contents:
+        response = mock.Mock()
+        response.choices = [mock.Mock()]
+        response.choices[0].message.content = json.dumps(content)
+        response.usage.prompt_tokens = 500
+        response.usage.completion_tokens = 20
+        response.usage.prompt_tokens_details.cached_tokens = 384
+        responses.append(response)
+    return mock.Mock(side_effect=responses)
+
+
+class TestCompactResponseFormat(unittest.TestCase):
+    """Test cases for the compact response format, with a mocked API."""
+    
+    TEXT = "Contact John Doe at john.doe@example.com."
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.detector = PIIDetector(api_key="test", response_format="compact")
+    
+    def test_values_are_rebuilt_from_offsets(self):
+        """Test that values are taken from the page text."""
+        create = fake_completion({"e": [{"t": "n", "s": 8, "x": 16}, {"t": "e", "s": 19, "x": 41}], "c": 0.9})
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            result = self.detector.analyze(self.TEXT)
+        
+        self.assertEqual(result["pii"], [
+            {"type": "name", "value": "John Doe", "start_index": 8, "end_index": 16},
+            {"type": "email", "value": "john.doe@example.com", "start_index": 20, "end_index": 40},
+        ])
+        self.assertEqual(result["confidence"], 0.9)
+        self.assertNotIn("fallback", result)
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(create.call_args.kwargs["response_format"]["type"], "json_schema")
+    
+    def test_fallback_when_offsets_do_not_line_up(self):
+        """Test the automatic fallback to the verbose format."""
+        verbose = {"pii": [{"type": "email", "value": "john.doe@example.com",
+                            "start_index": 20, "end_index": 40}], "confidence": 0.8}
+        create = fake_completion({"e": [{"t": "e", "s": 0, "x": 7}], "c": 0.9}, verbose)
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            result = self.detector.analyze(self.TEXT)
+        
+        self.assertTrue(result["fallback"])
+        self.assertEqual(result["pii"], verbose["pii"])
+        self.assertEqual(create.call_count, 2)
+        self.assertEqual(create.call_args.kwargs["response_format"], {"type": "json_object"})
+        self.assertEqual(result["usage"], {"prompt_tokens": 1000, "completion_tokens": 40, "cached_tokens": 768})
+    
+    def test_shifted_offsets_are_rejected(self):
+        """Test that offsets off by one or more never rebuild a value that leaves part of the entity out."""
+        text = "Contact John Doe at john.doe@example.com or 555-123-4567, born 1990-05-12, 12 Main Street."
+        entities = [("n", "John Doe"), ("e", "john.doe@example.com"), ("p", "555-123-4567"),
+                    ("d", "1990-05-12"), ("a", "12 Main Street")]
+        for code, value in entities:
+            start = text.index(value)
+            end = start + len(value)
+            self.assertEqual(self.detector._rebuild_entity(text, {"t": code, "s": start, "x": end})["value"], value)
+            for shift_start, shift_end in [(1, 0), (0, -1), (-2, 0), (0, 2), (1, 1), (-1, -1), (3, 3), (-4, -4)]:
+                entity = {"t": code, "s": start + shift_start, "x": end + shift_end}
+                rebuilt = self.detector._rebuild_entity(text, entity)
+                if rebuilt is not None:
+                    self.assertIn(value, rebuilt["value"], (value, entity))
+        
+        # Offsets moved by one onto the neighbouring words
+        self.assertIsNone(self.detector._rebuild_entity(text, {"t": "n", "s": 9, "x": 17}))
+        self.assertIsNone(self.detector._rebuild_entity(text, {"t": "n", "s": 8, "x": 19}))
+        self.assertIsNone(self.detector._rebuild_entity(text, {"t": "a", "s": 76, "x": 89}))
+    
+    def test_fallback_when_offsets_are_off_by_one(self):
+        """Test that a name shifted by one character is not redacted in place of the real one."""
+        verbose = {"pii": [{"type": "name", "value": "John Doe", "start_index": 8, "end_index": 16}],
+                   "confidence": 0.8}
+        create = fake_completion({"e": [{"t": "n", "s": 9, "x": 17}], "c": 0.9}, verbose)
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            result = self.detector.analyze(self.TEXT)
+        
+        self.assertTrue(result["fallback"])
+        self.assertEqual(result["pii"], verbose["pii"])
+    
+    def test_offsets_refer_to_the_original_text(self):
+        """Test that offsets in the collapsed text are mapped back to the page text."""
+        text = "Contact   John Doe\n\n\n   at john.doe@example.com."
+        # Collapsed: "Contact John Doe\nat john.doe@example.com."
+        create = fake_completion({"e": [{"t": "n", "s": 8, "x": 16}, {"t": "e", "s": 20, "x": 40}], "c": 0.9})
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            result = self.detector.analyze(text)
+        
+        for pii in result["pii"]:
+            self.assertEqual(text[pii["start_index"]:pii["end_index"]], pii["value"])
+        user_prompt = create.call_args.kwargs["messages"][1]["content"]
+        self.assertTrue(user_prompt.endswith("Text:\nContact John Doe\nat john.doe@example.com."))
+    
+    def test_analyze_async(self):
+        """Test the async client path, including the fallback to verbose."""
+        verbose = {"pii": [{"type": "email", "value": "john.doe@example.com",
+                            "start_index": 20, "end_index": 40}], "confidence": 0.8}
+        create = fake_completion({"e": [{"t": "e", "s": 0, "x": 7}], "c": 0.9}, verbose)
+        client = mock.Mock()
+        client.chat.completions.create = mock.AsyncMock(side_effect=create)
+        
+        with mock.patch("openai.AsyncOpenAI", return_value=client):
+            result = asyncio.run(self.detector.analyze_async(self.TEXT))
+        
+        self.assertTrue(result["fallback"])
+        self.assertEqual(result["pii"], verbose["pii"])
+        self.assertEqual(result["usage"]["prompt_tokens"], 1000)
+        self.assertEqual(client.chat.completions.create.await_count, 2)
+    
+    def test_prompt_versions(self):
+        """Test that each response format has its own prompt version."""
+        self.assertEqual(self.detector.prompt_version, PROMPT_VERSIONS["compact"])
+        self.assertNotEqual(PIIDetector(api_key="test").prompt_version, self.detector.prompt_version)
+        with self.assertRaises(ValueError):
+            PIIDetector(api_key="test", response_format="tiny")
+    
+    def test_detectors_keep_their_own_key(self):
+        """Test that a detector created later does not change the key of another one's requests."""
+        keys = []
+        
+        def create(completions, **kwargs):
+            keys.append(completions._client.api_key)
+            return fake_completion({"e": [], "c": 0.9})()
+        
+        first = PIIDetector(api_key="first-key")
+        PIIDetector(api_key="second-key")
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            first.analyze(self.TEXT)
+        
+        self.assertEqual(keys, ["first-key"])
+
+
 if __name__ == "__main__":
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,205 @@
+"""
+Tests for the pre-flight checks and the slow lane.
+"""
+
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from click.testing import CliRunner
+
+from pdf_pii_redactor.preflight import DEFAULT_LIMITS, SlowLane, limits_from_env, preflight, run_with_budget
+from pdf_pii_redactor.main import main
+
+
+def make_pdf(page_count=2, **save_options):
+    """Return the content of a PDF with some text on every page."""
+    doc = fitz.open()
+    for page_index in range(page_count):
+        doc.new_page().insert_text((50, 50), f"Page {page_index} of a letter to John Doe.")
+    content = doc.tobytes(**save_options)
+    doc.close()
+    return content
+
+
+def allocate(size):
+    """Allocate and return the length of a buffer of the given size."""
+    return len(bytearray(size))
+
+
+# Held by a thread of the test process while a slow lane child runs
+LOCK = threading.Lock()
+
+
+def take_lock():
+    """Acquire and release LOCK, as a redactor takes its locks."""
+    with LOCK:
+        return True
+
+
+class TestPreflight(unittest.TestCase):
+    """Test cases for preflight()."""
+
+    def setUp(self):
+        """Create a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up the temporary directory."""
+        self.temp_dir.cleanup()
+
+    def _write(self, content, name="input.pdf"):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_normal_document(self):
+        """Test the report of an ordinary document."""
+        content = make_pdf(3)
+        report = preflight(self._write(content))
+
+        self.assertEqual(report["lane"], "normal")
+        self.assertEqual(report["reasons"], [])
+        self.assertEqual(report["page_count"], 3)
+        self.assertEqual(report["file_size"], len(content))
+        self.assertGreater(report["object_count"], 3)
+        self.assertFalse(report["encrypted"])
+        self.assertFalse(report["repaired"])
+        self.assertLess(report["elapsed"], 1.0)
+
+        # In-memory content gives the same report
+        self.assertEqual(preflight(content)["page_count"], 3)
+
+    def test_page_limits(self):
+        """Test that documents over the slow limits go to the slow lane and over the hard limits are rejected."""
+        path = self._write(make_pdf(10))
+
+        slow = preflight(path, {"slow_pages": 5})
+        self.assertEqual(slow["lane"], "slow")
+        self.assertEqual(slow["reasons"], ["10 pages exceed 5"])
+
+        rejected = preflight(path, {"slow_pages": 5, "max_pages": 8, "slow_objects": 2})
+        self.assertEqual(rejected["lane"], "reject")
+        self.assertEqual(len(rejected["reasons"]), 2)
+
+    def test_file_size_is_checked_before_opening(self):
+        """Test that oversized files are rejected without being opened."""
+        path = self._write(make_pdf(1))
+
+        with mock.patch("pdf_pii_redactor.preflight.open_pdf") as open_pdf:
+            report = preflight(path, {"max_file_bytes": 100})
+
+        open_pdf.assert_not_called()
+        self.assertEqual(report["lane"], "reject")
+        self.assertIsNone(report["page_count"])
+
+    def test_broken_xref_goes_to_the_slow_lane(self):
+        """Test that a document whose xref table needs repair is sent to the slow lane."""
+        content = make_pdf(2).replace(b"startxref", b"startxrex")
+        report = preflight(self._write(content))
+
+        self.assertTrue(report["repaired"])
+        self.assertEqual(report["page_count"], 2)
+        self.assertEqual(report["lane"], "slow")
+
+    def test_encryption(self):
+        """Test that password-protected documents are rejected and owner-only encryption is reported."""
+        protected = make_pdf(1, encryption=fitz.PDF_ENCRYPT_AES_256, user_pw="user", owner_pw="owner")
+        report = preflight(self._write(protected))
+        self.assertEqual(report["lane"], "reject")
+        self.assertTrue(report["needs_password"])
+        self.assertEqual(report["reasons"], ["password protected"])
+
+        restricted = make_pdf(1, encryption=fitz.PDF_ENCRYPT_AES_256, owner_pw="owner")
+        report = preflight(self._write(restricted, "restricted.pdf"))
+        self.assertEqual(report["lane"], "normal")
+        self.assertTrue(report["encrypted"])
+
+    def test_unreadable_document(self):
+        """Test that content that cannot be opened is rejected."""
+        report = preflight(self._write(b"%PDF-1.4 not really a PDF"))
+        self.assertEqual(report["lane"], "reject")
+        self.assertTrue(report["reasons"][0].startswith("cannot be opened"))
+
+    def test_limits_from_env(self):
+        """Test that limits are read from the environment with their types."""
+        limits = limits_from_env({"PREFLIGHT_MAX_PAGES": "10", "PREFLIGHT_TIME_BUDGET": "2.5"})
+        self.assertEqual(limits["max_pages"], 10)
+        self.assertEqual(limits["time_budget"], 2.5)
+        self.assertEqual(limits["slow_pages"], DEFAULT_LIMITS["slow_pages"])
+
+    def test_cli(self):
+        """Test the preflight command."""
+        path = self._write(make_pdf(4))
+        runner = CliRunner()
+
+        result = runner.invoke(main, ["preflight", path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Pages: 4", result.output)
+        self.assertIn("Lane: normal", result.output)
+
+        result = runner.invoke(main, ["preflight", path], env={"PREFLIGHT_MAX_PAGES": "2"})
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Lane: reject (4 pages exceed 2)", result.output)
+
+
+class TestSlowLane(unittest.TestCase):
+    """Test cases for run_with_budget() and SlowLane."""
+
+    def test_result_is_returned(self):
+        """Test that the result of the function is returned from the child process."""
+        self.assertEqual(run_with_budget(allocate, 1024, time_budget=10), 1024)
+
+    def test_time_budget(self):
+        """Test that a function over its time budget is killed."""
+        start = time.perf_counter()
+        with self.assertRaises(TimeoutError):
+            run_with_budget(time.sleep, 30, time_budget=0.2)
+        self.assertLess(time.perf_counter() - start, 5)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/statm"), "Needs /proc to measure the process size")
+    def test_memory_budget(self):
+        """Test that a function over its memory budget fails without affecting the parent."""
+        with self.assertRaises(MemoryError):
+            run_with_budget(allocate, 512 * 1024 * 1024, time_budget=30, memory_budget=64 * 1024 * 1024)
+        self.assertEqual(run_with_budget(allocate, 1024 * 1024, time_budget=30,
+                                         memory_budget=64 * 1024 * 1024), 1024 * 1024)
+
+    def test_errors(self):
+        """Test that errors of the function are raised in the parent."""
+        with self.assertRaisesRegex(RuntimeError, "ValueError"):
+            run_with_budget(int, "not a number", time_budget=10)
+
+    def test_locks_held_by_other_threads(self):
+        """Test that a child does not inherit the locks held in this process when it starts."""
+        with LOCK:
+            self.assertTrue(run_with_budget(take_lock, time_budget=20))
+
+    def test_full_lane_rejects_immediately(self):
+        """Test that a job arriving while the lane is full is not queued."""
+        lane = SlowLane(max_jobs=1, time_budget=10)
+        started = threading.Event()
+        thread = threading.Thread(target=lambda: (started.set(), lane.run(time.sleep, 0.5)))
+        thread.start()
+        started.wait()
+        time.sleep(0.1)
+
+        start = time.perf_counter()
+        with self.assertRaisesRegex(RuntimeError, "try again later"):
+            lane.run(allocate, 1)
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+        thread.join()
+        self.assertEqual(lane.run(allocate, 1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Tests for the page pre-screening.
+"""
+
+import os
+import re
+import glob
+import tempfile
+import unittest
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.prescreen import PageScreener
+from pdf_pii_redactor.pdf_processor import PDFProcessor
+from pdf_pii_redactor.redactor import PDFRedactor
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "sample_pdfs")
+
+# PII that can be checked without the API: emails, phone numbers and dates
+REGEX_PII = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+|\+?\d[\d ()/-]{7,}\d|\d{1,2}[./]\d{1,2}[./]\d{2,4}")
+
+BOILERPLATE = (
+    "TERMS AND CONDITIONS\n"
+    "1. The services are provided as is, without warranty of any kind.\n"
+    "2. Liability is limited to the amount paid for the services.\n"
+    "3. These terms are governed by the laws of the country in which the provider is established.\n"
+)
+
+NUMBERS = "Total 1200.00 350.00 12.50 99.99 0.00\nSubtotal 1,350.50 7.25\n"
+
+
+class CountingDetector:
+    """Stand-in for PIIDetector that finds regex PII and counts calls."""
+    
+    model = "regex"
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def detect_pii(self, text, language="en"):
+        self.calls += 1
+        return [{"type": "regex", "value": match.group()} for match in REGEX_PII.finditer(text)]
+
+
+class TestPageScreener(unittest.TestCase):
+    """Test cases for the page screener."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.screener = PageScreener(threshold=1.0)
+    
+    def test_boilerplate_is_skipped(self):
+        """Test that legal text and number tables score below the threshold."""
+        self.assertFalse(self.screener.should_detect(BOILERPLATE))
+        self.assertFalse(self.screener.should_detect(NUMBERS))
+    
+    def test_pii_is_detected(self):
+        """Test that pages with typical PII pass the pre-screen."""
+        for text in [
+            "Please contact me at john.doe@example.com.",
+            "Call me at (555) 123-4567.",
+            "Dear John Smith, thank you for your order.",
+            "I live at 123 Main St, Anytown, CA 12345.",
+            "My credit card number is 4111 1111 1111 1111.",
+            "I was born on 15/01/1980.",
+            "Geboren am 3. März 1975 in Wien.",
+        ]:
+            self.assertTrue(self.screener.should_detect(text, "de" if "Geboren" in text else "en"), text)
+    
+    def test_uncased_languages_are_always_detected(self):
+        """Test that languages without letter case are never skipped."""
+        self.assertTrue(self.screener.should_detect("这是一个测试", "zh-cn"))
+        # The score is stored in JSON statistics
+        self.assertIsNone(self.screener.score("这是一个测试", "zh-cn")["score"])
+    
+    def test_sample_pdfs_call_reduction_and_recall(self):
+        """Measure detector calls saved and regex-PII recall on the sample PDFs plus boilerplate pages."""
+        pdf_paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, "*.pdf")))
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # A document mixing a PII page with boilerplate pages
+            mixed_path = os.path.join(temp_dir, "mixed.pdf")
+            doc = fitz.open()
+            for text in (BOILERPLATE, "Contact: jane.roe@example.com, +43 660 1234567", NUMBERS, BOILERPLATE):
+                doc.new_page().insert_text((50, 72), text, fontsize=9)
+            doc.save(mixed_path)
+            doc.close()
+            pdf_paths.append(mixed_path)
+            
+            processor = PDFProcessor()
+            baseline = CountingDetector()
+            screened = CountingDetector()
+            expected = set()
+            found = set()
+            for pdf_path in pdf_paths:
+                for detector, results in ((baseline, expected), (screened, found)):
+                    redactor = PDFRedactor(pii_detector=detector,
+                                           prescreen_threshold=1.0 if detector is screened else None)
+                    spans, _ = redactor.detect_spans(pdf_path)
+                    results.update((pdf_path, span["page"], span["value"]) for span in spans)
+            
+            pages = sum(len(processor.extract_text(path)) for path in pdf_paths)
+        
+        self.assertEqual(baseline.calls, pages)
+        # The three boilerplate pages are skipped
+        self.assertEqual(screened.calls, pages - 3)
+        # Every regex-detectable PII value is still found
+        self.assertEqual(found, expected)
+
+
+class TestRedactorPreScreen(unittest.TestCase):
+    """Test cases for the pre-screen statistics of the redactor."""
+    
+    def test_skip_decisions_in_stats(self):
+        """Test that skipped pages are reported."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_path = os.path.join(temp_dir, "input.pdf")
+            doc = fitz.open()
+            doc.new_page().insert_text((50, 72), BOILERPLATE, fontsize=9)
+            doc.new_page().insert_text((50, 72), "Contact: jane.roe@example.com", fontsize=9)
+            doc.save(input_path)
+            doc.close()
+            
+            detector = CountingDetector()
+            redactor = PDFRedactor(pii_detector=detector, prescreen_threshold=1.0)
+            stats = redactor.redact_pdf(input_path, os.path.join(temp_dir, "output.pdf"))
+        
+        self.assertEqual(detector.calls, 1)
+        self.assertEqual(stats["prescreen"]["pages_skipped"], 1)
+        self.assertEqual(stats["prescreen"]["skipped_pages"], [0])
+        self.assertEqual(stats["redacted_items"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for the profiling mode.
+"""
+
+import os
+import json
+import pstats
+import tempfile
+import unittest
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from click.testing import CliRunner
+
+from pdf_pii_redactor.profiling import Profiler
+from pdf_pii_redactor.redactor import PDFRedactor
+from pdf_pii_redactor.main import main
+from helpers import NameDetector
+
+
+class TestProfiling(unittest.TestCase):
+    """Test cases for Profiler and the profile option of PDFRedactor and the CLI."""
+
+    def setUp(self):
+        """Create a test PDF."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "claim.pdf")
+        self.output_path = os.path.join(self.temp_dir.name, "claim-redacted.pdf")
+        self.profile_dir = os.path.join(self.temp_dir.name, "profiles")
+
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Claim filed by John Doe.")
+        doc.new_page().insert_text((50, 50), "No personal data on this page.")
+        doc.save(self.input_path)
+        doc.close()
+
+    def tearDown(self):
+        """Clean up the test files."""
+        self.temp_dir.cleanup()
+
+    def test_stage_timings(self):
+        """Test that stages are timed overall and per page."""
+        profiler = Profiler()
+        with profiler:
+            for page in range(3):
+                with profiler.stage("search", page):
+                    sum(range(1000 * (page + 1)))
+            with profiler.stage("save"):
+                pass
+
+        summary = profiler.summary()
+        self.assertEqual(list(summary["stages"]), ["search", "save"])
+        self.assertEqual(summary["stages"]["search"]["calls"], 3)
+        self.assertEqual(sorted(summary["pages"]), ["0", "1", "2"])
+        self.assertEqual(len(summary["hotspots"]), 3)
+        self.assertGreaterEqual(summary["hotspots"][0]["seconds"], summary["hotspots"][-1]["seconds"])
+        self.assertNotIn("memory", summary)
+
+    def test_redactor_profile(self):
+        """Test that a profiled run writes a pstats dump and a stage summary."""
+        redactor = PDFRedactor(pii_detector=NameDetector(), profile=self.profile_dir, profile_memory=True)
+        redactor.language_detector.detect_document_language = lambda pages: "en"
+
+        stats = redactor.redact_pdf(self.input_path, self.output_path)
+
+        self.assertEqual(stats["redacted_items"], 1)
+        self.assertTrue(os.path.basename(stats["profile"]["pstats"]).startswith("claim-"))
+        pstats.Stats(stats["profile"]["pstats"])
+
+        with open(stats["profile"]["summary"], encoding="utf-8") as summary_file:
+            summary = json.load(summary_file)
+        self.assertEqual(list(summary["stages"]),
+                         ["extraction", "language_detection", "detection", "search", "apply", "save"])
+        self.assertEqual(set(summary["pages"]["0"]), {"extraction", "detection", "search", "apply"})
+        self.assertTrue(summary["functions"])
+        self.assertGreater(summary["memory"]["peak_bytes"], 0)
+
+        # The profiler is detached after the run
+        self.assertIsNone(redactor.pdf_processor.profiler)
+        self.assertNotIn("profile", PDFRedactor(pii_detector=NameDetector()).redact_pdf(
+            self.input_path, self.output_path))
+
+    def test_cli_profile(self):
+        """Test the --profile option of the CLI."""
+        runner = CliRunner()
+        with mock.patch("pdf_pii_redactor.redactor.PIIDetector", NameDetector), \
+                mock.patch("pdf_pii_redactor.redactor.LanguageDetector.detect_document_language",
+                           return_value="en"):
+            result = runner.invoke(main, ["redact", self.input_path, self.output_path,
+                                          "--openai-api-key", "test", "--profile", self.profile_dir])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Profile written to", result.output)
+        self.assertEqual(sorted(os.path.splitext(name)[1] for name in os.listdir(self.profile_dir)),
+                         [".json", ".pstats"])
+
+
+if __name__ == "__main__":
+    unittest.main()
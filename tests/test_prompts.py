@@ -0,0 +1,102 @@
+"""
+Tests for the prompt layout and whitespace collapsing.
+"""
+
+import os
+import glob
+import unittest
+from unittest import mock
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.prompts import build_prompt, collapse_whitespace, restore_offsets, SYSTEM_PROMPTS
+from pdf_pii_redactor.pdf_processor import PDFProcessor
+from pdf_pii_redactor.redactor import PDFRedactor
+
+SAMPLE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'sample_pdfs'))
+
+
+class UsageDetector:
+    """Detector stand-in reporting fixed token usage for every page."""
+
+    model = "fake"
+
+    def analyze(self, text, language="en"):
+        return {"pii": [], "ok": True, "error": None, "confidence": 1.0, "latency": 0.0, "model": self.model,
+                "usage": {"prompt_tokens": 600, "completion_tokens": 10, "cached_tokens": 512}}
+
+
+class TestPrompts(unittest.TestCase):
+    """Test cases for the prompt construction."""
+
+    def test_collapse_whitespace(self):
+        """Test that whitespace runs are collapsed and offsets map back."""
+        text = "Name:\t\tJohn  Doe\n \n  Phone: 555-1234   "
+        collapsed, offset_map = collapse_whitespace(text)
+
+        self.assertEqual(collapsed, "Name: John Doe\nPhone: 555-1234 ")
+        self.assertEqual(len(offset_map), len(collapsed) + 1)
+        for value in ("John", "Doe", "Phone: 555-1234"):
+            start = collapsed.index(value)
+            original_start, original_end = restore_offsets(offset_map, start, start + len(value))
+            self.assertEqual(text[original_start:original_end], value)
+
+        start = collapsed.index("John Doe")
+        original_start, original_end = restore_offsets(offset_map, start, start + len("John Doe"))
+        self.assertEqual(text[original_start:original_end], "John  Doe")
+
+    def test_text_without_runs_is_unchanged(self):
+        """Test that single spaces and newlines are kept as they are."""
+        text = "John Doe\nMain Street 1"
+        collapsed, offset_map = collapse_whitespace(text)
+
+        self.assertEqual(collapsed, text)
+        self.assertEqual(offset_map, list(range(len(text) + 1)))
+
+    def test_static_prefix(self):
+        """Test that the system prompt does not depend on the language or the text."""
+        for response_format in SYSTEM_PROMPTS:
+            english = build_prompt("John Doe", "en", response_format)
+            german = build_prompt("Hans Müller, Hauptstraße 1", "de", response_format)
+
+            self.assertEqual(english["system"], german["system"])
+            self.assertTrue(german["user"].startswith("Language: de\n"))
+            self.assertTrue(german["user"].endswith("Text:\nHans Müller, Hauptstraße 1"))
+
+    def test_sample_pdfs_send_less_text(self):
+        """Test that collapsing reduces the text sent for the sample PDFs."""
+        pdf_paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, "*.pdf")))
+        if not pdf_paths:
+            self.skipTest("No sample PDFs")
+
+        original_size = 0
+        collapsed_size = 0
+        for pdf_path in pdf_paths:
+            for page in PDFProcessor().extract_text(pdf_path):
+                collapsed, _ = collapse_whitespace(page["text"])
+                self.assertLessEqual(len(collapsed), len(page["text"]))
+                original_size += len(page["text"])
+                collapsed_size += len(collapsed)
+
+        self.assertLess(collapsed_size, original_size * 0.97)
+
+    def test_usage_stats(self):
+        """Test that token usage is reported per page and in total."""
+        pdf_path = os.path.join(SAMPLE_DIR, "example_2.pdf")
+        if not os.path.exists(pdf_path):
+            self.skipTest("No sample PDFs")
+
+        redactor = PDFRedactor(pii_detector=UsageDetector())
+        with mock.patch.object(redactor.language_detector, "detect_document_language", return_value="en"):
+            _, stats = redactor.detect_spans(pdf_path)
+
+        pages = stats["pages_processed"]
+        self.assertEqual(len(stats["usage"]["pages"]), pages)
+        self.assertEqual(stats["usage"]["total"],
+                         {"prompt_tokens": 600 * pages, "completion_tokens": 10 * pages,
+                          "cached_tokens": 512 * pages})
+
+
+if __name__ == "__main__":
+    unittest.main()
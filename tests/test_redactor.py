@@ -2,8 +2,14 @@
 Tests for the PDF redaction functionality.
 """
 
+import io
 import os
+import json
+import asyncio
 import tempfile
+from types import SimpleNamespace
+from unittest import mock
+import fitz
 import unittest
 import sys
 
@@ -11,11 +17,15 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from pdf_pii_redactor.redactor import PDFRedactor
 from pdf_pii_redactor.pdf_processor import PDFProcessor
+from helpers import NameDetector
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Capitalized word pairs, such as John Doe or John Doe1, are reported as names
+NAME_PATTERN = r"\b[A-Z][a-z]+ [A-Z][a-z]+\d*"
+
 
 class TestRedactor(unittest.TestCase):
     """Test cases for the PDF redactor."""
@@ -76,5 +86,215 @@ class TestRedactor(unittest.TestCase):
                 os.unlink(output_path)
 
 
+class TestInMemoryRedaction(unittest.TestCase):
+    """Test cases for redacting PDFs held in memory, without an API key."""
+    
+    def setUp(self):
+        """Create a test PDF in memory."""
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "The applicant is John Doe, resident since 2010.")
+        self.data = doc.tobytes()
+        doc.close()
+        
+        self.redactor = PDFRedactor(pii_detector=NameDetector(names=(), pattern=NAME_PATTERN))
+        self.redactor.language_detector.detect_document_language = lambda pages: "en"
+    
+    def _text(self, data):
+        doc = fitz.open(stream=data, filetype="pdf")
+        text = doc[0].get_text()
+        doc.close()
+        return text
+    
+    def test_redact_bytes(self):
+        """Test that redact_bytes returns the redacted PDF and its statistics."""
+        for data in (self.data, memoryview(self.data), bytearray(self.data)):
+            output, stats = self.redactor.redact_bytes(data)
+            
+            self.assertEqual(stats["redacted_items"], 1)
+            self.assertEqual(stats["apply_paths"], {"full": 1})
+            self.assertNotIn("John Doe", self._text(output))
+            self.assertIn("applicant", self._text(output))
+    
+    def test_redact_stream(self):
+        """Test redacting between file objects, matching the path-based result."""
+        input_file = io.BytesIO(self.data)
+        output_file = io.BytesIO()
+        stats = self.redactor.redact_stream(input_file, output_file)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_path = os.path.join(temp_dir, "input.pdf")
+            output_path = os.path.join(temp_dir, "output.pdf")
+            with open(input_path, "wb") as pdf_file:
+                pdf_file.write(self.data)
+            path_stats = self.redactor.redact_pdf(input_path, output_path)
+            with open(output_path, "rb") as pdf_file:
+                path_text = self._text(pdf_file.read())
+        
+        # Timings differ from run to run
+        stats.pop("timings")
+        path_stats.pop("timings")
+        self.assertEqual(stats, path_stats)
+        self.assertEqual(self._text(output_file.getvalue()), path_text)
+        # The input buffer is released and usable again
+        input_file.write(b"%%EOF")
+    
+    def test_verify(self):
+        """Test that a verified run reports the redacted pages as clean."""
+        redactor = PDFRedactor(pii_detector=NameDetector(names=(), pattern=NAME_PATTERN), verify="fail")
+        redactor.language_detector.detect_document_language = lambda pages: "en"
+        
+        _, stats = redactor.redact_bytes(self.data)
+        
+        self.assertEqual(stats["verification"], {"pages_checked": 1, "leaks": []})
+    
+    def test_nothing_to_redact(self):
+        """Test that a PDF without PII is returned unchanged."""
+        self.redactor.pii_detector = NameDetector(names=(), pattern=NAME_PATTERN)
+        self.redactor.pii_detector.detect_pii = lambda text, language="en": []
+        output, stats = self.redactor.redact_bytes(self.data)
+        
+        self.assertEqual(output, self.data)
+        self.assertEqual(stats["redacted_items"], 0)
+
+    
+    def test_no_text(self):
+        """Test that a PDF without text, or a page selection without text, is written out unchanged."""
+        doc = fitz.open()
+        doc.new_page()
+        blank = doc.tobytes()
+        doc.close()
+        
+        output, stats = self.redactor.redact_bytes(blank)
+        self.assertEqual(output, blank)
+        self.assertEqual(stats["pages_processed"], 0)
+        
+        output_file = io.BytesIO()
+        self.redactor.redact_stream(io.BytesIO(blank), output_file)
+        self.assertEqual(output_file.getvalue(), blank)
+        
+        output, _ = asyncio.run(self.redactor.redact_bytes_async(blank))
+        self.assertEqual(output, blank)
+        
+        doc = fitz.open(stream=self.data, filetype="pdf")
+        doc.new_page()
+        data = doc.tobytes()
+        doc.close()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_path = os.path.join(temp_dir, "input.pdf")
+            output_path = os.path.join(temp_dir, "output.pdf")
+            with open(input_path, "wb") as pdf_file:
+                pdf_file.write(data)
+            self.redactor.redact_pdf(input_path, output_path, pages=[1])
+            with open(output_path, "rb") as pdf_file:
+                self.assertEqual(pdf_file.read(), data)
+
+
+class FakeAsyncOpenAI:
+    """Stand-in for openai.AsyncOpenAI that reports capitalized word pairs as names."""
+    
+    latency = 0.05
+    in_flight = 0
+    max_in_flight = 0
+    
+    def __init__(self, api_key=None):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    async def create(self, **kwargs):
+        cls = FakeAsyncOpenAI
+        cls.in_flight += 1
+        cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            await asyncio.sleep(cls.latency)
+        finally:
+            cls.in_flight -= 1
+        
+        text = kwargs["messages"][1]["content"].split("Text:\n", 1)[1]
+        content = json.dumps({"pii": NameDetector(names=(), pattern=NAME_PATTERN).detect_pii(text), "confidence": 0.9})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+class TestAsyncRedaction(unittest.TestCase):
+    """Test cases for the asyncio API, with a fake async OpenAI client."""
+    
+    def setUp(self):
+        """Create test documents and a redactor limited to two requests in flight."""
+        self.documents = []
+        for index in range(4):
+            doc = fitz.open()
+            for page_num in range(3):
+                doc.new_page().insert_text((50, 50), f"Page {page_num}: signed by John Doe{index} today.")
+            self.documents.append(doc.tobytes())
+            doc.close()
+        
+        FakeAsyncOpenAI.in_flight = 0
+        FakeAsyncOpenAI.max_in_flight = 0
+        patcher = mock.patch("openai.AsyncOpenAI", FakeAsyncOpenAI)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.redactor = PDFRedactor(openai_api_key="test", max_concurrent_requests=2)
+        self.redactor.language_detector.detect_document_language = lambda pages: "en"
+    
+    def test_documents_share_the_request_limit(self):
+        """Test that many documents run at once within the request limit."""
+        async def run():
+            return await asyncio.gather(*(self.redactor.redact_bytes_async(data) for data in self.documents))
+        
+        results = asyncio.run(run())
+        
+        self.assertEqual(FakeAsyncOpenAI.max_in_flight, 2)
+        for index, (output, stats) in enumerate(results):
+            self.assertEqual(stats["redacted_items"], 3)
+            text = fitz.open(stream=output, filetype="pdf")[2].get_text()
+            self.assertNotIn(f"John Doe{index}", text)
+            self.assertIn("signed by", text)
+    
+    def test_event_loop_is_not_blocked(self):
+        """Test that other coroutines keep running during redaction."""
+        ticks = []
+        
+        async def ticker(done):
+            while not done.is_set():
+                ticks.append(1)
+                await asyncio.sleep(0.005)
+        
+        async def run():
+            done = asyncio.Event()
+            task = asyncio.create_task(ticker(done))
+            await self.redactor.redact_bytes_async(self.documents[0])
+            done.set()
+            await task
+        
+        asyncio.run(run())
+        # Three pages at two requests in flight take two rounds of 50 ms
+        self.assertGreater(len(ticks), 10)
+    
+    def test_timeout(self):
+        """Test the per-document timeout."""
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(self.redactor.redact_bytes_async(self.documents[0], timeout=0.01))
+    
+    def test_cancellation(self):
+        """Test that cancelling a document cancels its requests."""
+        async def run():
+            task = asyncio.create_task(self.redactor.redact_bytes_async(self.documents[0]))
+            while not FakeAsyncOpenAI.in_flight:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        
+        asyncio.run(run())
+        self.assertEqual(FakeAsyncOpenAI.in_flight, 0)
+    
+    def test_sync_detectors_run_in_the_executor(self):
+        """Test detectors without analyze_async."""
+        self.redactor.pii_detector = NameDetector(names=(), pattern=NAME_PATTERN)
+        output, stats = asyncio.run(self.redactor.redact_bytes_async(self.documents[1]))
+        
+        self.assertEqual(stats["redacted_items"], 3)
+        self.assertNotIn("John Doe1", fitz.open(stream=output, filetype="pdf")[0].get_text())
+
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Tests for the result store.
+"""
+
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.result_store import ResultStore
+
+
+class TestResultStore(unittest.TestCase):
+    """Test cases for the result store."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = ResultStore(os.path.join(self.temp_dir.name, "results"),
+                                 max_bytes=250, ttl=60, janitor_interval=0.05)
+    
+    def tearDown(self):
+        """Clean up after tests."""
+        self.store.stop_janitor()
+        self.temp_dir.cleanup()
+    
+    def _put(self, key, size=100):
+        path = os.path.join(self.temp_dir.name, f"{key}.upload")
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return self.store.put(key, path, {"redacted_items": size})
+    
+    def test_make_key(self):
+        """Test that keys depend on the content hash and the options."""
+        key = ResultStore.make_key("abc", "gpt-4o")
+        
+        self.assertTrue(ResultStore.is_valid_key(key))
+        self.assertEqual(key, ResultStore.make_key("abc", "gpt-4o"))
+        self.assertNotEqual(key, ResultStore.make_key("abc", "gpt-4o-mini"))
+        self.assertFalse(ResultStore.is_valid_key("../etc/passwd"))
+    
+    def test_put_and_get(self):
+        """Test storing and retrieving a result."""
+        key = ResultStore.make_key("doc", "gpt-4o")
+        self._put(key)
+        
+        result = self.store.get(key)
+        self.assertEqual(result["stats"], {"redacted_items": 100})
+        self.assertTrue(os.path.exists(result["path"]))
+        self.assertIsNone(self.store.get(ResultStore.make_key("other", "gpt-4o")))
+    
+    def test_expired_entries_are_not_returned(self):
+        """Test the TTL."""
+        key = ResultStore.make_key("doc", "gpt-4o")
+        path = self._put(key)
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        
+        self.assertIsNone(self.store.get(key))
+        self.assertFalse(os.path.exists(path))
+    
+    def test_evict_least_recently_used(self):
+        """Test that eviction keeps the store within max_bytes, oldest first."""
+        keys = [ResultStore.make_key(f"doc{i}") for i in range(3)]
+        for i, key in enumerate(keys):
+            path = self._put(key)
+            os.utime(path, (time.time() - 30 + i, time.time() - 30 + i))
+        
+        # Using the oldest entry makes it the most recently used
+        self.assertIsNotNone(self.store.get(keys[0]))
+        
+        self.assertEqual(self.store.evict(), 1)
+        self.assertIsNotNone(self.store.get(keys[0]))
+        self.assertIsNone(self.store.get(keys[1]))
+        self.assertIsNotNone(self.store.get(keys[2]))
+    
+    def test_evict_during_put(self):
+        """Test that an eviction between the two writes of put() keeps the metadata."""
+        key = ResultStore.make_key("doc")
+        replace = os.replace
+        
+        def replace_then_evict(source, destination):
+            replace(source, destination)
+            if not evictions:
+                evictions.append(self.store.evict())
+        
+        evictions = []
+        with mock.patch("pdf_pii_redactor.result_store.os.replace", side_effect=replace_then_evict):
+            self._put(key)
+        
+        self.assertEqual(evictions, [0])
+        self.assertEqual(self.store.get(key)["stats"], {"redacted_items": 100})
+    
+    def test_orphaned_metadata_expires(self):
+        """Test that metadata without a PDF is only removed once expired, and is not served."""
+        keys = [ResultStore.make_key(f"doc{i}") for i in range(2)]
+        for key in keys:
+            os.unlink(self._put(key))
+        meta_paths = [os.path.join(self.store.root, f"{key}.json") for key in keys]
+        old = time.time() - 120
+        os.utime(meta_paths[0], (old, old))
+        
+        self.store.evict()
+        
+        self.assertFalse(os.path.exists(meta_paths[0]))
+        self.assertTrue(os.path.exists(meta_paths[1]))
+        self.assertIsNone(self.store.get(keys[1]))
+    
+    def test_results_are_stored_once_complete(self):
+        """Test that a PDF whose metadata is not written yet is not served."""
+        key = ResultStore.make_key("doc")
+        self._put(key)
+        os.unlink(os.path.join(self.store.root, f"{key}.json"))
+        
+        self.assertIsNone(self.store.get(key))
+    
+    def test_janitor_evicts_in_background(self):
+        """Test that the janitor thread runs the eviction."""
+        key = ResultStore.make_key("doc")
+        path = self._put(key)
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        
+        deadline = time.time() + 5
+        while os.path.exists(path) and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Tests for the tiered model routing.
+"""
+
+import os
+import time
+import tempfile
+import unittest
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.routing import TieredPIIDetector, summarize_routes
+from pdf_pii_redactor.redactor import PDFRedactor
+
+
+class FakeBackend:
+    """Local stand-in for a PIIDetector model with a fixed latency and behaviour."""
+    
+    def __init__(self, model, latency, confidence=0.9, fail_on=()):
+        self.model = model
+        self.latency = latency
+        self.confidence = confidence
+        self.fail_on = fail_on
+        self.calls = 0
+    
+    def analyze(self, text, language="en"):
+        self.calls += 1
+        time.sleep(self.latency)
+        if any(marker in text for marker in self.fail_on):
+            return {"pii": [], "ok": False, "error": "Expecting value: line 1 column 1",
+                    "confidence": None, "latency": self.latency, "model": self.model}
+        
+        pii = [{"type": "name", "value": word} for word in text.split() if word.istitle()]
+        confidence = 0.3 if "ambiguous" in text else self.confidence
+        return {"pii": pii, "ok": True, "error": None, "confidence": confidence,
+                "latency": self.latency, "model": self.model}
+
+
+class TestTieredPIIDetector(unittest.TestCase):
+    """Test cases for the tiered detector."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.cheap = FakeBackend("cheap", 0.001, fail_on=("garbled",))
+        self.strong = FakeBackend("strong", 0.01, confidence=0.99)
+        self.detector = TieredPIIDetector(self.cheap, self.strong, confidence_threshold=0.7)
+    
+    def test_confident_first_pass_is_accepted(self):
+        """Test that confident first-pass answers are not escalated."""
+        result = self.detector.analyze("a letter to Alice about nothing")
+        
+        self.assertEqual(result["model"], "cheap")
+        self.assertEqual(result["route"]["tiers"], ["first_pass"])
+        self.assertEqual(self.strong.calls, 0)
+        self.assertEqual([pii["value"] for pii in result["pii"]], ["Alice"])
+    
+    def test_low_confidence_is_escalated(self):
+        """Test escalation on low first-pass confidence."""
+        result = self.detector.analyze("an ambiguous note from Bob")
+        
+        self.assertEqual(result["model"], "strong")
+        self.assertEqual(result["route"]["tiers"], ["first_pass", "escalation"])
+        self.assertEqual(result["route"]["reason"], "low_confidence")
+        self.assertAlmostEqual(result["latency"], sum(result["route"]["latency"].values()))
+    
+    def test_parse_error_is_escalated(self):
+        """Test escalation when the first pass does not parse."""
+        result = self.detector.analyze("garbled page for Carol")
+        
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["route"]["reason"], "error")
+        self.assertEqual(result["model"], "strong")
+    
+    def test_high_risk_pages_skip_first_pass(self):
+        """Test that high-risk pages go straight to the strong model."""
+        detector = TieredPIIDetector(self.cheap, self.strong, risk_threshold=5.0)
+        result = detector.analyze("Mail John Doe at john@example.com or call (555) 123-4567")
+        
+        self.assertEqual(result["route"]["tiers"], ["escalation"])
+        self.assertEqual(result["route"]["reason"], "high_risk")
+        self.assertEqual(self.cheap.calls, 0)
+        
+        # Pages in languages that cannot be scored are treated as high risk
+        result = detector.analyze("请联系张伟", language="zh-cn")
+        self.assertEqual(result["route"]["reason"], "high_risk")
+        self.assertEqual(self.cheap.calls, 0)
+    
+    def test_summarize_routes(self):
+        """Test the aggregated routing statistics."""
+        routes = {
+            0: self.detector.analyze("a letter to Alice")["route"],
+            1: self.detector.analyze("an ambiguous note from Bob")["route"],
+            2: self.detector.analyze("garbled page for Carol")["route"],
+        }
+        summary = summarize_routes(routes)
+        
+        self.assertEqual(summary["first_pass_only"], 1)
+        self.assertEqual(summary["escalated"], 2)
+        self.assertEqual(summary["reasons"], {"low_confidence": 1, "error": 1})
+        self.assertEqual(summary["latency"]["first_pass"]["calls"], 3)
+        self.assertEqual(summary["latency"]["escalation"]["calls"], 2)
+        self.assertEqual(summary["decisions"][0], {"tiers": ["first_pass"], "reason": None})
+
+
+class TestRedactorRouting(unittest.TestCase):
+    """Test cases for routing statistics in the redactor."""
+    
+    def test_routing_stats(self):
+        """Test that routing decisions appear in the redaction statistics."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_path = os.path.join(temp_dir, "input.pdf")
+            doc = fitz.open()
+            doc.new_page().insert_text((50, 72), "This is a letter written to Alice in English.")
+            doc.new_page().insert_text((50, 72), "This is an ambiguous note written by Bob.")
+            doc.save(input_path)
+            doc.close()
+            
+            detector = TieredPIIDetector(FakeBackend("cheap", 0.001), FakeBackend("strong", 0.001))
+            redactor = PDFRedactor(pii_detector=detector)
+            stats = redactor.redact_pdf(input_path, os.path.join(temp_dir, "output.pdf"))
+        
+        self.assertEqual(stats["routing"]["first_pass_only"], 1)
+        self.assertEqual(stats["routing"]["escalated"], 1)
+        self.assertEqual(stats["routing"]["decisions"][1]["reason"], "low_confidence")
+        self.assertEqual(stats["redacted_items"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
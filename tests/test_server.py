@@ -0,0 +1,129 @@
+"""
+Tests for the pre-forking server.
+"""
+
+import os
+import time
+import tempfile
+import signal
+import threading
+import http.client
+import multiprocessing
+import unittest
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.server import PreforkServer
+
+
+def app(environ, start_response):
+    """WSGI app answering with its pid, after sleeping for the seconds given in the path."""
+    delay = float(environ["PATH_INFO"].strip("/") or 0)
+    time.sleep(delay)
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [str(os.getpid()).encode()]
+
+
+def preload():
+    """Mark the master as preloaded; forked workers inherit the mark."""
+    os.environ["TEST_SERVER_PRELOADED"] = str(os.getpid())
+
+
+def preloaded_app(environ, start_response):
+    """WSGI app answering with the mark left by preload()."""
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [os.environ.get("TEST_SERVER_PRELOADED", "").encode()]
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "The server forks its workers")
+class TestPreforkServer(unittest.TestCase):
+    """Test cases for PreforkServer."""
+
+    def _start(self, wsgi_app=app, **options):
+        server = PreforkServer(wsgi_app, host="127.0.0.1", port=0, **options)
+        process = multiprocessing.get_context("fork").Process(target=server.run)
+        process.start()
+        server.socket.close()
+        self.addCleanup(self._stop, process)
+        return server.port, process
+
+    def _stop(self, process):
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+        process.join(10)
+        if process.is_alive():
+            process.kill()
+
+    def _get(self, port, path="/", timeout=10):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            return response.status, response.read().decode()
+        finally:
+            connection.close()
+
+    def test_requests_are_spread_over_workers(self):
+        """Test that a busy worker leaves new requests to the others."""
+        port, _ = self._start(workers=2, threads=1)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self._get(port, "/0.5"))) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([status for status, _ in results], [200, 200])
+        self.assertEqual(len({pid for _, pid in results}), 2)
+
+    def test_preload_runs_once_before_forking(self):
+        """Test that workers inherit what the master preloaded."""
+        port, process = self._start(preloaded_app, workers=2, preload=preload)
+        self.assertEqual(self._get(port), (200, str(process.pid)))
+
+    def test_graceful_drain(self):
+        """Test that a request in flight completes when the server is stopped."""
+        port, process = self._start(workers=1)
+        self._get(port)
+        result = []
+        thread = threading.Thread(target=lambda: result.append(self._get(port, "/1")))
+        thread.start()
+        time.sleep(0.3)
+
+        os.kill(process.pid, signal.SIGTERM)
+        thread.join()
+        process.join(10)
+
+        self.assertEqual(result[0][0], 200)
+        self.assertEqual(process.exitcode, 0)
+        with self.assertRaises(OSError):
+            self._get(port)
+
+    def test_worker_exit_runs_in_each_worker(self):
+        """Test that the worker_exit hook runs in every worker when the server stops."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            def worker_exit():
+                open(os.path.join(temp_dir, str(os.getpid())), "w").close()
+
+            port, process = self._start(workers=2, worker_exit=worker_exit)
+            self._get(port)
+            os.kill(process.pid, signal.SIGTERM)
+            process.join(10)
+            self.assertEqual(len(os.listdir(temp_dir)), 2)
+
+    def test_timeout_restarts_worker(self):
+        """Test that a request over the timeout restarts its worker, which a new one replaces."""
+        port, _ = self._start(workers=1, timeout=0.5, graceful_timeout=0.5)
+        _, first_pid = self._get(port)
+
+        with self.assertRaises((http.client.HTTPException, OSError)):
+            self._get(port, "/30")
+
+        status, second_pid = self._get(port)
+        self.assertEqual(status, 200)
+        self.assertNotEqual(first_pid, second_pid)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Tests for the span interchange files and the apply phase.
+"""
+
+import os
+import json
+import tempfile
+import unittest
+import subprocess
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.spans import (
+    SPAN_FILE_VERSION, make_span, write_span_file, read_span_file, apply_span_file
+)
+
+
+class TestSpans(unittest.TestCase):
+    """Test cases for span files."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_pdf_path = os.path.join(self.temp_dir.name, "input.pdf")
+
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((50, 50), "Hello, my name is John Doe. My email is john.doe@example.com.")
+        doc.save(self.test_pdf_path)
+        doc.close()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.temp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def _output_text(self, path):
+        doc = fitz.open(path)
+        text = doc[0].get_text()
+        doc.close()
+        return text
+
+    def test_round_trip(self):
+        """Test writing and reading both span file layouts."""
+        spans = [
+            make_span(0, "name", "John Doe", start=18, end=26, rects=[[50, 40, 100, 55]]),
+            make_span(0, "email", "john.doe@example.com")
+        ]
+
+        for name in ("spans.json", "spans.jsonl"):
+            path = self._path(name)
+            write_span_file(path, spans, source="input.pdf", metadata={"language": "en"})
+            data = read_span_file(path)
+
+            self.assertEqual(data["version"], SPAN_FILE_VERSION)
+            self.assertEqual(data["source"], "input.pdf")
+            self.assertEqual(data["language"], "en")
+            self.assertEqual(data["spans"], spans)
+
+    def test_unsupported_version(self):
+        """Test that unknown span file versions are rejected."""
+        path = self._path("spans.json")
+        with open(path, "w") as f:
+            json.dump({"version": 99, "spans": []}, f)
+
+        with self.assertRaises(ValueError):
+            read_span_file(path)
+
+    def test_apply_span_file(self):
+        """Test applying spans with and without rects."""
+        path = self._path("spans.jsonl")
+        output_path = self._path("output.pdf")
+        write_span_file(path, [
+            make_span(0, "name", "John Doe"),
+            make_span(0, "email", "john.doe@example.com")
+        ])
+
+        stats = apply_span_file(self.test_pdf_path, path, output_path)
+
+        self.assertEqual(stats["spans"], 2)
+        self.assertEqual(stats["redacted_items"], 2)
+        text = self._output_text(output_path)
+        self.assertNotIn("John Doe", text)
+        self.assertNotIn("john.doe@example.com", text)
+        self.assertIn("Hello", text)
+
+    def test_apply_without_detector_dependencies(self):
+        """Test that the apply phase does not import openai or langdetect."""
+        path = self._path("spans.json")
+        output_path = self._path("output.pdf")
+        write_span_file(path, [make_span(0, "name", "John Doe")])
+
+        script = (
+            "import sys\n"
+            "sys.modules['openai'] = None\n"
+            "sys.modules['langdetect'] = None\n"
+            "from pdf_pii_redactor.main import main\n"
+            "main(['apply', sys.argv[1], sys.argv[2], sys.argv[3]])\n"
+        )
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        result = subprocess.run(
+            [sys.executable, "-c", script, self.test_pdf_path, path, output_path],
+            cwd=root, capture_output=True, text=True
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn("John Doe", self._output_text(output_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,231 @@
+"""
+Tests for streaming detection with incremental location and marking.
+"""
+
+import os
+import json
+import time
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor.streaming import IncrementalEntityParser, IncrementalRedaction
+from pdf_pii_redactor.pii_detector import PIIDetector
+from pdf_pii_redactor.redactor import PDFRedactor
+
+PAGE_TEXT = "Customer: John Doe\nEmail: john.doe@example.com\nPhone: 555-123-4567"
+
+
+def stream_chunks(content, chunk_size=8, delay=0.0, events=None):
+    """Build a fake create() returning the content as a stream of chunks."""
+    def create(**kwargs):
+        def generate():
+            for start in range(0, len(content), chunk_size):
+                time.sleep(delay)
+                delta = SimpleNamespace(content=content[start:start + chunk_size])
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+            if events is not None:
+                events.append(("stream_end", time.perf_counter()))
+            usage = SimpleNamespace(prompt_tokens=300, completion_tokens=60,
+                                    prompt_tokens_details=SimpleNamespace(cached_tokens=0))
+            yield SimpleNamespace(choices=[], usage=usage)
+        return generate()
+    return mock.Mock(side_effect=create)
+
+
+def verbose_response(text, values):
+    """Verbose JSON response listing the given (type, value) pairs of text."""
+    pii = [{"type": pii_type, "value": value, "start_index": text.index(value),
+            "end_index": text.index(value) + len(value)} for pii_type, value in values]
+    return json.dumps({"pii": pii, "confidence": 0.9})
+
+
+class TestIncrementalEntityParser(unittest.TestCase):
+    """Test cases for the incremental JSON parser."""
+
+    def test_entities_complete_as_their_objects_close(self):
+        """Test that each entity is returned by the chunk that closes it."""
+        content = '{"pii": [{"type": "name", "value": "John {Doe}"}, {"type": "email", "value": "a\\"@b.c"}], "confidence": 1}'
+        parser = IncrementalEntityParser()
+
+        completed = []
+        for index, char in enumerate(content):
+            for entity in parser.feed(char):
+                completed.append((index, entity))
+
+        self.assertEqual([entity for _, entity in completed], json.loads(content)["pii"])
+        self.assertEqual(content[completed[0][0]], "}")
+        self.assertLess(completed[0][0], content.index('{"type": "email"'))
+        self.assertEqual(parser.text, content)
+
+    def test_compact_entities(self):
+        """Test the compact response format."""
+        parser = IncrementalEntityParser()
+        entities = parser.feed('{"e": [{"t": "n", "s": 0, "x": 4}, {"t": "e"')
+        self.assertEqual(entities, [{"t": "n", "s": 0, "x": 4}])
+        self.assertEqual(parser.feed(', "s": 5, "x": 9}], "c": 0.8}'), [{"t": "e", "s": 5, "x": 9}])
+
+
+class TestStreamingDetector(unittest.TestCase):
+    """Test cases for PIIDetector with streaming, with a mocked API."""
+
+    def test_entities_are_reported_before_the_response_ends(self):
+        """Test that on_entity runs while the response is still streaming."""
+        events = []
+        content = verbose_response(PAGE_TEXT, [("name", "John Doe"), ("email", "john.doe@example.com")])
+        create = stream_chunks(content, events=events)
+        detector = PIIDetector(api_key="test", stream=True)
+
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            result = detector.analyze(PAGE_TEXT, on_entity=lambda pii: events.append((pii["value"], None)))
+
+        self.assertEqual([name for name, _ in events], ["John Doe", "john.doe@example.com", "stream_end"])
+        self.assertEqual(len(result["pii"]), 2)
+        self.assertEqual(result["usage"]["prompt_tokens"], 300)
+        self.assertTrue(create.call_args.kwargs["stream"])
+
+    def test_compact_offsets_refer_to_the_original_text(self):
+        """Test that streamed compact entities carry offsets in the page text."""
+        text = "Customer:    John Doe"
+        # Collapsed: "Customer: John Doe"
+        create = stream_chunks(json.dumps({"e": [{"t": "n", "s": 10, "x": 18}], "c": 0.9}))
+        detector = PIIDetector(api_key="test", response_format="compact", stream=True)
+
+        streamed = []
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            detector.analyze(text, on_entity=streamed.append)
+
+        self.assertEqual(len(streamed), 1)
+        self.assertEqual(text[streamed[0]["start_index"]:streamed[0]["end_index"]], "John Doe")
+
+    def test_compact_entities_are_reported_once_validated(self):
+        """Test that a compact response that falls back to verbose does not stream its entities."""
+        # The phone offsets point at "Email: john" and make the whole response fall back
+        compact = stream_chunks(json.dumps({"e": [{"t": "n", "s": 10, "x": 18}, {"t": "p", "s": 19, "x": 30}]}))
+        verbose = stream_chunks(verbose_response(PAGE_TEXT, [("name", "John Doe"), ("phone", "555-123-4567")]))
+        create = mock.Mock(side_effect=lambda **kwargs: (compact if create.call_count == 1 else verbose)(**kwargs))
+        detector = PIIDetector(api_key="test", response_format="compact", stream=True)
+
+        streamed = []
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            result = detector.analyze(PAGE_TEXT, on_entity=streamed.append)
+
+        self.assertTrue(result["fallback"])
+        self.assertEqual([pii["value"] for pii in streamed], ["John Doe", "555-123-4567"])
+
+
+class TestStreamingRedaction(unittest.TestCase):
+    """Test cases for streaming redaction of a document."""
+
+    def setUp(self):
+        """Create a test PDF."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "input.pdf")
+        self.output_path = os.path.join(self.temp_dir.name, "output.pdf")
+
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), PAGE_TEXT)
+        doc.save(self.input_path)
+        doc.close()
+
+        self.redactor = PDFRedactor(openai_api_key="test", stream=True)
+        self.redactor.language_detector.detect_document_language = lambda pages: "en"
+
+    def tearDown(self):
+        """Clean up the test files."""
+        self.temp_dir.cleanup()
+
+    def test_entities_are_marked_during_generation(self):
+        """Test that marking overlaps with generation and the output is redacted."""
+        events = []
+        original_add = IncrementalRedaction.add
+
+        def add(redaction, span):
+            span = original_add(redaction, span)
+            events.append(("marked", time.perf_counter()))
+            return span
+
+        text = fitz.open(self.input_path)[0].get_text()
+        content = verbose_response(text, [("name", "John Doe"), ("email", "john.doe@example.com"),
+                                          ("phone", "555-123-4567")])
+        create = stream_chunks(content, chunk_size=4, delay=0.002, events=events)
+
+        with mock.patch("openai.resources.chat.completions.Completions.create", create), \
+                mock.patch.object(IncrementalRedaction, "add", add):
+            stats = self.redactor.redact_pdf(self.input_path, self.output_path)
+
+        stream_end = dict(events)["stream_end"]
+        marked = [timestamp for name, timestamp in events if name == "marked"]
+        self.assertEqual(len(marked), 3)
+        self.assertLess(marked[0], stream_end)
+        self.assertEqual(stats["streaming"], {"entities_streamed": 3, "entities_after_response": 0})
+        self.assertEqual(stats["redacted_items"], 3)
+
+        redacted_text = fitz.open(self.output_path)[0].get_text()
+        for value in ("John Doe", "john.doe@example.com", "555-123-4567"):
+            self.assertNotIn(value, redacted_text)
+        self.assertIn("Customer:", redacted_text)
+
+    def test_repeated_entities_on_several_pages(self):
+        """Test that a value streamed at the same offsets on every page is redacted on every page."""
+        doc = fitz.open()
+        for _ in range(3):
+            doc.new_page().insert_text((72, 72), "John Doe, account holder")
+        doc.save(self.input_path)
+        doc.close()
+
+        text = fitz.open(self.input_path)[0].get_text()
+        content = verbose_response(text, [("name", "John Doe")])
+        create = mock.Mock(side_effect=lambda **kwargs: stream_chunks(content)(**kwargs))
+
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            stats = self.redactor.redact_pdf(self.input_path, self.output_path)
+
+        self.assertEqual(stats["redacted_items"], 3)
+        self.assertEqual(stats["streaming"], {"entities_streamed": 3, "entities_after_response": 0})
+        doc = fitz.open(self.output_path)
+        for page in doc:
+            self.assertNotIn("John Doe", page.get_text())
+            self.assertIn("account holder", page.get_text())
+        doc.close()
+
+    def test_verification_of_marked_pages(self):
+        """Test that a value marked at only one of its occurrences is reported as leaked."""
+        doc = fitz.open(self.input_path)
+        doc[0].insert_text((72, 300), "Contact John Doe")
+        data = doc.tobytes()
+        first = doc[0].search_for("John Doe")[0]
+        doc.close()
+
+        with IncrementalRedaction(data, verify="report") as redaction:
+            redaction.add({"page": 0, "type": "name", "value": "John Doe",
+                           "rects": [[first.x0, first.y0, first.x1, first.y1]]})
+            stats = redaction.save(self.output_path)
+        self.assertEqual(stats["verification"]["leaks"], [{"page": 0, "type": "name", "count": 1}])
+
+        with IncrementalRedaction(data, verify="fail") as redaction:
+            redaction.add({"page": 0, "type": "name", "value": "John Doe"})
+            stats = redaction.save(self.output_path)
+        self.assertEqual(stats["verification"]["leaks"], [])
+
+    def test_detect_spans_locates_streamed_entities(self):
+        """Test that streamed spans are located without marking the document."""
+        text = fitz.open(self.input_path)[0].get_text()
+        create = stream_chunks(verbose_response(text, [("name", "John Doe")]))
+
+        with mock.patch("openai.resources.chat.completions.Completions.create", create):
+            spans, stats = self.redactor.detect_spans(self.input_path)
+
+        self.assertEqual(len(spans), 1)
+        self.assertEqual(len(spans[0]["rects"]), 1)
+        self.assertEqual(stats["streaming"]["entities_streamed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
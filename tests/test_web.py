@@ -0,0 +1,165 @@
+"""
+Tests for the web interface.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import fitz
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_pii_redactor import web
+from pdf_pii_redactor.result_store import ResultStore
+from pdf_pii_redactor.audit import AuditStore
+
+
+class FakeRedactor:
+    """Stand-in for PDFRedactor that copies the input and counts calls."""
+    
+    calls = 0
+    pii_detector = None
+    
+    def __init__(self, *args, **kwargs):
+        pass
+    
+    def redact_pdf(self, input_path, output_path):
+        FakeRedactor.calls += 1
+        shutil.copyfile(input_path, output_path)
+        return {"redacted_items": 3, "pages_processed": 1}
+
+
+class TestWeb(unittest.TestCase):
+    """Test cases for the web interface."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = ResultStore(os.path.join(self.temp_dir.name, "results"))
+        self.patches = [
+            mock.patch.object(web, "RESULT_STORE", self.store),
+            mock.patch.object(web, "PDFRedactor", FakeRedactor),
+            mock.patch.dict(web.REDACTORS, clear=True),
+        ]
+        for patch in self.patches:
+            patch.start()
+        FakeRedactor.calls = 0
+        
+        web.app.config["TESTING"] = True
+        self.client = web.app.test_client()
+        
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "My name is John Doe.")
+        self.pdf_bytes = doc.tobytes()
+        doc.close()
+    
+    def tearDown(self):
+        """Clean up after tests."""
+        for patch in self.patches:
+            patch.stop()
+        self.store.stop_janitor()
+        self.temp_dir.cleanup()
+    
+    def _upload(self, model="gpt-4o"):
+        return self.client.post("/", data={
+            "file": (io.BytesIO(self.pdf_bytes), "letter.pdf"),
+            "model": model
+        }, content_type="multipart/form-data")
+    
+    def test_identical_uploads_are_processed_once(self):
+        """Test that a re-upload with the same model is served from the result store."""
+        first = self._upload()
+        second = self._upload()
+        
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(first.headers["Location"], second.headers["Location"])
+        self.assertIn("redacted_items=3", second.headers["Location"])
+        self.assertEqual(FakeRedactor.calls, 1)
+        
+        self._upload(model="gpt-3.5-turbo")
+        self.assertEqual(FakeRedactor.calls, 2)
+    
+    def test_result_survives_download(self):
+        """Test that downloading does not delete the stored result."""
+        location = self._upload().headers["Location"]
+        filename = location.split("/download/", 1)[1].split("?", 1)[0]
+        
+        for _ in range(2):
+            response = self.client.get(f"/get_file/{filename}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, self.pdf_bytes)
+            self.assertIn("letter.pdf", response.headers["Content-Disposition"])
+            response.close()
+    
+    def test_preflight_rejects_and_routes_to_the_slow_lane(self):
+        """Test that oversized uploads are rejected and large ones run in the slow lane."""
+        with mock.patch.dict(web.PREFLIGHT_LIMITS, {"max_pages": 0}):
+            response = self._upload()
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn("/download/", response.headers["Location"])
+        self.assertEqual(FakeRedactor.calls, 0)
+        
+        with mock.patch.dict(web.PREFLIGHT_LIMITS, {"slow_pages": 0}), \
+                mock.patch.object(web.SLOW_LANE, "run", side_effect=lambda func, *args: func(*args)) as run:
+            response = self._upload()
+        self.assertIn("/download/", response.headers["Location"])
+        run.assert_called_once()
+    
+    def test_redactors_are_shared_by_model(self):
+        """Test that requests reuse one redactor per model, created by preload() for the default model."""
+        web.preload()
+        self.assertEqual(list(web.REDACTORS), [web.DEFAULT_MODEL])
+        self.assertIs(web.get_redactor(web.DEFAULT_MODEL), web.REDACTORS[web.DEFAULT_MODEL])
+        self.assertIsNot(web.get_redactor("gpt-3.5-turbo"), web.REDACTORS[web.DEFAULT_MODEL])
+    
+    def test_unknown_models_are_rejected(self):
+        """Test that a model outside the allowlist gets no redactor."""
+        response = self._upload(model="attacker-model-1")
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn("/download/", response.headers["Location"])
+        self.assertEqual(FakeRedactor.calls, 0)
+        self.assertEqual(web.REDACTORS, {})
+        with self.assertRaises(ValueError):
+            web.get_redactor("attacker-model-2")
+    
+    def test_uploads_are_audited(self):
+        """Test that processed, cached and failed uploads are recorded in the audit store."""
+        audit_store = AuditStore(os.path.join(self.temp_dir.name, "audit.db"))
+        with mock.patch.object(web, "AUDIT_STORE", audit_store):
+            self._upload()
+            self._upload()
+            with mock.patch.object(FakeRedactor, "redact_pdf", side_effect=RuntimeError("API unavailable")):
+                self._upload(model="gpt-3.5-turbo")
+        audit_store.close()
+        
+        documents = audit_store.query()
+        self.assertEqual([document["status"] for document in documents], ["error", "cached", "ok"])
+        self.assertEqual({document["source"] for document in documents}, {"letter.pdf"})
+        self.assertEqual(documents[0]["error"], "API unavailable")
+        self.assertEqual(documents[1]["redacted_items"], 3)
+        self.assertEqual(documents[2]["model"], "gpt-4o")
+    
+    def test_redactor_errors_remove_the_upload(self):
+        """Test that a redactor that cannot be created is reported and leaves no upload behind."""
+        upload_folder = os.path.join(self.temp_dir.name, "uploads")
+        os.makedirs(upload_folder)
+        with mock.patch.object(FakeRedactor, "__init__", side_effect=ValueError("No API key")), \
+                mock.patch.dict(web.app.config, {"UPLOAD_FOLDER": upload_folder}):
+            response = self._upload()
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn("/download/", response.headers["Location"])
+        self.assertEqual(os.listdir(upload_folder), [])
+    
+    def test_unknown_result(self):
+        """Test that unknown or malformed result names are not served."""
+        response = self.client.get("/get_file/nothing_redacted_letter.pdf")
+        self.assertEqual(response.status_code, 302)
+
+
+if __name__ == "__main__":
+    unittest.main()